@@ -22,7 +22,7 @@ if src_path not in sys.path:
     sys.path.insert(0, src_path)
 
 from agents.configurable_investment_agent import ConfigurableInvestmentAgent
-from agents.multi_agent_investment_v2 import MultiAgentInvestmentAnalyzer
+from agents.multi_agent_investment_v2 import MultiAgentInvestmentAnalyzerV2
 
 # 加载环境变量
 load_dotenv()
@@ -33,7 +33,7 @@ class InvestmentCLI:
     def __init__(self):
         """初始化CLI"""
         self.config_agent = ConfigurableInvestmentAgent()
-        self.multi_agent = MultiAgentInvestmentAnalyzer()
+        self.multi_agent = MultiAgentInvestmentAnalyzerV2()
         
     def show_welcome(self):
         """显示欢迎界面"""
@@ -82,12 +82,9 @@ class InvestmentCLI:
             
         print(f"\n🔍 正在分析 {symbol}...")
         
-        # 这里可以调用多Agent分析
+        # 多Agent分析，各位大师的输出按窗格实时流式显示
         try:
-            # TODO: 实现具体的分析逻辑
-            print("💡 功能开发中，请使用 Web 界面进行分析")
-            print(f"   python apps/playground.py")
-            print(f"   然后访问: https://app.agno.com/playground")
+            self.multi_agent.analyze_stock_multi_master(symbol, stream_output=True)
         except Exception as e:
             print(f"❌ 分析失败: {e}")
             
@@ -120,7 +117,8 @@ class InvestmentCLI:
         print("💼 可用的投资大师:")
         for i, master in enumerate(available_masters, 1):
             master_info = self.config_agent.get_master_info(master)
-            print(f"{i}. {master_info['agent_name']} - {master_info['description']}")
+            bundle = self.config_agent.get_instruction_bundle(master)
+            print(f"{i}. {master_info['agent_name']} - {master_info['description']}（指令约{bundle.token_count} tokens）")
             
         print("\n💡 每位大师都有独特的投资哲学和分析方法")
         print("建议使用 Web 界面与大师们直接对话，获得个性化分析")
@@ -34,6 +34,9 @@ from agno.tools.yfinance import YFinanceTools
 from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.storage.sqlite import SqliteStorage
 
+from utils.model_router import create_routed_model
+from utils.prompt_cache import dated_instructions
+
 # 加载环境变量
 load_dotenv()
 
@@ -44,13 +47,9 @@ class InvestmentMasterTeam:
         """初始化投资大师团队"""
         self.storage_db = os.path.join(project_root, "data/agent_storage/investment_team.db")
         
-    def _create_model(self, model_id: str = "qwen-plus-latest") -> OpenAILike:
-        """创建模型实例"""
-        return OpenAILike(
-            id=model_id,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-            api_key=os.getenv("ALIYUN_API_KEY")
-        )
+    def _create_model(self, route: str = "master_analysis") -> OpenAILike:
+        """按任务路由创建模型实例（模型ID来自配置文件 model_config.routes）"""
+        return create_routed_model(route)
     
     def _create_tools(self) -> list:
         """创建工具集合"""
@@ -106,12 +105,11 @@ class InvestmentMasterTeam:
             role="价值投资分析专家",
             model=self._create_model(),
             tools=self._create_tools(),
-            instructions=instructions,
+            instructions=dated_instructions(instructions),
             storage=SqliteStorage(
                 table_name="buffett_agent", 
                 db_file=self.storage_db
             ),
-            add_datetime_to_instructions=True,
             markdown=True
         )
     
@@ -159,12 +157,11 @@ class InvestmentMasterTeam:
             role="多学科投资思维专家",
             model=self._create_model(),
             tools=self._create_tools(),
-            instructions=instructions,
+            instructions=dated_instructions(instructions),
             storage=SqliteStorage(
                 table_name="munger_agent", 
                 db_file=self.storage_db
             ),
-            add_datetime_to_instructions=True,
             markdown=True
         )
     
@@ -178,10 +175,10 @@ class InvestmentMasterTeam:
         team_leader = Team(
             name="🏆 巴菲特-芒格投资分析团队",
             mode="coordinate",  # 协调模式，让团队成员协作
-            model=self._create_model("qwen-max-latest"),  # 使用更强的模型作为团队领导
+            model=self._create_model("team_coordination"),  # 使用更强的模型作为团队领导
             members=[buffett_agent, munger_agent],
             tools=[ReasoningTools(add_instructions=True)],
-            instructions=[
+            instructions=dated_instructions([
                 "你是巴菲特-芒格投资分析团队的协调者，负责综合两位投资大师的观点。",
                 "",
                 "**团队协调原则：**",
@@ -204,11 +201,10 @@ class InvestmentMasterTeam:
                 "- 包含具体的目标价格区间",
                 "- 标注信息来源",
                 "- 使用Markdown格式，结构清晰"
-            ],
+            ]),
             markdown=True,
             show_members_responses=True,  # 显示团队成员的回应
             enable_agentic_context=True,  # 启用智能上下文
-            add_datetime_to_instructions=True,
             success_criteria="团队已成功提供综合的投资分析报告，包含两位大师的观点和团队建议。"
         )
         
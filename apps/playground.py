@@ -17,6 +17,7 @@ Agno AI 投资分析系统 - Agent Playground UI界面
 import os
 import sys
 import yaml
+from contextlib import asynccontextmanager
 from typing import List, Optional
 from dotenv import load_dotenv
 
@@ -29,13 +30,20 @@ if src_path not in sys.path:
 from agno.agent import Agent
 from agno.models.openai.like import OpenAILike
 from agno.playground import Playground, serve_playground_app
-from agno.storage.sqlite import SqliteStorage
 from agno.tools.reasoning import ReasoningTools
 from agno.tools.yfinance import YFinanceTools
-from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.team.team import Team
 
-from agents.configurable_investment_agent import ConfigurableInvestmentAgent
+from agents.configurable_investment_agent import ConfigurableInvestmentAgent, ConfigurableMultiAgentAnalyzer
+from utils.model_router import get_model_router
+from utils.prompt_cache import dated_instructions
+from utils.search_cache import create_search_tools
+from utils.replay import apply_tool_replay
+from utils.event_stream import create_sse_router
+from utils.history_manager import HistoryManager, HistoryWindowMemory, HistoryWindowAgent
+from utils.health import HealthMonitor, create_health_router
+from storage import get_storage_engine
+from storage.api import create_storage_router
 
 # 加载环境变量
 load_dotenv()
@@ -48,10 +56,21 @@ class InvestmentPlayground:
         self.config_agent = ConfigurableInvestmentAgent()
         # 加载配置文件
         self.config = self._load_config()
-        # 更新数据库路径为新的data目录
-        self.storage_db = os.path.join(project_root, "data/agent_storage/investment_agents.db")
+        # 所有Agent共用一个存储引擎（WAL、busy_timeout、连接池和批量写入队列），见配置 storage 段
+        self.storage_engine = get_storage_engine(self.config)
+        self.storage_db = self.storage_engine.db_file
+        # 过期会话由进程内的保留服务分批清理，策略见配置 storage.retention 段
+        self.storage_engine.retention.start()
+        # 会话库按 storage.backup 段定时在线备份
+        self.storage_engine.backups.start()
+        # 长会话的历史窗口：最近几轮原样保留，更早的轮次折叠为滚动摘要，见配置 history 段
+        self.history_manager = HistoryManager(**(self.config.get("history") or {}))
         self.agents = self._create_all_investment_agents()
         self.teams = self._create_investment_teams()
+        # GET /health 并发探测所有Agent/团队的会话存储并汇总存储指标，见配置 health 段
+        self.health_monitor = HealthMonitor(self.agents, self.teams, self.storage_engine, self.config.get("health"))
+        # 流式分析接口共用一个分析器（配置、因子引擎、搜索缓存），每个请求只新建本次的大师Agent
+        self.stream_analyzer = ConfigurableMultiAgentAnalyzer()
         
     def _load_config(self) -> dict:
         """加载配置文件"""
@@ -71,26 +90,16 @@ class InvestmentPlayground:
                 }
             }
     
-    def _create_model(self, model_id: Optional[str] = None) -> OpenAILike:
-        """创建模型实例，从配置文件加载模型ID"""
-        if model_id is None:
-            model_id = self.config.get("model_config", {}).get("default_model", "qwen-plus-2025-04-28")
+    def _create_model(self, route: str = "master_analysis", model_id: Optional[str] = None) -> OpenAILike:
+        """按任务路由创建模型实例，模型ID来自配置文件 model_config.routes"""
+        router = get_model_router(self.config)
+        print(f"🤖 创建模型: {model_id or router.route_config(route).model}（路由: {route}）")
         
-        print(f"🤖 创建模型: {model_id}")
-        
-        return OpenAILike(
-            id=model_id,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-            api_key=os.getenv("ALIYUN_API_KEY")
-        )
-    
-    def _get_team_coordinator_model(self) -> str:
-        """获取团队协调者模型ID"""
-        return self.config.get("model_config", {}).get("team_coordinator_model", "qwen-max-latest")
+        return router.create_model(route, model_id, self.config)
     
     def _create_tools(self) -> List:
         """创建工具集合"""
-        return [
+        tools = [
             ReasoningTools(add_instructions=True),
             YFinanceTools(
                 stock_price=True,
@@ -103,8 +112,9 @@ class InvestmentPlayground:
                 stock_fundamentals=True,
                 historical_prices=True
             ),
-            DuckDuckGoTools()
+            create_search_tools(self.config)
         ]
+        return apply_tool_replay(tools, self.config)
     
     def _create_warren_buffett_agent(self) -> Agent:
         """创建 Warren Buffett Agent（用于团队）"""
@@ -160,12 +170,8 @@ class InvestmentPlayground:
             role="价值投资分析专家，专注于企业内在价值评估和长期投资机会识别",
             model=self._create_model(),  # 使用配置文件中的默认模型
             tools=self._create_tools(),
-            instructions=instructions,
-            storage=SqliteStorage(
-                table_name="warren_buffett_team_agent", 
-                db_file=self.storage_db
-            ),
-            add_datetime_to_instructions=True,
+            instructions=dated_instructions(instructions),
+            storage=self.storage_engine.storage("warren_buffett_team_agent"),
             markdown=True,
             show_tool_calls=False  # 隐藏工具调用以保持输出简洁
         )
@@ -236,12 +242,8 @@ class InvestmentPlayground:
             role="多学科投资分析专家，专注于风险识别、逆向思考和认知偏误检查",
             model=self._create_model(),  # 使用配置文件中的默认模型
             tools=self._create_tools(),
-            instructions=instructions,
-            storage=SqliteStorage(
-                table_name="charlie_munger_team_agent", 
-                db_file=self.storage_db
-            ),
-            add_datetime_to_instructions=True,
+            instructions=dated_instructions(instructions),
+            storage=self.storage_engine.storage("charlie_munger_team_agent"),
             markdown=True,
             show_tool_calls=False  # 隐藏工具调用以保持输出简洁
         )
@@ -257,11 +259,11 @@ class InvestmentPlayground:
         investment_team = Team(
             name="🏆 巴菲特-芒格投资分析团队",
             mode="coordinate",  # 使用 coordinate 模式进行任务协调
-            model=self._create_model(self._get_team_coordinator_model()),  # 团队协调者使用更强的模型
+            model=self._create_model("team_coordination"),  # 团队协调者使用更强的模型
             members=[warren_buffett, charlie_munger],
             tools=[ReasoningTools(add_instructions=True)],
             description="专业的投资分析团队，结合巴菲特的价值投资理念和芒格的多学科思维，为用户提供全面的投资分析和建议。",
-            instructions=[
+            instructions=dated_instructions([
                 "你是巴菲特-芒格投资分析团队的协调者，负责协调两位投资大师的分析工作。",
                 "",
                 "**团队协调流程：**",
@@ -304,13 +306,12 @@ class InvestmentPlayground:
                 "- **投资时机**：[时机建议]",
                 "- **风险提示**：[主要风险]",
                 "- **持有期限**：[建议期限]"
-            ],
+            ]),
             markdown=True,
             show_tool_calls=False,  # 隐藏工具调用以保持输出简洁
             show_members_responses=False,  # 隐藏成员响应以避免暴露内部prompt
             enable_agentic_context=True,  # 启用智能上下文管理
             share_member_interactions=True,  # 启用成员间交互共享
-            add_datetime_to_instructions=True,
             success_criteria="团队已成功完成投资分析，提供了结构化的综合报告，包含两位大师的观点和最终建议。"
         )
         
@@ -322,39 +323,8 @@ class InvestmentPlayground:
     def _create_investment_agent(self, master_name: str) -> Agent:
         """创建单个投资大师 Agent"""
         master_info = self.config_agent.get_master_info(master_name)
-        
-        # 构建指令
-        instructions = [
-            f"你是{master_info['agent_name']}，{master_info['description']}",
-            "",
-            "**投资哲学：**"
-        ]
-        
-        for philosophy in master_info['investment_philosophy']:
-            instructions.append(f"- {philosophy}")
-        
-        instructions.append("")
-        instructions.append("**分析指导原则：**")
-        
-        for instruction in master_info['instructions']:
-            instructions.append(f"- {instruction}")
-        
-        instructions.append("")
-        style = master_info['style_characteristics']
-        instructions.append("**分析风格：**")
-        instructions.append(f"- 语言风格：{style['voice']}")
-        instructions.append(f"- 分析方法：{style['approach']}")
-        instructions.append(f"- 举例特点：{style['examples']}")
-        
-        instructions.extend([
-            "",
-            "**重要提示：**",
-            "- 总是提供具体的投资建议和风险评估",
-            "- 使用你独特的投资风格和语言特点",
-            "- 结合最新的市场数据进行分析",
-            "- 如果用户询问股票代码，务必使用金融工具获取最新数据",
-            "- 提供清晰的买入/卖出/持有建议及理由"
-        ])
+        # 与分析路径共用预编译的指令包，末尾附带对话场景的提示
+        bundle = self.config_agent.get_instruction_bundle(master_name)
         
         # 获取投资大师对应的emoji
         emoji_map = {
@@ -368,28 +338,22 @@ class InvestmentPlayground:
         }
         emoji = emoji_map.get(master_name, "💼")
         
-        # 创建SQLite存储，添加错误处理
+        # 会话表建在共享存储引擎上，添加错误处理
         try:
-            storage = SqliteStorage(
-                table_name=f"{master_name}_agent", 
-                db_file=self.storage_db
-            )
+            storage = self.storage_engine.storage(f"{master_name}_agent")
         except Exception as e:
             print(f"⚠️ 创建存储时出错 {master_name}: {e}")
             # 使用默认存储路径作为后备
             fallback_db = os.path.join(project_root, "data/agent_storage/fallback_agents.db")
-            storage = SqliteStorage(
-                table_name=f"{master_name}_agent", 
-                db_file=fallback_db
-            )
+            storage = get_storage_engine(self.config, db_file=fallback_db).storage(f"{master_name}_agent")
         
-        return Agent(
+        return HistoryWindowAgent(
             name=f"{emoji} {master_info['agent_name']}",
             model=self._create_model(),
             tools=self._create_tools(),
-            instructions=instructions,
+            instructions=dated_instructions(bundle.chat_instructions),
             storage=storage,
-            add_datetime_to_instructions=True,
+            memory=HistoryWindowMemory(self.history_manager),
             add_history_to_messages=True,
             num_history_responses=5,
             markdown=True,
@@ -457,16 +421,13 @@ class InvestmentPlayground:
             "- 如果用户询问具体股票，引导其选择合适的投资大师进行专业分析"
         ]
         
-        return Agent(
+        return HistoryWindowAgent(
             name="🎯 投资大师选择助手",
-            model=self._create_model(),
+            model=self._create_model("selector"),
             tools=self._create_tools(),
-            instructions=instructions,
-            storage=SqliteStorage(
-                table_name="master_selector_agent", 
-                db_file=self.storage_db
-            ),
-            add_datetime_to_instructions=True,
+            instructions=dated_instructions(instructions),
+            storage=self.storage_engine.storage("master_selector_agent"),
+            memory=HistoryWindowMemory(self.history_manager),
             add_history_to_messages=True,
             num_history_responses=3,
             markdown=True,
@@ -526,25 +487,42 @@ class InvestmentPlayground:
             "- 监控投资组合表现"
         ]
         
-        return Agent(
+        return HistoryWindowAgent(
             name="🏦 投资组合综合分析师",
             model=self._create_model(),
             tools=self._create_tools(),
-            instructions=instructions,
-            storage=SqliteStorage(
-                table_name="portfolio_agent", 
-                db_file=self.storage_db
-            ),
-            add_datetime_to_instructions=True,
+            instructions=dated_instructions(instructions),
+            storage=self.storage_engine.storage("portfolio_agent"),
+            memory=HistoryWindowMemory(self.history_manager),
             add_history_to_messages=True,
             num_history_responses=5,
             markdown=True,
             show_tool_calls=True
         )
     
+    def _stream_analysis(self, symbol: str, masters: Optional[List[str]] = None):
+        """多位大师的流式分析事件，供SSE接口使用（未知的大师抛出 ValueError，接口返回400）"""
+        available = self.config_agent.get_available_masters()
+        unknown = [m for m in masters or [] if m not in available]
+        if unknown:
+            raise ValueError(f"未知的投资大师: {', '.join(unknown)}（可选: {', '.join(available)}）")
+        agents = self.stream_analyzer.agent_factory.create_multi_agent_system(masters or available[:5])
+        return self.stream_analyzer.stream_multi_perspective(symbol, agents=agents)
+    
+    @asynccontextmanager
+    async def _lifespan(self, app):
+        """服务停止时等待会话写入队列落盘"""
+        yield
+        if not self.storage_engine.flush(timeout=10):
+            print("⚠️ 会话写入队列未能在10秒内落盘，进程退出时继续写入")
+
     def get_playground_app(self):
-        """获取 Playground 应用"""
-        return Playground(agents=self.agents, teams=self.teams).get_app()
+        """获取 Playground 应用（附带 /v1/investment/stream/{symbol} 流式分析接口、/v1/storage/metrics 存储指标和 /health 健康检查）"""
+        app = Playground(agents=self.agents, teams=self.teams).get_app(lifespan=self._lifespan)
+        app.include_router(create_sse_router(self._stream_analysis))
+        app.include_router(create_storage_router(self.storage_engine))
+        app.include_router(create_health_router(self.health_monitor))
+        return app
 
 def main():
     """主函数"""
@@ -585,6 +563,8 @@ def main():
         print("   - 多投资大师观点对比")
         print("   - 个性化投资建议")
         print("   - 历史对话记录")
+        print("   - 流式分析接口: GET http://localhost:7777/v1/investment/stream/AAPL (SSE)")
+        print("   - 存储指标: GET http://localhost:7777/v1/storage/metrics")
         print("   - Markdown 格式输出")
         print("   - 🏆 巴菲特-芒格投资分析团队")
         print("")
@@ -17,6 +17,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from src.agents.warren_buffett_agent_v2 import InvestmentMasterFactory
 from src.agents.multi_agent_investment_v2 import MultiAgentInvestmentAnalyzerV2
 from src.agents.configurable_investment_agent import ConfigurableInvestmentAgent
+from src.utils.screener import UniverseScreener, load_universe
 
 # 加载环境变量
 load_dotenv()
@@ -257,32 +258,51 @@ def magic_formula_screening():
     print("   - 系统化投资方法")
     print("   - 长期超额收益")
     
-    # 输入多只股票
-    stocks_input = input("\n请输入多只股票代码，用逗号分隔 (如 AAPL,MSFT,GOOGL): ").strip().upper()
+    # 输入股票池：逗号分隔的代码，或每行一个代码的股票池文件
+    stocks_input = input("\n请输入多只股票代码（逗号分隔）或股票池文件路径 (如 AAPL,MSFT,GOOGL): ").strip()
     if not stocks_input:
         stocks = ["AAPL", "MSFT", "GOOGL"]
         print("使用默认股票组合: AAPL, MSFT, GOOGL")
+    elif os.path.isfile(stocks_input):
+        stocks = load_universe(stocks_input)
+        print(f"从文件加载股票池: {len(stocks)} 只股票")
     else:
-        stocks = [s.strip() for s in stocks_input.split(",")]
+        stocks = [s.strip() for s in stocks_input.upper().split(",")]
+    
+    top_k_input = input("进入大师深度分析的候选数量 (默认 3): ").strip()
+    top_k = int(top_k_input) if top_k_input.isdigit() else 3
     
     try:
         print(f"\n🎯 启动魔法公式筛选")
-        print(f"📊 分析股票: {', '.join(stocks)}")
+        print(f"📊 股票池: {len(stocks)} 只股票")
         print(f"🔢 使用Joel Greenblatt魔法公式策略")
         print("=" * 60)
         
+        # 先在本地因子表上做量化筛选，只有Top-K候选才调用LLM
+        config_agent = ConfigurableInvestmentAgent()
+        screener = UniverseScreener(config_agent.config)
+        candidates = screener.screen(stocks, "joel_greenblatt", top_k=top_k)
+        print(screener.format_screen_result(candidates, "joel_greenblatt"))
+        
+        if candidates.empty:
+            print("❌ 没有股票通过魔法公式筛选")
+            return
+        
         # 创建Joel Greenblatt Agent
         greenblatt_agent = InvestmentMasterFactory.create_joel_greenblatt()
         
-        # 分析每只股票
+        # 深度分析筛选出的候选
         results = []
-        for stock in stocks:
+        for stock in candidates.index:
             print(f"\n🔍 分析股票: {stock}")
-            result = greenblatt_agent.analyze_stock(stock)
+            factor_table = screener.factor_engine.format_factor_table(
+                candidates.loc[[stock]], greenblatt_agent.precomputed_factors
+            )
+            result = greenblatt_agent.analyze_stock(stock, factor_table=factor_table)
             results.append(result)
         
         print(f"\n✅ 魔法公式筛选完成！")
-        print(f"📊 已分析 {len(stocks)} 只股票")
+        print(f"📊 已筛选 {len(stocks)} 只股票，深度分析 {len(results)} 只")
         
     except Exception as e:
         print(f"❌ 筛选失败: {e}")
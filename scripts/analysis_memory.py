@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+分析记忆工具
+从分析结果库同步/重建向量索引，查看某位大师分析某只股票时会附加哪些历史摘录，并测量检索耗时
+
+运行方式:
+    python scripts/analysis_memory.py sync
+    python scripts/analysis_memory.py rebuild
+    python scripts/analysis_memory.py stats
+    python scripts/analysis_memory.py search AAPL --master warren_buffett --query "护城河 自由现金流"
+    python scripts/analysis_memory.py bench --chunks 100000
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+from datetime import datetime
+
+import yaml
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from storage.results import get_result_store
+from utils.analysis_memory import get_analysis_memory, run_memory_benchmark, format_benchmark
+
+
+def load_config():
+    config_path = os.path.join(project_root, "src", "config", "investment_agents_config.yaml")
+    try:
+        with open(config_path, "r", encoding="utf-8") as file:
+            return yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析记忆：历史分析的向量索引")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("sync", help="索引结果库中新保存的分析")
+    commands.add_parser("rebuild", help="清空后重新索引结果库中的全部分析")
+    commands.add_parser("stats", help="索引规模")
+    search = commands.add_parser("search", help="检索一位大师分析某只股票时附加的历史摘录")
+    search.add_argument("symbol")
+    search.add_argument("--master", help="大师键名，如 warren_buffett")
+    search.add_argument("--query", help="查询文本，默认为股票代码")
+    search.add_argument("--k", type=int)
+    search.add_argument("--max-tokens", type=int)
+    bench = commands.add_parser("bench", help="用合成摘录测量检索耗时")
+    bench.add_argument("--chunks", type=int, default=100000)
+    bench.add_argument("--symbols", type=int, default=500)
+    bench.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"⏱️ 写入 {args.chunks} 段合成摘录并测量检索耗时...")
+            result = run_memory_benchmark(os.path.join(tmp, "memory.db"), chunks=args.chunks,
+                                          symbols=args.symbols, dim=args.dim)
+        print(format_benchmark(result))
+        return
+
+    config = load_config()
+    store = get_result_store(config)
+    memory = get_analysis_memory(config, store)
+    if memory is None:
+        print("❌ 分析记忆未启用（需要同时启用 results_store 和 analysis_memory）")
+        sys.exit(1)
+
+    if args.command == "sync":
+        print(f"✅ 新增 {memory.sync(store)} 段摘录，共 {memory.size} 段")
+    elif args.command == "rebuild":
+        print(f"✅ 已重建索引，共 {memory.rebuild(store)} 段摘录")
+    elif args.command == "stats":
+        for key, value in memory.stats().items():
+            print(f"   {key}: {value}")
+    elif args.command == "search":
+        hits = memory.retrieve(args.symbol, args.master, args.query, args.k, args.max_tokens)
+        if not hits:
+            print("📭 没有相关的历史摘录")
+        for hit in hits:
+            when = datetime.fromtimestamp(hit["created_at"]).strftime("%Y-%m-%d %H:%M")
+            print(f"\n🧠 {when}  {hit['symbol']}  {hit['master']}  得分 {hit['score']:.3f}  {hit['tokens']} tokens")
+            print(hit["text"])
+        if hits:
+            print(f"\n📊 共 {len(hits)} 段，{sum(hit['tokens'] for hit in hits)} tokens")
+
+
+if __name__ == "__main__":
+    main()
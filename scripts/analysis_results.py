@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+分析结果查询工具
+查看保存的多大师分析报告、每只股票最新的评分、按条件筛选和全文检索
+
+运行方式:
+    python scripts/analysis_results.py show AAPL
+    python scripts/analysis_results.py latest --symbols AAPL,MSFT,KO --master benjamin_graham
+    python scripts/analysis_results.py history AAPL --master warren_buffett --since 2025-05-01
+    python scripts/analysis_results.py query --master benjamin_graham --min-rating 8 --since 2025-05-01
+    python scripts/analysis_results.py search "自由现金流 护城河" --symbol AAPL
+    python scripts/analysis_results.py bench --symbols 500 --runs 25
+"""
+
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from storage.results import main
+
+if __name__ == "__main__":
+    main()
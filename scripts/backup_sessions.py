@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+会话库在线备份工具
+备份、列出和恢复会话库，并可测量备份对并发对话延迟的影响（恢复前需先停止 Playground）
+
+运行方式:
+    python scripts/backup_sessions.py backup
+    python scripts/backup_sessions.py list
+    python scripts/backup_sessions.py restore data/agent_storage/backups/investment_agents.20250525_101205_000.db.gz
+    python scripts/backup_sessions.py bench --sessions 2000 --chats 16
+"""
+
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from storage.backup import main
+
+if __name__ == "__main__":
+    main()
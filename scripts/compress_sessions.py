@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+会话压缩迁移工具
+把已有会话库中未压缩的 memory/runs 列压缩，并报告节省的空间和读取延迟（建议先停止 Playground）
+
+运行方式:
+    python scripts/compress_sessions.py --db data/agent_storage/investment_agents.db
+"""
+
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from storage.recompress import main
+
+if __name__ == "__main__":
+    main()
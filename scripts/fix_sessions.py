@@ -4,10 +4,60 @@ Session修复脚本 - 解决404 session not found错误
 """
 
 import sqlite3
-import os
 import sys
 from pathlib import Path
 
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from storage.engine import create_sqlite_engine
+from storage.migrations import run_migrations, current_version
+from storage.retention import RetentionService
+
+def load_retention_settings(project_root):
+    """读取配置文件中的 storage.retention 段"""
+    config_path = project_root / "src" / "config" / "investment_agents_config.yaml"
+    with open(config_path, 'r', encoding='utf-8') as file:
+        config = yaml.safe_load(file) or {}
+    return (config.get("storage") or {}).get("retention") or {}
+
+def clean_sessions(engine, project_root, hours=None):
+    """
+    按保留策略分批清理过期session（与 Playground 内的保留服务相同）
+
+    Args:
+        engine: 已执行迁移的数据库引擎
+        project_root: 项目根目录
+        hours: 指定时所有会话表统一清理该小时数之前的会话（先归档），否则按配置的逐表策略
+    """
+    settings = load_retention_settings(project_root)
+    if hours is not None:
+        settings = {**settings, "default": {"max_age_hours": hours, "archive": True}, "tables": {}}
+    stats = RetentionService(engine, settings).run_once()
+    for table_name, deleted in stats["deleted"].items():
+        print(f"   🗑️  表 {table_name}: 清理了 {deleted} 条过期记录")
+    print(f"✅ 数据库清理完成，共 {sum(stats['deleted'].values())} 条（归档 {stats['archived']} 条）")
+    return stats
+
+def clean_expired_sessions(hours=None):
+    """只清理过期session，不做表结构检查和 VACUUM，可在 Playground 运行时执行"""
+    project_root = Path(__file__).parent.parent
+    db_path = project_root / "data" / "agent_storage" / "investment_agents.db"
+    if not db_path.exists():
+        print(f"❌ 数据库文件不存在: {db_path}")
+        return False
+    
+    engine = create_sqlite_engine(str(db_path))
+    try:
+        run_migrations(engine)
+        clean_sessions(engine, project_root, hours)
+    except Exception as e:
+        print(f"❌ 数据库清理失败: {e}")
+        return False
+    finally:
+        engine.dispose()
+    return True
+
 def fix_sessions():
     """修复session相关问题"""
     
@@ -31,30 +81,23 @@ def fix_sessions():
         tables = cursor.fetchall()
         print(f"✅ 找到表: {[table[0] for table in tables]}")
         
-        # 清理过期或无效的session记录
-        print("🧹 清理无效session记录...")
+        # 补齐会话索引和 schema_version（已执行过的迁移会跳过）
+        engine = create_sqlite_engine(str(db_path))
+        run_migrations(engine)
+        with engine.connect() as migrated:
+            print(f"✅ 数据库迁移版本: {current_version(migrated)}")
         
-        for table_name, in tables:
-            if 'agent' in table_name.lower():
-                try:
-                    # 检查表结构
-                    cursor.execute(f"PRAGMA table_info({table_name});")
-                    columns = [col[1] for col in cursor.fetchall()]
-                    print(f"   表 {table_name}: {columns}")
-                    
-                    # 如果有session相关字段，清理旧数据
-                    if 'session_id' in columns:
-                        cursor.execute(f"DELETE FROM {table_name} WHERE created_at < datetime('now', '-7 days');")
-                        deleted = cursor.rowcount
-                        if deleted > 0:
-                            print(f"   🗑️  清理了 {deleted} 条过期记录")
-                    
-                except Exception as e:
-                    print(f"   ⚠️  处理表 {table_name} 时出错: {e}")
+        # 按配置的保留策略分批清理（与 Playground 内的保留服务相同）
+        print("🧹 按保留策略清理过期session记录...")
+        clean_sessions(engine, project_root)
+        engine.dispose()
         
-        # 提交更改
-        conn.commit()
-        print("✅ 数据库清理完成")
+        # 旧库切换到 auto_vacuum=INCREMENTAL，之后由保留服务分批回收空闲页
+        cursor.execute("PRAGMA auto_vacuum;")
+        if cursor.fetchone()[0] != 2:
+            print("🗜️  切换为增量回收并整理数据库（VACUUM）...")
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+            cursor.execute("VACUUM;")
         
     except Exception as e:
         print(f"❌ 数据库操作失败: {e}")
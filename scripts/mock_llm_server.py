@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+启动本地 OpenAI 兼容模拟服务器
+用于在没有真实模型服务的情况下压测并发、限流和缓存路径
+
+运行方式:
+    python scripts/mock_llm_server.py --port 8000 --latency "lognormal:-1.0,0.4" --tps 60
+"""
+
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from utils.mock_llm_server import main
+
+if __name__ == "__main__":
+    main()
@@ -1,116 +1,70 @@
 #!/usr/bin/env python3
 """
 Session监控和自动恢复脚本
-监控playground运行状态，自动处理session错误
+读取playground的 /health 接口监控运行状态（探测在服务进程内并发执行），自动处理session错误
 """
 
 import requests
 import time
-import sqlite3
-import os
 import sys
 from pathlib import Path
-import json
-from datetime import datetime, timedelta
+from datetime import datetime
+
+# 数据库清理由 fix_sessions.py 负责，这里只是 /health 接口的客户端
+sys.path.insert(0, str(Path(__file__).parent))
+from fix_sessions import clean_expired_sessions
 
 class SessionMonitor:
     def __init__(self):
         self.base_url = "http://localhost:7777"
-        self.project_root = Path(__file__).parent.parent
-        self.db_path = self.project_root / "data" / "agent_storage" / "investment_agents.db"
+        # 所有请求复用同一个连接
+        self.http = requests.Session()
         
-    def check_service_health(self):
-        """检查服务健康状态"""
+    def get_health(self, refresh=False):
+        """获取服务的 /health 检查结果（服务不可用时返回None）"""
         try:
-            response = requests.get(f"{self.base_url}/v1/playground/status", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
-    
-    def get_agents(self):
-        """获取agent列表"""
-        try:
-            response = requests.get(f"{self.base_url}/v1/playground/agents", timeout=10)
-            if response.status_code == 200:
+            response = self.http.get(f"{self.base_url}/health", params={"refresh": str(refresh).lower()}, timeout=30)
+            if response.status_code in (200, 503):
                 return response.json()
-            return []
-        except:
-            return []
+            return None
+        except requests.RequestException:
+            return None
     
-    def clean_expired_sessions(self, hours=24):
-        """清理过期的session记录"""
-        if not self.db_path.exists():
-            return False
+    def check_service_health(self):
+        """检查服务健康状态"""
+        health = self.get_health()
+        return health is not None and health["status"] != "down"
+    
+    def print_health(self, health):
+        """打印各Agent的探测结果和存储状态"""
+        icons = {"ok": "✅", "slow": "🐢", "error": "❌", "no_storage": "⚪"}
+        print(f"🏥 整体状态: {health['status']}（检查耗时 {health['duration_ms']:.0f}ms）")
+        for result in health["agents"].values():
+            latency = f"{result['latency_ms']:.1f}ms" if result.get("latency_ms") is not None else "-"
+            if result["status"] == "no_storage":
+                detail = "未启用存储"
+            else:
+                detail = result.get("error") or f"{result['sessions']} 个会话"
+            print(f"   {icons.get(result['status'], '❔')} {result['name']}: {latency}，{detail}")
         
-        try:
-            conn = sqlite3.connect(str(self.db_path))
-            cursor = conn.cursor()
-            
-            # 获取所有agent表
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '%agent%';")
-            tables = cursor.fetchall()
-            
-            total_cleaned = 0
-            cutoff_time = datetime.now() - timedelta(hours=hours)
-            cutoff_str = cutoff_time.strftime('%Y-%m-%d %H:%M:%S')
-            
-            for table_name, in tables:
-                try:
-                    # 检查表是否有created_at字段
-                    cursor.execute(f"PRAGMA table_info({table_name});")
-                    columns = [col[1] for col in cursor.fetchall()]
-                    
-                    if 'created_at' in columns:
-                        cursor.execute(f"DELETE FROM {table_name} WHERE created_at < ?;", (cutoff_str,))
-                        cleaned = cursor.rowcount
-                        total_cleaned += cleaned
-                        if cleaned > 0:
-                            print(f"   清理表 {table_name}: {cleaned} 条记录")
-                except Exception as e:
-                    print(f"   警告: 清理表 {table_name} 时出错: {e}")
-            
-            conn.commit()
-            conn.close()
-            
-            print(f"✅ 总共清理了 {total_cleaned} 条过期记录")
-            return True
-            
-        except Exception as e:
-            print(f"❌ 数据库清理失败: {e}")
-            return False
+        storage = health["storage"]
+        if storage.get("status") == "error":
+            print(f"   ❌ 存储: {storage.get('error')}")
+        elif storage.get("status") != "disabled":
+            queue = storage["write_queue"]
+            print(f"   💾 存储: 连接 {storage['ping_ms']:.1f}ms，数据库 {storage['db_bytes'] / 1024:.0f} KB，"
+                  f"WAL {storage['wal_bytes'] / 1024:.0f} KB，队列 {queue['queue_depth']} 个"
+                  f"（落盘延迟P95 {queue['commit_lag_ms']['p95']:.1f}ms）")
     
     def test_agent_sessions(self):
-        """测试所有agent的session创建"""
-        agents = self.get_agents()
-        if not agents:
-            print("❌ 无法获取agent列表")
+        """通过 /health 测试所有agent的session存储"""
+        health = self.get_health(refresh=True)
+        if health is None:
+            print("❌ 服务不可用")
             return False
         
-        print(f"🧪 测试 {len(agents)} 个agents...")
-        
-        failed_agents = []
-        for agent in agents:
-            agent_id = agent.get('id')
-            agent_name = agent.get('name', 'Unknown')
-            
-            try:
-                # 测试获取sessions
-                response = requests.get(
-                    f"{self.base_url}/v1/playground/agents/{agent_id}/sessions",
-                    params={"user_id": "test_user"},
-                    timeout=10
-                )
-                
-                if response.status_code != 200:
-                    failed_agents.append(agent_name)
-                    print(f"   ❌ {agent_name}: HTTP {response.status_code}")
-                else:
-                    print(f"   ✅ {agent_name}: 正常")
-                    
-            except Exception as e:
-                failed_agents.append(agent_name)
-                print(f"   ❌ {agent_name}: {e}")
-        
+        self.print_health(health)
+        failed_agents = [result["name"] for result in health["agents"].values() if result["status"] == "error"]
         if failed_agents:
             print(f"\n⚠️  {len(failed_agents)} 个agents有问题: {', '.join(failed_agents)}")
             return False
@@ -122,9 +76,9 @@ class SessionMonitor:
         """自动修复session问题"""
         print("🔧 开始自动修复...")
         
-        # 1. 清理过期sessions
+        # 1. 按保留策略清理过期sessions
         print("1. 清理过期sessions...")
-        self.clean_expired_sessions(hours=6)  # 清理6小时前的记录
+        clean_expired_sessions()
         
         # 2. 测试agents
         print("\n2. 测试agent状态...")
@@ -138,7 +92,7 @@ class SessionMonitor:
         return True
     
     def monitor_loop(self, interval=300):  # 5分钟检查一次
-        """持续监控循环"""
+        """持续监控循环（每次读取 /health，探测在服务进程内并发执行）"""
         print(f"🔍 开始监控playground服务 (每{interval}秒检查一次)")
         print("按 Ctrl+C 停止监控")
         
@@ -146,17 +100,13 @@ class SessionMonitor:
             while True:
                 print(f"\n⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - 健康检查")
                 
-                if not self.check_service_health():
+                health = self.get_health()
+                if health is None:
                     print("❌ 服务不可用")
                     time.sleep(30)  # 服务不可用时等待短一些
                     continue
                 
-                # 定期清理session
-                if datetime.now().minute % 30 == 0:  # 每30分钟清理一次
-                    print("🧹 定期清理过期sessions...")
-                    self.clean_expired_sessions(hours=24)
-                
-                print("✅ 服务正常运行")
+                self.print_health(health)
                 time.sleep(interval)
                 
         except KeyboardInterrupt:
@@ -170,15 +120,20 @@ def main():
         
         if cmd == "health":
             print("🏥 检查服务健康状态...")
-            if monitor.check_service_health():
-                print("✅ 服务正常运行")
-            else:
+            health = monitor.get_health(refresh=True)
+            if health is None:
                 print("❌ 服务不可用")
+            else:
+                monitor.print_health(health)
                 
         elif cmd == "clean":
-            hours = int(sys.argv[2]) if len(sys.argv) > 2 else 24
-            print(f"🧹 清理 {hours} 小时前的session记录...")
-            monitor.clean_expired_sessions(hours)
+            if len(sys.argv) > 2:
+                hours = int(sys.argv[2])
+                print(f"🧹 清理 {hours} 小时前的session记录...")
+                clean_expired_sessions(hours)
+            else:
+                print("🧹 按保留策略清理过期session记录...")
+                clean_expired_sessions()
             
         elif cmd == "test":
             print("🧪 测试所有agent sessions...")
@@ -206,11 +161,11 @@ def print_usage():
 🛠️  Session监控工具使用说明：
 
 命令:
-  health     - 检查服务健康状态
-  clean [小时] - 清理指定小时前的session记录 (默认24小时)
+  health     - 检查服务健康状态 (GET /health：各agent存储探测延迟和存储指标)
+  clean [小时] - 清理指定小时前的session记录 (不指定时按配置的保留策略)
   test       - 测试所有agent的session功能
   fix        - 自动修复session问题
-  monitor    - 开始持续监控 (Ctrl+C停止)
+  monitor    - 开始持续监控 (Ctrl+C停止；过期session由Playground内的保留服务清理)
 
 示例:
   python scripts/session_monitor.py health
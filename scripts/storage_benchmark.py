@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+会话存储并发基准测试
+对比每个Agent独立引擎与共享引擎+写入队列在并发对话下的吞吐和失败率
+
+运行方式:
+    python scripts/storage_benchmark.py --chats 32 --turns 50
+"""
+
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from storage.benchmark import main
+
+if __name__ == "__main__":
+    main()
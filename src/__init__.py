@@ -9,6 +9,7 @@ Provides structured, professional-grade investment reports and recommendations.
 - agents: 投资大师Agent实现
 - config: 配置文件和设置
 - utils: 工具函数和通用代码
+- storage: 共享SQLite存储引擎和会话批量写入
 """
 
 __version__ = "2.0.0"
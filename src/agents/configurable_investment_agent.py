@@ -4,14 +4,27 @@
 """
 
 import os
+import sys
 import yaml
-from typing import Dict, List, Any, Optional
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Iterator
 from dotenv import load_dotenv
 from agno.agent import Agent
-from agno.models.openai.like import OpenAILike
 from agno.tools.reasoning import ReasoningTools
 from agno.tools.yfinance import YFinanceTools
-from agno.tools.duckduckgo import DuckDuckGoTools
+
+# 导入工具模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.model_router import create_routed_model, get_model_router
+from utils.fundamentals import FundamentalsFactorEngine, fetch_yfinance_fundamentals
+from utils.search_cache import create_search_tools, get_shared_search_cache, NewsDigestStore
+from utils.replay import apply_tool_replay, get_tool_replayer
+from utils.analysis_schema import build_master_schema, parse_structured, render_markdown
+from utils.event_stream import StreamEvent, iter_agent_events, merge_streams, START, DONE, ERROR, COMPLETE
+from utils.prompt_cache import assemble_prompt
+from utils.instruction_bundle import compile_master_bundle, InstructionBundle
 
 # 加载环境变量
 load_dotenv()
@@ -59,7 +72,7 @@ class ConfigurableInvestmentAgent:
         
         Args:
             master_name: 投资大师名称
-            model_id: 模型ID，如果不指定则使用默认模型
+            model_id: 模型ID，如果不指定则使用 master_analysis 路由的模型
             
         Returns:
             InvestmentMasterAgent实例
@@ -68,7 +81,7 @@ class ConfigurableInvestmentAgent:
             raise ValueError(f"未知的投资大师: {master_name}. 可用选项: {self.available_masters}")
         
         master_config = self.config['investment_masters'][master_name]
-        model_id = model_id or self.config['model_config']['default_model']
+        model_id = model_id or get_model_router(self.config).route_config('master_analysis').model
         
         return InvestmentMasterAgent(master_config, model_id, self.config)
     
@@ -102,6 +115,18 @@ class ConfigurableInvestmentAgent:
             raise ValueError(f"未知的投资大师: {master_name}")
         
         return self.config['investment_masters'][master_name]
+    
+    def get_instruction_bundle(self, master_name: str) -> InstructionBundle:
+        """
+        获取投资大师预编译的指令包
+        
+        Args:
+            master_name: 投资大师名称
+            
+        Returns:
+            指令包（渲染后的指令、分析框架、token数和内容哈希）
+        """
+        return compile_master_bundle(self.get_master_info(master_name))
 
 class InvestmentMasterAgent:
     """
@@ -122,21 +147,33 @@ class InvestmentMasterAgent:
         self.model_id = model_id
         self.global_config = global_config
         
-        # 创建模型
-        model = OpenAILike(
-            id=model_id,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-            api_key=os.getenv("ALIYUN_API_KEY")
-        )
+        # 创建模型（master_analysis 路由：延迟逼近SLO时自动切换备用模型）
+        model = create_routed_model('master_analysis', global_config, model_id)
+        
+        # 结构化输出：模型按大师Schema返回JSON（json模式或原生json_schema）
+        structured_config = global_config.get('structured_output', {})
+        self.structured = structured_config.get('enabled', False)
+        self.response_schema = build_master_schema(master_config) if self.structured else None
+        structured_kwargs = {}
+        if self.structured:
+            structured_kwargs = {
+                'response_model': self.response_schema,
+                'use_json_mode': structured_config.get('mode', 'json') == 'json',
+                'structured_outputs': structured_config.get('mode', 'json') == 'native',
+            }
+        
+        # 指令和分析框架按配置内容预编译，同一份配置的所有Agent共用
+        self.bundle = compile_master_bundle(master_config)
         
         # 创建Agent
         self.agent = Agent(
             name=master_config['agent_name'],
             model=model,
             tools=self._create_tools(),
-            instructions=self._build_instructions(),
-            markdown=global_config['analysis_output']['format'] == 'markdown',
-            show_tool_calls=global_config['analysis_output']['show_tool_calls']
+            instructions=list(self.bundle.instructions),
+            markdown=global_config['analysis_output']['format'] == 'markdown' and not self.structured,
+            show_tool_calls=global_config['analysis_output']['show_tool_calls'],
+            **structured_kwargs
         )
         
         # 投资大师信息
@@ -145,6 +182,7 @@ class InvestmentMasterAgent:
         self.investment_philosophy = master_config['investment_philosophy']
         self.analysis_framework = master_config['analysis_framework']
         self.style_characteristics = master_config['style_characteristics']
+        self.precomputed_factors = master_config.get('precomputed_factors', [])
     
     def _create_tools(self) -> List:
         """创建工具列表"""
@@ -166,58 +204,38 @@ class InvestmentMasterAgent:
             historical_prices=True
         ))
         
-        # 添加搜索工具
-        tools.append(DuckDuckGoTools())
+        # 添加搜索工具（启用search_cache时多个Agent共享同一份缓存）
+        tools.append(create_search_tools(self.global_config))
         
-        return tools
+        # 启用录制/回放时替换外部数据工具的调用
+        return apply_tool_replay(tools, self.global_config)
     
-    def _build_instructions(self) -> List[str]:
-        """构建Agent指令"""
-        instructions = []
-        
-        # 添加基本身份和描述
-        instructions.append(f"你是{self.master_config['agent_name']}，{self.master_config['description']}")
-        instructions.append("")
-        
-        # 添加投资哲学
-        instructions.append("**投资哲学：**")
-        for philosophy in self.master_config['investment_philosophy']:
-            instructions.append(f"- {philosophy}")
-        instructions.append("")
-        
-        # 添加具体指令
-        instructions.append("**分析指导原则：**")
-        for instruction in self.master_config['instructions']:
-            instructions.append(f"- {instruction}")
-        instructions.append("")
-        
-        # 添加风格特征
-        style = self.master_config['style_characteristics']
-        instructions.append("**分析风格：**")
-        instructions.append(f"- 语言风格：{style['voice']}")
-        instructions.append(f"- 分析方法：{style['approach']}")
-        instructions.append(f"- 举例特点：{style['examples']}")
-        
-        return instructions
-    
-    def analyze_stock(self, symbol: str, show_reasoning: bool = True) -> Dict[str, Any]:
+    def analyze_stock(self, symbol: str, show_reasoning: bool = True,
+                      factor_table: Optional[str] = None,
+                      news_digest: Optional[str] = None,
+                      memory_context: Optional[str] = None) -> Dict[str, Any]:
         """
         分析股票
         
         Args:
             symbol: 股票代码
             show_reasoning: 是否显示推理过程
+            factor_table: 预计算的量化因子表（Markdown），由因子引擎生成
+            news_digest: 本次运行共享的新闻摘要，由 NewsDigestStore 生成
+            memory_context: 相关的历史分析摘录，由 AnalysisMemory 检索
             
         Returns:
             分析结果字典
         """
-        prompt = self._build_analysis_prompt(symbol)
+        prompt = self._build_analysis_prompt(symbol, factor_table, news_digest, memory_context)
         
         print(f"\n{self._get_agent_emoji()} {self.agent_name}分析: {symbol}")
         print("=" * 60)
 
+        # 显式关闭流式：agno 会沿用上一次 run 的 stream 设置
         response = self.agent.run(
-            prompt
+            prompt,
+            stream=False
         )
         
         # 处理RunResponse对象，提取字符串内容
@@ -230,51 +248,92 @@ class InvestmentMasterAgent:
         else:
             # 如果没有这些属性，尝试转换为字符串
             analysis_text = str(response)
+        
+        return self._build_result(symbol, analysis_text)
+    
+    def analyze_stock_stream(self, symbol: str, factor_table: Optional[str] = None,
+                             news_digest: Optional[str] = None,
+                             memory_context: Optional[str] = None) -> Iterator[StreamEvent]:
+        """
+        流式分析股票
+        
+        Args:
+            symbol: 股票代码
+            factor_table: 预计算的量化因子表（Markdown）
+            news_digest: 本次运行共享的新闻摘要
+            memory_context: 相关的历史分析摘录
+            
+        Yields:
+            start、token、tool_call、tool_result 事件，最后是 data 为完整分析结果的 done 事件
+        """
+        prompt = self._build_analysis_prompt(symbol, factor_table, news_digest, memory_context)
+        yield StreamEvent(START, self.agent_name, symbol, self.description)
+        
+        chunks: List[str] = []
+        run_stream = self.agent.run(prompt, stream=True, stream_intermediate_steps=True)
+        yield from iter_agent_events(run_stream, self.agent_name, symbol, collected=chunks)
+        
+        result = self._build_result(symbol, "".join(chunks))
+        yield StreamEvent(DONE, self.agent_name, symbol, result["analysis"], data=result)
+    
+    def _build_result(self, symbol: str, analysis_text: Any) -> Dict[str, Any]:
+        """把模型输出整理为分析结果字典"""
+        # 结构化输出：保留字段供压缩/综合/排名直接读取，analysis 用渲染后的Markdown
+        structured = None
+        if self.structured:
+            structured = parse_structured(analysis_text, self.response_schema)
+            if structured:
+                analysis_text = render_markdown(structured)
+            else:
+                print(f"⚠️ {self.agent_name} 未返回有效的结构化结果，按文本处理")
+        if not isinstance(analysis_text, str):
+            analysis_text = str(analysis_text)
 
         return {
             "agent": self.agent_name,
             "symbol": symbol,
             "analysis": analysis_text,
+            "structured": structured,
             "style": self.description,
             "philosophy": self.investment_philosophy,
             "framework": self.analysis_framework
         }
     
-    def _build_analysis_prompt(self, symbol: str) -> str:
-        """构建分析提示词"""
-        prompt = f"""
-        请以{self.agent_name}的投资哲学分析股票 {symbol}。
+    def _build_analysis_prompt(self, symbol: str, factor_table: Optional[str] = None,
+                               news_digest: Optional[str] = None,
+                               memory_context: Optional[str] = None) -> str:
+        """
+        构建分析提示词
+        
+        分析框架、风格和输出要求组成固定前缀（同一位大师对任何股票都逐字节相同），
+        因子表、新闻摘要、历史分析摘录和股票代码放在最后，便于模型服务端的前缀缓存命中
+        """
+        static = f"""
+        请以{self.agent_name}的投资哲学分析下方指定的股票。
 
         **分析框架：**
-        {self._format_analysis_framework()}
+        {self.bundle.framework}
 
         请基于最新财务数据进行深入分析，并用{self.style_characteristics['voice']}的风格表达。
         分析应体现{self.style_characteristics['approach']}的特点。
         """
         
-        return prompt
-    
-    def _format_analysis_framework(self) -> str:
-        """格式化分析框架"""
-        framework_text = ""
-        for i, (key, value) in enumerate(self.analysis_framework.items(), 1):
-            if isinstance(value, str):
-                framework_text += f"{i}. **{key.replace('_', ' ').title()}** - {value}\n"
-            elif isinstance(value, list):
-                framework_text += f"{i}. **{key.replace('_', ' ').title()}**\n"
-                for item in value:
-                    framework_text += f"   - {item}\n"
-            elif isinstance(value, dict):
-                framework_text += f"{i}. **{key.replace('_', ' ').title()}**\n"
-                for sub_key, sub_value in value.items():
-                    if isinstance(sub_value, list):
-                        framework_text += f"   - {sub_key.replace('_', ' ')}:\n"
-                        for item in sub_value:
-                            framework_text += f"     * {item}\n"
-                    else:
-                        framework_text += f"   - {sub_key.replace('_', ' ')}: {sub_value}\n"
-        
-        return framework_text
+        if self.structured:
+            static += """
+        **输出要求：** 只输出符合Schema的JSON对象，不要输出Markdown；
+        summary不超过100字，key_points和risks每条不超过30字、最多5条。
+        """
+        
+        volatile = []
+        if factor_table:
+            volatile.append(f"**预计算量化因子（已按最新报告期计算，请直接引用，无需重新推导）：**\n{factor_table}")
+        if news_digest:
+            volatile.append(f"**近期新闻摘要（已去重，各位大师共享；如无新问题无需重复搜索）：**\n{news_digest}")
+        if memory_context:
+            volatile.append(f"**历史分析摘录（本系统此前对该公司及同类公司的分析，数据可能已过时，请以最新数据核实）：**\n{memory_context}")
+        volatile.append(f"**分析对象：** 股票 {symbol}")
+        
+        return assemble_prompt(static, volatile)
     
     def _get_agent_emoji(self) -> str:
         """获取Agent对应的emoji"""
@@ -323,6 +382,94 @@ class ConfigurableMultiAgentAnalyzer:
         
         self.agent_factory = ConfigurableInvestmentAgent(config_file)
         self.active_agents = {}
+        self.factor_engine = self._create_factor_engine()
+        # 分析记忆（AnalysisMemory），由启用了结果库的上层设置；为None时大师不附加历史摘录
+        self.analysis_memory = None
+    
+    def _create_factor_engine(self) -> Optional[FundamentalsFactorEngine]:
+        """根据配置创建基本面因子引擎"""
+        engine_config = self.agent_factory.config.get('factor_engine', {})
+        if not engine_config.get('enabled', False):
+            return None
+        
+        cache_dir = engine_config.get('cache_dir')
+        if cache_dir and not os.path.isabs(cache_dir):
+            project_root = os.path.join(os.path.dirname(__file__), "..", "..")
+            cache_dir = os.path.abspath(os.path.join(project_root, cache_dir))
+        
+        # 因子引擎直接调用yfinance，同样接入录制/回放
+        fetcher = None
+        replayer = get_tool_replayer(self.agent_factory.config)
+        if replayer is not None:
+            fetcher = replayer.wrap_callable("fundamentals.fetch", fetch_yfinance_fundamentals)
+        
+        return FundamentalsFactorEngine(
+            cache_dir=cache_dir,
+            fetcher=fetcher,
+            max_workers=engine_config.get('max_workers', 8),
+            filing_lag_days=engine_config.get('filing_lag_days', 45),
+            recheck_seconds=engine_config.get('recheck_seconds', 86400)
+        )
+    
+    def _build_factor_tables(self, symbol: str,
+                             agents: Optional[Dict[str, InvestmentMasterAgent]] = None) -> Dict[str, str]:
+        """为需要预计算因子的大师生成因子表（agents 默认为已加载的大师）"""
+        agents = self.active_agents if agents is None else agents
+        masters = {name: agent for name, agent in agents.items() if agent.precomputed_factors}
+        if self.factor_engine is None or not masters:
+            return {}
+        
+        # 魔法公式排名只在股票池内有意义：和配置的对比池一起计算，没有对比池时显示为 N/A
+        universe = []
+        if any("magic_formula_rank" in agent.precomputed_factors for agent in masters.values()):
+            universe = self.agent_factory.config.get('factor_engine', {}).get('magic_formula_universe', [])
+        
+        try:
+            table = self.factor_engine.build_table([symbol, *universe]).loc[[symbol.upper()]]
+        except Exception as e:
+            print(f"⚠️ 因子计算失败，大师将自行推导量化指标: {e}")
+            return {}
+        
+        return {
+            name: self.factor_engine.format_factor_table(table, agent.precomputed_factors)
+            for name, agent in masters.items()
+        }
+    
+    def _build_news_digest(self, symbol: str) -> Optional[str]:
+        """为本次运行构建一次股票新闻摘要，供所有大师共享"""
+        cache_config = self.agent_factory.config.get('search_cache', {})
+        if not (cache_config.get('enabled', False) and cache_config.get('news_digest', False)):
+            return None
+        
+        store = NewsDigestStore(
+            get_shared_search_cache(self.agent_factory.config),
+            max_items=cache_config.get('digest_max_items', 8)
+        )
+        try:
+            return store.get_digest(symbol) or None
+        except Exception as e:
+            print(f"⚠️ 新闻摘要获取失败，大师将自行搜索: {e}")
+            return None
+    
+    def _build_memory_contexts(self, symbol: str, news_digest: Optional[str] = None,
+                               agents: Optional[Dict[str, InvestmentMasterAgent]] = None) -> Dict[str, str]:
+        """为每位大师检索相关的历史分析摘录（查询文本为股票代码、大师风格和本次新闻摘要）"""
+        if self.analysis_memory is None or not self.analysis_memory.size:
+            return {}
+        
+        contexts = {}
+        try:
+            for name, agent in (self.active_agents if agents is None else agents).items():
+                query = " ".join(part for part in (symbol, agent.description, news_digest) if part)
+                context = self.analysis_memory.context(symbol, name, query)
+                if context:
+                    contexts[name] = context
+        except Exception as e:
+            print(f"⚠️ 历史分析检索失败，大师将从零开始分析: {e}")
+            return {}
+        if contexts:
+            print(f"🧠 已为 {len(contexts)} 位大师附加历史分析摘录")
+        return contexts
     
     def load_agents(self, master_names: List[str], model_id: Optional[str] = None) -> None:
         """
@@ -341,13 +488,23 @@ class ConfigurableMultiAgentAnalyzer:
         for name, agent in self.active_agents.items():
             print(f"   - {agent.agent_name}")
     
-    def analyze_stock_multi_perspective(self, symbol: str, show_reasoning: bool = False) -> Dict[str, Any]:
+    def analyze_stock_multi_perspective(self, symbol: str, show_reasoning: bool = False,
+                                        parallel: bool = False,
+                                        result_queue: Optional["queue.Queue"] = None,
+                                        max_workers: Optional[int] = None,
+                                        cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
         多视角分析股票
         
         Args:
             symbol: 股票代码
             show_reasoning: 是否显示推理过程
+            parallel: 是否并行运行各位大师
+            result_queue: 每位大师完成后立即放入结果的队列，供增量综合使用；
+                          提供队列时不再统一打印各位大师的分析
+            max_workers: 并行线程数，默认等于大师数量
+            cancel_event: 调用方不再需要结果时设置（如增量综合的截止时间已到），
+                          尚未开始的大师直接跳过，已完成的结果不再放入队列
             
         Returns:
             分析结果字典
@@ -361,23 +518,34 @@ class ConfigurableMultiAgentAnalyzer:
             print(f"   - {agent.agent_name}")
         print("=" * 80)
         
-        # 并行分析（如果需要的话可以实现）
-        analyses_results = []
-        for name, agent in self.active_agents.items():
+        # 一次性预计算量化因子，供量化类大师共享
+        factor_tables = self._build_factor_tables(symbol)
+        news_digest = self._build_news_digest(symbol)
+        memory_contexts = self._build_memory_contexts(symbol, news_digest)
+        
+        def run_master(name: str, agent: InvestmentMasterAgent) -> Dict[str, Any]:
+            if cancel_event is not None and cancel_event.is_set():
+                return self._error_result(agent, symbol, RuntimeError("已取消"))
             try:
-                result = agent.analyze_stock(symbol, show_reasoning)
-                analyses_results.append(result)
+                result = agent.analyze_stock(symbol, show_reasoning, factor_tables.get(name), news_digest,
+                                             memory_contexts.get(name))
             except Exception as exc:
                 print(f"❌ {agent.agent_name} 分析失败: {exc}")
-                analyses_results.append({
-                    "agent": agent.agent_name,
-                    "symbol": symbol,
-                    "analysis": f"分析失败: {str(exc)}",
-                    "style": "错误"
-                })
+                result = self._error_result(agent, symbol, exc)
+            if result_queue is not None and not (cancel_event is not None and cancel_event.is_set()):
+                result_queue.put(result)
+            return result
+        
+        if parallel and len(self.active_agents) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers or len(self.active_agents)) as executor:
+                futures = [executor.submit(run_master, name, agent) for name, agent in self.active_agents.items()]
+                analyses_results = [future.result() for future in futures]
+        else:
+            analyses_results = [run_master(name, agent) for name, agent in self.active_agents.items()]
         
         # 显示分析结果
-        self._display_individual_analyses(analyses_results)
+        if result_queue is None:
+            self._display_individual_analyses(analyses_results)
         
         return {
             "symbol": symbol,
@@ -385,6 +553,71 @@ class ConfigurableMultiAgentAnalyzer:
             "active_masters": list(self.active_agents.keys())
         }
     
+    def stream_multi_perspective(self, symbol: str, max_workers: Optional[int] = None,
+                                 agents: Optional[Dict[str, InvestmentMasterAgent]] = None) -> Iterator[StreamEvent]:
+        """
+        流式多视角分析：各位大师并发运行，事件按到达顺序合流
+        
+        Args:
+            symbol: 股票代码
+            max_workers: 同时运行的大师数量，默认全部同时运行
+            agents: 本次使用的大师Agent，默认为 load_agents() 加载的大师；
+                    并发的请求各自传入新建的Agent，可以共用同一个分析器
+            
+        Yields:
+            各位大师的 start/token/tool_call/tool_result/done/error 事件；
+            最后一条 complete 事件的 data 与 analyze_stock_multi_perspective 的返回值相同
+        """
+        agents = self.active_agents if agents is None else agents
+        if not agents:
+            raise ValueError("请先使用 load_agents() 加载投资大师Agent")
+        
+        factor_tables = self._build_factor_tables(symbol, agents)
+        news_digest = self._build_news_digest(symbol)
+        memory_contexts = self._build_memory_contexts(symbol, news_digest, agents)
+        
+        def master_stream(name: str, agent: InvestmentMasterAgent):
+            def events() -> Iterator[StreamEvent]:
+                try:
+                    for event in agent.analyze_stock_stream(symbol, factor_tables.get(name), news_digest,
+                                                            memory_contexts.get(name)):
+                        if event.type == ERROR and event.data is None:
+                            # 模型运行出错（RunError）：与非流式分析一样记为失败，不再产生半截的 done 结果
+                            event.data = self._error_result(agent, symbol, RuntimeError(event.content))
+                            yield event
+                            return
+                        yield event
+                except Exception as exc:
+                    result = self._error_result(agent, symbol, exc)
+                    yield StreamEvent(ERROR, agent.agent_name, symbol, str(exc), data=result)
+            return events
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        streams = {name: master_stream(name, agent) for name, agent in agents.items()}
+        for event in merge_streams(streams, max_workers):
+            if event.type in (DONE, ERROR) and event.data is not None:
+                results[event.agent] = event.data
+            yield event
+        
+        # 按大师加载顺序整理结果
+        analyses_results = [results[agent.agent_name] for agent in agents.values()
+                            if agent.agent_name in results]
+        yield StreamEvent(COMPLETE, symbol=symbol, data={
+            "symbol": symbol,
+            "individual_analyses": analyses_results,
+            "active_masters": list(agents.keys())
+        })
+    
+    @staticmethod
+    def _error_result(agent: InvestmentMasterAgent, symbol: str, exc: Exception) -> Dict[str, Any]:
+        """分析失败时的占位结果"""
+        return {
+            "agent": agent.agent_name,
+            "symbol": symbol,
+            "analysis": f"分析失败: {str(exc)}",
+            "style": "错误"
+        }
+    
     def _display_individual_analyses(self, analyses_results: List[Dict[str, Any]]) -> None:
         """显示各位大师的分析结果"""
         print(f"\n📋 各位投资大师的分析结果:")
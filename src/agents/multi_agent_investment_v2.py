@@ -5,54 +5,50 @@
 """
 
 import os
+import queue
+import threading
 import concurrent.futures
 import time
-import yaml
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 from agno.agent import Agent
-from agno.models.openai.like import OpenAILike
 from agno.tools.reasoning import ReasoningTools
 from .configurable_investment_agent import ConfigurableInvestmentAgent, ConfigurableMultiAgentAnalyzer
 
 # 导入token管理工具
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.model_router import get_model_router
 from utils.token_manager import TokenManager, TokenBudget, StreamingAnalyzer
+from utils.incremental_synthesis import IncrementalSynthesizer
+from utils.map_reduce_synthesis import MapReduceSynthesizer
+from utils.ranking import RankingEngine
+from utils.analysis_schema import analysis_payload
+from utils.event_stream import MultiPaneRenderer, COMPLETE
+from utils.consensus import ConsensusMonitor, run_until_consensus
+from utils.prompt_cache import assemble_prompt
+from utils.fundamentals import FundamentalsFactorEngine
+from utils.screener import UniverseScreener
+from storage.results import get_result_store
+from utils.analysis_memory import get_analysis_memory
 
 # 加载环境变量
 load_dotenv()
 
-def load_default_model_from_config():
-    """从配置文件中加载默认模型"""
-    try:
-        current_dir = os.path.dirname(__file__)
-        config_file = os.path.join(current_dir, "..", "config", "investment_agents_config.yaml")
-        
-        with open(config_file, 'r', encoding='utf-8') as file:
-            config = yaml.safe_load(file)
-            return config['model_config']['default_model']
-    except Exception as e:
-        print(f"⚠️ 无法加载配置文件中的默认模型，使用fallback: qwen-plus，错误: {e}")
-        return "qwen-plus"
-
 class EnhancedInvestmentSynthesizer:
     """
     增强版投资分析综合器
     支持更多投资大师的观点综合和token优化
     """
     def __init__(self, model_id=None, enable_token_optimization=True):
-        # 如果没有指定模型ID，从配置文件中读取默认模型
+        # 如果没有指定模型ID，使用配置文件中 synthesis 路由的模型
+        self.model_router = get_model_router()
         if model_id is None:
-            model_id = load_default_model_from_config()
-            print(f"📋 使用配置文件中的默认模型: {model_id}")
-        
-        # 使用阿里云百炼API
-        model = OpenAILike(
-            id=model_id,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-            api_key=os.getenv("ALIYUN_API_KEY")
-        )
+            model_id = self.model_router.route_config('synthesis').model
+            print(f"📋 使用配置文件中的综合模型: {model_id}")
+        
+        # 使用OpenAI兼容接口（默认阿里云百炼，可通过 model_config.base_url 或 LLM_BASE_URL 切换）
+        model = self.model_router.create_model('synthesis', model_id)
         
         # 初始化token管理器
         self.token_manager = TokenManager(TokenBudget(
@@ -62,8 +58,15 @@ class EnhancedInvestmentSynthesizer:
             reserve_tokens=300
         ))
         
+        self.model_id = model_id
         self.enable_token_optimization = enable_token_optimization
-        self.streaming_analyzer = StreamingAnalyzer(self.token_manager)
+        # 流式模式下四个章节并发生成，每个章节使用独立的Agent
+        self.streaming_analyzer = StreamingAnalyzer(self.token_manager, agent_factory=self._create_section_agent)
+        # 增量模式下边收大师结果边汇总，最后只做一次简短的LLM调用
+        self.incremental_synthesizer = IncrementalSynthesizer(self.token_manager, agent_factory=self._create_section_agent)
+        # 内容超出窗口时分层压缩，避免截断丢失大师观点
+        self.map_reduce_synthesizer = MapReduceSynthesizer(self.token_manager, agent_factory=self._create_summary_agent,
+                                                           final_agent_factory=self._create_section_agent)
         
         # 创建综合分析Agent
         self.synthesizer = Agent(
@@ -80,6 +83,30 @@ class EnhancedInvestmentSynthesizer:
             show_tool_calls=False
         )
 
+    def _create_section_agent(self) -> Agent:
+        """创建流式章节Agent（纯文本生成，不挂载推理工具以减少往返）"""
+        return Agent(
+            name="综合报告章节撰写",
+            model=self.model_router.create_model('synthesis', self.model_id),
+            instructions=[
+                "你是一位资深的投资分析综合师，负责撰写综合投资报告中的一个章节。",
+                "严格按照给定的Markdown模板输出，只输出本章节内容。"
+            ],
+            markdown=True
+        )
+
+    def _create_summary_agent(self) -> Agent:
+        """创建摘要压缩Agent（summarization 路由，使用更快的模型）"""
+        return Agent(
+            name="大师观点摘要",
+            model=self.model_router.create_model('summarization'),
+            instructions=[
+                "你负责把投资分析压缩为要点摘要，保留建议、核心理由、关键数据和主要风险。",
+                "只输出摘要内容，不要添加客套话。"
+            ],
+            markdown=True
+        )
+
     def synthesize_analyses(self, analyses_results: List[Dict[str, Any]], mode: str = "auto") -> str:
         """
         综合多个投资大师的分析结果
@@ -130,14 +157,37 @@ class EnhancedInvestmentSynthesizer:
         # 压缩分析结果
         compressed_analyses = self.token_manager.compress_analysis_results(analyses_results)
         
-        prompt = f"""
-基于{len(compressed_analyses)}位投资大师对{symbol}的分析摘要，生成投资报告：
+        # 优化prompt
+        optimized_prompt = self.token_manager.optimize_prompt_template(
+            self._build_compressed_prompt(symbol, compressed_analyses)
+        )
+        
+        print(f"🔍 优化后prompt长度: {self.token_manager.estimate_tokens(optimized_prompt)} tokens")
+        
+        response = self.synthesizer.run(optimized_prompt)
+        
+        # 处理RunResponse对象，提取字符串内容
+        if hasattr(response, 'content'):
+            analysis_text = response.content
+        elif hasattr(response, 'text'):
+            analysis_text = response.text
+        elif hasattr(response, 'message'):
+            analysis_text = response.message
+        else:
+            # 如果没有这些属性，尝试转换为字符串
+            analysis_text = str(response)
+        
+        # 时间戳在生成后追加，不进入提示词
+        return f"{analysis_text}\n\n---\n*分析时间: {time.strftime('%Y-%m-%d %H:%M')} | 参与大师: {len(compressed_analyses)}位*"
 
-{self._format_compressed_analyses(compressed_analyses)}
+    def _build_compressed_prompt(self, symbol: str, compressed_analyses: List[Dict[str, Any]]) -> str:
+        """压缩模式提示词：报告模板在前（跨股票不变），股票代码和大师摘要在后"""
+        static = """
+基于下方投资大师的分析摘要，为指定股票生成投资报告。
 
-请输出简洁的结构化报告：
+请输出简洁的结构化报告（[股票代码]替换为下方的股票代码）：
 
-# 📊 {symbol} 投资分析报告
+# 📊 [股票代码] 投资分析报告
 
 ## 🎯 投资建议
 | 项目 | 结论 |
@@ -147,7 +197,7 @@ class EnhancedInvestmentSynthesizer:
 | 风险等级 | [低/中/高] |
 
 ## 🎭 大师共识
-{self._create_consensus_table(compressed_analyses)}
+[照录下方的大师共识表]
 
 ## ⚠️ 关键风险
 - [风险1]
@@ -158,40 +208,45 @@ class EnhancedInvestmentSynthesizer:
 - **买入价位**: $[价格区间]
 - **目标仓位**: [X]%
 - **止损位**: $[价格]
-
----
-*分析时间: {time.strftime('%Y-%m-%d %H:%M')} | 参与大师: {len(compressed_analyses)}位*
 """
-        
-        # 优化prompt
-        optimized_prompt = self.token_manager.optimize_prompt_template(prompt)
-        
-        print(f"🔍 优化后prompt长度: {self.token_manager.estimate_tokens(optimized_prompt)} tokens")
-        
-        response = self.synthesizer.run(optimized_prompt)
-        
-        # 处理RunResponse对象，提取字符串内容
-        if hasattr(response, 'content'):
-            analysis_text = response.content
-        elif hasattr(response, 'text'):
-            analysis_text = response.text
-        elif hasattr(response, 'message'):
-            analysis_text = response.message
-        else:
-            # 如果没有这些属性，尝试转换为字符串
-            analysis_text = str(response)
-            
-        return analysis_text
+        return assemble_prompt(static, [
+            f"**股票代码：** {symbol}（{len(compressed_analyses)}位大师）",
+            f"**大师分析摘要：**\n{self._format_compressed_analyses(compressed_analyses)}",
+            f"**大师共识表：**\n{self._create_consensus_table(compressed_analyses)}",
+        ])
 
     def _synthesize_streaming(self, symbol: str, analyses_results: List[Dict[str, Any]]) -> str:
-        """流式模式综合分析"""
+        """流式模式综合分析：四个章节并发请求模型，按顺序输出已完成的章节"""
         print("🌊 使用流式模式进行分析...")
         
+        section_titles = {
+            "executive_summary": "执行摘要",
+            "master_opinions": "大师观点对比",
+            "risk_assessment": "风险评估",
+            "investment_plan": "投资计划"
+        }
+        
+        def on_section(name: str, text: str) -> None:
+            print(f"\n📄 章节就绪: {section_titles[name]}")
+            print(text)
+        
         # 使用流式分析器
-        streaming_result = self.streaming_analyzer.stream_multi_master_analysis(symbol, analyses_results)
+        streaming_result = self.streaming_analyzer.stream_multi_master_analysis(
+            symbol, analyses_results, on_section=on_section
+        )
         
         # 组合各个部分
         sections = streaming_result["sections"]
+        metrics = streaming_result["metrics"]
+        
+        print("\n⏱️ 章节耗时:")
+        for name, title in section_titles.items():
+            m = metrics.get(name, {})
+            ttft = f"{m['ttft_ms']:.0f}ms" if m.get("ttft_ms") is not None else "N/A"
+            print(f"   - {title}: 首token {ttft} | 耗时 {m.get('latency_ms', 0):.0f}ms")
+        total = metrics.get("total", {})
+        total_ttft = f"{total['ttft_ms']:.0f}ms" if total.get("ttft_ms") is not None else "N/A"
+        print(f"   - 总计: 首token {total_ttft} | 耗时 {total.get('latency_ms', 0):.0f}ms")
         
         full_report = f"""
 # 📊 {symbol} 综合投资分析报告
@@ -207,31 +262,30 @@ class EnhancedInvestmentSynthesizer:
 ---
 *📊 分析完成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}*
 *🎭 参与分析大师: {len(analyses_results)}位*
-*⚡ 处理模式: 流式分析*
+*⚡ 处理模式: 流式分析（章节并发，首token {total_ttft}）*
 """
         return full_report
 
     def _synthesize_full(self, symbol: str, analyses_results: List[Dict[str, Any]]) -> str:
-        """完整模式综合分析（简化版）"""
+        """完整模式综合分析：放得进窗口时单次调用，否则走分层 map-reduce，不截断大师观点"""
         print("📄 使用完整模式进行分析...")
         
-        # 生成简化的完整报告
-        prompt = f"""
-基于以下{len(analyses_results)}位投资大师对股票{symbol}的分析，生成综合投资报告：
-
-{self._format_analyses_summary(analyses_results)}
+        prompt = assemble_prompt("""
+基于下方投资大师对指定股票的分析，生成综合投资报告。
 
 请生成结构化报告，包含：执行摘要、大师观点对比、风险评估、投资计划
 保持内容简洁实用，避免冗余信息。
-"""
+""", [
+            f"**股票代码：** {symbol}（{len(analyses_results)}位大师）",
+            f"**大师分析：**\n{self._format_analyses_summary(analyses_results)}",
+        ])
         
-        # 截断prompt以确保不超过限制
-        truncated_prompt = self.token_manager.truncate_text(
-            prompt, 
-            self.token_manager.budget.max_input_tokens - 500
-        )
+        if self.token_manager.estimate_tokens(prompt) > self.map_reduce_synthesizer.window_tokens:
+            print("🧩 输入超出窗口，改用分层 map-reduce 综合...")
+            leaves = MapReduceSynthesizer.group_by_master(analyses_results)
+            return self.map_reduce_synthesizer.synthesize(leaves, symbol)["report"]
         
-        response = self.synthesizer.run(truncated_prompt)
+        response = self.synthesizer.run(prompt)
         
         # 处理RunResponse对象，提取字符串内容
         if hasattr(response, 'content'):
@@ -246,6 +300,29 @@ class EnhancedInvestmentSynthesizer:
             
         return analysis_text
 
+    def synthesize_comparison(self, all_results: Dict[str, Any]) -> str:
+        """
+        多股票跨标的综合：按股票分组并行压缩，再树形合并
+        
+        Args:
+            all_results: 股票代码 -> analyze_stock_multi_master 的结果
+        """
+        analyses = [a for result in all_results.values() for a in result.get("individual_analyses", [])]
+        if not analyses:
+            return ""
+        
+        symbols = list(all_results.keys())
+        topic = "、".join(symbols[:5]) + (f" 等{len(symbols)}只股票" if len(symbols) > 5 else "") + " 的对比"
+        leaves = self.map_reduce_synthesizer.group_by_symbol(analyses)
+        template = """请输出：
+## 🧠 跨股票综合观点
+| 股票 | 大师倾向 | 核心理由 | 风险 |
+|------|----------|----------|------|
+
+- 最值得关注：[股票及理由]
+- 需要回避：[股票及理由]"""
+        return self.map_reduce_synthesizer.synthesize(leaves, topic, final_template=template)["report"]
+
     def _format_compressed_analyses(self, compressed_analyses: List[Dict[str, Any]]) -> str:
         """格式化压缩后的分析结果"""
         formatted = ""
@@ -260,16 +337,12 @@ class EnhancedInvestmentSynthesizer:
         return formatted
 
     def _format_analyses_summary(self, analyses_results: List[Dict[str, Any]]) -> str:
-        """格式化分析结果摘要"""
+        """格式化分析结果（不截断，超出窗口时由 map-reduce 处理；结构化输出时只发送紧凑JSON）"""
         summaries = []
         for result in analyses_results:
-            # 提取关键信息
             agent = result.get('agent', '')
-            analysis = result.get('analysis', '')
-            
-            # 截取分析的关键部分
-            summary = self.token_manager.truncate_text(analysis, 300)
-            summaries.append(f"**{agent}**: {summary}")
+            analysis = analysis_payload(result)
+            summaries.append(f"**{agent}**: {analysis}")
         
         return "\n\n".join(summaries)
 
@@ -296,16 +369,11 @@ class MultiAgentInvestmentAnalyzerV2:
         初始化多Agent系统V2
         
         Args:
-            model_id: 模型ID，如果不指定则从配置文件读取默认模型
+            model_id: 综合报告使用的模型ID，如果不指定则使用配置文件中 synthesis 路由的模型
             enable_token_optimization: 是否启用token优化
         """
         print("🤖 初始化多Agent投资分析系统 V2...")
         
-        # 如果没有指定模型ID，从配置文件中读取默认模型
-        if model_id is None:
-            model_id = load_default_model_from_config()
-            print(f"📋 使用配置文件中的默认模型: {model_id}")
-        
         self.enable_token_optimization = enable_token_optimization
         
         # 创建配置化多Agent分析器
@@ -317,6 +385,16 @@ class MultiAgentInvestmentAnalyzerV2:
         # 获取所有可用的投资大师
         self.available_masters = self.config_analyzer.agent_factory.get_available_masters()
         
+        # 跨股票排名：从分析文本提取评分，按配置权重汇总
+        self.ranking_engine = RankingEngine(self.config_analyzer.agent_factory.config)
+        
+        # 分析结果库：每次分析的大师观点、综合报告和性能数据落盘，见配置 results_store 段
+        self.result_store = get_result_store(self.config_analyzer.agent_factory.config)
+        
+        # 分析记忆：从结果库索引历史分析，每位大师分析前检索相关摘录，见配置 analysis_memory 段
+        self.analysis_memory = get_analysis_memory(self.config_analyzer.agent_factory.config, self.result_store)
+        self.config_analyzer.analysis_memory = self.analysis_memory
+        
         # 初始化token管理器
         if enable_token_optimization:
             self.token_manager = TokenManager()
@@ -332,7 +410,10 @@ class MultiAgentInvestmentAnalyzerV2:
                                    selected_masters: Optional[List[str]] = None,
                                    parallel: bool = True,
                                    show_reasoning: bool = False,
-                                   analysis_mode: str = "auto") -> Dict[str, Any]:
+                                   analysis_mode: str = "auto",
+                                   deadline_seconds: Optional[float] = None,
+                                   stream_output: bool = False,
+                                   early_stop: Optional[bool] = None) -> Dict[str, Any]:
         """
         使用多位投资大师分析股票（支持token优化）
         
@@ -341,7 +422,10 @@ class MultiAgentInvestmentAnalyzerV2:
             selected_masters: 选择的投资大师列表
             parallel: 是否并行分析
             show_reasoning: 是否显示推理过程
-            analysis_mode: 分析模式 ("auto", "compressed", "streaming", "full")
+            analysis_mode: 分析模式 ("auto", "compressed", "streaming", "full", "incremental")
+            deadline_seconds: 增量模式的截止时间（秒），默认读取配置 synthesis.deadline_seconds
+            stream_output: 是否在终端按大师分窗格实时显示流式输出
+            early_stop: 大师达成共识时是否提前结束，默认读取配置 synthesis.early_stop.enabled
             
         Returns:
             分析结果字典
@@ -374,11 +458,30 @@ class MultiAgentInvestmentAnalyzerV2:
         # 加载选择的Agent
         self.config_analyzer.load_agents(selected_masters)
         
+        if analysis_mode == "incremental":
+            return self._analyze_incremental(symbol, selected_masters, show_reasoning, deadline_seconds, start_time,
+                                             parallel)
+        
         # 进行多视角分析
-        multi_analysis_result = self.config_analyzer.analyze_stock_multi_perspective(
-            symbol, 
-            show_reasoning=show_reasoning
-        )
+        early_stop_config = self.config_analyzer.agent_factory.config.get('synthesis', {}).get('early_stop', {})
+        if early_stop is None:
+            early_stop = early_stop_config.get('enabled', False)
+        
+        consensus = None
+        if stream_output or early_stop:
+            monitor = ConsensusMonitor(
+                [agent.agent_name for agent in self.config_analyzer.active_agents.values()],
+                threshold=early_stop_config.get('threshold', 0.8),
+                min_conviction=early_stop_config.get('min_conviction', 0.5),
+                min_masters=early_stop_config.get('min_masters', 3)
+            ) if early_stop else None
+            multi_analysis_result, consensus = self._stream_individual_analyses(symbol, stream_output, monitor)
+        else:
+            multi_analysis_result = self.config_analyzer.analyze_stock_multi_perspective(
+                symbol, 
+                show_reasoning=show_reasoning,
+                parallel=parallel
+            )
         
         analysis_time = time.time() - start_time
         
@@ -389,6 +492,8 @@ class MultiAgentInvestmentAnalyzerV2:
             multi_analysis_result['individual_analyses'],
             mode=analysis_mode
         )
+        if consensus is not None and consensus.reached:
+            synthesis_result = consensus.render(len(selected_masters)) + "\n\n" + synthesis_result
         
         # 清晰地显示分析结果
         print(f"\n{'='*80}")
@@ -406,21 +511,148 @@ class MultiAgentInvestmentAnalyzerV2:
         print(f"   🎭 参与大师: {len(selected_masters)}位")
         if self.enable_token_optimization:
             print(f"   🗜️ 优化模式: {analysis_mode}")
+        if consensus is not None and consensus.reached:
+            print(f"   ⚡ 共识提前结束: 跳过 {len(consensus.skipped)} 位大师")
+        route_report = self.synthesizer.model_router.format_report()
+        if route_report:
+            print(f"\n🔀 模型路由统计（进程累计）:\n{route_report}")
         
-        return {
+        result = {
             "symbol": symbol,
             "selected_masters": selected_masters,
             "individual_analyses": multi_analysis_result['individual_analyses'],
             "synthesis": synthesis_result,
             "analysis_mode": analysis_mode,
+            "skipped_masters": consensus.skipped if consensus is not None else [],
             "performance": {
                 "analysis_time": analysis_time,
                 "synthesis_time": synthesis_time,
                 "total_time": time.time() - start_time,
                 "masters_count": len(selected_masters),
+                "token_optimization": self.enable_token_optimization,
+                "model_routes": self.synthesizer.model_router.report()
+            }
+        }
+        result["run_id"] = self._save_result(result)
+        return result
+
+    def _stream_individual_analyses(self, symbol: str, render: bool = True,
+                                    monitor: Optional[ConsensusMonitor] = None) -> tuple:
+        """
+        流式运行各位大师
+        
+        Args:
+            symbol: 股票代码
+            render: 是否在终端按大师分窗格实时显示
+            monitor: 共识监视器，达成共识时不再等待其余大师
+            
+        Returns:
+            (与多视角分析相同的结果字典, 共识判断；未启用提前结束时为None)
+        """
+        agents = [agent.agent_name for agent in self.config_analyzer.active_agents.values()]
+        events = self.config_analyzer.stream_multi_perspective(symbol)
+        if render:
+            events = MultiPaneRenderer(agents).render(events)
+        
+        if monitor is None:
+            multi_analysis_result = None
+            for event in events:
+                if event.type == COMPLETE:
+                    multi_analysis_result = event.data
+            return multi_analysis_result, None
+        
+        results, decision = run_until_consensus(events, monitor)
+        if decision.reached:
+            print(f"⚡ {decision.render(len(agents)).lstrip('> ')}")
+        return {
+            "symbol": symbol,
+            "individual_analyses": results,
+            "active_masters": list(self.config_analyzer.active_agents.keys())
+        }, decision
+
+    def _analyze_incremental(self, symbol: str, selected_masters: List[str], show_reasoning: bool,
+                             deadline_seconds: Optional[float], start_time: float,
+                             parallel: bool = True) -> Dict[str, Any]:
+        """增量模式：大师分析的结果一到达就并入综合状态，截止时间到达时不再等待，并取消尚未开始的大师"""
+        if deadline_seconds is None:
+            synthesis_config = self.config_analyzer.agent_factory.config.get('synthesis', {})
+            deadline_seconds = synthesis_config.get('deadline_seconds')
+        
+        result_queue: "queue.Queue" = queue.Queue()
+        expected = [agent.agent_name for agent in self.config_analyzer.active_agents.values()]
+        
+        # 大师分析在后台线程运行，超时未完成的大师不会阻塞报告
+        cancel = threading.Event()
+        worker = threading.Thread(
+            target=self.config_analyzer.analyze_stock_multi_perspective,
+            kwargs={"symbol": symbol, "show_reasoning": show_reasoning, "parallel": parallel,
+                    "result_queue": result_queue, "cancel_event": cancel},
+            daemon=True
+        )
+        worker.start()
+        
+        def on_update(state, entry):
+            print(f"📥 [{len(state.compressed)}/{len(expected)}] {entry['agent']}: {entry['recommendation']} "
+                  f"（{state.arrival_seconds[entry['agent']]:.1f}秒）")
+        
+        print(f"\n{'='*80}")
+        print("📋 增量综合：大师结果到达即汇总...")
+        outcome = self.synthesizer.incremental_synthesizer.consume(
+            symbol, result_queue, expected,
+            deadline_seconds=deadline_seconds, on_update=on_update
+        )
+        # 报告已生成：还没开始的大师不再调用模型（串行模式下尤其明显）
+        cancel.set()
+        
+        print(f"\n{'='*80}")
+        print("📊 综合投资分析报告")
+        print("="*80)
+        print(outcome["report"])
+        
+        total_time = time.time() - start_time
+        print("\n⏱️  分析完成!")
+        print(f"   📊 等待大师: {outcome['wait_time']:.1f}秒")
+        print(f"   🔄 综合时间: {outcome['synthesis_time']:.1f}秒")
+        print(f"   ⚡ 总用时: {total_time:.1f}秒")
+        print(f"   🎭 参与大师: {len(outcome['individual_analyses'])}/{len(expected)}位")
+        
+        result = {
+            "symbol": symbol,
+            "selected_masters": selected_masters,
+            "individual_analyses": outcome["individual_analyses"],
+            "synthesis": outcome["report"],
+            "analysis_mode": "incremental",
+            "missing_masters": outcome["state"].missing,
+            "performance": {
+                "analysis_time": outcome["wait_time"],
+                "synthesis_time": outcome["synthesis_time"],
+                "total_time": total_time,
+                "masters_count": len(outcome["individual_analyses"]),
+                "timed_out": outcome["timed_out"],
                 "token_optimization": self.enable_token_optimization
             }
         }
+        result["run_id"] = self._save_result(result)
+        return result
+
+    def _save_result(self, result: Dict[str, Any]) -> Optional[str]:
+        """把分析结果保存到结果库（评分等字段由排名引擎提取）并索引到分析记忆，失败不影响本次分析"""
+        if self.result_store is None:
+            return None
+        try:
+            signals = self.ranking_engine.collect_signals({result["symbol"]: result})
+            master_keys = {agent.agent_name: key for key, agent in self.config_analyzer.active_agents.items()}
+            run_id = self.result_store.save(result, master_keys, {row["source"]: row for row in signals.to_dict("records")})
+            print(f"💾 分析结果已保存（运行 {run_id}），查看: python scripts/analysis_results.py show {result['symbol']}")
+        except Exception as e:
+            print(f"⚠️ 保存分析结果失败: {e}")
+            return None
+        if self.analysis_memory is not None:
+            try:
+                self.analysis_memory.sync(self.result_store)
+            except Exception as e:
+                print(f"⚠️ 分析记忆索引失败: {e}")
+        return run_id
 
     def compare_stocks_multi_master(self, 
                                     symbols: List[str],
@@ -477,6 +709,9 @@ class MultiAgentInvestmentAnalyzerV2:
         
         # 生成简化的对比报告
         comparison_report = self._generate_simplified_comparison_report(all_results)
+        if len(symbols) > 1:
+            print("\n📋 正在生成跨股票综合观点...")
+            comparison_report += "\n" + self.synthesizer.synthesize_comparison(all_results)
         print(f"\n{'='*80}")
         print("📈 多股票对比分析报告")
         print("="*80)
@@ -490,6 +725,71 @@ class MultiAgentInvestmentAnalyzerV2:
             "batch_processing": self.enable_token_optimization and len(symbols) > batch_size
         }
 
+    def screen_and_analyze(self,
+                           universe: List[str],
+                           screening_master: str = "joel_greenblatt",
+                           top_k: Optional[int] = None,
+                           selected_masters: Optional[List[str]] = None,
+                           show_reasoning: bool = False) -> Dict[str, Any]:
+        """
+        先用量化规则筛选股票池，再只对Top-K候选进行多大师LLM分析
+        
+        Args:
+            universe: 股票池（可包含成千上万只股票）
+            screening_master: 提供筛选规则的投资大师
+            top_k: 进入LLM分析的候选数量，默认读取配置
+            selected_masters: 参与LLM分析的投资大师列表
+            show_reasoning: 是否显示推理过程
+            
+        Returns:
+            包含筛选结果和对比分析结果的字典
+        """
+        config = self.config_analyzer.agent_factory.config
+        if top_k is None:
+            top_k = config.get('screening', {}).get('default_top_k', 5)
+        
+        factor_engine = self.config_analyzer.factor_engine or FundamentalsFactorEngine()
+        screener = UniverseScreener(config, factor_engine)
+        
+        print(f"\n🔎 使用 {screening_master} 的量化规则筛选 {len(universe)} 只股票...")
+        screen_start = time.time()
+        table = factor_engine.build_table(universe)
+        fetch_time = time.time() - screen_start
+        
+        rank_start = time.time()
+        candidates = screener.screen_table(table, screening_master, top_k)
+        rank_time = time.time() - rank_start
+        
+        print(f"   📥 因子表构建: {fetch_time:.1f}秒")
+        print(f"   ⚡ 规则筛选排名: {rank_time * 1000:.1f}毫秒")
+        print(screener.format_screen_result(candidates, screening_master))
+        
+        top_symbols = list(candidates.index)
+        if not top_symbols:
+            print("❌ 没有股票通过筛选")
+            return {
+                "universe_size": len(universe),
+                "candidates": [],
+                "screening_master": screening_master,
+                "comparison": None
+            }
+        
+        print(f"\n🎯 进入LLM分析的候选: {', '.join(top_symbols)}")
+        comparison = self.compare_stocks_multi_master(
+            symbols=top_symbols,
+            selected_masters=selected_masters,
+            show_reasoning=show_reasoning
+        )
+        
+        return {
+            "universe_size": len(universe),
+            "candidates": top_symbols,
+            "screening_master": screening_master,
+            "screen_table": candidates,
+            "screening_time": {"fetch": fetch_time, "rank": rank_time},
+            "comparison": comparison
+        }
+
     def _generate_simplified_comparison_report(self, all_results: Dict[str, Any]) -> str:
         """生成简化版对比报告"""
         symbols = list(all_results.keys())
@@ -526,11 +826,9 @@ class MultiAgentInvestmentAnalyzerV2:
         return report
 
     def _create_ranking_rows(self, all_results: Dict[str, Any]) -> str:
-        """创建排名表格行"""
-        rows = []
-        for i, (symbol, result) in enumerate(all_results.items(), 1):
-            rows.append(f"| {i} | {symbol} | 待评估 | 详见个股分析 |")
-        return "\n".join(rows)
+        """创建排名表格行（按各位大师和综合报告的加权评分排序）"""
+        ranking = self.ranking_engine.rank(all_results)
+        return self.ranking_engine.format_ranking_rows(ranking)
 
 def main():
     """主函数 - 演示多Agent投资分析系统V2"""
@@ -4,15 +4,18 @@
 """
 
 import os
+import sys
 import json
 from datetime import datetime
 from dotenv import load_dotenv
 from agno.agent import Agent
-from agno.models.openai.like import OpenAILike
 from agno.tools.reasoning import ReasoningTools
 from agno.tools.yfinance import YFinanceTools
 from agno.tools.duckduckgo import DuckDuckGoTools
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.model_factory import create_model
+
 # 加载环境变量
 load_dotenv()
 
@@ -29,12 +32,8 @@ class PortfolioAgent:
                      - qwen2.5-72b-instruct
                      - qwen2.5-32b-instruct
         """
-        # 使用阿里云百炼API
-        model = OpenAILike(
-            id=model_id,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-            api_key=os.getenv("ALIYUN_API_KEY")
-        )
+        # 使用OpenAI兼容接口（默认阿里云百炼，可通过 LLM_BASE_URL 切换）
+        model = create_model(model_id)
         
         # 创建Agent
         self.agent = Agent(
@@ -0,0 +1,50 @@
+"""
+Storage Module
+==============
+
+This module contains the shared persistence layer for the Agno AI Investment System.
+
+Available components:
+- StorageEngine: One pooled WAL-mode SQLite engine per database file with a session write queue
+- PooledSqliteStorage: agno SqliteStorage backed by the shared engine with queued, batched upserts
+- SessionWriteQueue: Background group commit of session upserts, coalesced per session, with queue/latency metrics
+- create_storage_router: FastAPI route exposing storage metrics at /v1/storage/metrics
+- run_migrations: Versioned, idempotent startup migrations tracked in schema_version
+- CompressedJSON: Transparent per-run framed zlib compression of session memory/runs columns
+- RetentionService: Per-table session retention in small batches with compressed archiving and incremental vacuum
+- BackupService: Scheduled online backups via the page-stepped SQLite backup API with gzip, rotation and restore
+- AnalysisResultStore: Persistent multi-master analysis results with covering indexes, FTS5 search and a query CLI
+
+"""
+
+from .engine import StorageEngine, create_sqlite_engine, get_storage_engine
+from .session_storage import PooledSqliteStorage
+from .write_queue import SessionWriteQueue
+from .api import create_storage_router
+from .migrations import Migration, run_migrations
+from .retention import RetentionService, load_archived_session
+from .compression import CompressedJSON, compress_json, recent_runs
+from .backup import BackupService, backup_database, list_backups, restore_backup
+from .results import AnalysisResultStore, get_result_store
+
+__all__ = [
+    "StorageEngine",
+    "create_sqlite_engine",
+    "get_storage_engine",
+    "PooledSqliteStorage",
+    "SessionWriteQueue",
+    "create_storage_router",
+    "Migration",
+    "run_migrations",
+    "RetentionService",
+    "load_archived_session",
+    "CompressedJSON",
+    "compress_json",
+    "recent_runs",
+    "BackupService",
+    "backup_database",
+    "list_backups",
+    "restore_backup",
+    "AnalysisResultStore",
+    "get_result_store"
+]
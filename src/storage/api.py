@@ -0,0 +1,26 @@
+"""
+存储相关的 HTTP 接口
+"""
+
+from .engine import StorageEngine
+
+
+def create_storage_router(storage_engine: StorageEngine, prefix: str = "/v1/storage"):
+    """
+    创建存储指标路由
+
+    GET {prefix}/metrics 返回 StorageEngine.metrics()
+
+    Args:
+        storage_engine: 共享存储引擎
+        prefix: 路由前缀
+    """
+    from fastapi import APIRouter
+
+    router = APIRouter(prefix=prefix)
+
+    @router.get("/metrics")
+    def storage_metrics():
+        return storage_engine.metrics()
+
+    return router
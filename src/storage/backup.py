@@ -0,0 +1,432 @@
+"""
+会话库在线备份
+使用 SQLite 在线备份API按页分步复制数据库：备份期间源连接持有一个读事务（WAL下读不阻塞写），
+复制的是开始时刻的一致快照，期间的写入不会导致备份重新开始。备份文件校验后 gzip 压缩、按数量轮换；
+BackupService 在 Playground 进程内按 storage.backup 配置定时备份，restore_backup() 从备份恢复
+"""
+
+import os
+import re
+import gzip
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import yaml
+from sqlalchemy.engine import Engine
+
+DEFAULT_BACKUP_SETTINGS = {
+    "dir": "data/agent_storage/backups",
+    "interval_hours": 24,
+    "keep": 7,
+    "pages_per_step": 256,
+    "step_sleep_ms": 10,
+    "compress": True,
+}
+
+# 备份文件名：<库名>.<年月日_时分秒_毫秒>.db[.gz]
+_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S_%f"
+
+
+def _backup_pattern(db_file: str) -> "re.Pattern":
+    stem = re.escape(Path(db_file).stem)
+    return re.compile(rf"^{stem}\.(\d{{8}}_\d{{6}}_\d{{3}})\.db(\.gz)?$")
+
+
+def _quick_check(conn: sqlite3.Connection) -> None:
+    result = conn.execute("PRAGMA quick_check").fetchone()[0]
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"备份校验失败: {result}")
+
+
+def backup_database(engine: Engine, db_file: str, backup_dir: str, pages_per_step: int = 256,
+                    step_sleep_ms: int = 10, compress: bool = True) -> Dict[str, Any]:
+    """
+    在线备份数据库
+
+    Args:
+        engine: 数据库引擎（从连接池借一个连接作为备份源）
+        db_file: 数据库文件（用于备份文件命名）
+        backup_dir: 备份目录
+        pages_per_step: 每步复制的页数，步与步之间释放GIL并暂停 step_sleep_ms 毫秒
+        step_sleep_ms: 每步之间的暂停
+        compress: 是否 gzip 压缩备份文件
+
+    Returns:
+        备份文件路径、大小、页数、步数、耗时和重新开始次数
+    """
+    directory = Path(backup_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{Path(db_file).stem}.{datetime.now().strftime(_TIMESTAMP_FORMAT)[:-3]}.db"
+    target = directory / (name + ".gz" if compress else name)
+    temp = directory / f".{name}.tmp"
+
+    progress = {"steps": 0, "pages": 0, "restarts": 0, "remaining": None}
+
+    def _progress(status, remaining, total):
+        # remaining 变大说明源库被其他连接修改、备份从头开始（持有读事务时不应发生）
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+        progress.update(steps=progress["steps"] + 1, pages=total, remaining=remaining)
+
+    started = time.perf_counter()
+    raw = engine.raw_connection()
+    try:
+        source = raw.driver_connection
+        source.rollback()
+        # 读事务固定快照：WAL 下不阻塞写入，备份期间的提交不会使备份重新开始
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        destination = sqlite3.connect(str(temp))
+        try:
+            source.backup(destination, pages=pages_per_step, progress=_progress, sleep=step_sleep_ms / 1000)
+            # 备份文件改为单文件日志模式，恢复时不依赖 -wal 文件
+            destination.execute("PRAGMA journal_mode=DELETE").fetchone()
+            _quick_check(destination)
+        finally:
+            destination.close()
+    except Exception:
+        temp.unlink(missing_ok=True)
+        raise
+    finally:
+        raw.driver_connection.rollback()
+        raw.close()
+    copied = time.perf_counter() - started
+
+    raw_bytes = temp.stat().st_size
+    if compress:
+        packed = directory / f".{name}.gz.tmp"
+        with open(temp, "rb") as src, gzip.open(packed, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        temp.unlink()
+        temp = packed
+    os.replace(temp, target)
+
+    return {
+        "file": str(target),
+        "db_bytes": raw_bytes,
+        "bytes": target.stat().st_size,
+        "pages": progress["pages"],
+        "steps": progress["steps"],
+        "restarts": progress["restarts"],
+        "copy_seconds": copied,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def list_backups(backup_dir: str, db_file: str) -> List[Dict[str, Any]]:
+    """列出数据库的备份（最新的在前）"""
+    directory = Path(backup_dir)
+    if not directory.is_dir():
+        return []
+    pattern = _backup_pattern(db_file)
+    backups = []
+    for path in directory.iterdir():
+        match = pattern.match(path.name)
+        if match:
+            backups.append({
+                "file": str(path),
+                "created_at": datetime.strptime(match.group(1), _TIMESTAMP_FORMAT),
+                "bytes": path.stat().st_size,
+                "compressed": bool(match.group(2)),
+            })
+    return sorted(backups, key=lambda backup: backup["created_at"], reverse=True)
+
+
+def rotate_backups(backup_dir: str, db_file: str, keep: int) -> List[str]:
+    """只保留最近 keep 个备份，返回删除的文件"""
+    removed = []
+    for backup in list_backups(backup_dir, db_file)[max(keep, 1):]:
+        os.remove(backup["file"])
+        removed.append(backup["file"])
+    return removed
+
+
+def restore_backup(backup_file: str, db_file: str, backup_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    从备份恢复数据库（需先停止 Playground）
+
+    Args:
+        backup_file: 备份文件（.db、.db.gz，或手工复制的数据库文件）
+        db_file: 要恢复的数据库文件
+        backup_dir: 恢复前先把当前数据库备份到该目录，None 表示不备份
+
+    Returns:
+        恢复的备份文件、恢复前的安全备份和耗时
+    """
+    from .engine import create_sqlite_engine
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        source_file = backup_file
+        if backup_file.endswith(".gz"):
+            source_file = os.path.join(tmp, "restore.db")
+            with gzip.open(backup_file, "rb") as src, open(source_file, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+        source = sqlite3.connect(f"file:{Path(source_file).resolve()}?mode=ro", uri=True)
+        try:
+            _quick_check(source)
+            safety = None
+            if backup_dir and os.path.exists(db_file):
+                engine = create_sqlite_engine(db_file)
+                try:
+                    safety = backup_database(engine, db_file, backup_dir)["file"]
+                finally:
+                    engine.dispose()
+            # 通过备份API写入目标库：目标库的 WAL 和其他连接看到的都是一致的新内容
+            destination = sqlite3.connect(db_file)
+            try:
+                source.backup(destination)
+                _quick_check(destination)
+            finally:
+                destination.close()
+        finally:
+            source.close()
+
+    return {"restored": backup_file, "db_file": db_file, "safety_backup": safety,
+            "seconds": time.perf_counter() - started}
+
+
+class BackupService:
+    """
+    定时备份服务
+
+    run_once() 备份一次并轮换；start() 启动后台线程，距最近一次备份满 interval_hours 时备份
+    （进程重启不会推迟备份）
+    """
+
+    def __init__(self, engine: Engine, db_file: str, settings: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            engine: 共享的SQLAlchemy引擎
+            db_file: 数据库文件
+            settings: 配置文件中的 storage.backup 段（缺省项使用 DEFAULT_BACKUP_SETTINGS）
+        """
+        self.engine = engine
+        self.db_file = db_file
+        self.settings = {**DEFAULT_BACKUP_SETTINGS, **(settings or {})}
+        self.last_run: Optional[Dict[str, Any]] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Dict[str, Any]:
+        """备份一次并删除超出 keep 的旧备份"""
+        stats = backup_database(self.engine, self.db_file, self.settings["dir"],
+                                self.settings["pages_per_step"], self.settings["step_sleep_ms"],
+                                self.settings["compress"])
+        stats["removed"] = rotate_backups(self.settings["dir"], self.db_file, self.settings["keep"])
+        self.last_run = {**stats, "finished_at": int(time.time())}
+        print(f"💾 会话库备份: {stats['file']}（{stats['bytes'] / 1024:.0f} KB，{stats['seconds']:.2f}秒）")
+        return stats
+
+    def next_delay(self) -> float:
+        """距下一次备份的秒数（按最近一个备份文件的时间计算）"""
+        interval = self.settings["interval_hours"] * 3600
+        backups = list_backups(self.settings["dir"], self.db_file)
+        if not backups:
+            return 0.0
+        age = (datetime.now() - backups[0]["created_at"]).total_seconds()
+        return max(interval - age, 0.0)
+
+    def start(self) -> None:
+        """启动后台备份线程（interval_hours 为 0 或重复调用时无效）"""
+        if not self.settings["interval_hours"] or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="session-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """停止后台备份线程（正在进行的备份会先完成）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.next_delay()):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ 会话库备份失败: {e}")
+                # 失败后一小时内不重试，避免反复占用IO
+                if self._stop.wait(3600):
+                    break
+
+
+def run_backup_benchmark(db_file: str, sessions: int = 2000, chats: int = 16, turns: int = 200,
+                         payload_bytes: int = 4000, pages_per_step: int = 256,
+                         step_sleep_ms: int = 10) -> Dict[str, Any]:
+    """
+    备份对并发对话延迟的影响
+
+    先写入 sessions 个会话，再分别在无备份和连续备份时运行同样的并发对话负载（每轮读会话再写回）
+
+    Returns:
+        两个阶段的每轮请求延迟 P50/P99、落盘延迟 P95/最大值，以及备份次数和单次备份耗时
+    """
+    from .engine import StorageEngine
+    from .benchmark import _chat_session
+
+    engine = StorageEngine(db_file)
+    rng = np.random.default_rng(0)
+    alphabet = np.array(list("护城河安全边际自由现金流资本回报率估值管理层竞争格局ABCDEFGHIJ0123456789"))
+    try:
+        storage = engine.storage("bench_agent")
+        for i in range(sessions):
+            session = _chat_session("bench", f"seed-{i}", 4, 200)
+            session.session_data = {"notes": "".join(rng.choice(alphabet, payload_bytes))}
+            storage.upsert(session)
+    finally:
+        engine.close()
+
+    def run_phase(phase: str, backup_dir: Optional[str] = None) -> Dict[str, Any]:
+        # 每个阶段一个新引擎，队列指标只包含本阶段的写入
+        engine = StorageEngine(db_file)
+        storage = engine.storage("bench_agent")
+        latencies: List[float] = []
+        backups: List[Dict[str, Any]] = []
+        lock = threading.Lock()
+
+        def chat(index: int) -> None:
+            for turn in range(turns):
+                start = time.perf_counter()
+                storage.read(f"{phase}-{index}")
+                storage.upsert(_chat_session("bench", f"{phase}-{index}", turn, payload_bytes))
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=chat, args=(i,)) for i in range(chats)]
+        try:
+            for thread in threads:
+                thread.start()
+            while backup_dir and any(thread.is_alive() for thread in threads):
+                backups.append(backup_database(engine.engine, engine.db_file, backup_dir,
+                                               pages_per_step, step_sleep_ms))
+                rotate_backups(backup_dir, engine.db_file, 1)
+            for thread in threads:
+                thread.join()
+            engine.flush()
+            lag = engine.write_queue.metrics()["commit_lag_ms"]
+        finally:
+            engine.close()
+        return {"p50_ms": float(np.percentile(latencies, 50)) * 1000,
+                "p99_ms": float(np.percentile(latencies, 99)) * 1000,
+                "commit_lag_p95_ms": lag["p95"], "commit_lag_max_ms": lag["max"], "backups": backups}
+
+    baseline = run_phase("baseline")
+    with tempfile.TemporaryDirectory() as backup_dir:
+        during = run_phase("backup", backup_dir)
+    backups = during.pop("backups")
+    baseline.pop("backups")
+
+    return {
+        "db_bytes": backups[0]["db_bytes"] if backups else os.path.getsize(db_file),
+        "pages_per_step": pages_per_step,
+        "baseline": baseline,
+        "during_backup": during,
+        "backups": len(backups),
+        "backup_seconds": float(np.mean([b["seconds"] for b in backups])) if backups else 0.0,
+        "copy_seconds": float(np.mean([b["copy_seconds"] for b in backups])) if backups else 0.0,
+        "backup_bytes": backups[-1]["bytes"] if backups else 0,
+        "restarts": sum(b["restarts"] for b in backups),
+    }
+
+
+def format_benchmark(result: Dict[str, Any]) -> str:
+    """Markdown格式的备份基准报告"""
+    base, during = result["baseline"], result["during_backup"]
+    lines = [f"数据库 {result['db_bytes'] / 1024 / 1024:.1f} MB，每步 {result['pages_per_step']} 页："
+             f"备份 {result['backups']} 次，平均耗时 {result['backup_seconds']:.2f} 秒"
+             f"（在线复制 {result['copy_seconds']:.2f} 秒），"
+             f"压缩后 {result['backup_bytes'] / 1024 / 1024:.1f} MB，重新开始 {result['restarts']} 次",
+             "",
+             "| 阶段 | 请求P50(毫秒) | 请求P99(毫秒) | 落盘延迟P95(毫秒) | 落盘延迟最大(毫秒) |",
+             "|------|---------------|---------------|-------------------|--------------------|",
+             f"| 无备份 | {base['p50_ms']:.2f} | {base['p99_ms']:.2f} | {base['commit_lag_p95_ms']:.1f} | "
+             f"{base['commit_lag_max_ms']:.1f} |",
+             f"| 备份中 | {during['p50_ms']:.2f} | {during['p99_ms']:.2f} | {during['commit_lag_p95_ms']:.1f} | "
+             f"{during['commit_lag_max_ms']:.1f} |"]
+    return "\n".join(lines)
+
+
+def load_backup_settings() -> Dict[str, Any]:
+    """读取配置文件中的 storage 段（db_file 和 backup）"""
+    from .engine import DEFAULT_STORAGE_SETTINGS, PROJECT_ROOT
+
+    config_path = os.path.join(PROJECT_ROOT, "src", "config", "investment_agents_config.yaml")
+    try:
+        with open(config_path, "r", encoding="utf-8") as file:
+            storage = (yaml.safe_load(file) or {}).get("storage") or {}
+    except FileNotFoundError:
+        storage = {}
+    return {"db_file": storage.get("db_file", DEFAULT_STORAGE_SETTINGS["db_file"]),
+            **DEFAULT_BACKUP_SETTINGS, **(storage.get("backup") or {})}
+
+
+def main():
+    """命令行备份、列出、恢复和基准测试"""
+    from .engine import create_sqlite_engine, resolve_db_file
+
+    settings = load_backup_settings()
+    parser = argparse.ArgumentParser(description="会话库在线备份")
+    parser.add_argument("--db", default=settings["db_file"], help="数据库文件")
+    parser.add_argument("--dir", default=settings["dir"], help="备份目录")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backup", help="立即备份并轮换")
+    commands.add_parser("list", help="列出备份")
+    restore = commands.add_parser("restore", help="从备份恢复（需先停止 Playground）")
+    restore.add_argument("backup_file", help="备份文件")
+    restore.add_argument("--no-safety-backup", action="store_true", help="恢复前不备份当前数据库")
+    bench = commands.add_parser("bench", help="测量备份耗时及其对并发对话延迟的影响")
+    bench.add_argument("--sessions", type=int, default=2000, help="预先写入的会话数")
+    bench.add_argument("--chats", type=int, default=16, help="并发对话数")
+    bench.add_argument("--turns", type=int, default=200, help="每个对话的轮数")
+    bench.add_argument("--pages", type=int, default=settings["pages_per_step"], help="每步复制的页数")
+    args = parser.parse_args()
+
+    db_file, backup_dir = resolve_db_file(args.db), resolve_db_file(args.dir)
+    if args.command == "bench":
+        with tempfile.TemporaryDirectory() as tmp:
+            print("⏱️ 运行备份基准测试...")
+            result = run_backup_benchmark(os.path.join(tmp, "bench.db"), args.sessions, args.chats, args.turns,
+                                          pages_per_step=args.pages, step_sleep_ms=settings["step_sleep_ms"])
+        print(format_benchmark(result))
+    elif args.command == "list":
+        backups = list_backups(backup_dir, db_file)
+        if not backups:
+            print(f"📭 {backup_dir} 中没有备份")
+        for backup in backups:
+            print(f"💾 {backup['created_at']:%Y-%m-%d %H:%M:%S}  {backup['bytes'] / 1024:>10.0f} KB  {backup['file']}")
+    elif args.command == "restore":
+        if not os.path.exists(args.backup_file):
+            print(f"❌ 备份文件不存在: {args.backup_file}")
+            return
+        result = restore_backup(args.backup_file, db_file, None if args.no_safety_backup else backup_dir)
+        if result["safety_backup"]:
+            print(f"🛟 恢复前的数据库已备份到: {result['safety_backup']}")
+        print(f"✅ 已从 {args.backup_file} 恢复 {db_file}（{result['seconds']:.2f}秒）")
+    else:
+        if not os.path.exists(db_file):
+            print(f"❌ 数据库文件不存在: {db_file}")
+            return
+        engine = create_sqlite_engine(db_file)
+        try:
+            stats = backup_database(engine, db_file, backup_dir, settings["pages_per_step"],
+                                    settings["step_sleep_ms"], settings["compress"])
+        finally:
+            engine.dispose()
+        removed = rotate_backups(backup_dir, db_file, settings["keep"])
+        print(f"✅ 备份完成: {stats['file']}（{stats['db_bytes'] / 1024:.0f} KB → {stats['bytes'] / 1024:.0f} KB，"
+              f"{stats['steps']} 步，{stats['seconds']:.2f}秒）")
+        if removed:
+            print(f"🗑️ 轮换删除 {len(removed)} 个旧备份")
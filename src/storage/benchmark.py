@@ -0,0 +1,146 @@
+"""
+会话存储并发基准测试
+模拟多个并发对话（每轮先读会话再写回），对比“每个Agent一个SqliteStorage引擎”和共享引擎+写入队列的吞吐、延迟和错误数
+
+运行方式:
+    python scripts/storage_benchmark.py --chats 32 --turns 50
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import threading
+from typing import Dict, Any, List
+
+import numpy as np
+from agno.storage.session.agent import AgentSession
+from agno.storage.sqlite import SqliteStorage
+
+from .engine import StorageEngine
+
+MODES = ("per_agent", "shared")
+
+
+def _chat_session(agent_id: str, session_id: str, turn: int, payload_bytes: int) -> AgentSession:
+    """构造一轮对话后的会话（保留最近5轮，与 Playground 的 num_history_responses 一致）"""
+    runs = [{"input": f"第{i}轮提问", "content": "分" * payload_bytes} for i in range(max(0, turn - 4), turn + 1)]
+    return AgentSession(session_id=session_id, agent_id=agent_id, user_id="benchmark",
+                        memory={"runs": runs}, session_data={"turn": turn})
+
+
+def run_storage_benchmark(db_file: str, mode: str = "shared", agents: int = 7, chats: int = 16,
+                          turns: int = 20, payload_bytes: int = 2000) -> Dict[str, Any]:
+    """
+    运行一次并发对话负载
+
+    Args:
+        db_file: 数据库文件（两种模式应使用不同文件，WAL模式会写入文件头）
+        mode: per_agent（每个Agent独立引擎，原 Playground 的方式）或 shared（共享引擎+写入队列）
+        agents: Agent数量，对话按轮询分配给各Agent
+        chats: 并发对话数（线程数）
+        turns: 每个对话的轮数
+        payload_bytes: 每轮回复的大小
+
+    Returns:
+        吞吐（次/秒）、写入延迟P50/P95（毫秒）、失败次数和最终落盘的会话数
+    """
+    if mode not in MODES:
+        raise ValueError(f"未知的模式: {mode}（可选: {', '.join(MODES)}）")
+
+    shared = StorageEngine(db_file) if mode == "shared" else None
+    storages: List[SqliteStorage] = []
+    for i in range(agents):
+        table = f"bench_agent_{i}"
+        if shared is not None:
+            storages.append(shared.storage(table))
+        else:
+            storage = SqliteStorage(table_name=table, db_file=db_file)
+            storage.create()
+            storages.append(storage)
+
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(chats + 1)
+
+    def chat(index: int) -> None:
+        storage = storages[index % agents]
+        agent_id, session_id = f"agent-{index % agents}", f"chat-{index}"
+        barrier.wait()
+        for turn in range(turns):
+            try:
+                storage.read(session_id)
+                start = time.perf_counter()
+                ok = storage.upsert(_chat_session(agent_id, session_id, turn, payload_bytes)) is not None
+                elapsed = time.perf_counter() - start
+            except Exception:
+                ok, elapsed = False, 0.0
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += int(not ok)
+
+    threads = [threading.Thread(target=chat, args=(i,)) for i in range(chats)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    if shared is not None:
+        shared.flush()
+    seconds = time.perf_counter() - start
+
+    persisted = sum(len(storage.get_all_session_ids()) for storage in storages)
+    result = {
+        "mode": mode,
+        "chats": chats,
+        "upserts": chats * turns,
+        "seconds": seconds,
+        "throughput": chats * turns / seconds if seconds else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000,
+        "errors": errors[0],
+        "persisted_sessions": persisted,
+    }
+    if shared is not None:
+        result["batches"] = shared.write_queue.stats["batches"]
+        shared.close()
+    else:
+        for storage in storages:
+            storage.db_engine.dispose()
+    return result
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Markdown格式的对比表"""
+    lines = ["| 模式 | 并发对话 | 写入次数 | 吞吐(次/秒) | P50(毫秒) | P95(毫秒) | 失败 | 落盘会话 |",
+             "|------|----------|----------|-------------|-----------|-----------|------|----------|"]
+    for r in results:
+        lines.append(f"| {r['mode']} | {r['chats']} | {r['upserts']} | {r['throughput']:.0f} | "
+                     f"{r['p50_ms']:.1f} | {r['p95_ms']:.1f} | {r['errors']} | {r['persisted_sessions']} |")
+    return "\n".join(lines)
+
+
+def main():
+    """命令行运行基准测试"""
+    parser = argparse.ArgumentParser(description="会话存储并发基准测试")
+    parser.add_argument("--chats", type=int, default=32, help="并发对话数")
+    parser.add_argument("--turns", type=int, default=50, help="每个对话的轮数")
+    parser.add_argument("--agents", type=int, default=7, help="Agent数量")
+    parser.add_argument("--payload", type=int, default=2000, help="每轮回复的字符数")
+    parser.add_argument("--dir", help="数据库目录，默认使用临时目录")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.dir or tmp
+        results = []
+        for mode in MODES:
+            print(f"⏱️ 运行 {mode} 模式...")
+            results.append(run_storage_benchmark(os.path.join(directory, f"{mode}.db"), mode, args.agents,
+                                                 args.chats, args.turns, args.payload))
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+会话JSON列压缩
+会话的 memory（以及工作流的 runs）列按运行记录分帧、逐帧 zlib 压缩后以BLOB保存：
+读取完整会话时整体解压，只需要最近几轮对话时只解压最后几帧。
+未压缩的旧数据（JSON文本）照常读取
+"""
+
+import json
+import struct
+import zlib
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy.types import String, TypeDecorator
+
+# 需要压缩的会话列
+COMPRESSED_COLUMNS = ("memory", "runs")
+
+_MAGIC = b"AZC1"
+_HEADER = struct.Struct("<BI")
+_FRAME = struct.Struct("<I")
+
+# 帧布局：dict 的 runs 拆成逐条帧（其余字段为第0帧）、list 逐元素成帧、其他值只有第0帧
+_KIND_DICT_RUNS, _KIND_LIST, _KIND_PLAIN = 0, 1, 2
+
+
+def _dump(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compress_json(value: Any, level: int = 6) -> bytes:
+    """把JSON值压缩为分帧BLOB"""
+    if isinstance(value, dict) and isinstance(value.get("runs"), list):
+        kind, base, runs = _KIND_DICT_RUNS, {k: v for k, v in value.items() if k != "runs"}, value["runs"]
+    elif isinstance(value, list):
+        kind, base, runs = _KIND_LIST, None, value
+    else:
+        kind, base, runs = _KIND_PLAIN, value, []
+
+    parts = [_MAGIC, _HEADER.pack(kind, len(runs))]
+    for item in [base, *runs]:
+        frame = zlib.compress(_dump(item), level)
+        parts.append(_FRAME.pack(len(frame)))
+        parts.append(frame)
+    return b"".join(parts)
+
+
+def is_compressed(raw: Any) -> bool:
+    """数据库中的原始值是否为压缩BLOB"""
+    return isinstance(raw, (bytes, bytearray, memoryview)) and bytes(raw[:len(_MAGIC)]) == _MAGIC
+
+
+def _frames(blob: bytes) -> Tuple[int, List[memoryview]]:
+    view = memoryview(blob)
+    kind, count = _HEADER.unpack_from(view, len(_MAGIC))
+    offset = len(_MAGIC) + _HEADER.size
+    frames = []
+    for _ in range(count + 1):
+        (size,) = _FRAME.unpack_from(view, offset)
+        offset += _FRAME.size
+        frames.append(view[offset:offset + size])
+        offset += size
+    return kind, frames
+
+
+def _load(frame: memoryview) -> Any:
+    return json.loads(zlib.decompress(frame))
+
+
+def decode_json_column(raw: Any) -> Any:
+    """解码数据库中的原始值：压缩BLOB整体解压，JSON文本直接解析"""
+    if raw is None:
+        return None
+    if not is_compressed(raw):
+        return json.loads(raw)
+    kind, frames = _frames(bytes(raw))
+    runs = [_load(frame) for frame in frames[1:]]
+    if kind == _KIND_DICT_RUNS:
+        return {**_load(frames[0]), "runs": runs}
+    if kind == _KIND_LIST:
+        return runs
+    return _load(frames[0])
+
+
+def recent_runs(raw: Any, n: int) -> List[Any]:
+    """
+    只解码最近 n 条运行记录
+
+    Args:
+        raw: memory/runs 列的原始值（压缩BLOB或JSON文本）
+        n: 需要的运行记录条数
+
+    Returns:
+        最后 n 条运行记录（按时间顺序）
+    """
+    if raw is None or n <= 0:
+        return []
+    if not is_compressed(raw):
+        value = json.loads(raw)
+        runs = value.get("runs") if isinstance(value, dict) else value
+        return list(runs or [])[-n:] if isinstance(runs, list) else []
+    kind, frames = _frames(bytes(raw))
+    if kind == _KIND_PLAIN:
+        return []
+    return [_load(frame) for frame in frames[1:][-n:]]
+
+
+class CompressedJSON(TypeDecorator):
+    """
+    压缩的JSON列类型
+
+    写入时序列化后小于 min_bytes 的值仍保存为JSON文本，其余压缩为BLOB；读取时两种格式都支持
+    """
+
+    impl = String
+    cache_ok = True
+
+    def __init__(self, level: int = 6, min_bytes: int = 512):
+        """
+        Args:
+            level: zlib 压缩级别（1-9）
+            min_bytes: 小于该大小的值不压缩
+        """
+        super().__init__()
+        self.level = level
+        self.min_bytes = min_bytes
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[Any]:
+        if value is None:
+            return None
+        text = _dump(value)
+        if len(text) < self.min_bytes:
+            return text.decode("utf-8")
+        return compress_json(value, self.level)
+
+    def process_result_value(self, value: Any, dialect) -> Any:
+        return decode_json_column(value)
@@ -0,0 +1,186 @@
+"""
+共享SQLite存储引擎
+同一个数据库文件在进程内只创建一个引擎：WAL模式、busy_timeout、按服务并发配置的连接池，
+外加一个会话写入队列、会话保留服务和在线备份服务，所有Agent/团队的会话表都从这里创建；创建时执行数据库迁移
+"""
+
+import os
+import atexit
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Literal
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from .write_queue import SessionWriteQueue
+from .session_storage import PooledSqliteStorage
+from .migrations import run_migrations, current_version
+from .retention import RetentionService
+from .backup import BackupService, DEFAULT_BACKUP_SETTINGS
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_STORAGE_SETTINGS = {
+    "db_file": "data/agent_storage/investment_agents.db",
+    "pool_size": 8,
+    "max_overflow": 4,
+    "busy_timeout_ms": 5000,
+    "write_batch_ms": 20,
+    "max_batch": 256,
+    "compression_level": 6,
+    "compress_min_bytes": 512,
+    "retention": {},
+    "backup": {},
+}
+
+
+def create_sqlite_engine(db_file: str, pool_size: int = 8, max_overflow: int = 4,
+                         busy_timeout_ms: int = 5000) -> Engine:
+    """
+    创建SQLite引擎
+
+    每个新连接都设置 WAL（读写互不阻塞）、busy_timeout（写锁被占用时等待而不是立即报错）
+    和 synchronous=NORMAL（WAL下仍保证崩溃一致性）；新建的数据库使用 auto_vacuum=INCREMENTAL，
+    删除会话后的空闲页可以由保留服务分批回收
+
+    Args:
+        db_file: 数据库文件路径
+        pool_size: 连接池常驻连接数
+        max_overflow: 突发时允许额外创建的连接数
+        busy_timeout_ms: 等待写锁的最长时间（毫秒）
+    """
+    path = Path(db_file).resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(
+        f"sqlite:///{path}",
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=busy_timeout_ms / 1000,
+        connect_args={"check_same_thread": False, "timeout": busy_timeout_ms / 1000},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        # 只对尚未建表的新库生效，已有的库需要一次 VACUUM 才会切换
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
+
+
+class StorageEngine:
+    """
+    共享存储引擎
+
+    持有一个引擎、一个写入队列、一个会话保留服务和一个备份服务（由 Playground 调用 start() 启动），
+    storage() 为每个Agent/团队创建会话表的存储对象
+    """
+
+    def __init__(self, db_file: str, settings: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            db_file: 数据库文件路径
+            settings: 配置文件中的 storage 段（缺省项使用 DEFAULT_STORAGE_SETTINGS）
+        """
+        self.settings = {**DEFAULT_STORAGE_SETTINGS, **(settings or {})}
+        self.db_file = str(Path(db_file).resolve())
+        self.engine = create_sqlite_engine(
+            self.db_file,
+            pool_size=self.settings["pool_size"],
+            max_overflow=self.settings["max_overflow"],
+            busy_timeout_ms=self.settings["busy_timeout_ms"],
+        )
+        self.schema_version = self._migrate()
+        self.write_queue = SessionWriteQueue(
+            self.engine,
+            batch_window_ms=self.settings["write_batch_ms"],
+            max_batch=self.settings["max_batch"],
+        )
+        self.retention = RetentionService(self.engine, self.settings["retention"])
+        backup = {**DEFAULT_BACKUP_SETTINGS, **(self.settings["backup"] or {})}
+        backup["dir"] = resolve_db_file(backup["dir"])
+        self.backups = BackupService(self.engine, self.db_file, backup)
+        self._storages: Dict[tuple, PooledSqliteStorage] = {}
+        self._lock = threading.Lock()
+
+    def _migrate(self) -> int:
+        """启动时执行尚未执行的迁移，返回当前版本"""
+        run_migrations(self.engine)
+        with self.engine.connect() as conn:
+            return current_version(conn)
+
+    def storage(self, table_name: str,
+                mode: Literal["agent", "team", "workflow", "workflow_v2"] = "agent") -> PooledSqliteStorage:
+        """获取会话表的存储对象（同一张表复用同一个对象）"""
+        with self._lock:
+            key = (table_name, mode)
+            if key not in self._storages:
+                self._storages[key] = PooledSqliteStorage(
+                    table_name, self.engine, self.write_queue, mode=mode,
+                    compression_level=self.settings["compression_level"],
+                    compress_min_bytes=self.settings["compress_min_bytes"],
+                )
+            return self._storages[key]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待写入队列落盘"""
+        return self.write_queue.flush(timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        """存储指标：写入队列（队列深度、提交耗时、落盘延迟）、最近一轮会话保留和最近一次备份"""
+        return {
+            "db_file": self.db_file,
+            "schema_version": self.schema_version,
+            "write_queue": self.write_queue.metrics(),
+            "retention": self.retention.last_run,
+            "backup": self.backups.last_run,
+        }
+
+    def close(self) -> None:
+        """停止保留和备份服务、写完剩余会话并释放连接"""
+        self.retention.stop()
+        self.backups.stop()
+        self.write_queue.close()
+        self.engine.dispose()
+
+
+_engines: Dict[str, StorageEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def resolve_db_file(db_file: str) -> str:
+    """相对路径按项目根目录解析"""
+    return db_file if os.path.isabs(db_file) else os.path.join(PROJECT_ROOT, db_file)
+
+
+def get_storage_engine(config: Optional[Dict[str, Any]] = None, db_file: Optional[str] = None) -> StorageEngine:
+    """
+    获取进程内共享的存储引擎（每个数据库文件一个）
+
+    Args:
+        config: 完整配置，读取其中的 storage 段
+        db_file: 指定数据库文件，默认使用 storage.db_file
+    """
+    settings = (config or {}).get("storage") or {}
+    path = str(Path(resolve_db_file(db_file or settings.get("db_file", DEFAULT_STORAGE_SETTINGS["db_file"]))).resolve())
+    with _engines_lock:
+        if path not in _engines:
+            _engines[path] = StorageEngine(path, settings)
+        return _engines[path]
+
+
+@atexit.register
+def close_storage_engines() -> None:
+    """关闭所有共享引擎（进程退出时自动调用）"""
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.close()
@@ -0,0 +1,110 @@
+"""
+会话库的版本化迁移
+schema_version 表记录已执行的迁移，启动时按版本号顺序执行尚未执行的迁移（可重复调用）；
+会话表（含 session_id/user_id/created_at/updated_at 列）统一建立清理和列表查询所需的索引
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+SCHEMA_VERSION_TABLE = "schema_version"
+ARCHIVE_TABLE = "session_archive"
+SESSION_COLUMNS = {"session_id", "user_id", "created_at", "updated_at"}
+
+
+@dataclass(frozen=True)
+class Migration:
+    """一次迁移"""
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+def session_tables(conn: Connection) -> List[str]:
+    """库中所有会话表（按列判断，兼容Agent、团队和工作流表）"""
+    tables = conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+    )).scalars().all()
+    result = []
+    for table in tables:
+        columns = {row[1] for row in conn.execute(text(f'PRAGMA table_info("{table}")'))}
+        if table != ARCHIVE_TABLE and SESSION_COLUMNS <= columns:
+            result.append(table)
+    return result
+
+
+def ensure_session_indexes(conn: Connection, table: str) -> None:
+    """
+    为会话表建立索引（已存在时跳过）
+
+    - (user_id, updated_at)：按用户列出最近的会话
+    - created_at：按创建时间清理过期会话
+    """
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "ix_{table}_user_updated" ON "{table}" (user_id, updated_at)'))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "ix_{table}_created_at" ON "{table}" (created_at)'))
+
+
+def _index_session_tables(conn: Connection) -> None:
+    for table in session_tables(conn):
+        ensure_session_indexes(conn, table)
+
+
+def _create_session_archive(conn: Connection) -> None:
+    # 过期会话的冷存储：payload 为 zlib 压缩的整行JSON
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} ("
+        "source_table TEXT NOT NULL, session_id TEXT NOT NULL, user_id TEXT, "
+        "last_active_at INTEGER, archived_at INTEGER NOT NULL, payload BLOB NOT NULL, "
+        "PRIMARY KEY (source_table, session_id))"
+    ))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS "ix_{ARCHIVE_TABLE}_archived_at" ON {ARCHIVE_TABLE} (archived_at)'))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "session_indexes", _index_session_tables),
+    Migration(2, "session_archive", _create_session_archive),
+]
+
+
+def current_version(conn: Connection) -> int:
+    """已执行的最高迁移版本，未初始化时为0"""
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} "
+        "(version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at INTEGER NOT NULL)"
+    ))
+    return conn.execute(text(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_VERSION_TABLE}")).scalar()
+
+
+def run_migrations(engine: Engine, migrations: List[Migration] = MIGRATIONS) -> List[int]:
+    """
+    执行尚未执行的迁移
+
+    整个过程在一个写事务中完成，多个进程同时启动时只有一个会真正执行
+
+    Args:
+        engine: 数据库引擎
+        migrations: 迁移列表（按版本号排序执行）
+
+    Returns:
+        本次执行的迁移版本号
+    """
+    applied = []
+    with engine.begin() as conn:
+        # 先拿写锁，避免两个进程读到相同的版本后重复执行
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        version = current_version(conn)
+        for migration in sorted(migrations, key=lambda m: m.version):
+            if migration.version <= version:
+                continue
+            migration.apply(conn)
+            conn.execute(text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, name, applied_at) "
+                              "VALUES (:version, :name, :applied_at)"),
+                         {"version": migration.version, "name": migration.name, "applied_at": int(time.time())})
+            applied.append(migration.version)
+    if applied:
+        print(f"🗄️ 已执行数据库迁移: {', '.join(str(v) for v in applied)}")
+    return applied
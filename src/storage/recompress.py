@@ -0,0 +1,172 @@
+"""
+会话压缩迁移工具
+把已有会话表中未压缩的 memory/runs 列分批压缩，并报告节省的空间和压缩前后的读取延迟
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import Dict, Any, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .engine import DEFAULT_STORAGE_SETTINGS, create_sqlite_engine, resolve_db_file
+from .migrations import run_migrations, session_tables
+from .compression import COMPRESSED_COLUMNS, compress_json
+from .session_storage import PooledSqliteStorage
+
+_MODE_COLUMNS = (("workflow_name", "workflow_v2"), ("workflow_id", "workflow"), ("team_id", "team"))
+
+
+def _table_mode(conn, table: str) -> str:
+    columns = {row[1] for row in conn.execute(text(f'PRAGMA table_info("{table}")'))}
+    return next((mode for column, mode in _MODE_COLUMNS if column in columns), "agent")
+
+
+def _columns(conn, table: str) -> List[str]:
+    columns = {row[1] for row in conn.execute(text(f'PRAGMA table_info("{table}")'))}
+    return [name for name in COMPRESSED_COLUMNS if name in columns]
+
+
+def _db_bytes(engine: Engine, db_file: str) -> int:
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").all()
+    return os.path.getsize(db_file)
+
+
+def _column_bytes(engine: Engine, tables: Dict[str, List[str]]) -> int:
+    total = 0
+    with engine.connect() as conn:
+        for table, columns in tables.items():
+            for column in columns:
+                total += conn.execute(text(f'SELECT COALESCE(SUM(length({column})), 0) FROM "{table}"')).scalar()
+    return total
+
+
+def _read_latency(engine: Engine, tables: Dict[str, List[str]], modes: Dict[str, str],
+                  sample: int, recent: int) -> Dict[str, float]:
+    """抽样读取会话的平均耗时（毫秒）：完整读取（Agent 加载会话的路径）和 read_recent_runs 读取最近 recent 条"""
+    full, partial = [], []
+    for table in tables:
+        storage = PooledSqliteStorage(table, engine, mode=modes[table])
+        with engine.connect() as conn:
+            ids = conn.execute(text(f'SELECT session_id FROM "{table}" LIMIT :n'), {"n": sample}).scalars().all()
+        for session_id in ids:
+            start = time.perf_counter()
+            storage.read(session_id)
+            full.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            storage.read_recent_runs(session_id, recent)
+            partial.append(time.perf_counter() - start)
+    average = lambda values: sum(values) / len(values) * 1000 if values else 0.0
+    return {"full_read_ms": average(full), "recent_runs_ms": average(partial)}
+
+
+def compress_sessions(engine: Engine, level: int = 6, min_bytes: int = 512, batch_size: int = 100) -> Dict[str, int]:
+    """
+    分批压缩未压缩的会话列（每批一个短事务，不改变 updated_at）
+
+    Args:
+        engine: 数据库引擎
+        level: zlib 压缩级别
+        min_bytes: 小于该大小的值保持不压缩
+        batch_size: 每个事务处理的会话数
+
+    Returns:
+        各表压缩的会话数
+    """
+    compressed: Dict[str, int] = {}
+    with engine.connect() as conn:
+        tables = {table: _columns(conn, table) for table in session_tables(conn)}
+    for table, columns in tables.items():
+        for column in columns:
+            select = text(f'SELECT session_id, {column} FROM "{table}" '
+                          f"WHERE typeof({column}) = 'text' AND length({column}) >= :min_bytes LIMIT :limit")
+            update = text(f'UPDATE "{table}" SET {column} = :value WHERE session_id = :session_id')
+            while True:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql("BEGIN IMMEDIATE")
+                    rows = conn.execute(select, {"min_bytes": min_bytes, "limit": batch_size}).all()
+                    if rows:
+                        conn.execute(update, [{"session_id": session_id, "value": compress_json(json.loads(raw), level)}
+                                              for session_id, raw in rows])
+                compressed[table] = compressed.get(table, 0) + len(rows)
+                if len(rows) < batch_size:
+                    break
+    return {table: count for table, count in compressed.items() if count}
+
+
+def run_compression_migration(db_file: str, level: int = 6, min_bytes: int = 512, batch_size: int = 100,
+                              sample: int = 50, recent: int = 5, vacuum: bool = True) -> Dict[str, Any]:
+    """
+    压缩已有会话库并报告效果
+
+    Args:
+        db_file: 数据库文件
+        level: zlib 压缩级别
+        min_bytes: 小于该大小的值保持不压缩
+        batch_size: 每个事务处理的会话数
+        sample: 每张表抽样测量读取延迟的会话数
+        recent: 只读最近运行记录时的条数（对应 num_history_responses）
+        vacuum: 压缩后执行 VACUUM 把空闲页还给文件系统（需先停止 Playground）
+    """
+    engine = create_sqlite_engine(db_file)
+    try:
+        run_migrations(engine)
+        with engine.connect() as conn:
+            tables = {table: _columns(conn, table) for table in session_tables(conn)}
+            modes = {table: _table_mode(conn, table) for table in tables}
+
+        before = {"file_bytes": _db_bytes(engine, db_file), "column_bytes": _column_bytes(engine, tables),
+                  **_read_latency(engine, tables, modes, sample, recent)}
+        compressed = compress_sessions(engine, level, min_bytes, batch_size)
+        if vacuum:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+        after = {"file_bytes": _db_bytes(engine, db_file), "column_bytes": _column_bytes(engine, tables),
+                 **_read_latency(engine, tables, modes, sample, recent)}
+    finally:
+        engine.dispose()
+    return {"compressed": compressed, "before": before, "after": after}
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Markdown格式的压缩报告"""
+    before, after = report["before"], report["after"]
+    saved = lambda key: (1 - after[key] / before[key]) * 100 if before[key] else 0.0
+    lines = [f"压缩会话数: {sum(report['compressed'].values())} "
+             f"({', '.join(f'{t}={n}' for t, n in report['compressed'].items()) or '无'})",
+             "",
+             "| 指标 | 压缩前 | 压缩后 | 变化 |",
+             "|------|--------|--------|------|",
+             f"| 数据库文件 | {before['file_bytes'] / 1024:.0f} KB | {after['file_bytes'] / 1024:.0f} KB | "
+             f"-{saved('file_bytes'):.1f}% |",
+             f"| memory/runs 列 | {before['column_bytes'] / 1024:.0f} KB | {after['column_bytes'] / 1024:.0f} KB | "
+             f"-{saved('column_bytes'):.1f}% |",
+             f"| 完整读取会话（Agent加载） | {before['full_read_ms']:.2f} ms | {after['full_read_ms']:.2f} ms | |",
+             f"| read_recent_runs（仅工具） | {before['recent_runs_ms']:.2f} ms | {after['recent_runs_ms']:.2f} ms | |"]
+    return "\n".join(lines)
+
+
+def main():
+    """命令行压缩已有会话库"""
+    parser = argparse.ArgumentParser(description="压缩已有会话库的 memory/runs 列")
+    parser.add_argument("--db", default=DEFAULT_STORAGE_SETTINGS["db_file"], help="数据库文件")
+    parser.add_argument("--level", type=int, default=DEFAULT_STORAGE_SETTINGS["compression_level"], help="zlib 压缩级别")
+    parser.add_argument("--min-bytes", type=int, default=DEFAULT_STORAGE_SETTINGS["compress_min_bytes"],
+                        help="小于该大小的值不压缩")
+    parser.add_argument("--batch", type=int, default=100, help="每个事务处理的会话数")
+    parser.add_argument("--recent", type=int, default=5, help="只读最近运行记录时的条数")
+    parser.add_argument("--no-vacuum", action="store_true", help="压缩后不执行 VACUUM")
+    args = parser.parse_args()
+
+    db_file = resolve_db_file(args.db)
+    if not os.path.exists(db_file):
+        print(f"❌ 数据库文件不存在: {db_file}")
+        return
+    print(f"🗜️ 压缩会话库: {db_file}")
+    report = run_compression_migration(db_file, args.level, args.min_bytes, args.batch,
+                                       recent=args.recent, vacuum=not args.no_vacuum)
+    print(format_report(report))
@@ -0,0 +1,596 @@
+"""
+分析结果存储
+多大师分析的每次运行（各位大师的分析、综合报告和性能数据）保存到独立的SQLite库：
+每条分析一行，带评分、建议、信心度、风险和目标价，(symbol, master, created_at, rating) 覆盖索引
+支持毫秒级的「自选股中每只股票最新的某位大师评分」；分析全文用 FTS5（trigram 分词，支持中文子串）检索
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .engine import create_sqlite_engine, resolve_db_file
+
+DEFAULT_RESULTS_SETTINGS = {
+    "enabled": True,
+    "db_file": "data/analysis_results/results.db",
+}
+
+# 综合报告与大师分析存在同一张表，master 使用这个键
+SYNTHESIS_MASTER = "synthesis"
+SYNTHESIS_AGENT = "综合报告"
+
+_SIGNAL_COLUMNS = ("rating", "recommendation", "conviction", "risk", "target_price")
+_RECOMMENDATIONS = {1.0: "买入", 0.5: "持有", 0.0: "卖出"}
+_ROW_COLUMNS = ("id", "run_id", "symbol", "master", "agent", "created_at", *_SIGNAL_COLUMNS)
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS analysis_runs (
+        run_id TEXT PRIMARY KEY,
+        symbol TEXT NOT NULL,
+        created_at INTEGER NOT NULL,
+        analysis_mode TEXT,
+        selected_masters TEXT,
+        total_time REAL,
+        performance TEXT,
+        extra TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_runs_symbol_date ON analysis_runs (symbol, created_at)",
+    """CREATE TABLE IF NOT EXISTS master_analyses (
+        id INTEGER PRIMARY KEY,
+        run_id TEXT NOT NULL REFERENCES analysis_runs (run_id) ON DELETE CASCADE,
+        symbol TEXT NOT NULL,
+        master TEXT NOT NULL,
+        agent TEXT,
+        created_at INTEGER NOT NULL,
+        rating REAL,
+        recommendation TEXT,
+        conviction REAL,
+        risk REAL,
+        target_price REAL,
+        structured TEXT,
+        analysis TEXT NOT NULL
+    )""",
+    # 最新评分查询只读这个索引：按 (symbol, master) 定位后取 created_at 最大的一条
+    "CREATE INDEX IF NOT EXISTS idx_analyses_symbol_master_date ON master_analyses (symbol, master, created_at, rating)",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_master_date ON master_analyses (master, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_master_rating ON master_analyses (master, rating)",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_run ON master_analyses (run_id)",
+]
+
+_FTS_SCHEMA = [
+    # 外部内容表：全文索引不重复保存分析文本，由触发器与 master_analyses 保持同步
+    """CREATE VIRTUAL TABLE IF NOT EXISTS analysis_fts USING fts5(
+        analysis, content='master_analyses', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS analyses_fts_insert AFTER INSERT ON master_analyses BEGIN
+        INSERT INTO analysis_fts (rowid, analysis) VALUES (new.id, new.analysis);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS analyses_fts_delete AFTER DELETE ON master_analyses BEGIN
+        INSERT INTO analysis_fts (analysis_fts, rowid, analysis) VALUES ('delete', old.id, old.analysis);
+    END""",
+]
+
+_BY_SYMBOL = "INDEXED BY idx_analyses_symbol_master_date"
+
+# trigram 分词只能用不少于3个字符的词检索
+_MIN_FTS_TERM = 3
+
+
+def _timestamp(value: Any) -> Optional[int]:
+    """时间参数：时间戳、datetime 或 YYYY-MM-DD[ HH:MM[:SS]] 字符串"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(str(value)).timestamp())
+
+
+def _number(value: Any) -> Optional[float]:
+    # 提取不到的信号是 NaN，入库为 NULL
+    if value is None:
+        return None
+    value = float(value)
+    return None if value != value else value
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False, default=str)
+
+
+class AnalysisResultStore:
+    """
+    分析结果存储
+
+    save() 保存一次 analyze_stock_multi_master 的结果；latest()、history()、query() 和 search() 查询，
+    get_run() 取回完整报告，不需要重新运行分析
+    """
+
+    def __init__(self, db_file: str, engine: Optional[Engine] = None):
+        """
+        Args:
+            db_file: 数据库文件
+            engine: 已创建的引擎（默认为该文件创建WAL模式的连接池引擎）
+        """
+        self.db_file = str(Path(db_file).resolve())
+        self.engine = engine or create_sqlite_engine(self.db_file)
+        self.fts_enabled = self._create_schema()
+
+    def _create_schema(self) -> bool:
+        """建表（幂等），返回全文索引是否可用（SQLite 未编译 FTS5/trigram 时退化为 LIKE 检索）"""
+        with self.engine.begin() as conn:
+            for statement in _SCHEMA:
+                conn.exec_driver_sql(statement)
+        try:
+            with self.engine.begin() as conn:
+                for statement in _FTS_SCHEMA:
+                    conn.exec_driver_sql(statement)
+            return True
+        except Exception as e:
+            print(f"⚠️ 全文索引不可用，分析检索改用 LIKE: {e}")
+            return False
+
+    def save(self, result: Dict[str, Any], master_keys: Optional[Dict[str, str]] = None,
+             signals: Optional[Dict[str, Dict[str, Any]]] = None, created_at: Any = None) -> str:
+        """
+        保存一次多大师分析
+
+        Args:
+            result: analyze_stock_multi_master 的返回值
+            master_keys: 大师显示名（分析结果中的 agent）到配置键名的映射，未提供时使用显示名
+            signals: 各来源（大师显示名或「综合报告」）提取的信号：rating、recommendation(0/0.5/1)、
+                conviction、risk、target_price
+            created_at: 分析时间（默认当前时间）
+
+        Returns:
+            运行ID
+        """
+        master_keys = master_keys or {}
+        signals = signals or {}
+        run_id = uuid.uuid4().hex
+        created = _timestamp(created_at) or int(time.time())
+        symbol = result["symbol"].upper()
+
+        rows, failed = [], []
+        for analysis in result.get("individual_analyses") or []:
+            agent = analysis.get("agent", "")
+            if analysis.get("style") == "错误":
+                failed.append(agent)
+                continue
+            rows.append(self._analysis_row(run_id, symbol, master_keys.get(agent, agent), agent, created,
+                                           analysis.get("analysis", ""), analysis.get("structured"),
+                                           signals.get(agent)))
+        synthesis = result.get("synthesis")
+        if isinstance(synthesis, str) and synthesis:
+            rows.append(self._analysis_row(run_id, symbol, SYNTHESIS_MASTER, SYNTHESIS_AGENT, created,
+                                           synthesis, None, signals.get(SYNTHESIS_AGENT)))
+
+        performance = result.get("performance") or {}
+        extra = {key: result[key] for key in ("skipped_masters", "missing_masters") if result.get(key)}
+        if failed:
+            extra["failed_masters"] = failed
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO analysis_runs (run_id, symbol, created_at, analysis_mode, selected_masters, "
+                "total_time, performance, extra) VALUES (:run_id, :symbol, :created_at, :analysis_mode, "
+                ":selected_masters, :total_time, :performance, :extra)"
+            ), {"run_id": run_id, "symbol": symbol, "created_at": created,
+                "analysis_mode": result.get("analysis_mode"),
+                "selected_masters": _dumps(result.get("selected_masters")),
+                "total_time": performance.get("total_time"),
+                "performance": _dumps(performance), "extra": _dumps(extra or None)})
+            if rows:
+                conn.execute(text(
+                    "INSERT INTO master_analyses (run_id, symbol, master, agent, created_at, rating, recommendation, "
+                    "conviction, risk, target_price, structured, analysis) VALUES (:run_id, :symbol, :master, :agent, "
+                    ":created_at, :rating, :recommendation, :conviction, :risk, :target_price, :structured, :analysis)"
+                ), rows)
+        return run_id
+
+    @staticmethod
+    def _analysis_row(run_id: str, symbol: str, master: str, agent: str, created: int, analysis: str,
+                      structured: Optional[Dict[str, Any]], signals: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        signals = signals or {}
+        recommendation = _number(signals.get("recommendation"))
+        return {
+            "run_id": run_id, "symbol": symbol, "master": master, "agent": agent, "created_at": created,
+            "rating": _number(signals.get("rating")),
+            "recommendation": _RECOMMENDATIONS.get(recommendation),
+            "conviction": _number(signals.get("conviction")),
+            "risk": _number(signals.get("risk")),
+            "target_price": _number(signals.get("target_price")),
+            "structured": _dumps(structured),
+            "analysis": analysis,
+        }
+
+    def latest(self, symbols: Optional[Iterable[str]] = None, master: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        每个 (股票, 大师) 最新的一条分析（不含全文）
+
+        Args:
+            symbols: 股票列表（如自选股），None 表示所有股票
+            master: 大师键名（综合报告为 synthesis），None 表示所有大师
+        """
+        where, params = self._filters(symbols=symbols, master=master)
+        # 对每个 (symbol, master) 在覆盖索引上倒序取第一条；显式指定索引，
+        # 未执行 ANALYZE 时查询规划器可能按 master 索引扫描该大师的全部历史
+        sql = (f"SELECT {', '.join(_ROW_COLUMNS)} FROM master_analyses WHERE id IN ("
+               f"SELECT (SELECT x.id FROM master_analyses x {_BY_SYMBOL} WHERE x.symbol = g.symbol "
+               "AND x.master = g.master ORDER BY x.created_at DESC LIMIT 1) "
+               f"FROM (SELECT DISTINCT symbol, master FROM master_analyses {_BY_SYMBOL} {where}) g) "
+               "ORDER BY symbol, master")
+        return self._rows(sql, params)
+
+    def history(self, symbol: str, master: Optional[str] = None, since: Any = None, until: Any = None,
+                limit: int = 50) -> List[Dict[str, Any]]:
+        """一只股票的历史分析（新的在前，不含全文）"""
+        return self.query(symbol=symbol, master=master, since=since, until=until, limit=limit)
+
+    def query(self, symbol: Optional[str] = None, master: Optional[str] = None, since: Any = None,
+              until: Any = None, min_rating: Optional[float] = None, max_rating: Optional[float] = None,
+              recommendation: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        按条件查询分析（新的在前，不含全文）
+
+        Args:
+            symbol: 股票代码
+            master: 大师键名
+            since: 起始时间（含）
+            until: 截止时间（不含）
+            min_rating: 最低评分
+            max_rating: 最高评分
+            recommendation: 建议（买入/持有/卖出）
+            limit: 最多返回条数
+        """
+        where, params = self._filters(symbols=[symbol] if symbol else None, master=master, since=since, until=until,
+                                      min_rating=min_rating, max_rating=max_rating, recommendation=recommendation)
+        sql = (f"SELECT {', '.join(_ROW_COLUMNS)} FROM master_analyses {_BY_SYMBOL if symbol else ''} {where} "
+               "ORDER BY created_at DESC, id DESC LIMIT :limit")
+        return self._rows(sql, {**params, "limit": limit})
+
+    def search(self, query: str, symbol: Optional[str] = None, master: Optional[str] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        全文检索分析（新的在前），结果带命中片段
+
+        Args:
+            query: 空格分隔的关键词，全部命中才返回；每个词不少于3个字符时走全文索引，否则逐行匹配
+            symbol: 限定股票
+            master: 限定大师
+            limit: 最多返回条数
+        """
+        terms = [term for term in query.split() if term]
+        if not terms:
+            return []
+        where, params = self._filters(symbols=[symbol] if symbol else None, master=master, alias="m")
+        columns = ", ".join(f"m.{column}" for column in _ROW_COLUMNS)
+        if self.fts_enabled and all(len(term) >= _MIN_FTS_TERM for term in terms):
+            match = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+            conditions = "analysis_fts MATCH :match" + (f" AND {where[len('WHERE '):]}" if where else "")
+            sql = (f"SELECT {columns}, snippet(analysis_fts, 0, '【', '】', '…', 24) AS snippet "
+                   "FROM analysis_fts JOIN master_analyses m ON m.id = analysis_fts.rowid "
+                   f"WHERE {conditions} ORDER BY m.created_at DESC, m.id DESC LIMIT :limit")
+            return self._rows(sql, {**params, "match": match, "limit": limit})
+
+        likes = " AND ".join(f"m.analysis LIKE :term{i} ESCAPE '\\'" for i in range(len(terms)))
+        params.update({f"term{i}": "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                       for i, term in enumerate(terms)})
+        conditions = likes + (f" AND {where[len('WHERE '):]}" if where else "")
+        sql = (f"SELECT {columns}, m.analysis FROM master_analyses m WHERE {conditions} "
+               "ORDER BY m.created_at DESC, m.id DESC LIMIT :limit")
+        rows = self._rows(sql, {**params, "limit": limit})
+        for row in rows:
+            row["snippet"] = self._snippet(row.pop("analysis"), terms[0])
+        return rows
+
+    @staticmethod
+    def _snippet(content: str, term: str, width: int = 24) -> str:
+        """命中词前后各 width 个字符的摘录（不区分大小写，与 trigram 检索一致）；找不到时取开头"""
+        index = content.lower().find(term.lower())
+        if index < 0:
+            return content[:width * 2] + ("…" if len(content) > width * 2 else "")
+        start, end = max(index - width, 0), min(index + len(term) + width, len(content))
+        return (("…" if start else "") + content[start:index] + f"【{content[index:index + len(term)]}】"
+                + content[index + len(term):end] + ("…" if end < len(content) else ""))
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """取回一次运行的完整结果（结构与 analyze_stock_multi_master 的返回值一致，另含 run_id 和 created_at）"""
+        with self.engine.connect() as conn:
+            run = conn.execute(text("SELECT * FROM analysis_runs WHERE run_id = :run_id"),
+                               {"run_id": run_id}).mappings().first()
+            if run is None:
+                return None
+            analyses = conn.execute(text("SELECT * FROM master_analyses WHERE run_id = :run_id ORDER BY id"),
+                                    {"run_id": run_id}).mappings().all()
+
+        individual, synthesis = [], None
+        for row in analyses:
+            if row["master"] == SYNTHESIS_MASTER:
+                synthesis = row["analysis"]
+                continue
+            individual.append({
+                "agent": row["agent"], "master": row["master"], "symbol": row["symbol"],
+                "analysis": row["analysis"],
+                "structured": json.loads(row["structured"]) if row["structured"] else None,
+                **{column: row[column] for column in _SIGNAL_COLUMNS},
+            })
+        return {
+            "run_id": run["run_id"],
+            "symbol": run["symbol"],
+            "created_at": run["created_at"],
+            "selected_masters": json.loads(run["selected_masters"]) if run["selected_masters"] else [],
+            "individual_analyses": individual,
+            "synthesis": synthesis,
+            "analysis_mode": run["analysis_mode"],
+            "performance": json.loads(run["performance"]) if run["performance"] else {},
+            **(json.loads(run["extra"]) if run["extra"] else {}),
+        }
+
+    def latest_run(self, symbol: str, since: Any = None) -> Optional[Dict[str, Any]]:
+        """一只股票最近一次运行的完整结果（since 之后没有运行时返回None）"""
+        params = {"symbol": symbol.upper(), "since": _timestamp(since) or 0}
+        with self.engine.connect() as conn:
+            run_id = conn.execute(text(
+                "SELECT run_id FROM analysis_runs WHERE symbol = :symbol AND created_at >= :since "
+                "ORDER BY created_at DESC LIMIT 1"
+            ), params).scalar()
+        return self.get_run(run_id) if run_id else None
+
+    def masters(self) -> List[str]:
+        """已保存分析的大师键名"""
+        with self.engine.connect() as conn:
+            return list(conn.execute(text("SELECT DISTINCT master FROM master_analyses ORDER BY master")).scalars())
+
+    def analyses_after(self, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        """按保存顺序返回 id 大于 after_id 的分析（含全文），供分析记忆增量建索引"""
+        return self._rows("SELECT id, run_id, symbol, master, agent, created_at, analysis FROM master_analyses "
+                          "WHERE id > :after ORDER BY id LIMIT :limit", {"after": after_id, "limit": limit})
+
+    def delete_before(self, before: Any) -> int:
+        """删除某个时间之前的运行（连同其分析和全文索引），返回删除的运行数"""
+        cutoff = _timestamp(before)
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM master_analyses WHERE run_id IN "
+                              "(SELECT run_id FROM analysis_runs WHERE created_at < :cutoff)"), {"cutoff": cutoff})
+            return conn.execute(text("DELETE FROM analysis_runs WHERE created_at < :cutoff"),
+                                {"cutoff": cutoff}).rowcount
+
+    @staticmethod
+    def _filters(symbols: Optional[Iterable[str]] = None, master: Optional[str] = None, since: Any = None,
+                 until: Any = None, min_rating: Optional[float] = None, max_rating: Optional[float] = None,
+                 recommendation: Optional[str] = None, alias: str = ""):
+        prefix = f"{alias}." if alias else ""
+        conditions, params = [], {}
+        if symbols is not None:
+            symbols = [symbol.upper() for symbol in symbols]
+            names = [f"symbol{i}" for i in range(len(symbols))]
+            conditions.append(f"{prefix}symbol IN ({', '.join(':' + name for name in names) or 'NULL'})")
+            params.update(zip(names, symbols))
+        for column, operator, value in (("master", "=", master), ("created_at", ">=", _timestamp(since)),
+                                        ("created_at", "<", _timestamp(until)), ("rating", ">=", min_rating),
+                                        ("rating", "<=", max_rating), ("recommendation", "=", recommendation)):
+            if value is not None:
+                name = f"p{len(params)}"
+                conditions.append(f"{prefix}{column} {operator} :{name}")
+                params[name] = value
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def _rows(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(text(sql), params).mappings()]
+
+    def close(self) -> None:
+        """释放连接"""
+        self.engine.dispose()
+
+
+_stores: Dict[str, AnalysisResultStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_result_store(config: Optional[Dict[str, Any]] = None,
+                     db_file: Optional[str] = None) -> Optional[AnalysisResultStore]:
+    """
+    获取进程内共享的分析结果存储（每个数据库文件一个）
+
+    Args:
+        config: 完整配置，读取其中的 results_store 段；enabled 为 false 时返回None
+        db_file: 指定数据库文件，默认使用 results_store.db_file
+    """
+    settings = {**DEFAULT_RESULTS_SETTINGS, **((config or {}).get("results_store") or {})}
+    if not settings["enabled"] and db_file is None:
+        return None
+    path = str(Path(resolve_db_file(db_file or settings["db_file"])).resolve())
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = AnalysisResultStore(path)
+        return _stores[path]
+
+
+def run_results_benchmark(db_file: str, symbols: int = 500, masters: int = 8, runs: int = 25,
+                          watchlist: int = 50, repeat: int = 20) -> Dict[str, Any]:
+    """
+    写入合成的分析记录并测量查询耗时（毫秒，取多次的中位数）
+
+    Args:
+        db_file: 数据库文件
+        symbols: 股票数
+        masters: 每次运行的大师数
+        runs: 每只股票的运行次数（分析行数 = symbols * runs * (masters + 1)）
+        watchlist: 最新评分查询的自选股数量
+        repeat: 每个查询的重复次数
+    """
+    import random
+    import statistics
+
+    store = AnalysisResultStore(db_file)
+    rng = random.Random(0)
+    tickers = [f"S{i:04d}" for i in range(symbols)]
+    names = [f"master_{i}" for i in range(masters)]
+    words = ["护城河", "安全边际", "自由现金流", "资本回报率", "估值偏高", "管理层", "竞争格局", "债务风险"]
+    now = int(time.time())
+
+    started = time.perf_counter()
+    for run in range(runs):
+        for symbol in tickers:
+            created = now - (runs - run) * 86400
+            analyses = [{"agent": name, "analysis": f"{symbol} {' '.join(rng.sample(words, 3))} 评分{rng.randint(1, 10)}/10"}
+                        for name in names]
+            signals = {name: {"rating": rng.randint(1, 10), "recommendation": rng.choice([0.0, 0.5, 1.0])}
+                       for name in names}
+            store.save({"symbol": symbol, "individual_analyses": analyses, "synthesis": f"{symbol} 综合报告"},
+                       signals=signals, created_at=created)
+    insert_seconds = time.perf_counter() - started
+
+    def timed(call) -> float:
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            durations.append((time.perf_counter() - start) * 1000)
+        return statistics.median(durations)
+
+    watch = rng.sample(tickers, min(watchlist, symbols))
+    with store.engine.connect() as conn:
+        rows = conn.execute(text("SELECT COUNT(*) FROM master_analyses")).scalar()
+    result = {
+        "rows": rows,
+        "insert_seconds": insert_seconds,
+        "latest_watchlist_ms": timed(lambda: store.latest(watch, "master_3")),
+        "latest_all_symbols_ms": timed(lambda: store.latest(master="master_3")),
+        "history_ms": timed(lambda: store.history(watch[0], "master_3")),
+        "high_rating_ms": timed(lambda: store.query(master="master_3", min_rating=9, since=now - 7 * 86400)),
+        "search_ms": timed(lambda: store.search("自由现金流 护城河", symbol=watch[0])),
+        "latest_run_ms": timed(lambda: store.latest_run(watch[0])),
+    }
+    store.close()
+    return result
+
+
+def format_benchmark(result: Dict[str, Any]) -> str:
+    """Markdown格式的查询耗时"""
+    labels = [("latest_watchlist_ms", "自选股最新评分（单个大师）"), ("latest_all_symbols_ms", "所有股票最新评分（单个大师）"),
+              ("history_ms", "单只股票历史"), ("high_rating_ms", "近7天高评分"), ("search_ms", "全文检索"),
+              ("latest_run_ms", "最近一次完整报告")]
+    lines = [f"{result['rows']} 条分析，写入耗时 {result['insert_seconds']:.1f} 秒", "",
+             "| 查询 | 耗时(毫秒) |", "|------|------------|"]
+    lines += [f"| {label} | {result[key]:.2f} |" for key, label in labels]
+    return "\n".join(lines)
+
+
+def _print_rows(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        print("📭 没有匹配的分析")
+        return
+    for row in rows:
+        rating = f"{row['rating']:.1f}" if row["rating"] is not None else "-"
+        when = datetime.fromtimestamp(row["created_at"]).strftime("%Y-%m-%d %H:%M")
+        line = f"{when}  {row['symbol']:<8} {row['master']:<18} 评分 {rating:>4}  {row['recommendation'] or '-'}"
+        if row.get("snippet"):
+            line += f"\n    {row['snippet']}"
+        print(line)
+
+
+def _print_run(run: Dict[str, Any]) -> None:
+    when = datetime.fromtimestamp(run["created_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"📊 {run['symbol']} 分析报告（{when}，运行 {run['run_id']}，模式 {run['analysis_mode'] or '-'}）")
+    print("=" * 80)
+    for analysis in run["individual_analyses"]:
+        print(f"\n🎭 {analysis['agent']}")
+        print("-" * 60)
+        print(analysis["analysis"])
+    if run["synthesis"]:
+        print(f"\n{'=' * 80}\n📋 综合投资分析报告\n{'=' * 80}")
+        print(run["synthesis"])
+
+
+def main():
+    """命令行查询分析结果"""
+    import yaml
+    from .engine import PROJECT_ROOT
+
+    config_path = os.path.join(PROJECT_ROOT, "src", "config", "investment_agents_config.yaml")
+    try:
+        with open(config_path, "r", encoding="utf-8") as file:
+            config = yaml.safe_load(file) or {}
+    except FileNotFoundError:
+        config = {}
+    settings = {**DEFAULT_RESULTS_SETTINGS, **(config.get("results_store") or {})}
+
+    parser = argparse.ArgumentParser(description="查询保存的多大师分析结果")
+    parser.add_argument("--db", default=settings["db_file"], help="数据库文件")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="显示一只股票最近一次的完整报告")
+    show.add_argument("symbol")
+    show.add_argument("--run", help="指定运行ID")
+    latest = commands.add_parser("latest", help="每只股票最新的评分")
+    latest.add_argument("--symbols", help="逗号分隔的股票列表（如自选股）")
+    latest.add_argument("--master", help="大师键名，如 benjamin_graham；综合报告为 synthesis")
+    history = commands.add_parser("history", help="一只股票的历史分析")
+    history.add_argument("symbol")
+    history.add_argument("--master")
+    history.add_argument("--since", help="起始日期 YYYY-MM-DD")
+    history.add_argument("--limit", type=int, default=50)
+    query = commands.add_parser("query", help="按大师、日期、评分和建议筛选")
+    query.add_argument("--master")
+    query.add_argument("--since")
+    query.add_argument("--until")
+    query.add_argument("--min-rating", type=float)
+    query.add_argument("--recommendation", choices=list(_RECOMMENDATIONS.values()))
+    query.add_argument("--limit", type=int, default=100)
+    search = commands.add_parser("search", help="全文检索分析内容")
+    search.add_argument("query")
+    search.add_argument("--symbol")
+    search.add_argument("--master")
+    search.add_argument("--limit", type=int, default=20)
+    bench = commands.add_parser("bench", help="用合成数据测量查询耗时")
+    bench.add_argument("--symbols", type=int, default=500)
+    bench.add_argument("--runs", type=int, default=25)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            print("⏱️ 写入合成分析记录...")
+            print(format_benchmark(run_results_benchmark(os.path.join(tmp, "results.db"), args.symbols,
+                                                         runs=args.runs)))
+        return
+
+    db_file = resolve_db_file(args.db)
+    if not os.path.exists(db_file):
+        print(f"❌ 分析结果库不存在: {db_file}")
+        return
+    store = AnalysisResultStore(db_file)
+    try:
+        if args.command == "show":
+            run = store.get_run(args.run) if args.run else store.latest_run(args.symbol)
+            if run is None:
+                print(f"📭 没有 {args.symbol.upper()} 的分析记录")
+            else:
+                _print_run(run)
+        elif args.command == "latest":
+            symbols = [s.strip() for s in args.symbols.split(",") if s.strip()] if args.symbols else None
+            _print_rows(store.latest(symbols, args.master))
+        elif args.command == "history":
+            _print_rows(store.history(args.symbol, args.master, since=args.since, limit=args.limit))
+        elif args.command == "query":
+            _print_rows(store.query(master=args.master, since=args.since, until=args.until,
+                                    min_rating=args.min_rating, recommendation=args.recommendation, limit=args.limit))
+        else:
+            _print_rows(store.search(args.query, args.symbol, args.master, args.limit))
+    except sqlite3.Error as e:
+        print(f"❌ 查询失败: {e}")
+    finally:
+        store.close()
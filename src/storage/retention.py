@@ -0,0 +1,194 @@
+"""
+会话保留服务
+在 Playground 进程内定期清理过期会话：每个批次一个短事务，批次之间让出写锁；
+过期会话可压缩归档到 session_archive 冷表；每轮结束后执行 incremental_vacuum 和 WAL checkpoint。
+保留策略在配置文件 storage.retention 段中按会话表配置
+"""
+
+import json
+import time
+import zlib
+import threading
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .migrations import ARCHIVE_TABLE, session_tables
+from .compression import decode_json_column, is_compressed
+
+DEFAULT_RETENTION_SETTINGS = {
+    "interval_seconds": 600,
+    "batch_size": 200,
+    "batch_pause_ms": 50,
+    "vacuum_pages": 1000,
+    "default": {"max_age_hours": 168, "archive": True},
+    "tables": {},
+}
+
+
+class RetentionService:
+    """
+    会话保留服务
+
+    run_once() 执行一轮清理；start() 启动后台线程每 interval_seconds 执行一轮。
+    会话以最后活跃时间（updated_at，未更新过时为 created_at）判断是否过期
+    """
+
+    def __init__(self, engine: Engine, settings: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            engine: 共享的SQLAlchemy引擎（需已执行迁移）
+            settings: 配置文件中的 storage.retention 段（缺省项使用 DEFAULT_RETENTION_SETTINGS）
+        """
+        settings = settings or {}
+        self.engine = engine
+        self.settings = {**DEFAULT_RETENTION_SETTINGS, **settings}
+        self.settings["default"] = {**DEFAULT_RETENTION_SETTINGS["default"], **(settings.get("default") or {})}
+        self.settings["tables"] = settings.get("tables") or {}
+        self.last_run: Optional[Dict[str, Any]] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def policy(self, table: str) -> Dict[str, Any]:
+        """会话表的保留策略（未单独配置的表使用 default）"""
+        return {**self.settings["default"], **(self.settings["tables"].get(table) or {})}
+
+    def run_once(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        执行一轮清理
+
+        Args:
+            now: 当前时间戳（测试用，默认 time.time()）
+
+        Returns:
+            本轮统计：各表删除数、归档数、批次数、单批最长持锁时间、回收页数和 checkpoint 结果
+        """
+        now = time.time() if now is None else now
+        stats = {"deleted": {}, "archived": 0, "batches": 0, "max_batch_ms": 0.0,
+                 "vacuumed_pages": 0, "checkpoint": None}
+
+        with self.engine.connect() as conn:
+            tables = session_tables(conn)
+        for table in tables:
+            policy = self.policy(table)
+            if not policy.get("max_age_hours"):
+                continue
+            cutoff = int(now - policy["max_age_hours"] * 3600)
+            deleted = self._purge_table(table, cutoff, bool(policy.get("archive")), int(now), stats)
+            if deleted:
+                stats["deleted"][table] = deleted
+
+        stats["vacuumed_pages"] = self._incremental_vacuum()
+        stats["checkpoint"] = self._checkpoint()
+        self.last_run = {**stats, "finished_at": int(time.time())}
+
+        total = sum(stats["deleted"].values())
+        if total:
+            print(f"🧹 会话保留: 清理 {total} 个过期会话（归档 {stats['archived']} 个），"
+                  f"{stats['batches']} 个批次，单批最长 {stats['max_batch_ms']:.1f}ms")
+        return stats
+
+    def _purge_table(self, table: str, cutoff: int, archive: bool, now: int, stats: Dict[str, Any]) -> int:
+        # created_at 条件用于走索引：最后活跃时间早于 cutoff 的会话创建时间一定也早于 cutoff
+        select = text(
+            f'SELECT * FROM "{table}" WHERE created_at < :cutoff '
+            f"AND COALESCE(updated_at, created_at) < :cutoff LIMIT :limit"
+        )
+        pause = self.settings["batch_pause_ms"] / 1000
+        deleted = 0
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            with self.engine.begin() as conn:
+                # 读取、归档和删除在同一个写事务里，避免归档到旧版本
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+                rows = conn.execute(select, {"cutoff": cutoff, "limit": self.settings["batch_size"]}).mappings().all()
+                if not rows:
+                    break
+                if archive:
+                    conn.execute(text(
+                        f"INSERT OR REPLACE INTO {ARCHIVE_TABLE} "
+                        "(source_table, session_id, user_id, last_active_at, archived_at, payload) "
+                        "VALUES (:source_table, :session_id, :user_id, :last_active_at, :archived_at, :payload)"
+                    ), [self._archive_row(table, row, now) for row in rows])
+                    stats["archived"] += len(rows)
+                conn.execute(text(f'DELETE FROM "{table}" WHERE session_id = :session_id'),
+                             [{"session_id": row["session_id"]} for row in rows])
+            stats["batches"] += 1
+            stats["max_batch_ms"] = max(stats["max_batch_ms"], (time.perf_counter() - started) * 1000)
+            deleted += len(rows)
+            if len(rows) < self.settings["batch_size"]:
+                break
+            # 批次之间让出写锁，Agent 的会话写入不必等整张表清理完
+            time.sleep(pause)
+        return deleted
+
+    @staticmethod
+    def _archive_row(table: str, row: Any, now: int) -> Dict[str, Any]:
+        # 压缩列先还原为JSON文本，归档内容与列是否压缩无关
+        values = {key: json.dumps(decode_json_column(value), ensure_ascii=False) if is_compressed(value) else value
+                  for key, value in row.items()}
+        payload = json.dumps(values, ensure_ascii=False, default=str).encode("utf-8")
+        return {
+            "source_table": table,
+            "session_id": row["session_id"],
+            "user_id": row["user_id"],
+            "last_active_at": row["updated_at"] or row["created_at"],
+            "archived_at": now,
+            "payload": zlib.compress(payload),
+        }
+
+    def _incremental_vacuum(self) -> int:
+        """回收空闲页（数据库不是 auto_vacuum=INCREMENTAL 时跳过）"""
+        pages = int(self.settings["vacuum_pages"])
+        if pages <= 0:
+            return 0
+        raw = self.engine.raw_connection()
+        try:
+            sqlite_conn = raw.driver_connection
+            if sqlite_conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            before = sqlite_conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # execute() 每次只回收一页，executescript() 才会执行到底
+            sqlite_conn.executescript(f"PRAGMA incremental_vacuum({pages});")
+            return before - sqlite_conn.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            raw.close()
+
+    def _checkpoint(self) -> List[int]:
+        """PASSIVE checkpoint：把 WAL 写回主库，不等待正在进行的读写"""
+        with self.engine.connect() as conn:
+            return list(conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one())
+
+    def start(self) -> None:
+        """启动后台清理线程（重复调用无效）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="session-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """停止后台清理线程（正在执行的批次会先提交）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.settings["interval_seconds"]):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ 会话保留清理失败: {e}")
+
+
+def load_archived_session(engine: Engine, table: str, session_id: str) -> Optional[Dict[str, Any]]:
+    """读取归档的会话（返回归档时的整行数据，不存在时返回None）"""
+    with engine.connect() as conn:
+        payload = conn.execute(
+            text(f"SELECT payload FROM {ARCHIVE_TABLE} WHERE source_table = :table AND session_id = :session_id"),
+            {"table": table, "session_id": session_id},
+        ).scalar()
+    return json.loads(zlib.decompress(payload)) if payload is not None else None
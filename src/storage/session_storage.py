@@ -0,0 +1,147 @@
+"""
+共享引擎上的Agent会话存储
+与 agno 的 SqliteStorage 接口一致，但所有实例共用一个连接池，upsert 交给写入队列批量提交；
+memory/runs 列透明压缩
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Literal
+
+from agno.storage.session import Session
+from agno.storage.sqlite import SqliteStorage
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import sessionmaker
+
+from .write_queue import SessionWriteQueue
+from .migrations import ensure_session_indexes
+from .compression import COMPRESSED_COLUMNS, CompressedJSON, recent_runs
+
+# 由数据库填写的时间列，不从会话对象取值
+_TIMESTAMP_COLUMNS = ("created_at", "updated_at")
+
+
+class PooledSqliteStorage(SqliteStorage):
+    """
+    使用共享引擎和写入队列的会话存储
+
+    读取时优先返回队列中尚未落盘的版本，保证同一会话读到自己刚写入的内容；
+    列表类查询前先等待队列落盘
+    """
+
+    def __init__(self, table_name: str, db_engine: Engine, write_queue: Optional[SessionWriteQueue] = None,
+                 mode: Optional[Literal["agent", "team", "workflow", "workflow_v2"]] = "agent",
+                 compression_level: int = 6, compress_min_bytes: int = 512):
+        """
+        Args:
+            table_name: 会话表名
+            db_engine: 共享的SQLAlchemy引擎
+            write_queue: 共享的写入队列，为None时同步写入
+            mode: agno 存储模式
+            compression_level: memory/runs 列的 zlib 压缩级别，0 表示不压缩
+            compress_min_bytes: 小于该大小的值不压缩
+        """
+        # get_table() 在父类构造函数中调用，压缩参数需先设置
+        self.compression_level = compression_level
+        self.compress_min_bytes = compress_min_bytes
+        super().__init__(table_name=table_name, db_engine=db_engine, mode=mode)
+        # agno 1.7 的 SqliteStorage 传入 db_engine 时仍会落到内存库分支，这里改绑到共享引擎
+        if self.db_engine is not db_engine:
+            self.db_engine.dispose()
+            self.db_engine = db_engine
+            self.inspector = inspect(db_engine)
+            self.SqlSession = sessionmaker(bind=db_engine)
+            self.table = self.get_table()
+        self.write_queue = write_queue
+        if not self.table_exists():
+            self.create()
+        # 启动迁移之后才创建的表同样需要会话索引
+        with db_engine.begin() as conn:
+            ensure_session_indexes(conn, table_name)
+
+    def get_table(self):
+        table = super().get_table()
+        if self.compression_level > 0:
+            for name in COMPRESSED_COLUMNS:
+                if name in table.c:
+                    table.c[name].type = CompressedJSON(self.compression_level, self.compress_min_bytes)
+        return table
+
+    def read_recent_runs(self, session_id: str, n: int) -> List[Dict[str, Any]]:
+        """
+        读取会话最近 n 条运行记录（只解压最后 n 帧，不构造完整会话）
+
+        供只看最近几轮的工具使用；Agent 加载会话仍走 read()，解压全部帧，
+        因为写回时 agno 会用内存中的运行记录覆盖整列，只加载最近几轮会丢掉更早的记录
+
+        Args:
+            session_id: 会话ID
+            n: 运行记录条数，通常为 Agent 的 num_history_responses
+        """
+        pending = self.write_queue.pending(self.table_name, session_id) if self.write_queue is not None else None
+        if pending is not None:
+            memory = getattr(pending, "memory", None) or {}
+            return list(memory.get("runs") or [])[-n:] if n > 0 else []
+        column = "runs" if self.mode == "workflow_v2" else "memory"
+        with self.db_engine.connect() as conn:
+            raw = conn.execute(text(f'SELECT {column} FROM "{self.table_name}" WHERE session_id = :session_id'),
+                               {"session_id": session_id}).scalar()
+        return recent_runs(raw, n)
+
+    def upsert_statement(self, session: Session):
+        """构造单个会话的 INSERT ... ON CONFLICT DO UPDATE 语句（列与当前模式的表结构一致）"""
+        values = {column.name: getattr(session, column.name, None)
+                  for column in self.table.columns if column.name not in _TIMESTAMP_COLUMNS}
+        if "runs" in values:
+            values["runs"] = session.to_dict().get("runs")
+        update = {name: value for name, value in values.items() if name != "session_id"}
+        update["updated_at"] = int(time.time())
+        return sqlite.insert(self.table).values(**values).on_conflict_do_update(
+            index_elements=["session_id"], set_=update
+        )
+
+    def write_through(self, session: Session) -> Optional[Session]:
+        """绕过队列同步写入（表不存在时建表重试）"""
+        return super().upsert(session)
+
+    def upsert(self, session: Session, create_and_retry: bool = True) -> Optional[Session]:
+        if self.write_queue is None:
+            return super().upsert(session, create_and_retry)
+        return self.write_queue.submit(self, session)
+
+    def read(self, session_id: str, user_id: Optional[str] = None) -> Optional[Session]:
+        if self.write_queue is not None:
+            pending = self.write_queue.pending(self.table_name, session_id)
+            if pending is not None and (user_id is None or pending.user_id == user_id):
+                return pending
+        return super().read(session_id, user_id)
+
+    def get_all_session_ids(self, user_id: Optional[str] = None, entity_id: Optional[str] = None) -> List[str]:
+        self._flush()
+        return super().get_all_session_ids(user_id, entity_id)
+
+    def get_all_sessions(self, user_id: Optional[str] = None, entity_id: Optional[str] = None) -> List[Session]:
+        self._flush()
+        return super().get_all_sessions(user_id, entity_id)
+
+    def get_recent_sessions(self, user_id: Optional[str] = None, entity_id: Optional[str] = None,
+                            limit: Optional[int] = 2) -> List[Session]:
+        self._flush()
+        return super().get_recent_sessions(user_id, entity_id, limit)
+
+    def delete_session(self, session_id: Optional[str] = None):
+        if self.write_queue is not None and session_id is not None:
+            self._flush()
+            self.write_queue.discard(self.table_name, session_id)
+        return super().delete_session(session_id)
+
+    def _flush(self) -> None:
+        if self.write_queue is not None:
+            self.write_queue.flush()
+
+    def __deepcopy__(self, memo: Dict[int, Any]):
+        # agno 复制Agent时会深拷贝存储：引擎和写入队列必须共用，不能复制
+        memo[id(self.write_queue)] = self.write_queue
+        return super().__deepcopy__(memo)
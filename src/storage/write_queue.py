@@ -0,0 +1,220 @@
+"""
+会话写入队列
+Agent每轮对话后的会话upsert先进入队列，由后台线程合并后在一个事务中批量提交，
+同一会话在批次内只写最新版本，避免多个对话线程争抢SQLite的单写锁；
+metrics() 报告队列深度、提交耗时和从提交到落盘的延迟
+"""
+
+import copy
+import time
+import queue
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple, List
+
+import numpy as np
+
+from sqlalchemy.engine import Engine
+
+_FLUSH = object()
+_STOP = object()
+
+
+class SessionWriteQueue:
+    """
+    会话批量写入队列
+
+    submit() 立即返回；后台线程拿到第一条写入后再等待 batch_window_ms 收集更多写入，
+    按 (表名, session_id) 去重后在同一事务中提交，批次失败时逐条重试
+    """
+
+    def __init__(self, engine: Engine, batch_window_ms: float = 20, max_batch: int = 256,
+                 metrics_window: int = 1024):
+        """
+        Args:
+            engine: 共享的SQLAlchemy引擎
+            batch_window_ms: 收集一个批次的最长等待时间（毫秒）
+            max_batch: 单个批次的最大写入条数
+            metrics_window: 计算延迟分位数时保留的最近批次/写入数
+        """
+        self.engine = engine
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = {"submitted": 0, "coalesced": 0, "batches": 0, "written": 0, "errors": 0}
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        # 尚未落盘的最新版本，供读取时保证读到自己刚写入的会话
+        # 值为 (存储对象, 会话快照, 提交时间)
+        self._pending: Dict[Tuple[str, str], Tuple[Any, Any, float]] = {}
+        self._submit_ms: deque = deque(maxlen=metrics_window)
+        self._flush_ms: deque = deque(maxlen=metrics_window)
+        self._lag_ms: deque = deque(maxlen=metrics_window)
+        self._batch_sizes: deque = deque(maxlen=metrics_window)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="session-write-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, storage: Any, session: Any) -> Any:
+        """
+        提交一次会话upsert
+
+        Args:
+            storage: 会话所属的 PooledSqliteStorage
+            session: agno 会话对象（提交时复制一份，之后Agent继续修改不影响本次写入）
+
+        Returns:
+            提交的会话快照
+        """
+        if self._closed:
+            raise RuntimeError("会话写入队列已关闭")
+        started = time.perf_counter()
+        snapshot = copy.deepcopy(session)
+        key = (storage.table_name, snapshot.session_id)
+        with self._lock:
+            self.stats["submitted"] += 1
+            if key in self._pending:
+                self.stats["coalesced"] += 1
+            self._pending[key] = (storage, snapshot, started)
+            self._submit_ms.append((time.perf_counter() - started) * 1000)
+        self._queue.put(key)
+        return snapshot
+
+    def pending(self, table_name: str, session_id: str) -> Optional[Any]:
+        """尚未落盘的会话（没有时返回None）"""
+        with self._lock:
+            item = self._pending.get((table_name, session_id))
+        return item[1] if item else None
+
+    def discard(self, table_name: str, session_id: str) -> None:
+        """丢弃尚未落盘的会话（删除会话时调用）"""
+        with self._lock:
+            self._pending.pop((table_name, session_id), None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        队列指标
+
+        Returns:
+            queue_depth（未落盘的会话数）、oldest_pending_ms、submit_ms（响应路径上的入队耗时）、
+            flush_ms（每批事务耗时）、commit_lag_ms（从提交到落盘）、batch_size，以及累计计数
+        """
+        now = time.perf_counter()
+        with self._lock:
+            oldest = min((item[2] for item in self._pending.values()), default=None)
+            result = {
+                "queue_depth": len(self._pending),
+                "oldest_pending_ms": (now - oldest) * 1000 if oldest is not None else 0.0,
+                "submit_ms": self._summary(self._submit_ms),
+                "flush_ms": self._summary(self._flush_ms),
+                "commit_lag_ms": self._summary(self._lag_ms),
+                "batch_size": self._summary(self._batch_sizes),
+                **self.stats,
+            }
+        return result
+
+    @staticmethod
+    def _summary(values: deque) -> Dict[str, float]:
+        if not values:
+            return {"last": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        data = np.asarray(values, dtype=float)
+        return {"last": float(data[-1]), "p50": float(np.percentile(data, 50)),
+                "p95": float(np.percentile(data, 95)), "max": float(data.max())}
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待此前提交的写入全部落盘，超时返回False"""
+        if self._closed or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """写完剩余会话并停止后台线程（后台线程未能及时写完时在当前线程同步写入）"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+        with self._lock:
+            remaining = list(self._pending.values())
+            self._pending.clear()
+        if remaining:
+            print(f"⚠️ 关闭写入队列时仍有 {len(remaining)} 个会话未落盘，同步写入")
+            for storage, session, _ in remaining:
+                if storage.write_through(session) is None:
+                    self.stats["errors"] += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            keys, waiters = [], []
+            self._collect(item, keys, waiters)
+            deadline = time.monotonic() + self.batch_window
+            stop = False
+            while len(keys) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                self._collect(item, keys, waiters)
+
+            if keys:
+                self._write(keys)
+            for done in waiters:
+                done.set()
+            if stop:
+                return
+
+    @staticmethod
+    def _collect(item: Any, keys: List[Tuple[str, str]], waiters: List[threading.Event]) -> None:
+        if isinstance(item, tuple) and item[0] is _FLUSH:
+            waiters.append(item[1])
+        elif item not in keys:
+            keys.append(item)
+
+    def _write(self, keys: List[Tuple[str, str]]) -> None:
+        with self._lock:
+            batch = [(key, self._pending[key]) for key in keys if key in self._pending]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        try:
+            with self.engine.begin() as conn:
+                for _, (storage, session, _) in batch:
+                    conn.execute(storage.upsert_statement(session))
+            written = batch
+        except Exception as e:
+            # 常见原因是表尚未创建：逐条走 SqliteStorage.upsert（会建表重试）
+            print(f"⚠️ 会话批量写入失败，逐条重试: {e}")
+            written = []
+            for item in batch:
+                _, (storage, session, _) = item
+                if storage.write_through(session) is not None:
+                    written.append(item)
+                else:
+                    with self._lock:
+                        self.stats["errors"] += 1
+
+        finished = time.perf_counter()
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["written"] += len(written)
+            self._flush_ms.append((finished - started) * 1000)
+            self._batch_sizes.append(len(batch))
+            self._lag_ms.extend((finished - submitted) * 1000 for _, (_, _, submitted) in written)
+            for key, (storage, session, _) in batch:
+                # 批次写入期间又提交了新版本时保留新版本，由下一批写入
+                if self._pending.get(key, (None, None))[1] is session:
+                    del self._pending[key]
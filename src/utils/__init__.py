@@ -8,13 +8,88 @@ Available utilities:
 - TokenManager: Handles token optimization and management
 - TokenBudget: Configuration for token limits
 - StreamingAnalyzer: Streaming analysis for large content
+- FundamentalsFactorEngine: Vectorized fundamentals factor table with per-period cache
+- UniverseScreener: Rule-based universe screening derived from each master's framework
+- SearchCache: Normalized, TTL and single-flight search cache with result deduplication
+- ToolReplayer: Record/replay of market-data and search tool calls with synthetic latency
+- create_model: OpenAI-compatible model factory with configurable base_url
+- MockLLMServer: Local OpenAI-compatible stand-in server for load testing
+- IncrementalSynthesizer: Queue-driven synthesis with rolling state and a deadline
+- MapReduceSynthesizer: Hierarchical map-reduce synthesis with bounded per-call tokens
+- RankingEngine: Cross-symbol ranking from structured scores in master analyses
+- MasterAnalysis: Structured-output schema for master analyses with per-master fields
+- StreamEvent: Token/tool events from streaming master runs, merged, as SSE or per-master panes
+- ConsensusMonitor: Early termination once enough masters strongly agree
+- ModelRouter: Per-task model routing with latency-SLO fallback and per-route usage stats
+- assemble_prompt: Static-prefix-first prompt assembly for provider-side prefix caching
+- InstructionBundle: Per-master instructions compiled once per config hash and shared by all entry points
+- HistoryManager: Bounded chat history with recent turns verbatim and older turns folded into a cached rolling summary
+- HealthMonitor: Concurrent in-process agent/storage probes behind a single /health endpoint
+- AnalysisMemory: Embedded vector index over past master analyses for retrieval-augmented prompts
 
 """
 
 from .token_manager import TokenManager, TokenBudget, StreamingAnalyzer
+from .fundamentals import FundamentalsFactorEngine
+from .screener import UniverseScreener
+from .search_cache import SearchCache, CachedSearchTools, NewsDigestStore
+from .replay import ToolReplayer, ToolCassette, LatencyModel
+from .model_factory import create_model
+from .mock_llm_server import MockLLMServer, MockLLMConfig
+from .incremental_synthesis import IncrementalSynthesizer, RollingSynthesisState
+from .map_reduce_synthesis import MapReduceSynthesizer
+from .ranking import RankingEngine
+from .analysis_schema import MasterAnalysis, build_master_schema
+from .event_stream import StreamEvent, merge_streams, MultiPaneRenderer
+from .consensus import ConsensusMonitor, run_until_consensus
+from .model_router import ModelRouter, get_model_router, create_routed_model
+from .prompt_cache import assemble_prompt, cached_prompt_tokens, dated_instructions
+from .instruction_bundle import InstructionBundle, compile_master_bundle
+from .history_manager import HistoryManager, HistoryWindowMemory, HistoryWindowAgent
+from .health import HealthMonitor, create_health_router
+from .analysis_memory import AnalysisMemory, VectorIndex, HashingEmbedder, get_analysis_memory
 
 __all__ = [
     "TokenManager",
     "TokenBudget", 
-    "StreamingAnalyzer"
+    "StreamingAnalyzer",
+    "FundamentalsFactorEngine",
+    "UniverseScreener",
+    "SearchCache",
+    "CachedSearchTools",
+    "NewsDigestStore",
+    "ToolReplayer",
+    "ToolCassette",
+    "LatencyModel",
+    "create_model",
+    "MockLLMServer",
+    "MockLLMConfig",
+    "IncrementalSynthesizer",
+    "RollingSynthesisState",
+    "MapReduceSynthesizer",
+    "RankingEngine",
+    "MasterAnalysis",
+    "build_master_schema",
+    "StreamEvent",
+    "merge_streams",
+    "MultiPaneRenderer",
+    "ConsensusMonitor",
+    "run_until_consensus",
+    "ModelRouter",
+    "get_model_router",
+    "create_routed_model",
+    "assemble_prompt",
+    "cached_prompt_tokens",
+    "dated_instructions",
+    "InstructionBundle",
+    "compile_master_bundle",
+    "HistoryManager",
+    "HistoryWindowMemory",
+    "HistoryWindowAgent",
+    "HealthMonitor",
+    "create_health_router",
+    "AnalysisMemory",
+    "VectorIndex",
+    "HashingEmbedder",
+    "get_analysis_memory"
 ] 
\ No newline at end of file
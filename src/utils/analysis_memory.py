@@ -0,0 +1,605 @@
+"""
+分析记忆（检索增强）
+把结果库中已保存的大师分析切成段落块，用本地嵌入模型向量化后存入内嵌向量索引
+（NumPy 暴力检索，条数达到 ann_threshold 后改用 IVF 聚类近似检索）；
+每次分析前为各位大师检索同一公司和同类公司的历史分析摘录，在token上限内附加到提示词
+"""
+
+import re
+import math
+import time
+import zlib
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .token_manager import TokenManager
+
+DEFAULT_MEMORY_SETTINGS = {
+    "enabled": True,
+    "db_file": "data/analysis_results/memory.db",
+    "embedder": "hashing",      # hashing，或 sentence-transformers 模型名（如 BAAI/bge-small-zh-v1.5）
+    "dim": 256,                 # 哈希嵌入的维度
+    "chunk_tokens": 200,
+    "top_k": 4,
+    "max_tokens": 600,          # 每位大师附加的历史摘录上限
+    "min_score": 0.2,           # 其他公司的摘录与查询的最低相似度
+    "symbol_boost": 0.3,        # 同一公司的摘录加分
+    "master_boost": 0.1,        # 同一位大师的摘录加分
+    "max_per_run": 2,           # 同一次运行最多取几段，避免一份报告占满上限
+    "ann_threshold": 200000,
+    "nlist": 0,                 # IVF 簇数，0 表示 sqrt(条数)
+    "nprobe": 16,
+}
+
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+_WORD_PATTERN = re.compile(r"[a-z][a-z0-9]+")
+_CJK_PATTERN = re.compile(r"[一-鿿]+")
+_SENTENCE_END = re.compile(r"(?<=[。！？；!?;])")
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS memory_chunks (
+        id INTEGER PRIMARY KEY,
+        analysis_id INTEGER NOT NULL,
+        run_id TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        master TEXT NOT NULL,
+        agent TEXT,
+        created_at INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        vector BLOB NOT NULL
+    )""",
+    "CREATE TABLE IF NOT EXISTS memory_meta (key TEXT PRIMARY KEY, value TEXT)",
+]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class HashingEmbedder:
+    """
+    特征哈希嵌入
+
+    英文按词、中文按相邻两字切分，带符号哈希到固定维度，词频取对数后归一化。
+    不需要下载模型，同一文本在任何机器上得到相同的向量
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    @staticmethod
+    def features(content: str) -> Counter:
+        """文本的特征（英文词和中文二字组）及出现次数"""
+        content = content.lower()
+        grams = Counter(_WORD_PATTERN.findall(content))
+        for run in _CJK_PATTERN.findall(content):
+            grams.update([run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+        return grams
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, content in enumerate(texts):
+            for gram, count in self.features(content).items():
+                h = zlib.crc32(gram.encode("utf-8"))
+                vectors[row, h % self.dim] += (1.0 + math.log(count)) * (1.0 if h & 0x80000000 else -1.0)
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """sentence-transformers 本地模型（可选依赖，首次使用时下载模型）"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=64, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def create_embedder(settings: Optional[Dict[str, Any]] = None):
+    """按配置创建嵌入模型；指定的 sentence-transformers 模型不可用时退回哈希嵌入"""
+    settings = {**DEFAULT_MEMORY_SETTINGS, **(settings or {})}
+    if settings["embedder"] != "hashing":
+        try:
+            return SentenceTransformerEmbedder(settings["embedder"])
+        except ImportError:
+            print(f"⚠️ 未安装 sentence-transformers，分析记忆改用哈希嵌入（安装后可使用 {settings['embedder']}）")
+    return HashingEmbedder(settings["dim"])
+
+
+class VectorIndex:
+    """
+    内嵌向量索引
+
+    向量按行存放在连续的 float32 矩阵中（容量按倍数增长），向量已归一化，内积即余弦相似度。
+    条数达到 ann_threshold 后用球面 k-means 把向量分到 nlist 个簇，查询只扫描最近的 nprobe 个簇；
+    之后新增的向量归入最近的簇，条数翻倍时重新聚类
+    """
+
+    def __init__(self, dim: int, ann_threshold: int = 200000, nlist: int = 0, nprobe: int = 16, seed: int = 0):
+        self.dim = dim
+        self.ann_threshold = ann_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.size = 0
+        self._vectors = np.zeros((1024, dim), dtype=np.float32)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._trained_size = 0
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self.size]
+
+    @property
+    def ann(self) -> bool:
+        """是否已切换到 IVF 近似检索"""
+        return self._centroids is not None
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """追加向量，返回它们在索引中的位置"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        end = self.size + len(vectors)
+        if end > len(self._vectors):
+            grown = np.zeros((max(end, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+            grown[:self.size] = self.vectors
+            self._vectors = grown
+        self._vectors[self.size:end] = vectors
+        positions = np.arange(self.size, end)
+        self.size = end
+
+        if self.size and self.size >= self.ann_threshold and self.size >= 2 * self._trained_size:
+            self.train()
+        elif self.ann and len(positions):
+            labels = self._nearest(vectors)
+            for label in np.unique(labels):
+                self._lists[label] = np.concatenate([self._lists[label], positions[labels == label]])
+        return positions
+
+    def train(self, iterations: int = 8) -> None:
+        """球面 k-means 聚类（在抽样上训练），并把全部向量分配到最近的簇"""
+        nlist = min(self.nlist or max(1, int(math.sqrt(self.size))), self.size)
+        rng = np.random.default_rng(self.seed)
+        sample = self.vectors[rng.choice(self.size, min(self.size, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(labels, minlength=nlist)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            nonempty = counts > 0
+            sums = centroids.copy()
+            sums[nonempty] = np.add.reduceat(sample[np.argsort(labels, kind="stable")], starts[nonempty])
+            centroids = _normalize(sums)
+        self._centroids = centroids
+
+        labels = self._nearest(self.vectors)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(nlist + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+        self._trained_size = self.size
+
+    def _nearest(self, vectors: np.ndarray, batch: int = 16384) -> np.ndarray:
+        return np.concatenate([np.argmax(vectors[i:i + batch] @ self._centroids.T, axis=1)
+                               for i in range(0, len(vectors), batch)] or [np.empty(0, dtype=np.int64)])
+
+    def search(self, query: np.ndarray, k: int, boosts: Sequence[Tuple[np.ndarray, float]] = (),
+               include: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        相似度最高的 k 个向量
+
+        Args:
+            query: 已归一化的查询向量
+            k: 返回条数
+            boosts: (升序位置数组, 加分) 列表，这些位置的得分加上对应分值
+            include: IVF 模式下无论属于哪个簇都参与比较的位置（如同一公司的摘录）
+
+        Returns:
+            位置数组和得分数组（按得分降序）
+        """
+        if self.size == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        candidates = None
+        if self.ann:
+            centroid_scores = self._centroids @ query
+            nprobe = min(self.nprobe, len(centroid_scores))
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            extra = [include] if include is not None else []
+            candidates = np.unique(np.concatenate([self._lists[c] for c in probe] + extra))
+            scores = self._vectors[candidates] @ query
+        else:
+            scores = self.vectors @ query
+
+        for positions, weight in boosts:
+            if not len(positions):
+                continue
+            if candidates is None:
+                scores[positions] += weight
+            else:
+                scores[np.isin(candidates, positions, assume_unique=True)] += weight
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return (top if candidates is None else candidates[top]), scores[top]
+
+
+def split_chunks(content: str, max_tokens: int, estimate: Callable[[str], int]) -> List[str]:
+    """按行合并成不超过 max_tokens 的块，超长的行按句切开（标题行与后面的内容在同一块）"""
+    pieces = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if estimate(line) > max_tokens:
+            pieces.extend(sentence.strip() for sentence in _SENTENCE_END.split(line) if sentence.strip())
+        else:
+            pieces.append(line)
+
+    chunks, current, tokens = [], [], 0
+    for piece in pieces:
+        size = estimate(piece)
+        if current and tokens + size > max_tokens:
+            chunks.append("\n".join(current))
+            current, tokens = [], 0
+        current.append(piece)
+        tokens += size
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class AnalysisMemory:
+    """
+    分析记忆
+
+    sync() 把结果库中新保存的大师分析切块、向量化后写入自己的SQLite文件和内存中的向量索引；
+    retrieve() 为一位大师检索某只股票的相关历史摘录，context() 把摘录整理成可直接放进提示词的文本
+    """
+
+    def __init__(self, db_file: str, settings: Optional[Dict[str, Any]] = None, embedder: Any = None):
+        """
+        Args:
+            db_file: 记忆数据库文件（保存摘录文本和向量）
+            settings: 配置文件中的 analysis_memory 段（缺省项使用 DEFAULT_MEMORY_SETTINGS）
+            embedder: 嵌入模型（默认按配置创建）
+        """
+        self.settings = {**DEFAULT_MEMORY_SETTINGS, **(settings or {})}
+        self.db_file = str(Path(db_file).resolve())
+        Path(self.db_file).parent.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or create_embedder(self.settings)
+        self.token_manager = TokenManager()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._load()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM memory_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO memory_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _load(self) -> None:
+        """把已保存的向量载入索引；嵌入模型变化时清空，由下一次 sync() 从结果库重建"""
+        self.index = VectorIndex(self.embedder.dim, self.settings["ann_threshold"], self.settings["nlist"],
+                                 self.settings["nprobe"])
+        self._chunk_ids: List[int] = []
+        self._run_ids: List[str] = []
+        self._by_symbol: Dict[str, List[int]] = {}
+        self._by_master: Dict[str, List[int]] = {}
+
+        if self._meta("embedder") != self.embedder.name:
+            self._conn.execute("DELETE FROM memory_chunks")
+            self._set_meta("embedder", self.embedder.name)
+            self._set_meta("last_analysis_id", 0)
+            self._conn.commit()
+            self.last_analysis_id = 0
+            return
+
+        self.last_analysis_id = int(self._meta("last_analysis_id") or 0)
+        rows = self._conn.execute("SELECT id, run_id, symbol, master, vector FROM memory_chunks ORDER BY id").fetchall()
+        if rows:
+            vectors = np.frombuffer(b"".join(row[4] for row in rows), dtype=np.float32).reshape(-1, self.embedder.dim)
+            self._track(self.index.add(vectors), rows)
+
+    def _track(self, positions: np.ndarray, rows: Sequence[Sequence[Any]]) -> None:
+        for position, (chunk_id, run_id, symbol, master) in zip(positions.tolist(), (row[:4] for row in rows)):
+            self._chunk_ids.append(chunk_id)
+            self._run_ids.append(run_id)
+            self._by_symbol.setdefault(symbol, []).append(position)
+            self._by_master.setdefault(master, []).append(position)
+
+    @property
+    def size(self) -> int:
+        """索引中的摘录块数"""
+        return self.index.size
+
+    def add_analyses(self, analyses: Sequence[Dict[str, Any]]) -> int:
+        """
+        切块并索引分析（结果库 master_analyses 的行：id、run_id、symbol、master、agent、created_at、analysis）
+
+        Returns:
+            新增的摘录块数
+        """
+        if not analyses:
+            return 0
+        records = [(analysis, chunk) for analysis in analyses
+                   for chunk in split_chunks(analysis.get("analysis") or "", self.settings["chunk_tokens"],
+                                             self.token_manager.estimate_tokens)]
+        vectors = self.embedder.embed([chunk for _, chunk in records]) if records else None
+
+        with self._lock:
+            rows = []
+            for (analysis, chunk), vector in zip(records, vectors if vectors is not None else []):
+                symbol = str(analysis["symbol"]).upper()
+                cursor = self._conn.execute(
+                    "INSERT INTO memory_chunks (analysis_id, run_id, symbol, master, agent, created_at, text, vector) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (analysis["id"], analysis["run_id"], symbol, analysis["master"], analysis.get("agent"),
+                     int(analysis["created_at"]), chunk, vector.tobytes()))
+                rows.append((cursor.lastrowid, analysis["run_id"], symbol, analysis["master"]))
+            self.last_analysis_id = max(self.last_analysis_id, max(int(a["id"]) for a in analyses))
+            self._set_meta("last_analysis_id", self.last_analysis_id)
+            self._conn.commit()
+            if rows:
+                self._track(self.index.add(vectors), rows)
+        return len(rows)
+
+    def sync(self, result_store: Any, batch_size: int = 500) -> int:
+        """
+        索引结果库中上次同步之后保存的分析
+
+        Args:
+            result_store: 分析结果库（AnalysisResultStore）
+
+        Returns:
+            新增的摘录块数
+        """
+        added = 0
+        with self._lock:
+            while True:
+                analyses = result_store.analyses_after(self.last_analysis_id, batch_size)
+                if not analyses:
+                    return added
+                added += self.add_analyses(analyses)
+
+    def rebuild(self, result_store: Any) -> int:
+        """清空后从结果库重新索引全部分析"""
+        with self._lock:
+            self._conn.execute("DELETE FROM memory_chunks")
+            self._set_meta("last_analysis_id", 0)
+            self._conn.commit()
+            self._load()
+            return self.sync(result_store)
+
+    def retrieve(self, symbol: str, master: Optional[str] = None, query: Optional[str] = None,
+                 k: Optional[int] = None, max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        检索相关的历史摘录
+
+        得分为与查询的余弦相似度，同一公司加 symbol_boost、同一位大师加 master_boost；
+        其他公司的摘录相似度需不低于 min_score，每次运行最多取 max_per_run 段，总token数不超过 max_tokens
+
+        Args:
+            symbol: 本次分析的股票
+            master: 本次分析的大师键名
+            query: 查询文本，默认为股票代码
+            k: 最多返回的摘录数，默认 top_k
+            max_tokens: 摘录总token上限，默认 max_tokens
+
+        Returns:
+            摘录列表（symbol、master、agent、created_at、run_id、text、score、similarity、tokens），按得分降序
+        """
+        k = k or self.settings["top_k"]
+        max_tokens = self.settings["max_tokens"] if max_tokens is None else max_tokens
+        symbol = symbol.upper()
+        query_vector = self.embedder.embed([query or symbol])[0]
+
+        with self._lock:
+            same_symbol = np.asarray(self._by_symbol.get(symbol, []), dtype=np.int64)
+            boosts = [(same_symbol, self.settings["symbol_boost"]),
+                      (np.asarray(self._by_master.get(master, []), dtype=np.int64), self.settings["master_boost"])]
+            positions, scores = self.index.search(query_vector, k * (self.settings["max_per_run"] + 2), boosts,
+                                                  include=same_symbol)
+            chunk_ids = [self._chunk_ids[position] for position in positions.tolist()]
+            if not chunk_ids:
+                return []
+            similarities = self.index.vectors[positions] @ query_vector
+            placeholders = ", ".join("?" * len(chunk_ids))
+            rows = {row[0]: row for row in self._conn.execute(
+                f"SELECT id, run_id, symbol, master, agent, created_at, text FROM memory_chunks WHERE id IN ({placeholders})",
+                chunk_ids)}
+
+        hits, used, per_run = [], 0, Counter()
+        for chunk_id, score, similarity in zip(chunk_ids, scores.tolist(), similarities.tolist()):
+            _, run_id, chunk_symbol, chunk_master, agent, created_at, content = rows[chunk_id]
+            if chunk_symbol != symbol and similarity < self.settings["min_score"]:
+                continue
+            tokens = self.token_manager.estimate_tokens(content)
+            if per_run[run_id] >= self.settings["max_per_run"] or used + tokens > max_tokens:
+                continue
+            per_run[run_id] += 1
+            used += tokens
+            hits.append({"symbol": chunk_symbol, "master": chunk_master, "agent": agent, "created_at": created_at,
+                         "run_id": run_id, "text": content, "score": score, "similarity": similarity,
+                         "tokens": tokens})
+            if len(hits) >= k:
+                break
+        return hits
+
+    @staticmethod
+    def format_hits(hits: List[Dict[str, Any]]) -> str:
+        """把摘录整理为提示词中的列表（日期、股票、大师和原文）"""
+        lines = []
+        for hit in hits:
+            when = datetime.fromtimestamp(hit["created_at"]).strftime("%Y-%m-%d")
+            lines.append(f"- [{when} {hit['symbol']} · {hit['agent'] or hit['master']}] "
+                         + hit["text"].replace("\n", "\n  "))
+        return "\n".join(lines)
+
+    def context(self, symbol: str, master: Optional[str] = None, query: Optional[str] = None) -> Optional[str]:
+        """一位大师本次分析可参考的历史摘录文本，没有相关摘录时返回None"""
+        hits = self.retrieve(symbol, master, query)
+        return self.format_hits(hits) if hits else None
+
+    def stats(self) -> Dict[str, Any]:
+        """索引规模和检索方式"""
+        return {
+            "db_file": self.db_file,
+            "embedder": self.embedder.name,
+            "chunks": self.index.size,
+            "symbols": len(self._by_symbol),
+            "last_analysis_id": self.last_analysis_id,
+            "ann": self.index.ann,
+            "nlist": len(self.index._lists),
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+_memories: Dict[str, AnalysisMemory] = {}
+_memories_lock = threading.Lock()
+
+
+def get_analysis_memory(config: Optional[Dict[str, Any]], result_store: Any) -> Optional[AnalysisMemory]:
+    """
+    获取进程内共享的分析记忆（每个数据库文件一个），首次创建时从结果库补齐索引
+
+    Args:
+        config: 完整配置，读取其中的 analysis_memory 段
+        result_store: 分析结果库；未启用结果库或 analysis_memory.enabled 为 false 时返回None
+    """
+    settings = {**DEFAULT_MEMORY_SETTINGS, **((config or {}).get("analysis_memory") or {})}
+    if result_store is None or not settings["enabled"]:
+        return None
+    path = Path(settings["db_file"])
+    path = str((path if path.is_absolute() else _PROJECT_ROOT / path).resolve())
+    with _memories_lock:
+        if path not in _memories:
+            memory = AnalysisMemory(path, settings)
+            try:
+                added = memory.sync(result_store)
+                if added:
+                    print(f"🧠 分析记忆已索引 {added} 段历史摘录（共 {memory.size} 段）")
+            except Exception as e:
+                print(f"⚠️ 分析记忆同步失败: {e}")
+            _memories[path] = memory
+        return _memories[path]
+
+
+_BENCH_PHRASES = ["护城河宽阔", "安全边际充足", "自由现金流稳定", "资本回报率高", "估值偏高", "管理层诚信",
+                  "竞争格局恶化", "债务风险上升", "品牌定价权", "市场份额扩大", "毛利率下滑", "研发投入加大",
+                  "周期底部", "宏观逆风", "分红稳定增长", "回购力度加大", "存货积压", "新业务拐点",
+                  "监管不确定性", "现金储备充裕", "净流动资产低于市值", "市盈率低于行业", "增长放缓", "客户粘性强"]
+
+
+def run_memory_benchmark(db_file: str, chunks: int = 100000, symbols: int = 500, masters: int = 8,
+                         k: int = 4, queries: int = 50, dim: int = 256) -> Dict[str, Any]:
+    """
+    写入合成的分析摘录，测量暴力检索和 IVF 检索的耗时（毫秒，取中位数）及 IVF 的召回率
+
+    Args:
+        db_file: 记忆数据库文件
+        chunks: 摘录块数（每条合成分析一块）
+        symbols: 股票数
+        masters: 大师数
+        k: 每次检索的摘录数
+        queries: 查询次数
+        dim: 哈希嵌入维度
+    """
+    import random
+    import statistics
+
+    rng = random.Random(0)
+    now = int(time.time())
+    tickers = [f"S{i:04d}" for i in range(symbols)]
+    names = [f"master_{i}" for i in range(masters)]
+    settings = {"dim": dim, "ann_threshold": chunks * 10}
+
+    memory = AnalysisMemory(db_file, settings)
+    started = time.perf_counter()
+    batch = []
+    for i in range(chunks):
+        symbol = tickers[i % symbols]
+        batch.append({"id": i + 1, "run_id": f"run{i // masters}", "symbol": symbol, "master": names[i % masters],
+                      "agent": names[i % masters], "created_at": now - (chunks - i) * 60,
+                      "analysis": f"{symbol} " + "，".join(rng.sample(_BENCH_PHRASES, 5)) + "。"})
+        if len(batch) == 2000:
+            memory.add_analyses(batch)
+            batch = []
+    memory.add_analyses(batch)
+    insert_seconds = time.perf_counter() - started
+    memory.close()
+
+    def timed(call) -> float:
+        durations = []
+        for query in probes:
+            start = time.perf_counter()
+            call(query)
+            durations.append((time.perf_counter() - start) * 1000)
+        return statistics.median(durations)
+
+    probes = [(rng.choice(tickers), rng.choice(names), "，".join(rng.sample(_BENCH_PHRASES, 3))) for _ in range(queries)]
+    started = time.perf_counter()
+    exact = AnalysisMemory(db_file, settings)
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    approx = AnalysisMemory(db_file, {**settings, "ann_threshold": 0})
+    train_seconds = time.perf_counter() - started - load_seconds
+
+    vectors = exact.embedder.embed([query for _, _, query in probes])
+    recall = statistics.mean(
+        len(set(exact.index.search(vector, k * 5)[0].tolist()) & set(approx.index.search(vector, k * 5)[0].tolist()))
+        / (k * 5) for vector in vectors)
+    result = {
+        "chunks": exact.size,
+        "dim": dim,
+        "insert_seconds": insert_seconds,
+        "load_seconds": load_seconds,
+        "train_seconds": train_seconds,
+        "nlist": len(approx.index._lists),
+        "nprobe": approx.index.nprobe,
+        "exact_search_ms": timed(lambda probe: exact.index.search(exact.embedder.embed([probe[2]])[0], k)),
+        "exact_retrieve_ms": timed(lambda probe: exact.retrieve(probe[0], probe[1], probe[2], k)),
+        "ann_search_ms": timed(lambda probe: approx.index.search(approx.embedder.embed([probe[2]])[0], k)),
+        "ann_retrieve_ms": timed(lambda probe: approx.retrieve(probe[0], probe[1], probe[2], k)),
+        "ann_recall": recall,
+        "recall_at": k * 5,
+    }
+    exact.close()
+    approx.close()
+    return result
+
+
+def format_benchmark(result: Dict[str, Any]) -> str:
+    """Markdown格式的检索耗时"""
+    lines = [f"{result['chunks']} 段摘录（{result['dim']} 维），写入 {result['insert_seconds']:.1f} 秒，"
+             f"载入 {result['load_seconds']:.2f} 秒，IVF 聚类 {result['train_seconds']:.2f} 秒"
+             f"（{result['nlist']} 簇，每次扫描 {result['nprobe']} 簇，top-{result['recall_at']} 召回率 {result['ann_recall']:.0%}）",
+             "", "| 方式 | 向量检索(毫秒) | 完整检索(毫秒) |", "|------|----------------|----------------|",
+             f"| 暴力检索 | {result['exact_search_ms']:.2f} | {result['exact_retrieve_ms']:.2f} |",
+             f"| IVF | {result['ann_search_ms']:.2f} | {result['ann_retrieve_ms']:.2f} |"]
+    return "\n".join(lines)
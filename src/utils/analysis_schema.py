@@ -0,0 +1,137 @@
+"""
+大师分析的结构化输出
+为每位投资大师生成响应Schema（评分、建议、目标价、护城河、风险、要点），
+启用后模型直接返回JSON，压缩、综合和排名都按字段读取，无需再从Markdown里正则提取
+"""
+
+import json
+from typing import List, Dict, Any, Optional, Literal, Type
+
+from pydantic import BaseModel, Field, create_model
+
+
+class MasterAnalysis(BaseModel):
+    """所有投资大师共用的结构化分析字段"""
+    recommendation: Literal["买入", "持有", "卖出"] = Field(..., description="投资建议")
+    rating: float = Field(..., ge=0, le=10, description="综合评分，0-10分")
+    conviction: Literal["高", "中", "低"] = Field("中", description="信心度")
+    risk_level: Literal["高", "中", "低"] = Field("中", description="风险等级")
+    target_price: Optional[float] = Field(None, description="目标价格（美元），无法判断时为null")
+    moat: str = Field("", description="护城河判断，一句话")
+    risks: List[str] = Field(default_factory=list, description="主要风险，每条不超过30字，最多5条")
+    key_points: List[str] = Field(default_factory=list, description="核心论据，每条不超过30字，最多5条")
+    summary: str = Field(..., description="结论摘要，不超过100字")
+
+
+# 与 TokenManager / 排名引擎保持一致的取值
+LEVEL_VALUES = {"高": 1.0, "中": 0.5, "低": 0.0}
+RECOMMENDATION_VALUES = {"买入": 1.0, "持有": 0.5, "卖出": 0.0}
+
+_SCHEMA_CACHE: Dict[tuple, Type[MasterAnalysis]] = {}
+
+
+def build_master_schema(master_config: Dict[str, Any]) -> Type[MasterAnalysis]:
+    """
+    按大师配置生成响应Schema
+
+    在 MasterAnalysis 的公共字段基础上追加配置中 structured_fields 声明的
+    大师专属字段（字段名 -> 说明），均为可选字符串
+
+    Args:
+        master_config: 单个投资大师的配置
+
+    Returns:
+        pydantic 模型类
+    """
+    extra_fields = master_config.get("structured_fields") or {}
+    key = (master_config.get("agent_name", ""), tuple(sorted(extra_fields.items())))
+    if key not in _SCHEMA_CACHE:
+        if not extra_fields:
+            _SCHEMA_CACHE[key] = MasterAnalysis
+        else:
+            fields = {name: (Optional[str], Field(None, description=description))
+                      for name, description in extra_fields.items()}
+            model_name = "".join(part.title() for part in key[0].split()) + "Analysis"
+            _SCHEMA_CACHE[key] = create_model(model_name or "CustomAnalysis", __base__=MasterAnalysis, **fields)
+    return _SCHEMA_CACHE[key]
+
+
+def parse_structured(content: Any, schema: Type[MasterAnalysis] = MasterAnalysis) -> Optional[Dict[str, Any]]:
+    """
+    把模型输出解析为结构化字典
+
+    Args:
+        content: Agent返回的pydantic对象、字典或JSON字符串（允许包在```json代码块里）
+        schema: 用于校验的Schema
+
+    Returns:
+        校验通过的字典，无法解析时返回None
+    """
+    if isinstance(content, BaseModel):
+        return content.model_dump()
+    if isinstance(content, str):
+        text = content.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[len("json"):]
+            text = text.strip()
+        try:
+            content = json.loads(text)
+        except ValueError:
+            return None
+    if not isinstance(content, dict):
+        return None
+    try:
+        return schema.model_validate(content).model_dump()
+    except ValueError:
+        return None
+
+
+def render_markdown(data: Dict[str, Any]) -> str:
+    """把结构化结果渲染成Markdown，供终端展示和报告保存"""
+    target = data.get("target_price")
+    lines = [
+        "## 投资建议",
+        f"**{data['recommendation']}** | 评分 {data['rating']:g}/10 | 信心度{data.get('conviction', '中')} | "
+        f"风险等级{data.get('risk_level', '中')}" + (f" | 目标价格 ${target:,.2f}" if target else ""),
+        "",
+        "## 摘要",
+        data.get("summary", ""),
+    ]
+    if data.get("moat"):
+        lines += ["", "## 护城河", data["moat"]]
+    if data.get("key_points"):
+        lines += ["", "## 关键要点", *[f"- {point}" for point in data["key_points"]]]
+    if data.get("risks"):
+        lines += ["", "## 主要风险", *[f"- {risk}" for risk in data["risks"]]]
+
+    extras = [(name, value) for name, value in data.items()
+              if name not in MasterAnalysis.model_fields and value]
+    if extras:
+        lines += ["", "## 专项判断", *[f"- {name.replace('_', ' ')}: {value}" for name, value in extras]]
+    return "\n".join(lines)
+
+
+def compact_json(data: Dict[str, Any]) -> str:
+    """发给综合器的紧凑JSON：去掉空字段，不转义中文"""
+    return json.dumps({k: v for k, v in data.items() if v not in (None, "", [])},
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+def analysis_payload(result: Dict[str, Any]) -> str:
+    """综合/摘要时使用的单条分析内容：有结构化字段时用紧凑JSON，否则用原文"""
+    structured = result.get("structured")
+    return compact_json(structured) if structured else result.get("analysis", "")
+
+
+def structured_signals(data: Dict[str, Any]) -> Dict[str, float]:
+    """把结构化字段转换为排名引擎使用的信号（字段含义见 ranking.extract_signals）"""
+    target = data.get("target_price")
+    return {
+        "rating": float(data["rating"]),
+        "recommendation": RECOMMENDATION_VALUES[data["recommendation"]],
+        "conviction": LEVEL_VALUES[data.get("conviction", "中")],
+        "risk": LEVEL_VALUES[data.get("risk_level", "中")],
+        "target_price": float(target) if target else float("nan"),
+    }
@@ -0,0 +1,128 @@
+"""
+共识提前结束
+每位大师完成后提取买入/持有/卖出建议和信心度，达到可配置的一致比例时
+不再等待其余大师：未开始的直接跳过，正在运行的中断流式请求
+"""
+
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Iterator, Callable, Tuple
+
+from .token_manager import TokenManager
+from .ranking import extract_signals
+from .analysis_schema import structured_signals
+from .event_stream import StreamEvent, DONE, ERROR
+
+RECOMMENDATION_LABELS = {1.0: "买入", 0.5: "持有", 0.0: "卖出"}
+
+
+@dataclass
+class ConsensusDecision:
+    """提前结束的判断结果"""
+    reached: bool
+    recommendation: str = ""
+    agreeing: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    mean_conviction: float = 0.0
+    elapsed: float = 0.0
+
+    def render(self, expected: int) -> str:
+        """报告中的说明"""
+        if not self.reached:
+            return ""
+        note = (f"> ⚡ 共识提前结束：{len(self.agreeing)}/{expected}位大师一致建议{self.recommendation}"
+                f"（平均信心度{self.mean_conviction:.0%}），{self.elapsed:.1f}秒后停止等待")
+        if self.skipped:
+            note += f"；未纳入: {', '.join(self.skipped)}"
+        return note
+
+
+class ConsensusMonitor:
+    """
+    共识监视器
+
+    一位大师"强烈同意"多数意见指：建议与多数一致，且信心度不低于 min_conviction
+    （提取不到信心度时不算强烈同意）。强烈同意的人数达到 ceil(threshold × 预期人数)
+    且已完成人数不少于 min_masters 时判定达成共识
+    """
+
+    def __init__(self, expected_masters: List[str], threshold: float = 0.8,
+                 min_conviction: float = 0.5, min_masters: int = 3,
+                 token_manager: Optional[TokenManager] = None):
+        """
+        Args:
+            expected_masters: 本次参与的大师名称
+            threshold: 需要强烈同意的大师比例
+            min_conviction: 计入强烈同意的最低信心度（0-1）
+            min_masters: 判定前至少完成的大师数量
+            token_manager: 提取建议时使用的token管理器
+        """
+        self.expected_masters = list(expected_masters)
+        self.required = max(min_masters, math.ceil(threshold * len(self.expected_masters)))
+        self.min_conviction = min_conviction
+        self.token_manager = token_manager or TokenManager()
+        self.signals: Dict[str, Tuple[str, float]] = {}
+        self.start = time.perf_counter()
+
+    def add(self, result: Dict[str, Any]) -> ConsensusDecision:
+        """并入一位大师的分析结果，返回当前的判断"""
+        if result.get("style") != "错误":
+            structured = result.get("structured")
+            signals = (structured_signals(structured) if structured
+                       else extract_signals(result.get("analysis", ""), self.token_manager))
+            recommendation = RECOMMENDATION_LABELS.get(signals["recommendation"], "未明确")
+            self.signals[result.get("agent", "")] = (recommendation, signals["conviction"])
+        return self.decision()
+
+    def decision(self) -> ConsensusDecision:
+        tally = Counter(rec for rec, _ in self.signals.values() if rec != "未明确")
+        if not tally:
+            return ConsensusDecision(reached=False)
+
+        majority, _ = tally.most_common(1)[0]
+        # 缺失的信心度为NaN，比较结果为False，不计入强烈同意
+        agreeing = [agent for agent, (rec, conviction) in self.signals.items()
+                    if rec == majority and conviction >= self.min_conviction]
+        reached = len(agreeing) >= self.required
+        return ConsensusDecision(
+            reached=reached,
+            recommendation=majority,
+            agreeing=agreeing,
+            skipped=[m for m in self.expected_masters if m not in self.signals] if reached else [],
+            mean_conviction=sum(self.signals[a][1] for a in agreeing) / len(agreeing) if agreeing else 0.0,
+            elapsed=time.perf_counter() - self.start,
+        )
+
+
+def run_until_consensus(events: Iterator[StreamEvent], monitor: ConsensusMonitor,
+                        on_event: Optional[Callable[[StreamEvent], None]] = None
+                        ) -> Tuple[List[Dict[str, Any]], ConsensusDecision]:
+    """
+    消费合流后的大师事件，达成共识时关闭事件流（取消其余大师）
+
+    Args:
+        events: stream_multi_perspective / merge_streams 产生的事件
+        monitor: 共识监视器
+        on_event: 每个事件的回调（如终端展示）
+
+    Returns:
+        (已完成的大师分析结果, 最终判断)
+    """
+    results: List[Dict[str, Any]] = []
+    decision = ConsensusDecision(reached=False)
+    try:
+        for event in events:
+            if on_event:
+                on_event(event)
+            if event.type in (DONE, ERROR) and event.data is not None:
+                results.append(event.data)
+                decision = monitor.add(event.data)
+                if decision.reached:
+                    break
+    finally:
+        close = getattr(events, "close", None)
+        if close is not None:
+            close()
+    return results, decision
@@ -0,0 +1,288 @@
+"""
+分析事件流
+把投资大师Agent的流式运行转换为统一的事件（token、工具调用、完成、错误），
+支持多位大师事件合流、异步迭代、Server-Sent Events 输出和终端多窗格实时展示
+"""
+
+import json
+import time
+import queue
+import asyncio
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Iterator, Iterable, AsyncIterator, Dict, Any, Optional, Callable, List
+
+
+# 事件类型
+START = "start"
+TOKEN = "token"
+TOOL_CALL = "tool_call"
+TOOL_RESULT = "tool_result"
+DONE = "done"
+ERROR = "error"
+COMPLETE = "complete"  # 合流后所有大师都结束
+
+_TOOL_RESULT_PREVIEW = 200
+
+
+@dataclass
+class StreamEvent:
+    """单个分析事件"""
+    type: str
+    agent: str = ""
+    symbol: str = ""
+    content: str = ""
+    data: Optional[Dict[str, Any]] = None
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_sse(self) -> str:
+        """编码为一条 Server-Sent Event"""
+        payload = json.dumps(self.to_dict(), ensure_ascii=False, default=str)
+        return f"event: {self.type}\ndata: {payload}\n\n"
+
+
+def iter_agent_events(run_stream: Iterable[Any], agent: str, symbol: str,
+                      collected: Optional[List[str]] = None) -> Iterator[StreamEvent]:
+    """
+    把 agno 的流式运行事件转换为 StreamEvent
+
+    Args:
+        run_stream: agent.run(prompt, stream=True, stream_intermediate_steps=True) 的返回值
+        agent: 大师名称
+        symbol: 股票代码
+        collected: 用于收集完整文本的列表，token 内容会依次追加进去
+    """
+    for event in run_stream:
+        kind = getattr(event, "event", None)
+        if kind == "RunResponseContent":
+            delta = getattr(event, "content", None)
+            if isinstance(delta, str) and delta:
+                if collected is not None:
+                    collected.append(delta)
+                yield StreamEvent(TOKEN, agent, symbol, delta)
+        elif kind in ("ToolCallStarted", "ToolCallCompleted"):
+            tool = getattr(event, "tool", None)
+            name = getattr(tool, "tool_name", "") or ""
+            if kind == "ToolCallStarted":
+                yield StreamEvent(TOOL_CALL, agent, symbol, name, {"args": getattr(tool, "tool_args", None)})
+            else:
+                result = str(getattr(tool, "result", "") or "")
+                yield StreamEvent(TOOL_RESULT, agent, symbol, name,
+                                  {"preview": result[:_TOOL_RESULT_PREVIEW], "chars": len(result)})
+        elif kind == "RunError":
+            yield StreamEvent(ERROR, agent, symbol, str(getattr(event, "content", "") or "运行错误"))
+
+
+def merge_streams(streams: Dict[str, Callable[[], Iterator[StreamEvent]]],
+                  max_workers: Optional[int] = None) -> Iterator[StreamEvent]:
+    """
+    并发运行多个事件流，按到达顺序合流
+
+    Args:
+        streams: 名称 -> 返回事件迭代器的工厂函数，每个流在独立线程中运行
+        max_workers: 同时运行的流数量，默认全部同时运行
+
+    Yields:
+        各个流的事件；某个流抛出异常时产生一条 error 事件，不影响其他流
+
+    调用方提前关闭合流（break 后 close()，或生成器被回收）时，尚未开始的流直接跳过，
+    正在运行的流在下一个事件到达时关闭，从而中断对应的模型请求
+    """
+    events: "queue.Queue" = queue.Queue()
+    finished = object()
+    stop = threading.Event()
+    slots = threading.Semaphore(max_workers or max(len(streams), 1))
+
+    def pump(name: str, factory: Callable[[], Iterator[StreamEvent]]) -> None:
+        with slots:
+            if stop.is_set():
+                events.put(finished)
+                return
+            stream = factory()
+            try:
+                for event in stream:
+                    if stop.is_set():
+                        break
+                    events.put(event)
+            except Exception as e:
+                events.put(StreamEvent(ERROR, name, content=str(e)))
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+                events.put(finished)
+
+    for name, factory in streams.items():
+        threading.Thread(target=pump, args=(name, factory), daemon=True).start()
+
+    remaining = len(streams)
+    try:
+        while remaining:
+            event = events.get()
+            if event is finished:
+                remaining -= 1
+            else:
+                yield event
+    finally:
+        stop.set()
+
+
+async def aiter_events(events: Iterator[StreamEvent]) -> AsyncIterator[StreamEvent]:
+    """
+    把同步事件迭代器包装成异步迭代器（在线程池中取下一个事件，不阻塞事件循环）
+
+    异步迭代器结束或被提前关闭（如SSE客户端断开）时关闭上游迭代器，中断仍在运行的模型请求
+    """
+    loop = asyncio.get_running_loop()
+    finished = object()
+    # 生成器不能在另一个线程执行 next() 时关闭，关闭前先等取事件的线程返回
+    busy = threading.Lock()
+
+    def step():
+        with busy:
+            return next(events, finished)
+
+    def close():
+        with busy:
+            close_events = getattr(events, "close", None)
+            if close_events is not None:
+                close_events()
+
+    try:
+        while True:
+            event = await loop.run_in_executor(None, step)
+            if event is finished:
+                return
+            yield event
+    finally:
+        if busy.acquire(blocking=False):
+            busy.release()
+            close()
+        else:
+            threading.Thread(target=close, daemon=True).start()
+
+
+def create_sse_router(stream_factory: Callable[[str, Optional[List[str]]], Iterator[StreamEvent]],
+                      prefix: str = "/v1/investment"):
+    """
+    创建以 Server-Sent Events 输出分析事件的 FastAPI 路由
+
+    GET {prefix}/stream/{symbol}?masters=warren_buffett,charlie_munger
+
+    Args:
+        stream_factory: (symbol, masters) -> 事件迭代器，参数无效时抛出 ValueError
+        prefix: 路由前缀
+    """
+    from fastapi import APIRouter, HTTPException
+    from fastapi.responses import StreamingResponse
+
+    router = APIRouter(prefix=prefix)
+
+    @router.get("/stream/{symbol}")
+    async def stream_analysis(symbol: str, masters: Optional[str] = None):
+        selected = [m.strip() for m in masters.split(",") if m.strip()] if masters else None
+        # 在响应开始前创建事件流：无效参数（如未知的大师）返回400，而不是中途截断的事件流
+        try:
+            events = iter(stream_factory(symbol.upper(), selected))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        async def body():
+            async for event in aiter_events(events):
+                yield event.to_sse()
+
+        return StreamingResponse(body(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    return router
+
+
+class MultiPaneRenderer:
+    """
+    终端多窗格实时展示
+
+    每位大师一个窗格，显示最近的输出和工具调用状态；
+    窗格只保留最后 tail_lines 行，按 refresh_per_second 限频重建，开销与输出总长度无关；
+    render() 透传事件，便于调用方一边展示一边收集结果
+    """
+
+    MAX_LINE_CHARS = 200
+
+    STATUS_ICONS = {START: "⏳", TOKEN: "✍️", TOOL_CALL: "🔧", TOOL_RESULT: "✍️", DONE: "✅", ERROR: "❌"}
+
+    def __init__(self, agents: List[str], tail_lines: int = 12, refresh_per_second: int = 8):
+        """
+        Args:
+            agents: 大师名称列表，决定窗格顺序
+            tail_lines: 每个窗格显示的最后几行
+            refresh_per_second: 刷新频率
+        """
+        self.agents = list(agents)
+        self.tail_lines = tail_lines
+        self.refresh_per_second = refresh_per_second
+        self.texts: Dict[str, str] = {agent: "" for agent in self.agents}
+        self.status: Dict[str, str] = {agent: START for agent in self.agents}
+        self.tools: Dict[str, int] = {agent: 0 for agent in self.agents}
+
+    def update(self, event: StreamEvent) -> None:
+        """把一个事件应用到对应窗格"""
+        if event.agent not in self.texts:
+            if event.type == COMPLETE or not event.agent:
+                return
+            self.agents.append(event.agent)
+            self.texts[event.agent], self.status[event.agent], self.tools[event.agent] = "", START, 0
+        self.status[event.agent] = event.type
+        if event.type == TOKEN:
+            self._append(event.agent, event.content)
+        elif event.type == TOOL_CALL:
+            self.tools[event.agent] += 1
+            self._append(event.agent, f"\n🔧 {event.content}\n")
+        elif event.type == ERROR:
+            self._append(event.agent, f"\n❌ {event.content}\n")
+
+    def _append(self, agent: str, content: Optional[str]) -> None:
+        """追加输出，只保留窗格能显示的末尾部分"""
+        text = self.texts[agent] + (content or "")
+        text = text[-(self.tail_lines + 1) * self.MAX_LINE_CHARS:]
+        if text.count("\n") > self.tail_lines:
+            text = text.split("\n", text.count("\n") - self.tail_lines)[-1]
+        self.texts[agent] = text
+
+    def build(self):
+        """生成当前的 rich 渲染对象"""
+        from rich.columns import Columns
+        from rich.panel import Panel
+        from rich.text import Text
+
+        panels = []
+        for agent in self.agents:
+            lines = self.texts[agent].splitlines()[-self.tail_lines:]
+            title = f"{self.STATUS_ICONS.get(self.status[agent], '')} {agent} · 工具{self.tools[agent]}次"
+            panels.append(Panel(Text("\n".join(lines)), title=title, title_align="left",
+                                height=self.tail_lines + 2))
+        return Columns(panels, equal=True, expand=True)
+
+    def render(self, events: Iterable[StreamEvent]) -> Iterator[StreamEvent]:
+        """一边刷新终端窗格一边透传事件"""
+        from rich.live import Live
+
+        interval = 1.0 / self.refresh_per_second
+        with Live(self.build(), refresh_per_second=self.refresh_per_second, transient=False) as live:
+            last_build = time.monotonic()
+            try:
+                for event in events:
+                    self.update(event)
+                    now = time.monotonic()
+                    if now - last_build >= interval or event.type != TOKEN:
+                        live.update(self.build())
+                        last_build = now
+                    yield event
+            finally:
+                live.update(self.build())
+                # 调用方提前结束时一并关闭上游事件流
+                close = getattr(events, "close", None)
+                if close is not None:
+                    close()
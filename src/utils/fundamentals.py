@@ -0,0 +1,414 @@
+"""
+基本面因子引擎
+为量化类投资大师（格林布拉特魔法公式、格雷厄姆防御性标准/净流动资产、巴菲特ROE检验）
+一次性向量化计算基本面因子，并按各股票最近的财报期缓存，作为预计算表格直接交给Agent提示词
+"""
+
+import os
+import json
+import time
+import concurrent.futures
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+import pandas as pd
+
+
+# 原始字段 -> yfinance info 字段
+INFO_FIELDS = {
+    "price": "currentPrice",
+    "market_cap": "marketCap",
+    "enterprise_value": "enterpriseValue",
+    "shares_outstanding": "sharesOutstanding",
+    "trailing_eps": "trailingEps",
+    "book_value_per_share": "bookValue",
+    "total_revenue": "totalRevenue",
+    "operating_margin": "operatingMargins",
+    "net_income": "netIncomeToCommon",
+    "total_debt": "totalDebt",
+    "total_cash": "totalCash",
+    "current_ratio": "currentRatio",
+    "reported_roe": "returnOnEquity",
+    "earnings_growth": "earningsGrowth",
+    "dividend_yield": "dividendYield",
+    "most_recent_quarter": "mostRecentQuarter",
+}
+
+# 原始字段 -> yfinance 季度资产负债表行名
+BALANCE_SHEET_FIELDS = {
+    "current_assets": "Current Assets",
+    "total_liabilities": "Total Liabilities Net Minority Interest",
+    "working_capital": "Working Capital",
+    "net_ppe": "Net PPE",
+}
+
+RAW_FIELDS = list(INFO_FIELDS.keys()) + list(BALANCE_SHEET_FIELDS.keys())
+
+# 因子展示名称
+FACTOR_LABELS = {
+    "price": "股价",
+    "roe": "ROE",
+    "roic": "ROIC",
+    "earnings_yield": "盈利收益率",
+    "pe": "P/E",
+    "pb": "P/B",
+    "pe_x_pb": "P/E×P/B",
+    "peg": "PEG",
+    "debt_to_equity": "债务/股本",
+    "current_ratio": "流动比率",
+    "graham_number": "格雷厄姆数",
+    "graham_margin": "格雷厄姆安全边际",
+    "ncav_per_share": "每股净流动资产",
+    "magic_formula_rank": "魔法公式排名",
+    "graham_defensive_score": "格雷厄姆防御性得分",
+    "net_net": "净流动资产股",
+    "buffett_roe_pass": "ROE>15%",
+}
+
+# 以百分比展示的因子
+PERCENT_FACTORS = {"roe", "roic", "earnings_yield", "graham_margin"}
+
+# 格雷厄姆防御性得分至少需要可评估的条目数
+GRAHAM_MIN_CRITERIA = 3
+
+DEFAULT_FACTOR_COLUMNS = [
+    "roe", "roic", "earnings_yield", "pe", "pb",
+    "debt_to_equity", "current_ratio", "graham_number",
+]
+
+
+def fetch_yfinance_fundamentals(symbol: str) -> Dict[str, Any]:
+    """
+    通过yfinance获取单只股票的原始基本面数据
+
+    缺失的字段返回None，由因子计算阶段统一处理为NaN
+    """
+    import yfinance as yf
+
+    ticker = yf.Ticker(symbol)
+    info = ticker.info or {}
+
+    raw = {field: info.get(key) for field, key in INFO_FIELDS.items()}
+    if raw["price"] is None:
+        raw["price"] = info.get("regularMarketPrice")
+
+    try:
+        balance_sheet = ticker.quarterly_balance_sheet
+    except Exception:
+        balance_sheet = None
+
+    for field, row in BALANCE_SHEET_FIELDS.items():
+        value = None
+        if balance_sheet is not None and not balance_sheet.empty and row in balance_sheet.index:
+            latest = balance_sheet.loc[row].dropna()
+            if not latest.empty:
+                value = float(latest.iloc[0])
+        raw[field] = value
+
+    return raw
+
+
+def compute_factors(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    向量化计算基本面因子
+
+    Args:
+        raw: 以股票代码为索引、RAW_FIELDS为列的原始数据表
+
+    Returns:
+        因子表（同索引）
+    """
+    df = raw.reindex(columns=RAW_FIELDS).apply(pd.to_numeric, errors="coerce")
+
+    price = df["price"].to_numpy(dtype=float)
+    eps = df["trailing_eps"].to_numpy(dtype=float)
+    bvps = df["book_value_per_share"].to_numpy(dtype=float)
+    shares = df["shares_outstanding"].to_numpy(dtype=float)
+    market_cap = df["market_cap"].to_numpy(dtype=float)
+    total_debt = df["total_debt"].to_numpy(dtype=float)
+    total_cash = df["total_cash"].to_numpy(dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        equity = bvps * shares
+        ebit = df["operating_margin"].to_numpy(dtype=float) * df["total_revenue"].to_numpy(dtype=float)
+
+        # ROE：优先使用净利润/股东权益，缺失时回退到数据源提供的ROE
+        roe = np.where(equity > 0, df["net_income"].to_numpy(dtype=float) / equity, np.nan)
+        roe = np.where(np.isnan(roe), df["reported_roe"].to_numpy(dtype=float), roe)
+
+        # ROIC（格林布拉特口径）：EBIT / (净营运资本 + 净固定资产)，缺失时回退到 债务+权益-现金
+        invested_capital = df["working_capital"].to_numpy(dtype=float) + df["net_ppe"].to_numpy(dtype=float)
+        fallback_capital = total_debt + equity - total_cash
+        invested_capital = np.where(np.isnan(invested_capital), fallback_capital, invested_capital)
+        roic = np.where(invested_capital > 0, ebit / invested_capital, np.nan)
+
+        ev = df["enterprise_value"].to_numpy(dtype=float)
+        earnings_yield = np.where(ev > 0, ebit / ev, np.nan)
+
+        pe = np.where(eps > 0, price / eps, np.nan)
+        pb = np.where(bvps > 0, price / bvps, np.nan)
+        growth_pct = df["earnings_growth"].to_numpy(dtype=float) * 100
+        peg = np.where(growth_pct > 0, pe / growth_pct, np.nan)
+
+        debt_to_equity = np.where(equity > 0, total_debt / equity, np.nan)
+
+        graham_number = np.where((eps > 0) & (bvps > 0), np.sqrt(22.5 * eps * bvps), np.nan)
+        graham_margin = np.where(price > 0, graham_number / price - 1, np.nan)
+
+        ncav = df["current_assets"].to_numpy(dtype=float) - df["total_liabilities"].to_numpy(dtype=float)
+        ncav_per_share = np.where(shares > 0, ncav / shares, np.nan)
+
+    current_ratio = df["current_ratio"].to_numpy(dtype=float)
+
+    factors = pd.DataFrame({
+        "price": price,
+        "roe": roe,
+        "roic": roic,
+        "earnings_yield": earnings_yield,
+        "pe": pe,
+        "pb": pb,
+        "pe_x_pb": pe * pb,
+        "peg": peg,
+        "debt_to_equity": debt_to_equity,
+        "current_ratio": current_ratio,
+        "graham_number": graham_number,
+        "graham_margin": graham_margin,
+        "ncav_per_share": ncav_per_share,
+    }, index=df.index)
+
+    # 巴菲特：ROE > 15%（布尔因子在输入缺失时为NaN，展示为N/A而不是“否”）
+    factors["buffett_roe_pass"] = (factors["roe"] > 0.15).where(factors["roe"].notna())
+
+    # 格雷厄姆防御性标准（满足的条目数，0-5）：输入缺失的条目不计为未满足，
+    # 可评估的条目少于 GRAHAM_MIN_CRITERIA 时为NaN（亏损、净资产为负仍计为未满足）
+    criteria = [
+        (factors["pe"] < 15, _known(df.index, price, eps)),
+        (factors["pb"] < 1.5, _known(df.index, price, bvps)),
+        (factors["pe_x_pb"] < 22.5, _known(df.index, price, eps, bvps)),
+        (factors["current_ratio"] >= 2, _known(df.index, current_ratio)),
+        (factors["debt_to_equity"] < 0.5, _known(df.index, total_debt, equity)),
+    ]
+    passed = sum((met & evaluable).astype(int) for met, evaluable in criteria)
+    evaluable = sum(evaluable.astype(int) for _, evaluable in criteria)
+    factors["graham_defensive_score"] = passed.where(evaluable >= GRAHAM_MIN_CRITERIA)
+
+    # 格雷厄姆净流动资产股：市值低于净流动资产的2/3
+    factors["net_net"] = pd.Series((ncav > 0) & (market_cap < ncav * 2 / 3), index=df.index) \
+        .where(~np.isnan(ncav) & ~np.isnan(market_cap))
+
+    factors["fiscal_period"] = [
+        time.strftime("%Y-%m-%d", time.localtime(q)) if pd.notna(q) else None
+        for q in df["most_recent_quarter"]
+    ]
+
+    return add_magic_formula_rank(factors)
+
+
+def _known(index: pd.Index, *arrays: np.ndarray) -> pd.Series:
+    """各输入均不缺失的行"""
+    return pd.Series(np.all([~np.isnan(a) for a in arrays], axis=0), index=index)
+
+
+def add_magic_formula_rank(factors: pd.DataFrame) -> pd.DataFrame:
+    """
+    在当前股票池内计算魔法公式综合排名（ROIC排名 + 盈利收益率排名，越小越好）
+
+    magic_formula_pool 为参与排名的股票数；少于2只时排名没有意义，记为NaN
+    """
+    factors = factors.copy()
+    roic_rank = pd.to_numeric(factors["roic"], errors="coerce").rank(ascending=False, method="min")
+    ey_rank = pd.to_numeric(factors["earnings_yield"], errors="coerce").rank(ascending=False, method="min")
+    combined = roic_rank + ey_rank
+    pool = int(combined.notna().sum())
+    factors["magic_formula_rank"] = combined.rank(method="min") if pool >= 2 else np.nan
+    factors["magic_formula_pool"] = pool
+    return factors
+
+
+class FactorCache:
+    """
+    按财报期缓存的因子表（所有股票一个JSON文件）
+
+    每行记录股票最近的财报期（fiscal_period）和获取时间。在下一期财报预计发布
+    （财报期结束后一个季度再加 filing_lag_days）之前直接使用缓存；之后或财报期未知时，
+    每 recheck_seconds 重新获取一次，直到拿到新的财报期
+    """
+
+    FILE_NAME = "factors.json"
+
+    def __init__(self, cache_dir: Optional[str] = None, filing_lag_days: int = 45,
+                 recheck_seconds: int = 86400):
+        self.cache_dir = cache_dir
+        self.filing_lag_days = filing_lag_days
+        self.recheck_seconds = recheck_seconds
+        self._rows: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _path(self) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, self.FILE_NAME)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._rows is not None:
+            return self._rows
+
+        rows: Dict[str, Dict[str, Any]] = {}
+        path = self._path()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    rows = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 因子缓存读取失败，将重新计算: {e}")
+        self._rows = rows
+        return rows
+
+    def next_due(self, fiscal_period: Optional[str]) -> Optional[float]:
+        """下一期财报的预计发布时间（时间戳），财报期未知时为None"""
+        if not fiscal_period:
+            return None
+        try:
+            end = time.mktime(time.strptime(fiscal_period, "%Y-%m-%d"))
+        except ValueError:
+            return None
+        return end + (91 + self.filing_lag_days) * 86400
+
+    def is_fresh(self, row: Dict[str, Any], now: float) -> bool:
+        """缓存行是否仍对应最新财报"""
+        due = self.next_due(row.get("fiscal_period"))
+        if due is not None and now < due:
+            return True
+        return now - (row.get("fetched_at") or 0) < self.recheck_seconds
+
+    def get(self, symbols: List[str], now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """获取仍然有效的股票因子"""
+        now = time.time() if now is None else now
+        rows = self._load()
+        return {s: rows[s] for s in symbols if s in rows and self.is_fresh(rows[s], now)}
+
+    def put(self, factors: pd.DataFrame, now: Optional[float] = None) -> None:
+        """写入因子并持久化"""
+        now = time.time() if now is None else now
+        rows = self._load()
+        for symbol, row in factors.iterrows():
+            rows[symbol] = {
+                k: (None if isinstance(v, float) and np.isnan(v) else
+                    v.item() if isinstance(v, np.generic) else v)
+                for k, v in row.items()
+            }
+            rows[symbol]["fetched_at"] = now
+
+        path = self._path()
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(rows, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+
+class FundamentalsFactorEngine:
+    """
+    基本面因子引擎
+    批量获取原始数据，向量化计算因子，按财报期缓存
+    """
+
+    def __init__(self,
+                 cache_dir: Optional[str] = None,
+                 fetcher: Optional[Callable[[str], Dict[str, Any]]] = None,
+                 max_workers: int = 8,
+                 filing_lag_days: int = 45,
+                 recheck_seconds: int = 86400):
+        """
+        Args:
+            cache_dir: 缓存目录，为None时只做进程内缓存
+            fetcher: 单只股票原始数据获取函数，默认使用yfinance
+            max_workers: 批量获取的并发数
+            filing_lag_days: 季度结束后到财报发布的预计天数
+            recheck_seconds: 财报期未知或新财报逾期未出时，重新获取的间隔
+        """
+        self.cache = FactorCache(cache_dir, filing_lag_days, recheck_seconds)
+        self.fetcher = fetcher or fetch_yfinance_fundamentals
+        self.max_workers = max_workers
+
+    def fetch_raw(self, symbols: List[str]) -> pd.DataFrame:
+        """并发获取原始数据，失败的股票记为全空行"""
+        results: Dict[str, Dict[str, Any]] = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetcher, symbol): symbol for symbol in symbols}
+            for future in concurrent.futures.as_completed(futures):
+                symbol = futures[future]
+                try:
+                    results[symbol] = future.result()
+                except Exception as e:
+                    print(f"⚠️ 获取 {symbol} 基本面数据失败: {e}")
+                    results[symbol] = {}
+
+        return pd.DataFrame.from_dict(
+            {s: results.get(s, {}) for s in symbols}, orient="index"
+        ).reindex(columns=RAW_FIELDS)
+
+    def build_table(self, symbols: List[str], refresh: bool = False,
+                    now: Optional[float] = None) -> pd.DataFrame:
+        """
+        构建股票池的因子表
+
+        Args:
+            symbols: 股票代码列表
+            refresh: 是否忽略缓存重新获取
+            now: 判断缓存是否过期的当前时间，默认 time.time()
+
+        Returns:
+            以股票代码为索引的因子表，魔法公式排名在该股票池内计算
+        """
+        symbols = [s.upper() for s in dict.fromkeys(symbols)]
+
+        cached = {} if refresh else self.cache.get(symbols, now)
+        missing = [s for s in symbols if s not in cached]
+
+        frames = []
+        if cached:
+            frames.append(pd.DataFrame.from_dict(cached, orient="index").drop(columns="fetched_at", errors="ignore"))
+        if missing:
+            fresh = compute_factors(self.fetch_raw(missing))
+            self.cache.put(fresh, now)
+            frames.append(fresh)
+
+        table = pd.concat(frames) if len(frames) > 1 else frames[0]
+        table = table.reindex(symbols)
+        return add_magic_formula_rank(table)
+
+    def format_factor_table(self, table: pd.DataFrame,
+                            columns: Optional[List[str]] = None) -> str:
+        """将因子表格式化为Markdown表格，用于Agent提示词"""
+        columns = [c for c in (columns or DEFAULT_FACTOR_COLUMNS) if c in table.columns]
+        if table.empty or not columns:
+            return ""
+
+        header = "| 股票 | " + " | ".join(FACTOR_LABELS.get(c, c) for c in columns) + " |"
+        separator = "|------|" + "|".join("------" for _ in columns) + "|"
+        rows = [header, separator]
+        for symbol, row in table.iterrows():
+            cells = [self._format_value(c, row[c]) for c in columns]
+            if "magic_formula_rank" in columns and "magic_formula_pool" in table.columns:
+                # 排名附带股票池大小，如 3/30
+                index = columns.index("magic_formula_rank")
+                if cells[index] != "N/A":
+                    cells[index] += f"/{int(row['magic_formula_pool'])}"
+            rows.append(f"| {symbol} | " + " | ".join(cells) + " |")
+
+        return "\n".join(rows)
+
+    @staticmethod
+    def _format_value(column: str, value: Any) -> str:
+        """格式化单个因子值"""
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return "N/A"
+        if isinstance(value, (bool, np.bool_)):
+            return "是" if value else "否"
+        if column in PERCENT_FACTORS:
+            return f"{value * 100:.1f}%"
+        if column in ("magic_formula_rank", "graham_defensive_score"):
+            return f"{int(value)}"
+        return f"{value:.2f}"
@@ -0,0 +1,168 @@
+"""
+服务健康检查
+在 Playground 进程内并发探测所有 Agent/团队的会话存储（与 /v1/playground/.../sessions 相同的查询），
+并汇总存储引擎的连通性、文件大小、写入队列、保留和备份指标，由 GET /health 一次返回。
+探测在线程池中执行：agno 的会话接口在事件循环里同步访问数据库，回环HTTP探测会互相排队并阻塞正在进行的对话
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+DEFAULT_HEALTH_SETTINGS = {
+    "timeout_seconds": 5.0,
+    "concurrency": 8,
+    "cache_seconds": 5.0,
+    "slow_ms": 1000,
+    "max_queue_lag_ms": 5000,
+    "probe_user_id": "health_check",
+}
+
+# 整体状态
+OK = "ok"
+DEGRADED = "degraded"
+DOWN = "down"
+
+
+class HealthMonitor:
+    """
+    健康检查
+
+    check() 并发探测所有 Agent/团队并检查存储，cache_seconds 内的重复请求复用上一次结果
+    （同一时刻只有一次检查在执行）
+    """
+
+    def __init__(self, agents: Optional[List[Any]] = None, teams: Optional[List[Any]] = None,
+                 storage_engine: Optional[Any] = None, settings: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            agents: Playground 中的 Agent
+            teams: Playground 中的团队
+            storage_engine: 共享存储引擎（StorageEngine）
+            settings: 配置文件中的 health 段（缺省项使用 DEFAULT_HEALTH_SETTINGS）
+        """
+        self.agents = list(agents or [])
+        self.teams = list(teams or [])
+        self.storage_engine = storage_engine
+        self.settings = {**DEFAULT_HEALTH_SETTINGS, **(settings or {})}
+        self.last_result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def check(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        执行一次健康检查
+
+        Args:
+            refresh: 忽略缓存立即检查
+
+        Returns:
+            整体状态、检查耗时、各 Agent/团队的探测结果和存储状态
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not refresh and self.last_result and time.monotonic() - self._checked_at < self.settings["cache_seconds"]:
+                return self.last_result
+
+            started = time.perf_counter()
+            semaphore = asyncio.Semaphore(self.settings["concurrency"])
+            entities = [("agent", agent) for agent in self.agents] + [("team", team) for team in self.teams]
+            probes = asyncio.gather(*(self._probe(kind, entity, semaphore) for kind, entity in entities))
+            storage = asyncio.get_running_loop().run_in_executor(None, self.storage_status)
+            results, storage = await asyncio.gather(probes, storage)
+
+            agents = {result.pop("id"): result for result in results}
+            self.last_result = {
+                "status": self._overall(agents, storage),
+                "checked_at": int(time.time()),
+                "duration_ms": (time.perf_counter() - started) * 1000,
+                "agents": agents,
+                "storage": storage,
+            }
+            self._checked_at = time.monotonic()
+            return self.last_result
+
+    async def _probe(self, kind: str, entity: Any, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        entity_id = getattr(entity, f"{kind}_id", None) or ""
+        result = {"id": entity_id, "name": getattr(entity, "name", None) or entity_id, "kind": kind}
+        storage = getattr(entity, "storage", None)
+        if storage is None:
+            return {**result, "status": "no_storage", "latency_ms": None}
+
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                probe = asyncio.get_running_loop().run_in_executor(None, self._probe_storage, storage, entity_id)
+                sessions = await asyncio.wait_for(probe, self.settings["timeout_seconds"])
+            except asyncio.TimeoutError:
+                return {**result, "status": "error", "latency_ms": (time.perf_counter() - started) * 1000,
+                        "error": f"超时（{self.settings['timeout_seconds']}秒）"}
+            except Exception as e:
+                return {**result, "status": "error", "latency_ms": (time.perf_counter() - started) * 1000,
+                        "error": str(e)}
+        latency = (time.perf_counter() - started) * 1000
+        status = "slow" if latency > self.settings["slow_ms"] else OK
+        return {**result, "status": status, "latency_ms": latency, "table": storage.table_name, "sessions": sessions}
+
+    def _probe_storage(self, storage: Any, entity_id: str) -> int:
+        """与会话列表接口相同的查询路径，返回会话表中的会话数"""
+        storage.get_all_session_ids(user_id=self.settings["probe_user_id"], entity_id=entity_id)
+        with storage.db_engine.connect() as conn:
+            return conn.execute(text(f'SELECT COUNT(*) FROM "{storage.table_name}"')).scalar()
+
+    def storage_status(self) -> Dict[str, Any]:
+        """存储引擎状态：连通性和延迟、数据库/WAL文件大小，以及写入队列、保留和备份指标"""
+        if self.storage_engine is None:
+            return {"status": "disabled"}
+        status: Dict[str, Any] = {"db_file": self.storage_engine.db_file}
+        started = time.perf_counter()
+        try:
+            with self.storage_engine.engine.connect() as conn:
+                conn.exec_driver_sql("SELECT 1").scalar()
+        except Exception as e:
+            return {**status, "status": "error", "error": str(e)}
+        status["ping_ms"] = (time.perf_counter() - started) * 1000
+
+        for key, path in (("db_bytes", status["db_file"]), ("wal_bytes", status["db_file"] + "-wal")):
+            status[key] = os.path.getsize(path) if os.path.exists(path) else 0
+        metrics = self.storage_engine.metrics()
+        lag = metrics["write_queue"]["oldest_pending_ms"]
+        status["status"] = "slow" if lag > self.settings["max_queue_lag_ms"] else OK
+        status.update({key: value for key, value in metrics.items() if key != "db_file"})
+        return status
+
+    @staticmethod
+    def _overall(agents: Dict[str, Dict[str, Any]], storage: Dict[str, Any]) -> str:
+        probed = [result for result in agents.values() if result["status"] != "no_storage"]
+        if storage.get("status") == "error" or (probed and all(result["status"] == "error" for result in probed)):
+            return DOWN
+        if storage.get("status") == "slow" or any(result["status"] != OK for result in probed):
+            return DEGRADED
+        return OK
+
+
+def create_health_router(monitor: HealthMonitor, path: str = "/health"):
+    """
+    创建健康检查路由
+
+    GET {path}?refresh=true 返回 HealthMonitor.check() 的结果，整体状态为 down 时返回 503
+
+    Args:
+        monitor: 健康检查
+        path: 路由路径
+    """
+    from fastapi import APIRouter
+    from fastapi.responses import JSONResponse
+
+    router = APIRouter()
+
+    @router.get(path)
+    async def health(refresh: bool = False):
+        result = await monitor.check(refresh)
+        return JSONResponse(result, status_code=503 if result["status"] == DOWN else 200)
+
+    return router
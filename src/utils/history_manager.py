@@ -0,0 +1,265 @@
+"""
+对话历史窗口管理
+长会话中最近几轮对话原样保留，更早的对话折叠进滚动摘要（TokenManager 的分析压缩路径），
+历史总token数不超过上限；摘要随所属会话的 session_data 落盘，已折叠的轮次不会重复计算
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.agent import Agent
+from agno.memory.v2.memory import Memory
+from agno.models.message import Message
+from agno.run.base import RunStatus
+
+from .token_manager import TokenManager
+
+# 摘要存放在会话 session_data 的这个键下（每行会话只保存自己的摘要）
+HISTORY_SUMMARY_KEY = "history_window"
+# 旧版本把所有会话的摘要放在 Memory.summaries 的这个键下，加载时迁移
+_LEGACY_SUMMARY_KEY = "__history_window__"
+_COVERED_PREFIX = "covered:"
+
+
+@dataclass
+class HistoryWindow:
+    """一次运行使用的历史"""
+    summary: str
+    covered_run_id: Optional[str]
+    verbatim_runs: List[Any]
+    messages: List[Message]
+    tokens: int
+    folded_runs: int
+    summary_reused: bool
+
+
+class HistoryManager:
+    """
+    对话历史管理器
+
+    最多保留 max_verbatim_runs 轮原样对话；超出的轮次以及超出 max_context_tokens 时最早的原样轮次
+    折叠进摘要。单条工具结果先截断到 tool_result_tokens，摘要截断到 summary_tokens
+    """
+
+    def __init__(self, token_manager: Optional[TokenManager] = None, max_context_tokens: int = 6000,
+                 summary_tokens: int = 800, tool_result_tokens: int = 1500):
+        """
+        Args:
+            token_manager: token管理器（估算token、截断和提取分析要点）
+            max_context_tokens: 每轮注入的历史（摘要 + 原样对话）token上限
+            summary_tokens: 滚动摘要的token上限
+            tool_result_tokens: 原样对话中单条工具结果的token上限
+        """
+        self.token_manager = token_manager or TokenManager()
+        self.max_context_tokens = max_context_tokens
+        self.summary_tokens = summary_tokens
+        self.tool_result_tokens = tool_result_tokens
+
+    def build_window(self, runs: List[Any], max_verbatim_runs: Optional[int] = None,
+                     cached: Optional[Tuple[str, Optional[str]]] = None, skip_role: Optional[str] = None) -> HistoryWindow:
+        """
+        计算本轮使用的历史
+
+        Args:
+            runs: 会话中已完成的运行记录（按时间顺序）
+            max_verbatim_runs: 原样保留的最多轮数（通常为 num_history_responses），None 表示不限
+            cached: 缓存的摘要 (摘要文本, 摘要覆盖到的最后一个 run_id)
+            skip_role: 不放入历史的消息角色（通常为 system）
+        """
+        summary, covered = cached or ("", None)
+        ids = [run.run_id for run in runs]
+        # 缓存的摘要对应的轮次已不在会话中时从头重新折叠
+        start = ids.index(covered) + 1 if covered in ids else 0
+        if start == 0:
+            summary, covered = "", None
+        reused = start > 0
+
+        keep = len(runs) - start if max_verbatim_runs is None else min(max_verbatim_runs, len(runs) - start)
+        verbatim = [(run, self._run_messages(run, skip_role)) for run in runs[len(runs) - keep:]]
+        to_fold = runs[start:len(runs) - keep]
+
+        # 超出上限时把最早的原样轮次也折叠进摘要（至少保留最近一轮）
+        while True:
+            new_summary = self._fold(summary, to_fold, runs)
+            tokens = self._tokens(new_summary) + sum(self._messages_tokens(messages) for _, messages in verbatim)
+            if tokens <= self.max_context_tokens or len(verbatim) <= 1:
+                break
+            to_fold.append(verbatim.pop(0)[0])
+
+        if to_fold:
+            covered = to_fold[-1].run_id
+        messages = [message for _, run_messages in verbatim for message in run_messages]
+        if tokens > self.max_context_tokens and messages:
+            messages = self._fit(messages, self.max_context_tokens - self._tokens(new_summary))
+            tokens = self._tokens(new_summary) + self._messages_tokens(messages)
+
+        return HistoryWindow(
+            summary=new_summary,
+            covered_run_id=covered,
+            verbatim_runs=[run for run, _ in verbatim],
+            messages=messages,
+            tokens=tokens,
+            folded_runs=len(to_fold),
+            summary_reused=reused,
+        )
+
+    def summary_message(self, summary: str) -> Message:
+        """把摘要包装为历史消息"""
+        return Message(role="user", content=f"以下是本次会话较早对话的摘要，供参考：\n{summary}")
+
+    def _fold(self, summary: str, runs: List[Any], all_runs: List[Any]) -> str:
+        if not runs:
+            return summary
+        lines = [summary] if summary else []
+        for run in runs:
+            lines.append(self._summarize_run(run, all_runs.index(run) + 1))
+        # 摘要最多占历史上限的一半，给最近一轮原样对话留出空间
+        limit = min(self.summary_tokens, self.max_context_tokens // 2)
+        return self.token_manager.truncate_text("\n".join(lines), limit)
+
+    def _summarize_run(self, run: Any, turn: int) -> str:
+        """用 TokenManager 的分析压缩提取一轮对话的结论和要点"""
+        question = next((self._text(m.content) for m in run.messages or [] if m.role == "user"), "")
+        answer = self._text(run.content)
+        compressed = self.token_manager.compress_analysis_results([{"analysis": answer}])[0]
+        line = (f"- 第{turn}轮 问：{self.token_manager.truncate_text(question, 60)}"
+                f"｜结论：{compressed['recommendation']}"
+                f"｜{compressed['summary'].strip()}")
+        if compressed["key_points"]:
+            line += f"｜要点：{'；'.join(compressed['key_points'][:3])}"
+        return line.replace("\n", " ")
+
+    def _run_messages(self, run: Any, skip_role: Optional[str]) -> List[Message]:
+        messages = []
+        for message in run.messages or []:
+            if (skip_role and message.role == skip_role) or message.role == "system" or message.from_history:
+                continue
+            if message.role == "tool" and isinstance(message.content, str):
+                truncated = self.token_manager.truncate_text(message.content, self.tool_result_tokens)
+                if truncated is not message.content:
+                    message = message.model_copy(update={"content": truncated})
+            messages.append(message)
+        return messages
+
+    def _fit(self, messages: List[Message], budget: int) -> List[Message]:
+        """只剩最近一轮仍超出上限时，按比例截断其中的长消息"""
+        total = self._messages_tokens(messages)
+        ratio = max(budget, 0) / total if total else 1.0
+        fitted = []
+        for message in messages:
+            if isinstance(message.content, str):
+                limit = max(int(self._tokens(message.content) * ratio), 1)
+                message = message.model_copy(update={"content": self.token_manager.truncate_text(message.content, limit)})
+            fitted.append(message)
+        return fitted
+
+    @staticmethod
+    def _text(content: Any) -> str:
+        if content is None:
+            return ""
+        return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False, default=str)
+
+    def _tokens(self, text: str) -> int:
+        return self.token_manager.estimate_tokens(text) if text else 0
+
+    def _messages_tokens(self, messages: List[Message]) -> int:
+        total = 0
+        for message in messages:
+            total += self._tokens(self._text(message.content))
+            if message.tool_calls:
+                total += self._tokens(self._text(message.tool_calls))
+        return total
+
+
+class HistoryWindowMemory(Memory):
+    """
+    使用 HistoryManager 的 agno 会话记忆
+
+    Agent 开启 add_history_to_messages 时，agno 通过 get_messages_from_last_n_runs 取历史：
+    这里返回「摘要 + 最近几轮原样对话」。摘要按会话保存在 history_summaries 中，不放进 Memory.summaries
+    （Playground 中同一个 Agent 服务所有会话，agno 会把 summaries 整体写入每一行会话）；
+    由 HistoryWindowAgent 写入和恢复所属会话的 session_data
+    """
+
+    def __init__(self, history_manager: Optional[HistoryManager] = None, **kwargs):
+        """
+        Args:
+            history_manager: 历史管理器
+            **kwargs: 传给 agno Memory 的参数
+        """
+        super().__init__(**kwargs)
+        self.history_manager = history_manager or HistoryManager()
+        self.last_window: Optional[HistoryWindow] = None
+        # 会话ID -> (摘要, 摘要覆盖到的最后一个 run_id)
+        self.history_summaries: Dict[str, Tuple[str, str]] = {}
+
+    def get_messages_from_last_n_runs(self, session_id: str, agent_id: Optional[str] = None,
+                                      team_id: Optional[str] = None, last_n: Optional[int] = None,
+                                      skip_role: Optional[str] = None, skip_status: Optional[List[RunStatus]] = None,
+                                      skip_history_messages: bool = True) -> List[Message]:
+        if skip_status is None:
+            skip_status = [RunStatus.paused, RunStatus.cancelled, RunStatus.error]
+        runs = [run for run in (self.runs or {}).get(session_id, [])
+                if (not agent_id or getattr(run, "agent_id", None) == agent_id)
+                and (not team_id or getattr(run, "team_id", None) == team_id)
+                and getattr(run, "status", None) not in skip_status]
+        if not runs:
+            return []
+
+        window = self.history_manager.build_window(runs, last_n, self.history_summaries.get(session_id), skip_role)
+        self.last_window = window
+        if window.summary and window.covered_run_id:
+            self.history_summaries[session_id] = (window.summary, window.covered_run_id)
+
+        messages = list(window.messages)
+        if window.summary:
+            messages.insert(0, self.history_manager.summary_message(window.summary))
+        return messages
+
+    def session_summary(self, session_id: str) -> Optional[Dict[str, str]]:
+        """一个会话的摘要（写入该会话的 session_data），没有摘要时返回None"""
+        cached = self.history_summaries.get(session_id)
+        if cached is None:
+            return None
+        return {"summary": cached[0], "covered_run_id": cached[1]}
+
+    def restore_session_summary(self, session_id: str, data: Optional[Dict[str, Any]]) -> None:
+        """从会话的 session_data 恢复摘要"""
+        if data and data.get("summary") and data.get("covered_run_id"):
+            self.history_summaries[session_id] = (data["summary"], data["covered_run_id"])
+        else:
+            self.history_summaries.pop(session_id, None)
+
+    def pop_legacy_summary(self, session_id: str) -> Optional[Dict[str, str]]:
+        """取出并删除旧版本存放在 Memory.summaries 中的摘要，返回该会话的那一份"""
+        legacy = (self.summaries or {}).pop(_LEGACY_SUMMARY_KEY, None) or {}
+        cached = legacy.get(session_id)
+        if cached is None:
+            return None
+        covered = next((topic[len(_COVERED_PREFIX):] for topic in cached.topics or []
+                        if topic.startswith(_COVERED_PREFIX)), None)
+        return {"summary": cached.summary, "covered_run_id": covered}
+
+
+class HistoryWindowAgent(Agent):
+    """
+    使用 HistoryWindowMemory 的 Agent
+
+    保存会话时只把该会话的摘要写入它自己的 session_data，加载会话时从 session_data 恢复
+    """
+
+    def get_agent_session(self, session_id: str, user_id: Optional[str] = None):
+        session = super().get_agent_session(session_id, user_id)
+        if isinstance(self.memory, HistoryWindowMemory):
+            summary = self.memory.session_summary(session_id)
+            if summary is not None:
+                session.session_data = {**(session.session_data or {}), HISTORY_SUMMARY_KEY: summary}
+        return session
+
+    def load_agent_session(self, session) -> None:
+        super().load_agent_session(session)
+        if isinstance(self.memory, HistoryWindowMemory):
+            legacy = self.memory.pop_legacy_summary(session.session_id)
+            self.memory.restore_session_summary(session.session_id,
+                                                (session.session_data or {}).get(HISTORY_SUMMARY_KEY) or legacy)
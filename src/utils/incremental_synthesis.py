@@ -0,0 +1,211 @@
+"""
+增量综合分析
+大师分析结果一到达就并入滚动的压缩状态（共识、分歧、建议统计），
+最后一位大师完成或截止时间到达时，只用一次简短的LLM调用生成最终报告
+"""
+
+import time
+import queue
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable
+
+from .token_manager import TokenManager
+
+
+@dataclass
+class RollingSynthesisState:
+    """滚动的综合状态，只保存压缩后的大师观点"""
+    symbol: str
+    expected_masters: List[str] = field(default_factory=list)
+    compressed: List[Dict[str, Any]] = field(default_factory=list)
+    tally: Counter = field(default_factory=Counter)
+    arrival_seconds: Dict[str, float] = field(default_factory=dict)
+    failed: List[str] = field(default_factory=list)
+
+    def add(self, result: Dict[str, Any], token_manager: TokenManager, elapsed: float) -> Dict[str, Any]:
+        """并入一位大师的分析结果，返回压缩后的条目"""
+        entry = token_manager.compress_analysis_results([result])[0]
+        if result.get("style") == "错误":
+            entry["recommendation"] = "分析失败"
+            self.failed.append(entry["agent"])
+        else:
+            self.tally[entry["recommendation"]] += 1
+        self.compressed.append(entry)
+        self.arrival_seconds[entry["agent"]] = elapsed
+        return entry
+
+    @property
+    def received(self) -> List[str]:
+        return [entry["agent"] for entry in self.compressed]
+
+    @property
+    def missing(self) -> List[str]:
+        received = set(self.received)
+        return [name for name in self.expected_masters if name not in received]
+
+    def consensus(self) -> Optional[str]:
+        """多数建议（忽略未明确），没有结论时返回None"""
+        votes = {rec: n for rec, n in self.tally.items() if rec != "未明确"}
+        if not votes:
+            return None
+        return max(votes.items(), key=lambda item: item[1])[0]
+
+    def consensus_ratio(self) -> float:
+        """多数建议在有效票中的占比"""
+        consensus = self.consensus()
+        valid = sum(n for rec, n in self.tally.items() if rec != "未明确")
+        return self.tally[consensus] / valid if consensus and valid else 0.0
+
+    def disagreements(self) -> List[Dict[str, Any]]:
+        """与多数建议不同的大师观点"""
+        consensus = self.consensus()
+        return [
+            entry for entry in self.compressed
+            if consensus and entry["recommendation"] not in (consensus, "未明确", "分析失败")
+        ]
+
+    def render(self, max_points: int = 8) -> str:
+        """渲染为简短的Markdown，作为最终LLM调用的输入"""
+        lines = [f"股票: {self.symbol}"]
+        tally = "，".join(f"{rec} {n}位" for rec, n in self.tally.most_common()) or "暂无"
+        lines.append(f"建议统计: {tally}")
+        consensus = self.consensus()
+        if consensus:
+            lines.append(f"多数意见: {consensus}（{self.consensus_ratio():.0%}）")
+        if self.missing:
+            lines.append(f"未按时完成的大师: {', '.join(self.missing)}")
+
+        lines.append("")
+        lines.append("| 投资大师 | 建议 | 核心观点 |")
+        lines.append("|----------|------|----------|")
+        for entry in self.compressed:
+            summary = entry["summary"].replace("\n", " ")[:60]
+            lines.append(f"| {entry['agent']} | {entry['recommendation']} | {summary} |")
+
+        disagreements = self.disagreements()
+        if disagreements:
+            lines.append("")
+            lines.append("主要分歧:")
+            for entry in disagreements:
+                lines.append(f"- {entry['agent']} 认为应{entry['recommendation']}")
+
+        points = list(dict.fromkeys(p for entry in self.compressed for p in entry["key_points"]))
+        if points:
+            lines.append("")
+            lines.append("关键要点:")
+            lines.extend(f"- {point}" for point in points[:max_points])
+
+        return "\n".join(lines)
+
+
+class IncrementalSynthesizer:
+    """
+    增量综合器
+    从队列消费大师分析结果，不必等待最慢的大师
+    """
+
+    def __init__(self, token_manager: TokenManager,
+                 agent_factory: Optional[Callable[[], Any]] = None,
+                 deadline_seconds: Optional[float] = None):
+        """
+        Args:
+            token_manager: token管理器
+            agent_factory: 创建最终报告Agent的工厂函数，为None时直接输出滚动状态
+            deadline_seconds: 默认截止时间（秒），None表示等待全部大师
+        """
+        self.token_manager = token_manager
+        self.agent_factory = agent_factory
+        self.deadline_seconds = deadline_seconds
+
+    def consume(self, symbol: str, result_queue: "queue.Queue",
+                expected_masters: List[str],
+                deadline_seconds: Optional[float] = None,
+                on_update: Optional[Callable[[RollingSynthesisState, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        消费分析结果并生成最终报告
+
+        Args:
+            symbol: 股票代码
+            result_queue: 大师分析结果队列（每项为 analyze_stock 返回的字典）
+            expected_masters: 预期的大师名称（agent_name）
+            deadline_seconds: 截止时间，覆盖默认值
+            on_update: 每并入一位大师后的回调
+
+        Returns:
+            包含 report、state、timed_out 和耗时的结果字典
+        """
+        deadline_seconds = deadline_seconds if deadline_seconds is not None else self.deadline_seconds
+        state = RollingSynthesisState(symbol=symbol, expected_masters=list(expected_masters))
+        results: List[Dict[str, Any]] = []
+
+        start = time.perf_counter()
+        deadline = start + deadline_seconds if deadline_seconds is not None else None
+        timed_out = False
+
+        while len(results) < len(expected_masters):
+            timeout = None if deadline is None else deadline - time.perf_counter()
+            if timeout is not None and timeout <= 0:
+                timed_out = True
+                break
+            try:
+                result = result_queue.get(timeout=timeout)
+            except queue.Empty:
+                timed_out = True
+                break
+
+            results.append(result)
+            entry = state.add(result, self.token_manager, time.perf_counter() - start)
+            if on_update:
+                on_update(state, entry)
+
+        wait_time = time.perf_counter() - start
+        if timed_out:
+            print(f"⏰ 已到截止时间，使用 {len(results)}/{len(expected_masters)} 位大师的结果生成报告")
+
+        report = self._final_report(state)
+        return {
+            "report": report,
+            "state": state,
+            "individual_analyses": results,
+            "timed_out": timed_out,
+            "wait_time": wait_time,
+            "synthesis_time": time.perf_counter() - start - wait_time
+        }
+
+    def _final_report(self, state: RollingSynthesisState) -> str:
+        """基于滚动状态，用一次简短的LLM调用生成最终报告"""
+        summary = state.render()
+        if self.agent_factory is None or not state.compressed:
+            return summary
+
+        prompt = f"""
+基于以下已汇总的投资大师观点，生成简洁的综合投资报告：
+
+{summary}
+
+请输出：
+
+# 📊 {state.symbol} 投资分析报告
+
+## 🎯 投资建议
+| 项目 | 结论 |
+|------|------|
+| 推荐操作 | [买入/持有/卖出] |
+| 综合评分 | [X/10分] |
+| 风险等级 | [低/中/高] |
+
+## 🎭 共识与分歧
+- [2-3句话]
+
+## ⚠️ 关键风险
+- [风险1]
+- [风险2]
+"""
+        try:
+            response = self.agent_factory().run(prompt)
+            content = getattr(response, "content", None)
+            return content if isinstance(content, str) and content else str(response)
+        except Exception as e:
+            print(f"⚠️ 最终报告生成失败，输出汇总状态: {e}")
+            return summary
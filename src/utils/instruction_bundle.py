@@ -0,0 +1,125 @@
+"""
+预编译的大师指令包
+每位投资大师的身份、投资哲学、指导原则、风格和分析框架按配置内容只渲染一次，
+CLI、多Agent分析和Playground共用同一份不可变结果（含渲染文本、token数和内容哈希）
+"""
+
+import json
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, Tuple
+
+from .token_manager import TokenManager
+
+# Playground 对话场景在大师指令之后追加的提示
+CHAT_NOTES: Tuple[str, ...] = (
+    "",
+    "**重要提示：**",
+    "- 总是提供具体的投资建议和风险评估",
+    "- 使用你独特的投资风格和语言特点",
+    "- 结合最新的市场数据进行分析",
+    "- 如果用户询问股票代码，务必使用金融工具获取最新数据",
+    "- 提供清晰的买入/卖出/持有建议及理由",
+)
+
+
+@dataclass(frozen=True)
+class InstructionBundle:
+    """单个投资大师编译后的指令"""
+    agent_name: str
+    instructions: Tuple[str, ...]
+    chat_instructions: Tuple[str, ...]
+    framework: str
+    text: str
+    token_count: int
+    content_hash: str
+    config_hash: str
+
+
+_BUNDLE_CACHE: Dict[str, InstructionBundle] = {}
+_BUNDLE_LOCK = threading.Lock()
+
+
+def config_hash(master_config: Dict[str, Any]) -> str:
+    """大师配置内容的哈希（键顺序无关），配置变化即视为新版本"""
+    canonical = json.dumps(master_config, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def render_instructions(master_config: Dict[str, Any]) -> Tuple[str, ...]:
+    """渲染Agent指令：身份、投资哲学、分析指导原则和分析风格"""
+    style = master_config['style_characteristics']
+    return (
+        f"你是{master_config['agent_name']}，{master_config['description']}",
+        "",
+        "**投资哲学：**",
+        *(f"- {philosophy}" for philosophy in master_config['investment_philosophy']),
+        "",
+        "**分析指导原则：**",
+        *(f"- {instruction}" for instruction in master_config['instructions']),
+        "",
+        "**分析风格：**",
+        f"- 语言风格：{style['voice']}",
+        f"- 分析方法：{style['approach']}",
+        f"- 举例特点：{style['examples']}",
+    )
+
+
+def render_framework(analysis_framework: Dict[str, Any]) -> str:
+    """渲染分析框架（编号列表，嵌套的列表和字典逐级缩进）"""
+    lines = []
+    for i, (key, value) in enumerate(analysis_framework.items(), 1):
+        title = key.replace('_', ' ').title()
+        if isinstance(value, str):
+            lines.append(f"{i}. **{title}** - {value}")
+        elif isinstance(value, list):
+            lines.append(f"{i}. **{title}**")
+            lines.extend(f"   - {item}" for item in value)
+        elif isinstance(value, dict):
+            lines.append(f"{i}. **{title}**")
+            for sub_key, sub_value in value.items():
+                if isinstance(sub_value, list):
+                    lines.append(f"   - {sub_key.replace('_', ' ')}:")
+                    lines.extend(f"     * {item}" for item in sub_value)
+                else:
+                    lines.append(f"   - {sub_key.replace('_', ' ')}: {sub_value}")
+    return "".join(f"{line}\n" for line in lines)
+
+
+def compile_master_bundle(master_config: Dict[str, Any]) -> InstructionBundle:
+    """
+    获取大师的指令包，同一份配置内容只编译一次
+
+    Args:
+        master_config: 单个投资大师的配置
+
+    Returns:
+        不可变的指令包
+    """
+    key = config_hash(master_config)
+    bundle = _BUNDLE_CACHE.get(key)
+    if bundle is not None:
+        return bundle
+
+    instructions = render_instructions(master_config)
+    framework = render_framework(master_config.get('analysis_framework', {}))
+    text = "\n".join(instructions) + "\n\n**分析框架：**\n" + framework
+    bundle = InstructionBundle(
+        agent_name=master_config['agent_name'],
+        instructions=instructions,
+        chat_instructions=instructions + CHAT_NOTES,
+        framework=framework,
+        text=text,
+        token_count=TokenManager().estimate_tokens(text),
+        content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+        config_hash=key,
+    )
+    with _BUNDLE_LOCK:
+        return _BUNDLE_CACHE.setdefault(key, bundle)
+
+
+def clear_bundle_cache() -> None:
+    """清空已编译的指令包（配置热更新后调用）"""
+    with _BUNDLE_LOCK:
+        _BUNDLE_CACHE.clear()
@@ -0,0 +1,197 @@
+"""
+分层 Map-Reduce 综合分析
+先并行把每位大师（或每组股票）的分析压缩成限长摘要，再按树形逐层合并，
+直到内容放得进综合器的上下文窗口；每次调用的token和调用次数都可预估
+"""
+
+import math
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Callable
+
+from .token_manager import TokenManager
+from .analysis_schema import analysis_payload
+
+
+@dataclass
+class MapReducePlan:
+    """调用计划：叶子数、每层节点数和总调用次数"""
+    leaves: int
+    fan_in: int
+    reduce_levels: List[int] = field(default_factory=list)
+
+    @property
+    def total_calls(self) -> int:
+        # map调用 + 各层reduce调用 + 最终报告调用
+        return self.leaves + sum(self.reduce_levels) + (1 if self.leaves else 0)
+
+
+class MapReduceSynthesizer:
+    """
+    分层综合器
+
+    map: 每个叶子（一位大师的分析，或一只股票的全部大师观点）压缩为不超过 summary_tokens 的摘要
+    reduce: 每 fan_in 个摘要合并为一个，逐层进行，直到摘要总量放得进 window_tokens
+    final: 用一次调用基于剩余摘要生成最终报告
+    """
+
+    PROMPT_OVERHEAD_TOKENS = 300  # 指令模板本身的预留
+
+    def __init__(self, token_manager: TokenManager,
+                 agent_factory: Callable[[], Any],
+                 summary_tokens: int = 300,
+                 window_tokens: Optional[int] = None,
+                 max_workers: int = 8,
+                 final_agent_factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            token_manager: token管理器
+            agent_factory: 创建Agent的工厂函数，每次调用使用独立实例以便并发
+            summary_tokens: 每个摘要的token上限
+            window_tokens: 单次调用的输入上限，默认取 max_input_tokens - reserve_tokens
+            max_workers: 并发调用数
+            final_agent_factory: 生成最终报告的Agent工厂，默认与 agent_factory 相同
+                                 （可让摘要用快模型、最终报告用强模型）
+        """
+        self.token_manager = token_manager
+        self.agent_factory = agent_factory
+        self.final_agent_factory = final_agent_factory or agent_factory
+        self.summary_tokens = summary_tokens
+        budget = token_manager.budget
+        self.window_tokens = window_tokens or budget.max_input_tokens - budget.reserve_tokens
+        self.max_workers = max_workers
+        self.fan_in = max(2, (self.window_tokens - self.PROMPT_OVERHEAD_TOKENS) // summary_tokens)
+        self.stats = {"calls": 0, "max_call_tokens": 0}
+        self._lock = threading.Lock()
+
+    def plan(self, leaves: int) -> MapReducePlan:
+        """预估调用计划（摘要长度有硬上限，因此层数和调用次数是确定的）"""
+        plan = MapReducePlan(leaves=leaves, fan_in=self.fan_in)
+        nodes = leaves
+        while nodes > self.fan_in:
+            nodes = math.ceil(nodes / self.fan_in)
+            plan.reduce_levels.append(nodes)
+        return plan
+
+    @staticmethod
+    def group_by_master(analyses: List[Dict[str, Any]]) -> "OrderedDict[str, str]":
+        """每位大师的分析作为一个叶子"""
+        leaves: "OrderedDict[str, str]" = OrderedDict()
+        for result in analyses:
+            label = f"{result.get('agent', '')} · {result.get('symbol', '')}"
+            leaves[label] = analysis_payload(result)
+        return leaves
+
+    def group_by_symbol(self, analyses: List[Dict[str, Any]]) -> "OrderedDict[str, str]":
+        """同一只股票的全部大师观点（先做本地压缩）作为一个叶子"""
+        grouped: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        for result in analyses:
+            grouped.setdefault(result.get("symbol", ""), []).append(result)
+
+        leaves: "OrderedDict[str, str]" = OrderedDict()
+        for symbol, results in grouped.items():
+            lines = []
+            for entry in self.token_manager.compress_analysis_results(results):
+                points = "；".join(entry["key_points"][:3])
+                lines.append(f"- {entry['agent']}: {entry['recommendation']}。{entry['summary']} {points}")
+            leaves[symbol] = "\n".join(lines)
+        return leaves
+
+    def synthesize(self, leaves: "OrderedDict[str, str]", topic: str,
+                   final_template: str = "") -> Dict[str, Any]:
+        """
+        执行 map-reduce 综合
+
+        Args:
+            leaves: 叶子标签 -> 原始内容
+            topic: 综合主题，如 "AAPL" 或 "AAPL、MSFT 等50只股票对比"
+            final_template: 最终报告的输出模板
+
+        Returns:
+            包含 report、plan、levels 和调用统计的结果字典
+        """
+        start = time.perf_counter()
+        self.stats = {"calls": 0, "max_call_tokens": 0}
+        plan = self.plan(len(leaves))
+        print(f"🧩 Map-Reduce综合: {plan.leaves}个叶子, 每组合并{plan.fan_in}个, "
+              f"reduce层数{len(plan.reduce_levels)}, 预计{plan.total_calls}次调用")
+
+        input_cap = self.window_tokens - self.PROMPT_OVERHEAD_TOKENS
+        summaries = self._parallel([
+            (label, self._map_prompt(label, self.token_manager.truncate_text(text, input_cap), topic))
+            for label, text in leaves.items()
+        ])
+
+        levels = [len(summaries)]
+        while len(summaries) > self.fan_in:
+            labels = list(summaries)
+            groups = [labels[i:i + self.fan_in] for i in range(0, len(labels), self.fan_in)]
+            summaries = self._parallel([
+                (f"{group[0]} … {group[-1]}" if len(group) > 1 else group[0],
+                 self._reduce_prompt({label: summaries[label] for label in group}, topic))
+                for group in groups
+            ])
+            levels.append(len(summaries))
+
+        report = self._call(self._final_prompt(summaries, topic, final_template), cap=None,
+                            agent_factory=self.final_agent_factory)
+        return {
+            "report": report,
+            "plan": plan,
+            "levels": levels,
+            "calls": self.stats["calls"],
+            "max_call_tokens": self.stats["max_call_tokens"],
+            "elapsed": time.perf_counter() - start
+        }
+
+    def _parallel(self, jobs: List[tuple]) -> "OrderedDict[str, str]":
+        """并发执行一层调用，保持输入顺序"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(label, executor.submit(self._call, prompt, self.summary_tokens)) for label, prompt in jobs]
+            return OrderedDict((label, future.result()) for label, future in futures)
+
+    def _call(self, prompt: str, cap: Optional[int],
+              agent_factory: Optional[Callable[[], Any]] = None) -> str:
+        """单次LLM调用，输出按 cap 强制截断"""
+        prompt_tokens = self.token_manager.estimate_tokens(prompt)
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["max_call_tokens"] = max(self.stats["max_call_tokens"], prompt_tokens)
+
+        try:
+            response = (agent_factory or self.agent_factory)().run(prompt)
+            content = getattr(response, "content", None)
+            text = content if isinstance(content, str) else str(response)
+        except Exception as e:
+            text = f"（摘要生成失败: {e}）"
+        return self.token_manager.truncate_text(text, cap) if cap else text
+
+    def _map_prompt(self, label: str, text: str, topic: str) -> str:
+        return f"""
+请把以下关于 {topic} 的分析（{label}）压缩为要点摘要，不超过{self.summary_tokens}字：
+保留投资建议、核心理由、关键数据和主要风险，去掉客套和重复内容。
+
+{text}
+"""
+
+    def _reduce_prompt(self, summaries: Dict[str, str], topic: str) -> str:
+        body = "\n\n".join(f"### {label}\n{text}" for label, text in summaries.items())
+        return f"""
+请把以下关于 {topic} 的{len(summaries)}份摘要合并为一份，不超过{self.summary_tokens}字：
+保留每份摘要的建议倾向（可汇总为统计），突出共识和分歧，保留关键数据。
+
+{body}
+"""
+
+    def _final_prompt(self, summaries: Dict[str, str], topic: str, final_template: str) -> str:
+        body = "\n\n".join(f"### {label}\n{text}" for label, text in summaries.items())
+        return f"""
+基于以下已逐层汇总的投资大师观点，生成关于 {topic} 的综合投资报告：
+
+{body}
+
+{final_template or "请生成结构化报告，包含：执行摘要、大师观点对比、风险评估、投资计划。"}
+"""
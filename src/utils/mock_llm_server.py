@@ -0,0 +1,353 @@
+"""
+本地 OpenAI 兼容模拟服务器
+用于在没有真实模型服务的情况下压测并发、限流和缓存路径
+
+支持：
+- 可配置的首包延迟分布（固定/均匀/对数正态）和输出吞吐（tokens/秒）
+- 流式（SSE）和非流式响应
+- 工具调用脚本：按对话轮次依次返回工具调用或文本
+- 429 限流注入（按概率或每N个请求）
+- 前缀缓存模拟：提示词按块做链式哈希，与之前请求相同的前缀块计入 usage.prompt_tokens_details.cached_tokens
+
+运行方式:
+    python scripts/mock_llm_server.py --port 8000 --latency "lognormal:-1.0,0.4" --tps 60
+    LLM_BASE_URL=http://127.0.0.1:8000/v1 python apps/playground.py
+"""
+
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional
+
+from .replay import LatencyModel
+
+
+@dataclass
+class MockLLMConfig:
+    """模拟服务器配置"""
+    latency: LatencyModel = field(default_factory=lambda: LatencyModel(kind="none"))
+    tokens_per_second: float = 0.0  # 0 表示不限速
+    completion_tokens: int = 64  # 默认回复的token数
+    reply: Optional[str] = None  # 固定回复内容，None 时生成占位文本
+    tool_script: List[Dict[str, Any]] = field(default_factory=list)
+    rate_limit_probability: float = 0.0
+    rate_limit_every: int = 0  # 每N个请求返回一次429
+    retry_after: float = 1.0
+    seed: Optional[int] = None
+    prefix_cache_block: int = 64  # 前缀缓存按块命中（token），0 表示不模拟
+    prefix_cache_entries: int = 65536  # 记住的前缀块数（LRU）
+
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算token数（与 TokenManager 一致的 4字符/token）"""
+    return max(1, len(text) // 4)
+
+
+class MockLLMServer:
+    """
+    OpenAI 兼容模拟服务器
+    在后台线程运行，可作为上下文管理器使用
+    """
+
+    def __init__(self, config: Optional[MockLLMConfig] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockLLMConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "in_flight": 0, "peak_in_flight": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        self._prefix_blocks: "OrderedDict[int, None]" = OrderedDict()
+
+        server = self
+
+        class Handler(_MockHandler):
+            mock = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """在后台线程启动服务器"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务器"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _should_rate_limit(self) -> bool:
+        with self._lock:
+            self.stats["requests"] += 1
+            count = self.stats["requests"]
+            limited = (
+                (self.config.rate_limit_every and count % self.config.rate_limit_every == 0)
+                or self._rng.random() < self.config.rate_limit_probability
+            )
+            if limited:
+                self.stats["rate_limited"] += 1
+            return bool(limited)
+
+    def _track(self, delta: int) -> None:
+        with self._lock:
+            self.stats["in_flight"] += delta
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+
+    def cached_tokens(self, prompt: str) -> int:
+        """
+        按前缀块估算缓存命中的token数
+
+        与 vLLM 的前缀缓存一样，每个完整块的哈希链接前面所有块，命中数为开头连续命中的块数。
+        哈希在锁外计算，锁内只做字典查找，并发请求不会因长提示词互相排队
+        """
+        block = self.config.prefix_cache_block
+        if block <= 0:
+            return 0
+        size = block * 4  # 与 _estimate_tokens 一致的 4字符/token
+        hashes, previous = [], 0
+        for start in range(0, len(prompt) - size + 1, size):
+            previous = hash((previous, prompt[start:start + size]))
+            hashes.append(previous)
+
+        with self._lock:
+            hits = 0
+            while hits < len(hashes) and hashes[hits] in self._prefix_blocks:
+                hits += 1
+            for digest in hashes:
+                self._prefix_blocks[digest] = None
+                self._prefix_blocks.move_to_end(digest)
+            while len(self._prefix_blocks) > self.config.prefix_cache_entries:
+                self._prefix_blocks.popitem(last=False)
+        return hits * block
+
+    def build_step(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        根据工具调用脚本和对话轮次决定本次回复
+
+        脚本的第N步对应对话中已有N条assistant消息；脚本用完后返回文本回复
+        """
+        messages = request.get("messages", [])
+        turn = sum(1 for m in messages if m.get("role") == "assistant")
+        if turn < len(self.config.tool_script):
+            return self.config.tool_script[turn]
+
+        if self.config.reply is not None:
+            return {"content": self.config.reply}
+
+        last_user = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "")
+        words = [f"tok{i}" for i in range(self.config.completion_tokens)]
+        return {"content": f"[mock:{request.get('model', '')}] {str(last_user)[:40]} " + " ".join(words)}
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """请求处理器（mock 属性在 MockLLMServer 中注入）"""
+
+    mock: MockLLMServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock-model", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        mock = self.mock
+
+        if mock._should_rate_limit():
+            self._send_json(429, {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error",
+                                            "code": "rate_limit_exceeded"}},
+                            headers={"Retry-After": str(mock.config.retry_after)})
+            return
+
+        mock._track(1)
+        try:
+            delay = mock.config.latency.sample()
+            if delay > 0:
+                time.sleep(delay)
+
+            step = mock.build_step(request)
+            prompt = json.dumps(request.get("messages", []), ensure_ascii=False)
+            prompt_tokens, cached_tokens = _estimate_tokens(prompt), mock.cached_tokens(prompt)
+            if request.get("stream"):
+                self._stream(request, step, prompt_tokens, cached_tokens)
+            else:
+                self._complete(request, step, prompt_tokens, cached_tokens)
+        finally:
+            mock._track(-1)
+
+    def _tool_calls(self, step: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+            }
+            for call in step.get("tool_calls", [])
+        ]
+
+    def _record_usage(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Dict[str, Any]:
+        with self.mock._lock:
+            self.mock.stats["prompt_tokens"] += prompt_tokens
+            self.mock.stats["completion_tokens"] += completion_tokens
+            self.mock.stats["cached_tokens"] += cached_tokens
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+    def _complete(self, request: Dict[str, Any], step: Dict[str, Any], prompt_tokens: int,
+                  cached_tokens: int = 0) -> None:
+        content = step.get("content")
+        tool_calls = self._tool_calls(step)
+        completion_tokens = _estimate_tokens(content or json.dumps(step.get("tool_calls", [])))
+
+        tps = self.mock.config.tokens_per_second
+        if tps > 0:
+            time.sleep(completion_tokens / tps)
+
+        message: Dict[str, Any] = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock-model"),
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if tool_calls else "stop"}],
+            "usage": self._record_usage(prompt_tokens, completion_tokens, cached_tokens),
+        })
+
+    def _stream(self, request: Dict[str, Any], step: Dict[str, Any], prompt_tokens: int,
+                cached_tokens: int = 0) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model", "mock-model")
+
+        def send(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage=None) -> None:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage is not None:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        tps = self.mock.config.tokens_per_second
+        tool_calls = self._tool_calls(step)
+        send({"role": "assistant", "content": ""})
+
+        if tool_calls:
+            for index, call in enumerate(tool_calls):
+                send({"tool_calls": [dict(call, index=index)]})
+            completion_tokens = _estimate_tokens(json.dumps(step.get("tool_calls", [])))
+            finish_reason = "tool_calls"
+        else:
+            # 按空格切分为token片段，按吞吐量节流输出
+            pieces = (step.get("content") or "").split(" ")
+            for i, piece in enumerate(pieces):
+                send({"content": piece if i == 0 else f" {piece}"})
+                if tps > 0:
+                    time.sleep(1.0 / tps)
+            completion_tokens = len(pieces)
+            finish_reason = "stop"
+
+        usage = self._record_usage(prompt_tokens, completion_tokens, cached_tokens)
+        include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+        send({}, finish_reason=finish_reason, usage=usage if include_usage else None)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main():
+    """命令行启动模拟服务器"""
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="none", help='首包延迟，如 "fixed:0.5"、"lognormal:-1.0,0.4"')
+    parser.add_argument("--tps", type=float, default=0.0, help="输出吞吐（tokens/秒），0为不限速")
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--tool-script", help="工具调用脚本JSON文件")
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--prefix-cache-block", type=int, default=64, help="前缀缓存命中粒度（token），0为不模拟")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    tool_script = []
+    if args.tool_script:
+        with open(args.tool_script, "r", encoding="utf-8") as f:
+            tool_script = json.load(f)
+
+    config = MockLLMConfig(
+        latency=LatencyModel.parse(args.latency, seed=args.seed),
+        tokens_per_second=args.tps,
+        completion_tokens=args.completion_tokens,
+        tool_script=tool_script,
+        rate_limit_probability=args.rate_limit_probability,
+        rate_limit_every=args.rate_limit_every,
+        seed=args.seed,
+        prefix_cache_block=args.prefix_cache_block,
+    )
+    server = MockLLMServer(config, host=args.host, port=args.port)
+    print(f"🧪 模拟LLM服务器已启动: {server.base_url}")
+    print(f"💡 使用方式: LLM_BASE_URL={server.base_url} python apps/playground.py")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 模拟服务器已停止")
+
+
+if __name__ == "__main__":
+    main()
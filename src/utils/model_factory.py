@@ -0,0 +1,59 @@
+"""
+模型工厂
+统一创建 OpenAI 兼容模型，base_url 和 API Key 可通过配置或环境变量指定，
+便于切换到本地模拟服务器做压测
+"""
+
+import os
+from typing import Dict, Any, Optional
+
+import yaml
+from agno.models.openai.like import OpenAILike
+
+# 默认使用阿里云百炼的 OpenAI 兼容接口
+DEFAULT_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+DEFAULT_API_KEY_ENV = "ALIYUN_API_KEY"
+
+
+def load_model_config() -> Dict[str, Any]:
+    """读取默认配置文件中的 model_config，读取失败时返回空配置"""
+    config_file = os.path.join(os.path.dirname(__file__), "..", "config", "investment_agents_config.yaml")
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f).get("model_config", {})
+    except Exception:
+        return {}
+
+
+def resolve_base_url(model_config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    解析模型服务地址
+
+    优先级：环境变量 LLM_BASE_URL > model_config.base_url > 百炼默认地址
+    """
+    model_config = model_config if model_config is not None else load_model_config()
+    return os.getenv("LLM_BASE_URL") or model_config.get("base_url") or DEFAULT_BASE_URL
+
+
+def resolve_api_key(model_config: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """从 model_config.api_key_env 指定的环境变量读取 API Key（默认 ALIYUN_API_KEY）"""
+    model_config = model_config if model_config is not None else load_model_config()
+    return os.getenv("LLM_API_KEY") or os.getenv(model_config.get("api_key_env", DEFAULT_API_KEY_ENV))
+
+
+def create_model(model_id: str, config: Optional[Dict[str, Any]] = None, **kwargs) -> OpenAILike:
+    """
+    创建 OpenAI 兼容模型
+
+    Args:
+        model_id: 模型ID
+        config: 完整的投资大师配置（读取其中的 model_config），None 时读取默认配置文件
+        **kwargs: 透传给 OpenAILike 的其他参数
+
+    Returns:
+        OpenAILike 模型实例
+    """
+    model_config = config.get("model_config", {}) if config is not None else load_model_config()
+    kwargs.setdefault("base_url", resolve_base_url(model_config))
+    kwargs.setdefault("api_key", resolve_api_key(model_config))
+    return OpenAILike(id=model_id, **kwargs)
@@ -0,0 +1,261 @@
+"""
+分级模型路由
+按任务（摘要压缩、大师分析、综合报告、团队协调、大师选择）选择模型，
+主模型近期延迟逼近SLO时自动切换到更快的备用模型，并按路由统计延迟、token用量和前缀缓存命中率
+"""
+
+import time
+import threading
+from collections import deque, defaultdict
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from agno.models.openai.like import OpenAILike
+
+from .model_factory import create_model, load_model_config
+from .prompt_cache import cached_prompt_tokens
+
+ROUTES = ("summarization", "master_analysis", "synthesis", "team_coordination", "selector")
+
+
+@dataclass
+class RouteConfig:
+    """单个路由的配置"""
+    model: str
+    fallback: Optional[str] = None
+    latency_slo_seconds: Optional[float] = None
+
+
+class ModelRouter:
+    """
+    模型路由器
+
+    每次模型调用前根据主模型最近 window 次调用的P90延迟决定用哪个模型：
+    P90超过 latency_slo_seconds × risk_ratio 时改用 fallback，
+    期间每 probe_every 次调用仍发一次给主模型，以便主模型恢复后切回。
+    出错的调用不计入延迟窗口；试探调用在阈值内返回时清空窗口，立即切回主模型
+    """
+
+    def __init__(self, model_config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            model_config: 配置文件中的 model_config 段
+        """
+        model_config = model_config if model_config is not None else load_model_config()
+        self.model_config = model_config
+        routing = model_config.get("routing", {})
+        self.risk_ratio = float(routing.get("risk_ratio", 0.8))
+        self.min_samples = int(routing.get("min_samples", 3))
+        self.window = int(routing.get("window", 20))
+        self.probe_every = int(routing.get("probe_every", 10))
+
+        default_model = model_config.get("default_model", "qwen-plus")
+        defaults = {route: default_model for route in ROUTES}
+        defaults["team_coordination"] = model_config.get("team_coordinator_model", default_model)
+
+        self.routes: Dict[str, RouteConfig] = {}
+        for route in ROUTES:
+            settings = (model_config.get("routes") or {}).get(route) or {}
+            self.routes[route] = RouteConfig(
+                model=settings.get("model", defaults[route]),
+                fallback=settings.get("fallback"),
+                latency_slo_seconds=settings.get("latency_slo_seconds"),
+            )
+
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self._diverted: Dict[str, int] = defaultdict(int)
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def route_config(self, route: str) -> RouteConfig:
+        if route not in self.routes:
+            raise ValueError(f"未知的模型路由: {route}（可选: {', '.join(ROUTES)}）")
+        return self.routes[route]
+
+    def at_risk(self, route: str, primary: Optional[str] = None) -> bool:
+        """主模型近期P90延迟是否逼近SLO"""
+        config = self.route_config(route)
+        primary = primary or config.model
+        if not config.fallback or not config.latency_slo_seconds:
+            return False
+        with self._lock:
+            samples = list(self._latencies[(route, primary)])
+        return self._over_slo(samples, config.latency_slo_seconds)
+
+    def _over_slo(self, samples, slo: float) -> bool:
+        if len(samples) < self.min_samples:
+            return False
+        return float(np.percentile(samples, 90)) > slo * self.risk_ratio
+
+    def choose(self, route: str, primary: Optional[str] = None) -> str:
+        """为一次调用选择模型"""
+        config = self.route_config(route)
+        primary = primary or config.model
+        if not self.at_risk(route, primary):
+            return primary
+        with self._lock:
+            self._diverted[route] += 1
+            probe = self._diverted[route] % self.probe_every == 0
+        return primary if probe else config.fallback
+
+    def record(self, route: str, model_id: str, latency: float, input_tokens: int = 0,
+               output_tokens: int = 0, cached_tokens: int = 0,
+               fallback: bool = False, error: bool = False) -> None:
+        """记录一次调用"""
+        slo = self.routes[route].latency_slo_seconds if route in self.routes else None
+        with self._lock:
+            if not error:
+                window = self._latencies[(route, model_id)]
+                if slo and latency <= slo * self.risk_ratio and self._over_slo(window, slo):
+                    # 降级期间的试探调用已足够快，旧样本不再代表主模型现状
+                    window.clear()
+                window.append(latency)
+            stats = self._stats.setdefault((route, model_id), {
+                "calls": 0, "fallback_calls": 0, "errors": 0,
+                "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "latencies": []
+            })
+            stats["calls"] += 1
+            stats["fallback_calls"] += int(fallback)
+            stats["errors"] += int(error)
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cached_tokens"] += cached_tokens
+            stats["latencies"].append(latency)
+
+    def create_model(self, route: str, model_id: Optional[str] = None,
+                     config: Optional[Dict[str, Any]] = None, **kwargs) -> OpenAILike:
+        """
+        创建带路由的模型：每次调用前选择主模型或备用模型，调用后记录延迟和token
+
+        Args:
+            route: 路由名称，见 ROUTES
+            model_id: 指定主模型，默认使用路由配置
+            config: 完整配置，透传给 model_factory.create_model
+            **kwargs: 透传给 OpenAILike 的其他参数
+        """
+        primary = model_id or self.route_config(route).model
+        model = create_model(primary, config if config is not None else {"model_config": self.model_config}, **kwargs)
+        self._instrument(model, route, primary)
+        return model
+
+    def _instrument(self, model: OpenAILike, route: str, primary: str) -> None:
+        """替换模型实例的 invoke 系列方法，在调用前后完成路由和统计"""
+        router = self
+        invoke, invoke_stream = model.invoke, model.invoke_stream
+        ainvoke, ainvoke_stream = model.ainvoke, model.ainvoke_stream
+
+        def usage_of(response) -> Tuple[int, int, int]:
+            usage = getattr(response, "usage", None)
+            if usage is None:
+                return 0, 0, 0
+            return (getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0,
+                    cached_prompt_tokens(usage))
+
+        def begin() -> str:
+            model.id = router.choose(route, primary)
+            return model.id
+
+        def finish(chosen: str, start: float, usage: Tuple[int, int, int], error: bool) -> None:
+            router.record(route, chosen, time.perf_counter() - start, *usage,
+                          fallback=chosen != primary, error=error)
+
+        def routed_invoke(*args, **kwargs):
+            chosen, start, usage, error = begin(), time.perf_counter(), (0, 0, 0), True
+            try:
+                response = invoke(*args, **kwargs)
+                usage, error = usage_of(response), False
+                return response
+            finally:
+                finish(chosen, start, usage, error)
+
+        def routed_invoke_stream(*args, **kwargs):
+            chosen, start, usage, error = begin(), time.perf_counter(), (0, 0, 0), True
+            try:
+                for chunk in invoke_stream(*args, **kwargs):
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = usage_of(chunk)
+                    yield chunk
+                error = False
+            finally:
+                finish(chosen, start, usage, error)
+
+        async def routed_ainvoke(*args, **kwargs):
+            chosen, start, usage, error = begin(), time.perf_counter(), (0, 0, 0), True
+            try:
+                response = await ainvoke(*args, **kwargs)
+                usage, error = usage_of(response), False
+                return response
+            finally:
+                finish(chosen, start, usage, error)
+
+        async def routed_ainvoke_stream(*args, **kwargs):
+            chosen, start, usage, error = begin(), time.perf_counter(), (0, 0, 0), True
+            try:
+                async for chunk in ainvoke_stream(*args, **kwargs):
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = usage_of(chunk)
+                    yield chunk
+                error = False
+            finally:
+                finish(chosen, start, usage, error)
+
+        model.invoke = routed_invoke
+        model.invoke_stream = routed_invoke_stream
+        model.ainvoke = routed_ainvoke
+        model.ainvoke_stream = routed_ainvoke_stream
+
+    def report(self) -> List[Dict[str, Any]]:
+        """按路由和模型汇总的调用统计"""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: (ROUTES.index(item[0][0]), item[0][1]))
+            return [{
+                "route": route,
+                "model": model_id,
+                "calls": stats["calls"],
+                "fallback_calls": stats["fallback_calls"],
+                "errors": stats["errors"],
+                "p50_seconds": float(np.percentile(stats["latencies"], 50)),
+                "p90_seconds": float(np.percentile(stats["latencies"], 90)),
+                "input_tokens": stats["input_tokens"],
+                "output_tokens": stats["output_tokens"],
+                "cached_tokens": stats["cached_tokens"],
+                "cache_ratio": stats["cached_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0,
+            } for (route, model_id), stats in items]
+
+    def format_report(self) -> str:
+        """Markdown格式的路由统计表"""
+        rows = self.report()
+        if not rows:
+            return ""
+        lines = ["| 路由 | 模型 | 调用 | 降级 | P50(秒) | P90(秒) | 输入token | 输出token | 前缀缓存 |",
+                 "|------|------|------|------|---------|---------|-----------|-----------|----------|"]
+        for row in rows:
+            lines.append(f"| {row['route']} | {row['model']} | {row['calls']} | {row['fallback_calls']} | "
+                         f"{row['p50_seconds']:.1f} | {row['p90_seconds']:.1f} | "
+                         f"{row['input_tokens']} | {row['output_tokens']} | {row['cache_ratio']:.0%} |")
+        return "\n".join(lines)
+
+    def reset_stats(self) -> None:
+        """清空统计（保留延迟窗口，路由判断不受影响）"""
+        with self._lock:
+            self._stats.clear()
+
+
+_shared_router: Optional[ModelRouter] = None
+_shared_router_lock = threading.Lock()
+
+
+def get_model_router(config: Optional[Dict[str, Any]] = None) -> ModelRouter:
+    """获取进程内共享的模型路由器（按 model_config 创建，config 为None时读取默认配置文件）"""
+    global _shared_router
+    with _shared_router_lock:
+        if _shared_router is None:
+            _shared_router = ModelRouter(config.get("model_config", {}) if config is not None else None)
+        return _shared_router
+
+
+def create_routed_model(route: str, config: Optional[Dict[str, Any]] = None,
+                        model_id: Optional[str] = None, **kwargs) -> OpenAILike:
+    """按路由创建模型（使用共享路由器，统计在整个进程内累计）"""
+    return get_model_router(config).create_model(route, model_id, config, **kwargs)
@@ -0,0 +1,65 @@
+"""
+提示词前缀稳定化
+把长而固定的部分（指令、投资哲学、分析框架、输出模板）放在最前面形成字节稳定的前缀，
+股票代码、因子表、新闻、时间等易变内容统一放在最后，让模型服务端的前缀（KV）缓存能够命中
+"""
+
+import datetime
+from typing import List, Any, Optional, Callable, Sequence
+
+# 固定前缀与易变内容之间的分隔，前缀部分不得包含任何随请求变化的内容
+VOLATILE_SECTION_HEADER = "---\n**本次任务数据：**"
+
+
+def assemble_prompt(static: str, volatile: List[Optional[str]]) -> str:
+    """
+    拼接提示词：固定部分在前，易变部分在后
+
+    Args:
+        static: 不随股票、时间和运行变化的内容
+        volatile: 易变内容片段，空片段会被跳过
+
+    Returns:
+        完整提示词
+    """
+    parts = [part.strip() for part in volatile if part and part.strip()]
+    return f"{static.strip()}\n\n{VOLATILE_SECTION_HEADER}\n\n" + "\n\n".join(parts)
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    """两段文本的公共前缀长度（字符）"""
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """
+    从 usage 中读取命中前缀缓存的token数
+
+    兼容 OpenAI 风格的 prompt_tokens_details.cached_tokens（对象或字典），没有该字段时返回0
+    """
+    if usage is None:
+        return 0
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        return 0
+    cached = details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)
+    return int(cached or 0)
+
+
+def dated_instructions(instructions: Sequence[str]) -> Callable[[], List[str]]:
+    """
+    在指令末尾附加当前日期（按天变化），替代 add_datetime_to_instructions
+
+    agno 的 add_datetime_to_instructions 精确到秒，系统提示每次请求都不同；
+    返回的可调用对象在每次运行时求值，日期只在跨天时变化，且位于全部固定指令之后
+    """
+    static = list(instructions)
+
+    def build() -> List[str]:
+        return static + [f"当前日期：{datetime.date.today().isoformat()}"]
+
+    return build
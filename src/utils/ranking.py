@@ -0,0 +1,190 @@
+"""
+跨股票排名引擎
+从各位大师的分析和综合报告中提取结构化评分（评分、建议、信心度、目标价、风险等级；
+结构化输出模式下直接读取字段），
+按可配置权重跨大师汇总，无需额外LLM调用即可对上百只股票排序
+"""
+
+import re
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from .token_manager import TokenManager
+from .analysis_schema import structured_signals
+
+
+RECOMMENDATION_SCORES = {"买入": 1.0, "持有": 0.5, "卖出": 0.0}
+LEVEL_SCORES = {"高": 1.0, "中": 0.5, "低": 0.0}
+
+# 信心度不单独计分，而是缩放建议偏离中性（持有）的幅度
+DEFAULT_WEIGHTS = {"rating": 0.4, "recommendation": 0.45, "risk": 0.15}
+COMPONENTS = ["rating", "recommendation", "conviction", "risk"]
+
+_RATING_RE = re.compile(r"(?:综合评分|评分|打分|rating|score)[^0-9\n]{0,12}(\d+(?:\.\d+)?)\s*(?:/\s*10|分)", re.IGNORECASE)
+_BARE_RATING_RE = re.compile(r"(\d+(?:\.\d+)?)\s*/\s*10\b")
+_CONVICTION_RE = re.compile(r"(?:信心度|信心|置信度|conviction)[^\n高中低0-9]{0,8}(?:(高|中等?|低)|(\d{1,3})\s*%)", re.IGNORECASE)
+_RISK_RE = re.compile(r"(?:风险等级|风险水平|风险)[^\n高中低]{0,8}(高|中等?|低)")
+_TARGET_RE = re.compile(r"目标(?:价格?|价位)[^\n0-9$¥]{0,8}[$¥]?\s*(\d+(?:,\d{3})*(?:\.\d+)?)")
+
+
+def _level(value: str) -> float:
+    return LEVEL_SCORES[value[0]]
+
+
+def extract_signals(text: str, token_manager: Optional[TokenManager] = None) -> Dict[str, float]:
+    """
+    从一段分析文本中提取结构化信号
+
+    Returns:
+        rating(0-10)、recommendation(0/0.5/1)、conviction(0-1)、risk(0-1，越高风险越大)、
+        target_price；提取不到的字段为NaN
+    """
+    token_manager = token_manager or TokenManager()
+    signals = {"rating": np.nan, "recommendation": np.nan, "conviction": np.nan,
+               "risk": np.nan, "target_price": np.nan}
+    if not text:
+        return signals
+
+    match = _RATING_RE.search(text) or _BARE_RATING_RE.search(text)
+    if match:
+        rating = float(match.group(1))
+        if 0 <= rating <= 10:
+            signals["rating"] = rating
+
+    recommendation = token_manager._extract_recommendation(text)
+    if recommendation in RECOMMENDATION_SCORES:
+        signals["recommendation"] = RECOMMENDATION_SCORES[recommendation]
+
+    match = _CONVICTION_RE.search(text)
+    if match:
+        signals["conviction"] = _level(match.group(1)) if match.group(1) else min(int(match.group(2)), 100) / 100
+
+    match = _RISK_RE.search(text)
+    if match:
+        signals["risk"] = _level(match.group(1))
+
+    match = _TARGET_RE.search(text)
+    if match:
+        signals["target_price"] = float(match.group(1).replace(",", ""))
+
+    return signals
+
+
+class RankingEngine:
+    """
+    排名引擎
+
+    每个来源（大师分析或综合报告）先按组件权重算出0-10分，缺失组件的权重按比例重新分配；
+    再按来源权重（大师权重、综合报告权重）求股票的加权平均分
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            config: 投资大师YAML配置，读取其中的 ranking 段
+        """
+        config = config or {}
+        ranking_config = config.get("ranking", {})
+        self.weights = {**DEFAULT_WEIGHTS, **ranking_config.get("weights", {})}
+        self.synthesis_weight = float(ranking_config.get("synthesis_weight", 1.0))
+
+        # 配置里按大师键名设置权重，分析结果里是 agent_name，这里统一成 agent_name
+        masters = config.get("investment_masters", {})
+        self.master_weights = {
+            masters.get(key, {}).get("agent_name", key): float(weight)
+            for key, weight in ranking_config.get("master_weights", {}).items()
+        }
+        self.token_manager = TokenManager()
+
+    def collect_signals(self, all_results: Dict[str, Any]) -> pd.DataFrame:
+        """把每只股票的大师分析和综合报告展开为一行一个来源的信号表"""
+        rows = []
+        for symbol, result in all_results.items():
+            for analysis in result.get("individual_analyses", []):
+                if analysis.get("style") == "错误":
+                    continue
+                agent = analysis.get("agent", "")
+                structured = analysis.get("structured")
+                signals = (structured_signals(structured) if structured
+                           else extract_signals(analysis.get("analysis", ""), self.token_manager))
+                rows.append({"symbol": symbol, "source": agent,
+                             "weight": self.master_weights.get(agent, 1.0), **signals})
+            synthesis = result.get("synthesis")
+            if isinstance(synthesis, str) and synthesis:
+                rows.append({"symbol": symbol, "source": "综合报告", "weight": self.synthesis_weight,
+                             **extract_signals(synthesis, self.token_manager)})
+        return pd.DataFrame(rows, columns=["symbol", "source", "weight", *COMPONENTS, "target_price"])
+
+    def score_sources(self, signals: pd.DataFrame) -> np.ndarray:
+        """向量化计算每个来源的0-10分，没有任何信号的来源为NaN"""
+        # 高信心的卖出比低信心的卖出更接近0分，缺失信心度时按建议原值计
+        conviction = np.nan_to_num(signals["conviction"].to_numpy(dtype=float), nan=1.0)
+        recommendation = 0.5 + (signals["recommendation"].to_numpy(dtype=float) - 0.5) * conviction
+        normalized = np.column_stack([
+            signals["rating"].to_numpy(dtype=float) / 10,
+            recommendation,
+            1 - signals["risk"].to_numpy(dtype=float),
+        ]) if len(signals) else np.empty((0, len(DEFAULT_WEIGHTS)))
+        weights = np.array([self.weights[c] for c in DEFAULT_WEIGHTS], dtype=float)
+
+        present = ~np.isnan(normalized)
+        weight_sum = (present * weights).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = np.where(present, normalized, 0.0) @ weights / weight_sum * 10
+        return np.where(weight_sum > 0, scores, np.nan)
+
+    def rank(self, all_results: Dict[str, Any]) -> pd.DataFrame:
+        """
+        对全部股票排序
+
+        Returns:
+            以股票代码为索引、按 score 降序排列的表，包含 score、各信号均值、
+            买入/持有/卖出计数和目标价中位数；没有可用信号的股票排在最后
+        """
+        signals = self.collect_signals(all_results)
+        signals["source_score"] = self.score_sources(signals)
+        valid = signals["source_score"].notna()
+        signals["weighted"] = np.where(valid, signals["source_score"] * signals["weight"], 0.0)
+        signals["valid_weight"] = np.where(valid, signals["weight"], 0.0)
+
+        is_master = signals["source"] != "综合报告"
+        rec = signals["recommendation"].where(is_master)
+        signals["buy"] = (rec == 1.0).astype(int)
+        signals["hold"] = (rec == 0.5).astype(int)
+        signals["sell"] = (rec == 0.0).astype(int)
+
+        grouped = signals.groupby("symbol", sort=False)
+        table = pd.DataFrame({
+            "weighted": grouped["weighted"].sum(),
+            "valid_weight": grouped["valid_weight"].sum(),
+            "rating": grouped["rating"].mean(),
+            "conviction": grouped["conviction"].mean(),
+            "risk": grouped["risk"].mean(),
+            "target_price": grouped["target_price"].median(),
+            "buy": grouped["buy"].sum(),
+            "hold": grouped["hold"].sum(),
+            "sell": grouped["sell"].sum(),
+        })
+        table = table.reindex(list(all_results.keys()))
+        counts = ["buy", "hold", "sell"]
+        table[counts] = table[counts].fillna(0).astype(int)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            table["score"] = np.where(table["valid_weight"] > 0, table["weighted"] / table["valid_weight"], np.nan)
+
+        table = table.drop(columns=["weighted", "valid_weight"])
+        return table.sort_values("score", ascending=False, na_position="last", kind="mergesort")
+
+    def format_ranking_rows(self, ranking: pd.DataFrame) -> str:
+        """生成Markdown排名表格行：| 排名 | 股票 | 推荐度 | 备注 |"""
+        rows = []
+        for i, (symbol, row) in enumerate(ranking.iterrows(), 1):
+            score = "待评估" if pd.isna(row["score"]) else f"{row['score']:.1f}/10"
+            notes = [f"买入{int(row['buy'])}/持有{int(row['hold'])}/卖出{int(row['sell'])}"]
+            if not pd.isna(row["target_price"]):
+                notes.append(f"目标价${row['target_price']:.2f}")
+            if not pd.isna(row["risk"]):
+                notes.append(f"风险{'低' if row['risk'] < 0.34 else '中' if row['risk'] < 0.67 else '高'}")
+            rows.append(f"| {i} | {symbol} | {score} | {' · '.join(notes)} |")
+        return "\n".join(rows)
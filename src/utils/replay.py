@@ -0,0 +1,274 @@
+"""
+工具调用录制/回放
+把 YFinance、DuckDuckGo 等工具的真实响应录制到压缩磁带（gzip JSON），
+离线时按参数回放并注入可配置的合成延迟，使多大师分析在基准测试和CI中可重复
+"""
+
+import os
+import json
+import gzip
+import time
+import random
+import hashlib
+import functools
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+MODES = ("off", "record", "replay")
+
+# 默认只录制外部数据源工具，推理工具等本地工具不受影响
+DEFAULT_TOOLKITS = ["yfinance_tools", "duckduckgo"]
+
+
+class CassetteMissError(KeyError):
+    """回放模式下磁带中没有对应的录制"""
+
+
+def _make_key(tool: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+    """根据工具名和参数生成稳定的录制键"""
+    payload = json.dumps({"tool": tool, "args": list(args), "kwargs": kwargs},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ToolCassette:
+    """
+    压缩的工具响应磁带
+    每条录制包含工具名、参数、响应和录制时的真实耗时
+
+    文件为 gzip 压缩的JSON行，录制时每条追加一个 gzip 成员，不重写整个文件；
+    save() 把全部录制压实为一个成员。旧版整文件JSON格式照常读取
+    """
+
+    VERSION = 2
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self.load()
+
+    def load(self) -> None:
+        """从磁盘读取磁带"""
+        entries: Dict[str, Dict[str, Any]] = {}
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "entries" in record:  # 版本1：整文件一个JSON对象
+                    entries.update(record["entries"])
+                else:
+                    entries[record.pop("key")] = record
+        self.entries = entries
+
+    @staticmethod
+    def _line(key: str, entry: Dict[str, Any]) -> str:
+        return json.dumps({"key": key, **entry}, ensure_ascii=False) + "\n"
+
+    def save(self) -> None:
+        """把全部录制压实后原子地写回磁盘"""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.writelines(self._line(key, entry) for key, entry in self.entries.items())
+            os.replace(tmp_path, self.path)
+
+    def append(self, key: str, entry: Dict[str, Any]) -> None:
+        """记录一条录制并追加到磁盘（同一键后写入的覆盖先写入的）"""
+        with self._lock:
+            self.entries[key] = entry
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(self._line(key, entry))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries[key] = entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+@dataclass
+class LatencyModel:
+    """
+    回放时的合成延迟
+
+    kind:
+        none      - 不等待
+        recorded  - 使用录制时的真实耗时
+        fixed     - 固定 value 秒
+        uniform   - [low, high] 均匀分布
+        lognormal - 对数正态分布（mu, sigma），更接近网络长尾
+    """
+    kind: str = "recorded"
+    value: float = 0.0
+    low: float = 0.0
+    high: float = 0.0
+    mu: float = -1.5
+    sigma: float = 0.5
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: Optional[str], seed: Optional[int] = None) -> "LatencyModel":
+        """
+        从字符串解析延迟模型，如 "fixed:0.2"、"uniform:0.1,0.5"、"lognormal:-1.5,0.5"
+        """
+        if not spec:
+            return cls(seed=seed)
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v.strip()]
+        kind = kind.strip().lower()
+        if kind == "fixed":
+            return cls(kind=kind, value=values[0] if values else 0.0, seed=seed)
+        if kind == "uniform":
+            return cls(kind=kind, low=values[0], high=values[1], seed=seed)
+        if kind == "lognormal":
+            return cls(kind=kind, mu=values[0], sigma=values[1], seed=seed)
+        if kind in ("none", "recorded"):
+            return cls(kind=kind, seed=seed)
+        raise ValueError(f"未知的延迟模型: {spec}")
+
+    def sample(self, recorded: float = 0.0) -> float:
+        """采样一次延迟（秒）"""
+        with self._lock:
+            if self.kind == "recorded":
+                return recorded
+            if self.kind == "fixed":
+                return self.value
+            if self.kind == "uniform":
+                return self._rng.uniform(self.low, self.high)
+            if self.kind == "lognormal":
+                return self._rng.lognormvariate(self.mu, self.sigma)
+            return 0.0
+
+
+class ToolReplayer:
+    """
+    工具录制/回放器
+    通过替换 Toolkit 中函数的 entrypoint 实现，对Agent透明
+    """
+
+    def __init__(self, cassette: ToolCassette, mode: str = "replay",
+                 latency: Optional[LatencyModel] = None,
+                 toolkits: Optional[List[str]] = None):
+        """
+        Args:
+            cassette: 响应磁带
+            mode: off / record / replay
+            latency: 回放延迟模型
+            toolkits: 需要录制/回放的工具集名称
+        """
+        if mode not in MODES:
+            raise ValueError(f"未知的回放模式: {mode}. 可用选项: {list(MODES)}")
+        self.cassette = cassette
+        self.mode = mode
+        self.latency = latency or LatencyModel()
+        self.toolkits = toolkits if toolkits is not None else list(DEFAULT_TOOLKITS)
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+    def wrap_callable(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        """包装单个可调用对象"""
+        if self.mode == "off":
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(name, args, kwargs)
+
+            if self.mode == "replay":
+                entry = self.cassette.get(key)
+                if entry is None:
+                    self.stats["misses"] += 1
+                    raise CassetteMissError(f"磁带中没有录制: {name}{args or ''}{kwargs or ''}")
+                delay = self.latency.sample(entry.get("latency", 0.0))
+                if delay > 0:
+                    time.sleep(delay)
+                self.stats["replayed"] += 1
+                return entry["response"]
+
+            start = time.perf_counter()
+            response = func(*args, **kwargs)
+            self.cassette.append(key, {
+                "tool": name,
+                "args": list(args),
+                "kwargs": kwargs,
+                "response": response,
+                "latency": round(time.perf_counter() - start, 4),
+            })
+            self.stats["recorded"] += 1
+            return response
+
+        return wrapper
+
+    def wrap_toolkit(self, toolkit: Any) -> Any:
+        """包装工具集中的全部函数（只处理 toolkits 中列出的工具集）"""
+        if self.mode == "off" or getattr(toolkit, "name", None) not in self.toolkits:
+            return toolkit
+        for name, function in toolkit.functions.items():
+            if function.entrypoint is not None:
+                function.entrypoint = self.wrap_callable(f"{toolkit.name}.{name}", function.entrypoint)
+        return toolkit
+
+    def wrap_tools(self, tools: List[Any]) -> List[Any]:
+        """包装Agent的工具列表"""
+        return [self.wrap_toolkit(tool) for tool in tools]
+
+
+_replayers: Dict[str, ToolReplayer] = {}
+_replayers_lock = threading.Lock()
+
+
+def get_tool_replayer(config: Optional[Dict[str, Any]] = None) -> Optional[ToolReplayer]:
+    """
+    根据 tool_replay 配置和环境变量获取回放器（同一磁带共享一个实例）
+
+    环境变量优先于配置：
+        AGNO_TOOL_REPLAY   off / record / replay
+        AGNO_TOOL_CASSETTE 磁带路径
+        AGNO_TOOL_LATENCY  延迟模型，如 "lognormal:-1.5,0.5"
+    """
+    replay_config = (config or {}).get("tool_replay", {})
+    mode = os.getenv("AGNO_TOOL_REPLAY", replay_config.get("mode", "off")).lower()
+    if mode == "off":
+        return None
+
+    path = os.getenv("AGNO_TOOL_CASSETTE", replay_config.get("cassette", "data/cassettes/tools.json.gz"))
+    if not os.path.isabs(path):
+        project_root = os.path.join(os.path.dirname(__file__), "..", "..")
+        path = os.path.abspath(os.path.join(project_root, path))
+
+    latency = LatencyModel.parse(
+        os.getenv("AGNO_TOOL_LATENCY", replay_config.get("latency")),
+        seed=replay_config.get("seed")
+    )
+
+    with _replayers_lock:
+        replayer = _replayers.get(path)
+        if replayer is None or replayer.mode != mode:
+            replayer = ToolReplayer(ToolCassette(path), mode=mode, latency=latency,
+                                    toolkits=replay_config.get("toolkits"))
+            _replayers[path] = replayer
+            print(f"📼 工具{'录制' if mode == 'record' else '回放'}模式: {path}")
+        return replayer
+
+
+def apply_tool_replay(tools: List[Any], config: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """按配置为工具列表启用录制/回放，未启用时原样返回"""
+    replayer = get_tool_replayer(config)
+    return replayer.wrap_tools(tools) if replayer else tools
@@ -0,0 +1,260 @@
+"""
+股票池筛选器
+根据投资大师的 analysis_framework 生成量化筛选规则，
+在本地因子表上对成千上万只股票做向量化筛选和排名，只把Top-K候选交给LLM分析
+"""
+
+import operator
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .fundamentals import FundamentalsFactorEngine, add_magic_formula_rank
+
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+}
+
+
+@dataclass(frozen=True)
+class ScreeningRule:
+    """单条筛选规则"""
+    factor: str
+    op: str
+    value: float
+    required: bool = False  # True为硬性过滤条件，False为加分项
+    weight: float = 1.0
+
+    def evaluate(self, table: pd.DataFrame) -> np.ndarray:
+        """对整张因子表求值，缺失数据视为不满足"""
+        if self.factor not in table.columns:
+            return np.zeros(len(table), dtype=bool)
+        values = pd.to_numeric(table[self.factor], errors="coerce").to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            passed = OPERATORS[self.op](values, self.value)
+        return passed & ~np.isnan(values)
+
+    def describe(self) -> str:
+        return f"{self.factor} {self.op} {self.value}"
+
+
+@dataclass
+class ScreeningRuleSet:
+    """投资大师的筛选规则集"""
+    master: str
+    rules: List[ScreeningRule] = field(default_factory=list)
+    rank_by: List[Tuple[str, bool]] = field(default_factory=list)  # (因子, 是否升序)
+    sources: List[str] = field(default_factory=list)  # 规则来源的框架条目
+
+
+# analysis_framework 条目 -> 量化规则
+FRAMEWORK_RULES: Dict[str, List[ScreeningRule]] = {
+    "financial_quality": [
+        ScreeningRule("roe", ">", 0.15),
+        ScreeningRule("debt_to_equity", "<", 0.5),
+    ],
+    "safety_margin": [
+        ScreeningRule("graham_margin", ">", 0.0),
+    ],
+    "quantitative_screening": [
+        ScreeningRule("pe", ">", 0.0, required=True),
+        ScreeningRule("pe", "<", 15.0),
+        ScreeningRule("pb", "<", 1.5),
+        ScreeningRule("pe_x_pb", "<", 22.5),
+        ScreeningRule("current_ratio", ">=", 2.0),
+        ScreeningRule("debt_to_equity", "<", 1.0),
+    ],
+    "intrinsic_value": [
+        ScreeningRule("ncav_per_share", ">", 0.0),
+    ],
+    "defensive_investing": [
+        ScreeningRule("graham_defensive_score", ">=", 3),
+    ],
+    "peg_valuation": [
+        ScreeningRule("peg", ">", 0.0, required=True),
+        ScreeningRule("peg", "<", 1.0, weight=2.0),
+    ],
+    "magic_formula_metrics": [
+        ScreeningRule("roic", ">", 0.0, required=True),
+        ScreeningRule("earnings_yield", ">", 0.0, required=True),
+    ],
+    "capital_efficiency": [
+        ScreeningRule("roic", ">", 0.15),
+    ],
+    "earnings_quality": [
+        ScreeningRule("earnings_yield", ">", 0.05),
+    ],
+    "business_quality": [
+        ScreeningRule("roe", ">", 0.15),
+        ScreeningRule("roic", ">", 0.12),
+    ],
+    "distress_analysis": [
+        ScreeningRule("pb", "<", 1.0),
+        ScreeningRule("debt_to_equity", ">", 1.0),
+    ],
+}
+
+# analysis_framework 条目 -> 排序依据
+FRAMEWORK_RANKING: Dict[str, List[Tuple[str, bool]]] = {
+    "magic_formula_metrics": [("magic_formula_rank", True)],
+    "peg_valuation": [("peg", True)],
+    "quantitative_screening": [("graham_defensive_score", False), ("pe_x_pb", True)],
+    "financial_quality": [("roe", False)],
+    "distress_analysis": [("pb", True)],
+}
+
+DEFAULT_RANKING: List[Tuple[str, bool]] = [("roe", False)]
+
+
+def build_rule_set(master_name: str, master_config: Dict[str, Any]) -> ScreeningRuleSet:
+    """
+    从大师配置生成筛选规则集
+
+    优先使用配置中的 screening_rules，否则根据 analysis_framework 条目推导
+    """
+    rule_set = ScreeningRuleSet(master=master_name)
+
+    for key in master_config.get("analysis_framework", {}):
+        if key in FRAMEWORK_RULES:
+            rule_set.rules.extend(FRAMEWORK_RULES[key])
+            rule_set.sources.append(key)
+        rule_set.rank_by.extend(FRAMEWORK_RANKING.get(key, []))
+
+    custom_rules = master_config.get("screening_rules")
+    if custom_rules:
+        rule_set.rules = [
+            ScreeningRule(
+                factor=rule["factor"],
+                op=rule["op"],
+                value=float(rule["value"]),
+                required=rule.get("required", False),
+                weight=float(rule.get("weight", 1.0)),
+            )
+            for rule in custom_rules
+        ]
+        rule_set.sources = ["screening_rules"]
+
+    if not rule_set.rank_by:
+        rule_set.rank_by = list(DEFAULT_RANKING)
+
+    return rule_set
+
+
+def build_rule_sets(config: Dict[str, Any]) -> Dict[str, ScreeningRuleSet]:
+    """为配置中的全部投资大师生成筛选规则集"""
+    return {
+        name: build_rule_set(name, master_config)
+        for name, master_config in config.get("investment_masters", {}).items()
+    }
+
+
+def load_universe(path: str) -> List[str]:
+    """
+    读取股票池文件
+
+    支持每行一个代码，或逗号分隔；以#开头的行为注释
+    """
+    symbols = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                symbols.extend(s.strip().upper() for s in line.split(",") if s.strip())
+    return list(dict.fromkeys(symbols))
+
+
+class UniverseScreener:
+    """
+    股票池筛选器
+    在LLM分析之前，用大师的量化规则对整个股票池打分排序
+    """
+
+    def __init__(self, config: Dict[str, Any],
+                 factor_engine: Optional[FundamentalsFactorEngine] = None):
+        """
+        Args:
+            config: 投资大师YAML配置
+            factor_engine: 基本面因子引擎，负责批量获取并缓存因子表
+        """
+        self.config = config
+        self.factor_engine = factor_engine or FundamentalsFactorEngine()
+        self.rule_sets = build_rule_sets(config)
+
+    def get_rule_set(self, master_name: str) -> ScreeningRuleSet:
+        """获取投资大师的规则集"""
+        if master_name not in self.rule_sets:
+            raise ValueError(f"未知的投资大师: {master_name}. 可用选项: {list(self.rule_sets)}")
+        return self.rule_sets[master_name]
+
+    def screen_table(self, table: pd.DataFrame, master_name: str,
+                     top_k: Optional[int] = None) -> pd.DataFrame:
+        """
+        在已构建的因子表上筛选排名（纯内存向量化计算）
+
+        Args:
+            table: 因子表
+            master_name: 投资大师名称
+            top_k: 返回前K只股票，None表示全部通过的股票
+
+        Returns:
+            按得分排序的因子表，附加 screen_score 列
+        """
+        rule_set = self.get_rule_set(master_name)
+
+        mask = np.ones(len(table), dtype=bool)
+        score = np.zeros(len(table), dtype=float)
+        for rule in rule_set.rules:
+            passed = rule.evaluate(table)
+            if rule.required:
+                mask &= passed
+            else:
+                score += passed * rule.weight
+
+        result = table.loc[mask].copy()
+        result["screen_score"] = score[mask]
+
+        # 魔法公式排名需要在筛选后的股票池内重新计算
+        if any(factor == "magic_formula_rank" for factor, _ in rule_set.rank_by):
+            result = add_magic_formula_rank(result)
+
+        sort_columns = ["screen_score"]
+        ascending = [False]
+        for factor, asc in rule_set.rank_by:
+            if factor in result.columns and factor not in sort_columns:
+                result[factor] = pd.to_numeric(result[factor], errors="coerce")
+                sort_columns.append(factor)
+                ascending.append(asc)
+
+        result = result.sort_values(sort_columns, ascending=ascending, na_position="last", kind="mergesort")
+        return result.head(top_k) if top_k else result
+
+    def screen(self, symbols: List[str], master_name: str,
+               top_k: int = 5, refresh: bool = False) -> pd.DataFrame:
+        """
+        构建（或读取缓存的）因子表并筛选
+
+        Args:
+            symbols: 股票池
+            master_name: 投资大师名称
+            top_k: 返回前K只股票
+            refresh: 是否忽略缓存重新获取数据
+        """
+        table = self.factor_engine.build_table(symbols, refresh=refresh)
+        return self.screen_table(table, master_name, top_k)
+
+    def format_screen_result(self, result: pd.DataFrame, master_name: str) -> str:
+        """格式化筛选结果"""
+        rule_set = self.get_rule_set(master_name)
+        columns = list(dict.fromkeys(
+            [rule.factor for rule in rule_set.rules] + [factor for factor, _ in rule_set.rank_by]
+        ))
+        table = self.factor_engine.format_factor_table(result, columns)
+        sources = ", ".join(rule_set.sources) or "默认质量排序"
+        return f"🔎 筛选规则来源: {sources}\n\n{table}"
@@ -0,0 +1,341 @@
+"""
+新闻/搜索缓存层
+包装 DuckDuckGoTools：查询归一化、TTL缓存、single-flight合并并发请求、
+按URL/内容哈希去重，并为每只股票生成一次可在多位大师间共享的新闻摘要
+"""
+
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from agno.tools import Toolkit
+
+from .replay import ToolReplayer, get_tool_replayer
+
+
+# 归一化时忽略的填充词（不改变查询意图）；news、price、earnings、股价、新闻等意图词保留在缓存键中
+QUERY_STOPWORDS = {
+    "latest", "recent", "today", "inc", "corp", "the", "of", "for", "and", "about",
+    "最新", "的",
+}
+
+
+def normalize_query(query: str, aliases: Optional[Dict[str, str]] = None) -> str:
+    """
+    归一化搜索查询
+
+    小写、去标点、去通用词、公司名映射为代码、词序无关，
+    使 "AAPL news" 与 "aapl latest news" 命中同一缓存
+    """
+    tokens = re.findall(r"[\w一-鿿]+", query.lower())
+    aliases = aliases or {}
+    normalized = {aliases.get(t, t) for t in tokens if t not in QUERY_STOPWORDS}
+    if not normalized:
+        normalized = set(tokens)
+    return " ".join(sorted(normalized))
+
+
+def normalize_url(url: str) -> str:
+    """归一化URL：去掉协议差异、www前缀、跟踪参数、锚点和末尾斜杠"""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not k.lower().startswith("utm_")])
+    path = parts.path.rstrip("/")
+    return urlunsplit(("", host, path, query, ""))
+
+
+def content_hash(result: Dict[str, Any]) -> str:
+    """基于标题和正文开头计算内容哈希，用于识别转载的相同新闻"""
+    title = re.sub(r"\s+", " ", str(result.get("title", ""))).strip().lower()
+    body = re.sub(r"\s+", " ", str(result.get("body", ""))).strip().lower()[:200]
+    return hashlib.sha1(f"{title}|{body}".encode("utf-8")).hexdigest()
+
+
+def dedupe_results(results: List[Dict[str, Any]],
+                   seen_urls: Optional[set] = None,
+                   seen_hashes: Optional[set] = None) -> List[Dict[str, Any]]:
+    """按URL和内容哈希去重，可传入已见集合实现跨批次去重"""
+    seen_urls = seen_urls if seen_urls is not None else set()
+    seen_hashes = seen_hashes if seen_hashes is not None else set()
+
+    unique = []
+    for result in results:
+        url = normalize_url(result.get("href") or result.get("url") or "")
+        digest = content_hash(result)
+        if (url and url in seen_urls) or digest in seen_hashes:
+            continue
+        if url:
+            seen_urls.add(url)
+        seen_hashes.add(digest)
+        unique.append(result)
+    return unique
+
+
+class DuckDuckGoBackend:
+    """
+    DuckDuckGo 在线搜索后端
+    传入回放器时请求经过录制/回放，新闻摘要等不经过Agent工具的调用在离线回放时同样不联网
+    """
+
+    def __init__(self, replayer: Optional[ToolReplayer] = None, **ddg_kwargs):
+        from agno.tools.duckduckgo import DuckDuckGoTools
+        self.tools = DuckDuckGoTools(**ddg_kwargs)
+        self._search, self._news = self.tools.duckduckgo_search, self.tools.duckduckgo_news
+        if replayer is not None:
+            self._search = replayer.wrap_callable("search_backend.search", self._search)
+            self._news = replayer.wrap_callable("search_backend.news", self._news)
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        return json.loads(self._search(query=query, max_results=max_results))
+
+    def news(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        return json.loads(self._news(query=query, max_results=max_results))
+
+
+class FixtureSearchBackend:
+    """
+    本地fixture搜索后端，用于离线测试
+
+    fixture格式: {"search": {"归一化查询": [结果...]}, "news": {...}}
+    """
+
+    def __init__(self, fixtures: Optional[Dict[str, Any]] = None, fixture_path: Optional[str] = None):
+        if fixtures is None and fixture_path:
+            with open(fixture_path, "r", encoding="utf-8") as f:
+                fixtures = json.load(f)
+        fixtures = fixtures or {}
+        self.fixtures = {
+            kind: {normalize_query(q): results for q, results in fixtures.get(kind, {}).items()}
+            for kind in ("search", "news")
+        }
+        self.calls: List[Tuple[str, str]] = []
+
+    def _lookup(self, kind: str, query: str, max_results: int) -> List[Dict[str, Any]]:
+        self.calls.append((kind, query))
+        return list(self.fixtures[kind].get(normalize_query(query), []))[:max_results]
+
+    def search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        return self._lookup("search", query, max_results)
+
+    def news(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        return self._lookup("news", query, max_results)
+
+
+@dataclass
+class _CacheEntry:
+    results: List[Dict[str, Any]]
+    max_results: int
+    created_at: float
+
+
+@dataclass
+class _Flight:
+    event: threading.Event = field(default_factory=threading.Event)
+    results: Optional[List[Dict[str, Any]]] = None
+    error: Optional[BaseException] = None
+
+
+class SearchCache:
+    """
+    线程安全的搜索缓存
+    相同归一化查询在TTL内只请求一次，并发的相同请求合并为一次（single-flight）
+    """
+
+    def __init__(self, backend=None, ttl_seconds: int = 900, max_entries: int = 1024):
+        self.backend = backend or DuckDuckGoBackend(get_tool_replayer())
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.aliases: Dict[str, str] = {}
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def register_alias(self, name: str, symbol: str) -> None:
+        """注册公司名到股票代码的映射，如 apple -> aapl"""
+        for token in re.findall(r"[\w一-鿿]+", name.lower()):
+            if token not in QUERY_STOPWORDS:
+                self.aliases[token] = symbol.lower()
+
+    def get(self, kind: str, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        获取搜索结果（kind 为 "search" 或 "news"）
+        """
+        key = (kind, normalize_query(query, self.aliases))
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry.created_at < self.ttl_seconds and entry.max_results >= max_results:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry.results[:max_results]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.results[:max_results]
+
+        try:
+            fetch = self.backend.news if kind == "news" else self.backend.search
+            results = dedupe_results(fetch(query, max_results))
+            flight.results = results
+            with self._lock:
+                self._entries[key] = _CacheEntry(results, max_results, time.time())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return results
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedSearchTools(Toolkit):
+    """
+    带缓存的搜索工具集
+    与 DuckDuckGoTools 暴露相同的函数名，多个Agent共享同一个 SearchCache
+    """
+
+    def __init__(self, cache: SearchCache, search: bool = True, news: bool = True, **kwargs):
+        self.cache = cache
+
+        tools: List[Any] = []
+        if search:
+            tools.append(self.duckduckgo_search)
+        if news:
+            tools.append(self.duckduckgo_news)
+
+        super().__init__(name="duckduckgo", tools=tools, **kwargs)
+
+    def duckduckgo_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search DuckDuckGo for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The result from DuckDuckGo.
+        """
+        return json.dumps(self.cache.get("search", query, max_results), indent=2, ensure_ascii=False)
+
+    def duckduckgo_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from DuckDuckGo.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from DuckDuckGo.
+        """
+        return json.dumps(self.cache.get("news", query, max_results), indent=2, ensure_ascii=False)
+
+
+class NewsDigestStore:
+    """
+    单次运行内的股票新闻摘要
+    每只股票只构建一次，多位大师共享同一份去重后的新闻列表
+    """
+
+    DIGEST_QUERIES = ("{symbol} news", "{symbol} earnings")
+
+    def __init__(self, cache: SearchCache, max_items: int = 8):
+        self.cache = cache
+        self.max_items = max_items
+        self._digests: Dict[str, List[Dict[str, Any]]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_items(self, symbol: str) -> List[Dict[str, Any]]:
+        """获取股票的去重新闻条目（首次调用时构建）"""
+        symbol = symbol.upper()
+        with self._lock:
+            symbol_lock = self._locks.setdefault(symbol, threading.Lock())
+
+        with symbol_lock:
+            if symbol not in self._digests:
+                seen_urls: set = set()
+                seen_hashes: set = set()
+                items: List[Dict[str, Any]] = []
+                for template in self.DIGEST_QUERIES:
+                    results = self.cache.get("news", template.format(symbol=symbol), self.max_items)
+                    items.extend(dedupe_results(results, seen_urls, seen_hashes))
+                self._digests[symbol] = items[:self.max_items]
+            return self._digests[symbol]
+
+    def get_digest(self, symbol: str) -> str:
+        """获取格式化的新闻摘要（Markdown列表）"""
+        lines = []
+        for item in self.get_items(symbol):
+            title = item.get("title", "").strip()
+            source = item.get("source", "")
+            date = str(item.get("date", ""))[:10]
+            url = item.get("url") or item.get("href", "")
+            meta = " | ".join(part for part in (source, date) if part)
+            lines.append(f"- {title}" + (f"（{meta}）" if meta else "") + (f" {url}" if url else ""))
+        return "\n".join(lines)
+
+
+_shared_cache: Optional[SearchCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_search_cache(config: Optional[Dict[str, Any]] = None) -> SearchCache:
+    """获取进程内共享的搜索缓存（按 search_cache 配置创建）"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            cache_config = (config or {}).get("search_cache", {})
+            if cache_config.get("backend") == "fixture":
+                backend = FixtureSearchBackend(fixture_path=cache_config.get("fixture_path"))
+            else:
+                backend = DuckDuckGoBackend(get_tool_replayer(config))
+            _shared_cache = SearchCache(
+                backend=backend,
+                ttl_seconds=cache_config.get("ttl_seconds", 900),
+                max_entries=cache_config.get("max_entries", 1024),
+            )
+            # aliases: {股票代码: 公司名或公司名列表}，让 "Apple news" 与 "AAPL news" 命中同一条缓存
+            for symbol, names in (cache_config.get("aliases") or {}).items():
+                for name in [names] if isinstance(names, str) else names:
+                    _shared_cache.register_alias(name, symbol)
+        return _shared_cache
+
+
+def create_search_tools(config: Optional[Dict[str, Any]] = None) -> Toolkit:
+    """根据配置创建搜索工具：启用缓存时返回共享缓存的工具集，否则返回原始DuckDuckGoTools"""
+    if not (config or {}).get("search_cache", {}).get("enabled", False):
+        from agno.tools.duckduckgo import DuckDuckGoTools
+        return DuckDuckGoTools()
+    return CachedSearchTools(get_shared_search_cache(config))
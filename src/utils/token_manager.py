@@ -5,7 +5,9 @@ Token管理工具
 
 import re
 import json
-from typing import List, Dict, Any, Optional, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from dataclasses import dataclass
 
 
@@ -63,7 +65,8 @@ class TokenManager:
         if target_length < len(text):
             keep_start = target_length // 2
             keep_end = target_length - keep_start
-            truncated = text[:keep_start] + "\n\n[... 内容过长，已截断 ...]\n\n" + text[-keep_end:]
+            # keep_end 为0时 text[-0:] 会返回全文
+            truncated = text[:keep_start] + "\n\n[... 内容过长，已截断 ...]\n\n" + text[len(text) - keep_end:]
             return truncated
         
         return text
@@ -75,6 +78,19 @@ class TokenManager:
         compressed_analyses = []
         
         for analysis in analyses:
+            # 结构化输出模式下直接读取字段
+            structured = analysis.get("structured")
+            if structured:
+                compressed_analyses.append({
+                    "agent": analysis.get("agent", ""),
+                    "symbol": analysis.get("symbol", ""),
+                    "style": analysis.get("style", ""),
+                    "summary": structured.get("summary", ""),
+                    "recommendation": structured.get("recommendation", "未明确"),
+                    "key_points": structured.get("key_points", [])[:5]
+                })
+                continue
+            
             # 提取关键信息
             compressed = {
                 "agent": analysis.get("agent", ""),
@@ -241,30 +257,129 @@ class TokenManager:
 
 
 class StreamingAnalyzer:
-    """流式分析器，支持大内容的分段处理"""
+    """
+    流式分析器，支持大内容的分段处理
+
+    四个章节（执行摘要、大师观点、风险评估、投资计划）的提示词并发发送给模型，
+    每个章节的token到达时立即回调，报告按章节顺序在前序章节完成后依次组装
+    """
     
-    def __init__(self, token_manager: TokenManager):
+    SECTION_ORDER = ["executive_summary", "master_opinions", "risk_assessment", "investment_plan"]
+    
+    def __init__(self, token_manager: TokenManager,
+                 agent_factory: Optional[Callable[[], Any]] = None,
+                 max_workers: int = 4):
+        """
+        Args:
+            token_manager: token管理器
+            agent_factory: 创建章节Agent的工厂函数，每个章节使用独立的Agent实例以便并发；
+                           为None时只生成各章节提示词而不调用模型
+            max_workers: 并发章节数
+        """
         self.token_manager = token_manager
+        self.agent_factory = agent_factory
+        self.max_workers = max_workers
         
-    def stream_multi_master_analysis(self, symbol: str, analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def build_section_prompts(self, symbol: str, compressed_analyses: List[Dict[str, Any]]) -> Dict[str, str]:
+        """生成四个章节的提示词"""
+        return {
+            "executive_summary": self._generate_executive_summary(symbol, compressed_analyses),
+            "master_opinions": self._generate_master_opinions(compressed_analyses),
+            "risk_assessment": self._generate_risk_assessment(symbol, compressed_analyses),
+            "investment_plan": self._generate_investment_plan(symbol, compressed_analyses)
+        }
+    
+    def stream_multi_master_analysis(self, symbol: str, analyses: List[Dict[str, Any]],
+                                     on_token: Optional[Callable[[str, str], None]] = None,
+                                     on_section: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
         """
         流式处理多投资大师分析
+        
+        Args:
+            symbol: 股票代码
+            analyses: 投资大师分析结果
+            on_token: token回调 (章节名, 增量文本)，可能从多个线程调用
+            on_section: 章节就绪回调 (章节名, 章节全文)，严格按章节顺序调用
+            
+        Returns:
+            包含 sections（按顺序）、metrics（每章节首token延迟和总耗时）的结果字典
         """
         # 压缩分析结果
         compressed_analyses = self.token_manager.compress_analysis_results(analyses)
+        prompts = self.build_section_prompts(symbol, compressed_analyses)
+        
+        if self.agent_factory is None:
+            return {
+                "symbol": symbol,
+                "sections": prompts,
+                "compressed_analyses": compressed_analyses,
+                "metrics": {}
+            }
         
-        # 生成分段报告
-        sections = {
-            "executive_summary": self._generate_executive_summary(symbol, compressed_analyses),
-            "master_opinions": self._generate_master_opinions(compressed_analyses),
-            "risk_assessment": self._generate_risk_assessment(symbol, compressed_analyses),
-            "investment_plan": self._generate_investment_plan(symbol, compressed_analyses)
+        start = time.perf_counter()
+        sections: Dict[str, str] = {}
+        metrics: Dict[str, Dict[str, Any]] = {}
+        next_index = 0
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._run_section, name, prompts[name], start, on_token): name
+                for name in self.SECTION_ORDER
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                sections[name], metrics[name] = future.result()
+                
+                # 按章节顺序输出已完成的前缀
+                while next_index < len(self.SECTION_ORDER) and self.SECTION_ORDER[next_index] in sections:
+                    ready = self.SECTION_ORDER[next_index]
+                    if on_section:
+                        on_section(ready, sections[ready])
+                    next_index += 1
+        
+        ttfts = [m["ttft_ms"] for m in metrics.values() if m["ttft_ms"] is not None]
+        metrics["total"] = {
+            "ttft_ms": min(ttfts) if ttfts else None,
+            "latency_ms": (time.perf_counter() - start) * 1000
         }
         
         return {
             "symbol": symbol,
-            "sections": sections,
-            "compressed_analyses": compressed_analyses
+            "sections": {name: sections[name] for name in self.SECTION_ORDER},
+            "compressed_analyses": compressed_analyses,
+            "metrics": metrics
+        }
+    
+    def _run_section(self, name: str, prompt: str, start: float,
+                     on_token: Optional[Callable[[str, str], None]]) -> Tuple[str, Dict[str, Any]]:
+        """运行单个章节，返回章节文本和耗时指标"""
+        section_start = time.perf_counter()
+        first_token_at = None
+        chunks: List[str] = []
+        
+        try:
+            agent = self.agent_factory()
+            for event in agent.run(prompt, stream=True):
+                delta = getattr(event, "content", None)
+                if getattr(event, "event", None) != "RunResponseContent" or not isinstance(delta, str) or not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunks.append(delta)
+                if on_token:
+                    on_token(name, delta)
+            error = None
+        except Exception as e:
+            error = str(e)
+            chunks.append(f"❌ 章节生成失败: {e}")
+        
+        end = time.perf_counter()
+        return "".join(chunks), {
+            "ttft_ms": (first_token_at - start) * 1000 if first_token_at else None,
+            "latency_ms": (end - section_start) * 1000,
+            "finished_ms": (end - start) * 1000,
+            "chunks": len(chunks),
+            "error": error
         }
     
     def _generate_executive_summary(self, symbol: str, analyses: List[Dict[str, Any]]) -> str:
@@ -313,9 +428,13 @@ class StreamingAnalyzer:
     
     def _generate_risk_assessment(self, symbol: str, analyses: List[Dict[str, Any]]) -> str:
         """生成风险评估"""
+        # 只截断大师摘要，保证输出模板完整
+        summaries = self.token_manager.truncate_text(json.dumps(analyses, ensure_ascii=False), 500)
         prompt = f"""
 基于投资大师分析，为{symbol}生成风险评估：
 
+{summaries}
+
 请输出：
 ## ⚠️ 风险评估
 
@@ -333,8 +452,11 @@ class StreamingAnalyzer:
     
     def _generate_investment_plan(self, symbol: str, analyses: List[Dict[str, Any]]) -> str:
         """生成投资计划"""
+        summaries = self.token_manager.truncate_text(json.dumps(analyses, ensure_ascii=False), 350)
         prompt = f"""
-为{symbol}生成投资执行计划：
+基于以下投资大师分析，为{symbol}生成投资执行计划：
+
+{summaries}
 
 ## 🎯 投资执行计划
 
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+测试分析记忆：从结果库增量索引历史分析、按公司/大师检索摘录、token上限、IVF 近似检索和提示词注入
+"""
+
+import os
+import time
+import tempfile
+
+# 导入路径现在由conftest.py统一处理
+
+BUFFETT = "Warren Buffett价值投资分析师"
+GRAHAM = "Benjamin Graham价值投资鼻祖"
+KEYS = {BUFFETT: "warren_buffett", GRAHAM: "benjamin_graham"}
+
+
+def _result(symbol, buffett_text, graham_text):
+    return {"symbol": symbol, "selected_masters": list(KEYS.values()), "synthesis": f"{symbol} 综合评分 7/10",
+            "individual_analyses": [{"agent": BUFFETT, "symbol": symbol, "analysis": buffett_text, "style": "价值"},
+                                    {"agent": GRAHAM, "symbol": symbol, "analysis": graham_text, "style": "价值"}]}
+
+
+def _seed(store, created_at=None):
+    created_at = created_at or time.time() - 86400
+    store.save(_result("AAPL", "## 护城河\n生态系统护城河宽阔，用户转换成本高。\n\n## 估值\n市盈率偏高，等待回调再买入。",
+                       "格雷厄姆数低于股价，安全边际不足。"), KEYS, created_at=created_at)
+    store.save(_result("KO", "品牌护城河稳固，自由现金流充沛，分红稳定增长。", "净流动资产不足，但盈利稳定。"),
+               KEYS, created_at=created_at)
+    store.save(_result("PEP", "品牌定价权强，自由现金流稳定，护城河与可口可乐相当。", "股息率合理，市盈率略高。"),
+               KEYS, created_at=created_at)
+
+
+def test_sync_and_retrieve():
+    """测试增量同步、同一公司优先、同类公司按内容召回、token上限，以及重启后从磁盘载入"""
+    print("🧪 测试分析记忆检索")
+    print("=" * 60)
+
+    from src.storage import AnalysisResultStore
+    from src.utils.analysis_memory import AnalysisMemory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnalysisResultStore(os.path.join(tmp, "results.db"))
+        memory_file = os.path.join(tmp, "memory.db")
+        memory = AnalysisMemory(memory_file, {"chunk_tokens": 30})
+        try:
+            _seed(store)
+            added = memory.sync(store)
+            print(f"📊 索引 {added} 段摘录: {memory.stats()}")
+            assert added == memory.size >= 9 and memory.sync(store) == 0
+
+            hits = memory.retrieve("aapl", "warren_buffett", "AAPL 护城河 估值")
+            assert hits and hits[0]["symbol"] == "AAPL" and hits[0]["master"] == "warren_buffett"
+            assert all(hit["symbol"] == "AAPL" for hit in hits[:2])
+            # 同一次运行最多取 max_per_run 段
+            assert sum(hit["run_id"] == hits[0]["run_id"] for hit in hits) <= 2
+
+            # 没有历史的新公司：按内容召回同类公司
+            peers = memory.retrieve("MNST", "warren_buffett", "MNST 品牌 自由现金流")
+            assert {hit["symbol"] for hit in peers} <= {"KO", "PEP"} and peers
+            assert memory.retrieve("MNST", query="完全无关的量子计算") == []
+
+            capped = memory.retrieve("AAPL", "warren_buffett", "AAPL 护城河", k=10, max_tokens=40)
+            assert sum(hit["tokens"] for hit in capped) <= 40
+
+            context = memory.context("AAPL", "warren_buffett", "AAPL 护城河")
+            assert context.startswith("- [") and "AAPL · Warren Buffett" in context
+
+            store.save(_result("AAPL", "新的一季：服务收入增长放缓。", "安全边际依然不足。"), KEYS)
+            assert memory.sync(store) == 3
+        finally:
+            memory.close()
+
+        reopened = AnalysisMemory(memory_file, {"chunk_tokens": 30})
+        try:
+            assert reopened.size == added + 3 and reopened.last_analysis_id == memory.last_analysis_id
+            assert reopened.retrieve("AAPL", "warren_buffett", "服务收入")[0]["text"].startswith("新的一季")
+        finally:
+            reopened.close()
+
+        # 嵌入模型变化后旧向量被清空，从结果库重建
+        rebuilt = AnalysisMemory(memory_file, {"chunk_tokens": 30, "dim": 128})
+        try:
+            assert rebuilt.size == 0
+            assert rebuilt.sync(store) == added + 3
+        finally:
+            rebuilt.close()
+            store.close()
+
+    print("✅ 分析记忆检索正常")
+
+
+def test_vector_index_switches_to_ivf():
+    """测试条数达到阈值后切换为 IVF：自身仍能命中，强制包含的位置和加分生效，新增向量归入最近的簇"""
+    print("\n🧪 测试向量索引")
+    print("=" * 60)
+
+    import numpy as np
+    from src.utils.analysis_memory import VectorIndex
+
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(3000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    exact = VectorIndex(32, ann_threshold=10 ** 9)
+    approx = VectorIndex(32, ann_threshold=2000, nprobe=8)
+    exact.add(vectors[:2500])
+    for start in range(0, 2500, 500):
+        approx.add(vectors[start:start + 500])
+    assert not exact.ann and approx.ann and len(approx._lists) == int(np.sqrt(2000))
+
+    for i in (0, 1234, 2499):
+        assert approx.search(vectors[i], 1)[0][0] == exact.search(vectors[i], 1)[0][0] == i
+    recall = np.mean([len(set(exact.search(v, 10)[0]) & set(approx.search(v, 10)[0])) / 10 for v in vectors[:50]])
+    print(f"📊 IVF top-10 召回率: {recall:.0%}")
+    assert recall > 0.5
+
+    far = int(np.argmin(vectors[:2500] @ vectors[7]))
+    positions, scores = approx.search(vectors[7], 2, boosts=[(np.array([far]), 5.0)], include=np.array([far]))
+    assert positions.tolist() == [far, 7] and scores[0] > 4
+
+    new = approx.add(vectors[2500:])
+    assert approx.size == 3000 and approx.search(vectors[2900], 1)[0][0] == new[400]
+
+    print("✅ 向量索引正常")
+
+
+def test_masters_get_memory_context():
+    """测试分析前为每位大师检索历史摘录，并放在提示词的可变部分"""
+    print("\n🧪 测试历史摘录注入提示词")
+    print("=" * 60)
+
+    from src.agents.configurable_investment_agent import ConfigurableMultiAgentAnalyzer, InvestmentMasterAgent
+    from src.storage import AnalysisResultStore
+    from src.utils.analysis_memory import get_analysis_memory
+    from src.utils.prompt_cache import VOLATILE_SECTION_HEADER
+
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnalysisResultStore(os.path.join(tmp, "results.db"))
+        try:
+            _seed(store)
+            config = {"analysis_memory": {"db_file": os.path.join(tmp, "memory.db")}}
+            memory = get_analysis_memory(config, store)
+            assert memory.size > 0 and get_analysis_memory(config, store) is memory
+            assert get_analysis_memory(config, None) is None
+            assert get_analysis_memory({"analysis_memory": {"enabled": False}}, store) is None
+
+            analyzer = ConfigurableMultiAgentAnalyzer()
+            assert analyzer._build_memory_contexts("AAPL") == {}
+            analyzer.analysis_memory = memory
+            buffett = InvestmentMasterAgent(analyzer.agent_factory.config["investment_masters"]["warren_buffett"],
+                                            "mock-model", analyzer.agent_factory.config)
+            analyzer.active_agents = {"warren_buffett": buffett}
+            contexts = analyzer._build_memory_contexts("AAPL")
+            assert list(contexts) == ["warren_buffett"] and "生态系统护城河" in contexts["warren_buffett"]
+
+            prompt = buffett._build_analysis_prompt("AAPL", memory_context=contexts["warren_buffett"])
+            plain = buffett._build_analysis_prompt("AAPL")
+            static_end = plain.index(VOLATILE_SECTION_HEADER)
+            assert prompt[:static_end] == plain[:static_end]
+            assert prompt.index("历史分析摘录") > static_end and prompt.rstrip().endswith("**分析对象：** 股票 AAPL")
+            memory.close()
+        finally:
+            store.close()
+            if previous is None:
+                os.environ.pop("LLM_API_KEY", None)
+            else:
+                os.environ["LLM_API_KEY"] = previous
+
+    print("✅ 历史摘录注入正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试分析记忆")
+    print("=" * 80)
+
+    test_sync_and_retrieve()
+    test_vector_index_switches_to_ivf()
+    test_masters_get_memory_context()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
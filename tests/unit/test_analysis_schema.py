@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+测试大师分析的结构化输出模式
+"""
+
+import os
+import copy
+import json
+
+import yaml
+
+# 导入路径现在由conftest.py统一处理
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "src", "config", "investment_agents_config.yaml")
+
+GRAHAM_REPLY = {
+    "recommendation": "卖出",
+    "rating": 3.5,
+    "conviction": "高",
+    "risk_level": "高",
+    "target_price": 120.0,
+    "moat": "品牌护城河较宽，但无法弥补估值过高",
+    "risks": ["P/E远高于15倍", "P/B超过1.5倍"],
+    "key_points": ["价格高于格雷厄姆数", "缺乏安全边际"],
+    "summary": "估值远超防御型投资者标准，不具备安全边际，建议卖出。",
+    "margin_of_safety": "当前价格高于格雷厄姆数约80%",
+}
+
+
+def test_master_schema():
+    """测试按大师配置生成Schema和解析"""
+    print("🧪 测试大师Schema")
+    print("=" * 60)
+
+    from src.utils.analysis_schema import (MasterAnalysis, build_master_schema, parse_structured,
+                                           render_markdown, structured_signals)
+
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    graham = config["investment_masters"]["benjamin_graham"]
+
+    schema = build_master_schema(graham)
+    assert issubclass(schema, MasterAnalysis)
+    assert "margin_of_safety" in schema.model_json_schema()["properties"]
+    assert build_master_schema(graham) is schema
+    assert build_master_schema({"agent_name": "Anonymous"}) is MasterAnalysis
+
+    data = parse_structured("```json\n" + json.dumps(GRAHAM_REPLY, ensure_ascii=False) + "\n```", schema)
+    assert data["margin_of_safety"] == "当前价格高于格雷厄姆数约80%"
+    assert parse_structured('{"rating": 42}', schema) is None
+    assert parse_structured("这不是JSON", schema) is None
+
+    markdown = render_markdown(data)
+    assert "**卖出** | 评分 3.5/10" in markdown and "- 缺乏安全边际" in markdown
+    assert structured_signals(data) == {"rating": 3.5, "recommendation": 0.0, "conviction": 1.0,
+                                        "risk": 1.0, "target_price": 120.0}
+
+    print("✅ 大师Schema正常")
+
+
+def test_structured_agent_end_to_end():
+    """测试结构化模式下Agent、压缩和排名直接读取字段"""
+    print("\n🧪 测试结构化输出端到端")
+    print("=" * 60)
+
+    from src.agents.configurable_investment_agent import InvestmentMasterAgent
+    from src.utils.analysis_schema import analysis_payload
+    from src.utils.mock_llm_server import MockLLMServer, MockLLMConfig
+    from src.utils.ranking import RankingEngine
+    from src.utils.token_manager import TokenManager
+
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    try:
+        with MockLLMServer(MockLLMConfig(reply=json.dumps(GRAHAM_REPLY, ensure_ascii=False))) as server:
+            config = copy.deepcopy(config)
+            config["structured_output"] = {"enabled": True, "mode": "json"}
+            config["model_config"]["base_url"] = server.base_url
+            agent = InvestmentMasterAgent(config["investment_masters"]["benjamin_graham"], "mock-model", config)
+            result = agent.analyze_stock("AAPL")
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_API_KEY", None)
+        else:
+            os.environ["LLM_API_KEY"] = previous
+
+    assert result["structured"]["rating"] == 3.5
+    assert result["analysis"].startswith("## 投资建议")
+
+    compressed = TokenManager().compress_analysis_results([result])[0]
+    assert compressed["recommendation"] == "卖出"
+    assert compressed["key_points"] == GRAHAM_REPLY["key_points"]
+
+    ranking = RankingEngine(config).rank({"AAPL": {"individual_analyses": [result]}})
+    assert ranking.loc["AAPL", "target_price"] == 120.0
+    assert ranking.loc["AAPL", "sell"] == 1
+
+    # 发给综合器的内容只有紧凑JSON，远小于一份典型的Markdown长文分析
+    payload = analysis_payload(result)
+    typical_markdown = "## 价值评估\n" + "格雷厄姆会仔细审视资产负债表，逐项计算安全边际。\n" * 60
+    print(f"📦 综合器载荷: {len(payload)} 字符（典型Markdown分析 {len(typical_markdown)} 字符）")
+    assert json.loads(payload)["recommendation"] == "卖出"
+    assert len(payload) * 5 < len(typical_markdown)
+
+    print("✅ 结构化输出端到端正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试结构化输出模式")
+    print("=" * 80)
+
+    test_master_schema()
+    test_structured_agent_end_to_end()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
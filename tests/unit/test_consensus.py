@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+测试共识提前结束
+"""
+
+import time
+import threading
+
+# 导入路径现在由conftest.py统一处理
+
+MASTERS = ["Warren Buffett", "Charlie Munger", "Peter Lynch", "Benjamin Graham", "Ray Dalio"]
+
+
+def _result(agent, text):
+    return {"agent": agent, "symbol": "AAPL", "analysis": text, "style": "价值投资"}
+
+
+def test_monitor_thresholds():
+    """测试强烈同意的计数和阈值"""
+    print("🧪 测试共识判断")
+    print("=" * 60)
+
+    from src.utils.consensus import ConsensusMonitor
+
+    monitor = ConsensusMonitor(MASTERS, threshold=0.8, min_conviction=0.6)
+    assert monitor.required == 4
+    assert not monitor.add(_result(MASTERS[0], "建议买入，信心度：高")).reached
+    assert not monitor.add(_result(MASTERS[1], "建议买入，信心度 90%")).reached
+    # 信心度不足的买入不计入强烈同意
+    assert not monitor.add(_result(MASTERS[2], "建议买入，信心度：低")).reached
+    assert not monitor.add(_result(MASTERS[3], "建议买入，信心度 70%")).reached
+
+    decision = monitor.add(_result(MASTERS[4], "建议买入，信心度：高"))
+    assert decision.reached and decision.recommendation == "买入"
+    assert decision.agreeing == [MASTERS[0], MASTERS[1], MASTERS[3], MASTERS[4]]
+
+    # 没有给出信心度的同意不算强烈同意
+    monitor = ConsensusMonitor(MASTERS, threshold=0.6, min_conviction=0.5)
+    for agent in MASTERS[:3]:
+        decision = monitor.add(_result(agent, "建议买入"))
+    assert not decision.reached and decision.agreeing == []
+    assert monitor.add(_result(MASTERS[3], "建议买入，信心度：中")).agreeing == [MASTERS[3]]
+
+    # 分歧较大时不会提前结束
+    monitor = ConsensusMonitor(MASTERS)
+    for agent, text in zip(MASTERS, ["建议买入，信心度高", "建议卖出，信心度高", "建议买入，信心度高",
+                                     "继续持有"]):
+        decision = monitor.add(_result(agent, text))
+    assert not decision.reached
+
+    print("✅ 共识判断正常")
+
+
+def test_cancels_remaining_masters():
+    """测试达成共识后立即返回并中断尚未完成的大师"""
+    print("\n🧪 测试提前结束")
+    print("=" * 60)
+
+    from src.utils.consensus import ConsensusMonitor, run_until_consensus
+    from src.utils.event_stream import StreamEvent, merge_streams
+
+    closed = threading.Event()
+    produced = []
+
+    def fast(agent, delay):
+        def events():
+            time.sleep(delay)
+            yield StreamEvent("token", agent, "AAPL", "…")
+            yield StreamEvent("done", agent, "AAPL", data=_result(agent, "强烈建议买入，信心度：高"))
+        return events
+
+    def slow():
+        try:
+            for i in range(100):
+                time.sleep(0.02)
+                produced.append(i)
+                yield StreamEvent("token", MASTERS[4], "AAPL", f"{i}")
+        finally:
+            closed.set()
+
+    streams = {agent: fast(agent, 0.02 * i) for i, agent in enumerate(MASTERS[:4])}
+    streams[MASTERS[4]] = lambda: slow()
+
+    start = time.perf_counter()
+    results, decision = run_until_consensus(merge_streams(streams), ConsensusMonitor(MASTERS))
+    elapsed = time.perf_counter() - start
+
+    note = decision.render(len(MASTERS))
+    print(note)
+    print(f"⚡ 用时 {elapsed:.2f}秒（慢速大师需要约2秒）")
+    assert decision.reached and decision.skipped == [MASTERS[4]]
+    assert [r["agent"] for r in results] == MASTERS[:4]
+    assert elapsed < 0.5
+    assert "4/5位大师一致建议买入" in note and "未纳入: Ray Dalio" in note
+
+    # 慢速大师的流在下一个事件时被关闭，不再继续生成
+    assert closed.wait(1.0)
+    stopped_at = len(produced)
+    time.sleep(0.1)
+    assert len(produced) == stopped_at < 100
+
+    print("✅ 提前结束正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试共识提前结束")
+    print("=" * 80)
+
+    test_monitor_thresholds()
+    test_cancels_remaining_masters()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+测试分析事件流：大师流式运行、多路合流、SSE接口和终端多窗格
+"""
+
+import os
+import copy
+import json
+import time
+
+import yaml
+
+# 导入路径现在由conftest.py统一处理
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "src", "config", "investment_agents_config.yaml")
+
+
+def _fake_stream(agent, delays, fail=False):
+    from src.utils.event_stream import StreamEvent, START, TOKEN, DONE
+
+    def events():
+        yield StreamEvent(START, agent, "AAPL")
+        for i, delay in enumerate(delays):
+            time.sleep(delay)
+            yield StreamEvent(TOKEN, agent, "AAPL", f"{agent}{i} ")
+        if fail:
+            raise RuntimeError("模型超时")
+        yield StreamEvent(DONE, agent, "AAPL", data={"agent": agent})
+    return events
+
+
+def test_merge_streams_interleaves():
+    """测试多位大师的事件按到达顺序合流"""
+    print("🧪 测试事件合流")
+    print("=" * 60)
+
+    from src.utils.event_stream import merge_streams
+
+    start = time.perf_counter()
+    events = list(merge_streams({
+        "fast": _fake_stream("fast", [0.01, 0.01, 0.01]),
+        "slow": _fake_stream("slow", [0.05, 0.05]),
+        "broken": _fake_stream("broken", [0.02], fail=True),
+    }))
+    elapsed = time.perf_counter() - start
+
+    tokens = [e.content.strip() for e in events if e.type == "token"]
+    print(f"📡 合流顺序: {tokens}（{elapsed * 1000:.0f}毫秒）")
+    assert tokens.index("fast2") < tokens.index("slow0")  # 快的大师不等待慢的大师
+    assert elapsed < 0.2  # 三路并发，而不是串行
+    errors = [e for e in events if e.type == "error"]
+    assert len(errors) == 1 and errors[0].agent == "broken" and "模型超时" in errors[0].content
+    assert sum(e.type == "done" for e in events) == 2
+
+    print("✅ 事件合流正常")
+
+
+def test_master_agent_stream():
+    """测试大师Agent通过模拟服务器流式输出并收集完整文本"""
+    print("\n🧪 测试大师流式分析")
+    print("=" * 60)
+
+    from src.agents.configurable_investment_agent import InvestmentMasterAgent
+    from src.utils.mock_llm_server import MockLLMServer, MockLLMConfig
+
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    try:
+        reply = "## 投资建议\n建议持有，评分 6/10。"
+        with MockLLMServer(MockLLMConfig(reply=reply, tokens_per_second=2000)) as server:
+            config = copy.deepcopy(config)
+            config["model_config"]["base_url"] = server.base_url
+            agent = InvestmentMasterAgent(config["investment_masters"]["warren_buffett"], "mock-model", config)
+            events = list(agent.analyze_stock_stream("AAPL"))
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_API_KEY", None)
+        else:
+            os.environ["LLM_API_KEY"] = previous
+
+    kinds = [e.type for e in events]
+    assert kinds[0] == "start" and kinds[-1] == "done"
+    tokens = [e.content for e in events if e.type == "token"]
+    assert len(tokens) > 1
+    result = events[-1].data
+    assert result["analysis"] == "".join(tokens) == reply
+    assert result["agent"] == agent.agent_name
+
+    print(f"✅ 大师流式分析正常（{len(tokens)} 个token事件）")
+
+
+def test_sse_endpoint():
+    """测试SSE接口按事件输出"""
+    print("\n🧪 测试SSE接口")
+    print("=" * 60)
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src.utils.event_stream import create_sse_router, merge_streams
+
+    requested = []
+
+    def stream_factory(symbol, masters):
+        requested.append((symbol, masters))
+        return merge_streams({name: _fake_stream(name, [0.0]) for name in masters})
+
+    app = FastAPI()
+    app.include_router(create_sse_router(stream_factory))
+    with TestClient(app) as client:
+        response = client.get("/v1/investment/stream/aapl", params={"masters": "a,b"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert requested == [("AAPL", ["a", "b"])]
+
+    blocks = [block for block in response.text.split("\n\n") if block]
+    events = [json.loads(block.split("data: ", 1)[1]) for block in blocks]
+    assert all(block.startswith("event: ") for block in blocks)
+    assert sorted(e["agent"] for e in events if e["type"] == "done") == ["a", "b"]
+    assert {e["content"] for e in events if e["type"] == "token"} == {"a0 ", "b0 "}
+
+    # 参数无效时在响应开始前返回400，而不是中途截断的事件流
+    def invalid_factory(symbol, masters):
+        raise ValueError(f"未知的投资大师: {masters[0]}")
+
+    app = FastAPI()
+    app.include_router(create_sse_router(invalid_factory))
+    with TestClient(app) as client:
+        response = client.get("/v1/investment/stream/aapl", params={"masters": "nobody"})
+    assert response.status_code == 400 and "nobody" in response.json()["detail"]
+
+    print("✅ SSE接口正常")
+
+
+def test_aiter_events_closes_upstream():
+    """测试异步迭代提前结束（如SSE客户端断开）时关闭上游事件流"""
+    print("\n🧪 测试异步迭代关闭上游")
+    print("=" * 60)
+
+    import asyncio
+    from src.utils.event_stream import aiter_events, merge_streams
+
+    closed = []
+
+    def endless():
+        try:
+            for i in range(1000):
+                time.sleep(0.01)
+                yield i
+        finally:
+            closed.append("upstream")
+
+    async def consume():
+        events = aiter_events(endless())
+        received = [await events.__anext__() for _ in range(2)]
+        await events.aclose()
+        return received
+
+    assert asyncio.run(consume()) == [0, 1] and closed == ["upstream"]
+
+    # 合流的事件流被关闭后，尚在运行的大师流在下一个事件到达时停止
+    async def first_event():
+        events = aiter_events(merge_streams({"slow": _fake_stream("slow", [0.01] * 100)}))
+        async for event in events:
+            await events.aclose()
+            return event.type
+
+    start = time.perf_counter()
+    assert asyncio.run(first_event()) == "start"
+    assert time.perf_counter() - start < 0.5
+
+    print("✅ 异步迭代关闭上游正常")
+
+
+def test_run_error_becomes_error_entry():
+    """测试模型运行出错（RunError，事件不带结果）时记为失败条目，不产生半截的 done 结果"""
+    print("\n🧪 测试流式运行错误")
+    print("=" * 60)
+
+    from src.agents.configurable_investment_agent import ConfigurableMultiAgentAnalyzer
+    from src.utils.event_stream import StreamEvent, START, TOKEN, ERROR, DONE
+
+    class FailingMaster:
+        agent_name = "Warren Buffett价值投资分析师"
+        description = "价值投资"
+        precomputed_factors = []
+
+        def analyze_stock_stream(self, symbol, *args):
+            yield StreamEvent(START, self.agent_name, symbol)
+            yield StreamEvent(TOKEN, self.agent_name, symbol, "护城河")
+            yield StreamEvent(ERROR, self.agent_name, symbol, "上游模型 500")
+            yield StreamEvent(DONE, self.agent_name, symbol, "护城河", data={"agent": self.agent_name})
+
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    try:
+        analyzer = ConfigurableMultiAgentAnalyzer()
+        analyzer.factor_engine = None
+        analyzer._build_news_digest = lambda symbol: None  # 不联网
+        events = list(analyzer.stream_multi_perspective("AAPL", agents={"warren_buffett": FailingMaster()}))
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_API_KEY", None)
+        else:
+            os.environ["LLM_API_KEY"] = previous
+
+    assert [e.type for e in events] == ["start", "token", "error", "complete"]
+    analyses = events[-1].data["individual_analyses"]
+    assert analyses == [{"agent": FailingMaster.agent_name, "symbol": "AAPL",
+                         "analysis": "分析失败: 上游模型 500", "style": "错误"}]
+    assert analyzer.active_agents == {}
+
+    print("✅ 流式运行错误处理正常")
+
+
+def test_multi_pane_renderer():
+    """测试终端多窗格状态"""
+    print("\n🧪 测试多窗格展示")
+    print("=" * 60)
+
+    from rich.console import Console
+    from src.utils.event_stream import MultiPaneRenderer, StreamEvent
+
+    renderer = MultiPaneRenderer(["Buffett", "Munger"], tail_lines=3)
+    for event in [StreamEvent("token", "Buffett", content="护城河\n宽广"),
+                  StreamEvent("tool_call", "Munger", content="get_current_stock_price"),
+                  StreamEvent("done", "Buffett")]:
+        renderer.update(event)
+
+    console = Console(record=True, width=100)
+    console.print(renderer.build())
+    text = console.export_text()
+    assert "✅ Buffett" in text and "宽广" in text
+    assert "🔧 Munger · 工具1次" in text
+
+    # 窗格只保留末尾几行；大量token事件按刷新频率限频重建
+    for i in range(2000):
+        renderer.update(StreamEvent("token", "Munger", content=f"第{i}行\n"))
+    assert len(renderer.texts["Munger"].splitlines()) <= 4 and renderer.texts["Munger"].endswith("第1999行\n")
+
+    builds = []
+    throttled = MultiPaneRenderer(["Buffett"], refresh_per_second=4)
+    build = throttled.build
+    throttled.build = lambda: builds.append(1) or build()
+    events = [StreamEvent("token", "Buffett", content="字") for _ in range(5000)] + [StreamEvent("done", "Buffett")]
+    assert len(list(throttled.render(iter(events)))) == 5001
+    print(f"📊 5001个事件重建窗格 {len(builds)} 次")
+    assert len(builds) < 50
+
+    print("✅ 多窗格展示正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试分析事件流")
+    print("=" * 80)
+
+    test_merge_streams_interleaves()
+    test_master_agent_stream()
+    test_sse_endpoint()
+    test_aiter_events_closes_upstream()
+    test_run_error_becomes_error_entry()
+    test_multi_pane_renderer()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+测试基本面因子引擎
+使用本地模拟数据，无需网络
+"""
+
+import math
+import time
+import tempfile
+
+import pandas as pd
+
+# 导入路径现在由conftest.py统一处理
+
+SAMPLE_RAW = {
+    "AAA": {
+        "price": 100.0, "market_cap": 1.0e9, "enterprise_value": 1.2e9,
+        "shares_outstanding": 1.0e7, "trailing_eps": 5.0, "book_value_per_share": 40.0,
+        "total_revenue": 2.0e9, "operating_margin": 0.12, "net_income": 8.0e7,
+        "total_debt": 1.0e8, "total_cash": 5.0e7, "current_ratio": 2.5,
+        "earnings_growth": 0.25, "working_capital": 3.0e8, "net_ppe": 5.0e8,
+        "current_assets": 6.0e8, "total_liabilities": 4.0e8,
+        "most_recent_quarter": time.mktime(time.strptime("2025-03-31", "%Y-%m-%d")),
+    },
+    "BBB": {
+        "price": 10.0, "market_cap": 1.0e8, "enterprise_value": 1.5e8,
+        "shares_outstanding": 1.0e7, "trailing_eps": -1.0, "book_value_per_share": 20.0,
+        "total_revenue": 5.0e8, "operating_margin": 0.02, "net_income": -1.0e7,
+        "total_debt": 2.0e8, "total_cash": 1.0e7, "current_ratio": 1.1,
+        "current_assets": 4.0e8, "total_liabilities": 1.5e8,
+    },
+    "CCC": {"price": 50.0},
+}
+
+
+def _make_engine(cache_dir=None, calls=None):
+    from src.utils.fundamentals import FundamentalsFactorEngine
+
+    def fake_fetcher(symbol):
+        if calls is not None:
+            calls.append(symbol)
+        return SAMPLE_RAW[symbol]
+
+    return FundamentalsFactorEngine(cache_dir=cache_dir, fetcher=fake_fetcher, max_workers=2)
+
+
+def test_factor_computation():
+    """测试因子的向量化计算"""
+    print("🧪 测试因子计算")
+    print("=" * 60)
+
+    table = _make_engine().build_table(["AAA", "BBB"])
+    aaa = table.loc["AAA"]
+
+    assert math.isclose(aaa["roe"], 8.0e7 / 4.0e8)
+    assert math.isclose(aaa["roic"], 2.4e8 / 8.0e8)
+    assert math.isclose(aaa["earnings_yield"], 2.4e8 / 1.2e9)
+    assert math.isclose(aaa["pe"], 20.0)
+    assert math.isclose(aaa["pb"], 2.5)
+    assert math.isclose(aaa["graham_number"], math.sqrt(22.5 * 5.0 * 40.0))
+    assert bool(aaa["buffett_roe_pass"]) is True
+
+    bbb = table.loc["BBB"]
+    assert math.isnan(bbb["pe"])  # 亏损公司没有P/E
+    assert bool(bbb["net_net"]) is True  # 市值1亿 < 净流动资产2.5亿 * 2/3
+    assert table.loc["AAA", "magic_formula_rank"] < table.loc["BBB", "magic_formula_rank"]
+    assert aaa["fiscal_period"] == "2025-03-31" and pd.isna(bbb["fiscal_period"])
+    # 缺少财务数据时布尔因子为NaN而不是False
+    missing = _make_engine().build_table(["AAA", "CCC"])
+    assert math.isnan(missing.loc["CCC", "net_net"]) and math.isnan(missing.loc["CCC", "buffett_roe_pass"])
+    # 格雷厄姆防御性得分：缺失的输入不计为未满足，亏损仍计为未满足，可评估条目太少时为NaN
+    assert table.loc["AAA", "graham_defensive_score"] == 2 and table.loc["BBB", "graham_defensive_score"] == 1
+    assert math.isnan(missing.loc["CCC", "graham_defensive_score"])
+    from src.utils.fundamentals import compute_factors
+    partial = compute_factors(pd.DataFrame.from_dict({
+        "THREE": {"price": 10.0, "trailing_eps": 1.0, "book_value_per_share": 8.0},  # P/E、P/B、P/E×P/B 均满足
+        "TWO": {"price": 10.0, "trailing_eps": 1.0, "current_ratio": 3.0},
+    }, orient="index"))
+    assert partial.loc["THREE", "graham_defensive_score"] == 3
+    assert math.isnan(partial.loc["TWO", "graham_defensive_score"])
+
+    # 单只股票没有可比对象，不给出排名
+    single = _make_engine().build_table(["AAA"])
+    assert math.isnan(single.loc["AAA", "magic_formula_rank"]) and single.loc["AAA", "magic_formula_pool"] == 1
+
+    print("✅ 因子计算正确")
+
+
+def test_factor_cache_per_fiscal_period():
+    """测试按财报期缓存：下一期财报预计发布前使用缓存，之后每天重新获取直到出现新财报"""
+    print("\n🧪 测试因子缓存")
+    print("=" * 60)
+
+    day = 86400
+    quarter_end = SAMPLE_RAW["AAA"]["most_recent_quarter"]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        calls = []
+        _make_engine(cache_dir, calls).build_table(["AAA", "BBB"], now=quarter_end + 30 * day)
+        assert sorted(calls) == ["AAA", "BBB"]
+
+        # 新的引擎实例从磁盘读取缓存；跨过日历季度（7月）但新财报还没发布，AAA 仍然有效
+        calls.clear()
+        table = _make_engine(cache_dir, calls).build_table(["AAA", "BBB"], now=quarter_end + 100 * day)
+        assert calls == ["BBB"]  # BBB 没有财报期，按 recheck_seconds 过期
+        assert math.isclose(table.loc["AAA", "pe"], 20.0)
+
+        # 下一期财报预计已发布（季度结束后 91+45 天）：重新获取，仍是旧财报则一天内不再重复获取
+        calls.clear()
+        _make_engine(cache_dir, calls).build_table(["AAA"], now=quarter_end + 140 * day)
+        _make_engine(cache_dir, calls).build_table(["AAA"], now=quarter_end + 140.5 * day)
+        assert calls == ["AAA"]
+
+    print("✅ 因子缓存正常")
+
+
+def test_format_factor_table():
+    """测试因子表格式化"""
+    print("\n🧪 测试因子表格式化")
+    print("=" * 60)
+
+    engine = _make_engine()
+    table = engine.build_table(["AAA", "BBB"])
+    markdown = engine.format_factor_table(table, ["roe", "pe", "net_net", "magic_formula_rank"])
+    print(markdown)
+
+    lines = markdown.splitlines()
+    assert lines[0] == "| 股票 | ROE | P/E | 净流动资产股 | 魔法公式排名 |"
+    assert "| AAA | 20.0% | 20.00 | 否 | 1/2 |" in lines
+    assert "| BBB |" in lines[3] and "N/A" in lines[3]
+
+    # 缺少输入的布尔因子和单只股票的排名显示为 N/A
+    single = engine.build_table(["CCC"])
+    assert engine.format_factor_table(single, ["net_net", "buffett_roe_pass", "magic_formula_rank",
+                                               "graham_defensive_score"]).splitlines()[2] == "| CCC | N/A | N/A | N/A | N/A |"
+
+    print("✅ 因子表格式化正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试基本面因子引擎")
+    print("=" * 80)
+
+    test_factor_computation()
+    test_factor_cache_per_fiscal_period()
+    test_format_factor_table()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
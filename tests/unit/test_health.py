@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试健康检查：并发探测各Agent的会话存储、存储状态和 /health 接口
+"""
+
+import os
+import time
+import tempfile
+
+# 导入路径现在由conftest.py统一处理
+
+
+class _SlowStorage:
+    """包装会话存储，探测时额外等待或抛出异常"""
+
+    def __init__(self, storage, delay=0.0, fail=False):
+        self._storage = storage
+        self.delay = delay
+        self.fail = fail
+
+    def get_all_session_ids(self, user_id=None, entity_id=None):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("no such table")
+        return self._storage.get_all_session_ids(user_id, entity_id)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+class _Entity:
+    def __init__(self, agent_id, storage):
+        self.agent_id = agent_id
+        self.name = agent_id
+        self.storage = storage
+
+
+def test_probes_run_concurrently_and_report_storage():
+    """测试各Agent探测并发执行，结果包含延迟、会话数和存储指标，并在缓存时间内复用"""
+    print("🧪 测试健康检查")
+    print("=" * 60)
+
+    import asyncio
+    from agno.storage.session.agent import AgentSession
+    from src.storage import StorageEngine
+    from src.utils.health import HealthMonitor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = StorageEngine(os.path.join(tmp, "agents.db"))
+        try:
+            agents = []
+            for i in range(6):
+                storage = engine.storage(f"master{i}_agent")
+                storage.upsert(AgentSession(session_id=f"s{i}", agent_id=f"master{i}", user_id="u1"))
+                agents.append(_Entity(f"master{i}", _SlowStorage(storage, delay=0.2)))
+            agents.append(_Entity("no_storage", None))
+            assert engine.flush(5)
+
+            monitor = HealthMonitor(agents, storage_engine=engine, settings={"cache_seconds": 60, "slow_ms": 5000})
+            result = asyncio.run(monitor.check())
+            print(f"📊 检查耗时 {result['duration_ms']:.0f}ms，状态 {result['status']}")
+            # 6个各0.2秒的探测并发执行
+            assert result["status"] == "ok" and result["duration_ms"] < 6 * 200 * 0.6
+            master = result["agents"]["master0"]
+            assert master["status"] == "ok" and master["sessions"] == 1 and master["latency_ms"] >= 200
+            assert result["agents"]["no_storage"]["status"] == "no_storage"
+
+            storage = result["storage"]
+            assert storage["status"] == "ok" and storage["ping_ms"] >= 0 and storage["db_bytes"] > 0
+            assert storage["write_queue"]["queue_depth"] == 0 and storage["schema_version"] == engine.schema_version
+
+            again = asyncio.run(monitor.check())
+            assert again is result
+            assert asyncio.run(monitor.check(refresh=True)) is not result
+        finally:
+            engine.close()
+
+    print("✅ 健康检查正常")
+
+
+def test_health_endpoint_status_codes():
+    """测试 /health 接口：部分Agent异常或超时为 degraded，全部异常为 down 并返回503"""
+    print("\n🧪 测试 /health 接口")
+    print("=" * 60)
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src.storage import StorageEngine
+    from src.utils.health import HealthMonitor, create_health_router
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = StorageEngine(os.path.join(tmp, "agents.db"))
+        try:
+            good = _Entity("buffett", engine.storage("buffett_agent"))
+            broken = _Entity("munger", _SlowStorage(engine.storage("munger_agent"), fail=True))
+            hung = _Entity("graham", _SlowStorage(engine.storage("graham_agent"), delay=1.0))
+            settings = {"cache_seconds": 0, "timeout_seconds": 0.3}
+
+            app = FastAPI()
+            app.include_router(create_health_router(HealthMonitor([good, broken, hung], storage_engine=engine,
+                                                                  settings=settings)))
+            response = TestClient(app).get("/health")
+            body = response.json()
+            print(f"📊 /health: {response.status_code} {body['status']}")
+            assert response.status_code == 200 and body["status"] == "degraded"
+            assert body["agents"]["buffett"]["status"] == "ok"
+            assert body["agents"]["munger"]["status"] == "error" and "no such table" in body["agents"]["munger"]["error"]
+            assert body["agents"]["graham"]["status"] == "error" and "超时" in body["agents"]["graham"]["error"]
+
+            app = FastAPI()
+            app.include_router(create_health_router(HealthMonitor([broken], storage_engine=engine, settings=settings)))
+            response = TestClient(app).get("/health")
+            assert response.status_code == 503 and response.json()["status"] == "down"
+        finally:
+            engine.close()
+
+    print("✅ /health 接口正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试健康检查")
+    print("=" * 80)
+
+    test_probes_run_concurrently_and_report_storage()
+    test_health_endpoint_status_codes()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
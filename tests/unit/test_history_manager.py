@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+测试对话历史窗口：最近几轮原样保留、更早轮次折叠为滚动摘要、历史token上限和摘要缓存
+"""
+
+import os
+import tempfile
+
+# 导入路径现在由conftest.py统一处理
+
+ANALYSIS = ("## 投资建议\n建议买入，护城河稳固。\n\n"
+            + "- 自由现金流连续十年增长，资本回报率高于行业平均水平\n" * 3
+            + "估值、管理层、竞争格局的详细讨论。" * 120)
+
+
+def _run(index, tool_chars=6000):
+    from agno.models.message import Message
+    from agno.run.response import RunResponse
+    return RunResponse(run_id=f"run{index}", session_id="s1", content=f"第{index}轮分析\n{ANALYSIS}", messages=[
+        Message(role="system", content="你是巴菲特"),
+        Message(role="user", content=f"第{index}个问题：AAPL 值得买吗？"),
+        Message(role="tool", content="行情" * (tool_chars // 2), tool_call_id=f"c{index}"),
+        Message(role="assistant", content=f"第{index}轮分析\n{ANALYSIS}"),
+    ])
+
+
+def test_window_folds_old_runs_under_token_cap():
+    """测试超出原样轮数和token上限的轮次折叠进摘要，缓存的摘要只追加新轮次"""
+    print("🧪 测试历史窗口")
+    print("=" * 60)
+
+    from src.utils.history_manager import HistoryManager
+
+    manager = HistoryManager(max_context_tokens=6000, summary_tokens=600, tool_result_tokens=300)
+    runs = [_run(i) for i in range(1, 9)]
+
+    window = manager.build_window(runs, max_verbatim_runs=5, skip_role="system")
+    print(f"📏 历史token: {window.tokens}，原样 {len(window.verbatim_runs)} 轮，折叠 {window.folded_runs} 轮")
+    assert window.tokens <= 6000
+    assert [run.run_id for run in window.verbatim_runs] == ["run7", "run8"]
+    assert window.folded_runs == 6 and window.covered_run_id == "run6"
+    assert "第1轮" in window.summary and "结论：买入" in window.summary
+    assert all(message.role != "system" for message in window.messages)
+    tool = next(message for message in window.messages if message.role == "tool")
+    assert "已截断" in tool.content and runs[-1].messages[2].content.startswith("行情")
+
+    # 新增一轮后复用缓存：已折叠的轮次不重新计算
+    runs.append(_run(9))
+    calls = []
+    original = manager._summarize_run
+    manager._summarize_run = lambda run, turn: calls.append(run.run_id) or original(run, turn)
+    again = manager.build_window(runs, 5, (window.summary, window.covered_run_id), "system")
+    assert again.summary_reused and calls == ["run7"]
+    assert again.summary.startswith(window.summary.split("\n")[0]) and again.covered_run_id == "run7"
+
+    # 缓存指向的轮次已不在会话中时重新折叠
+    rebuilt = manager.build_window(runs[3:], 5, (window.summary, "missing"), "system")
+    assert not rebuilt.summary_reused and "第1个问题" not in rebuilt.summary and "第4个问题" in rebuilt.summary
+
+    # 只剩最近一轮仍然超限时截断其中的长消息
+    tight = HistoryManager(max_context_tokens=500, tool_result_tokens=300).build_window(runs, 5, None, "system")
+    assert len(tight.verbatim_runs) == 1 and tight.tokens <= 500 + 50
+
+    print("✅ 历史窗口正常")
+
+
+def test_agent_history_is_bounded_and_summary_persisted():
+    """测试 Agent 使用窗口记忆后每轮历史token有上限，摘要随会话落盘并在重新加载后复用"""
+    print("\n🧪 测试 Agent 历史窗口")
+    print("=" * 60)
+
+    from agno.agent import Agent
+    from agno.memory.v2.memory import Memory
+    from agno.models.openai.like import OpenAILike
+    from src.storage import StorageEngine
+    from src.utils.history_manager import HistoryManager, HistoryWindowMemory, HistoryWindowAgent, HISTORY_SUMMARY_KEY
+    from src.utils.mock_llm_server import MockLLMServer, MockLLMConfig
+
+    def last_prompt_tokens(memory_factory, storage, turns=8, agent_class=Agent):
+        with MockLLMServer(MockLLMConfig(reply=ANALYSIS, prefix_cache_block=0)) as server:
+            agent = agent_class(model=OpenAILike(id="mock-model", api_key="test", base_url=server.base_url),
+                                memory=memory_factory(), storage=storage, session_id="chat-1",
+                                add_history_to_messages=True, num_history_responses=5)
+            sizes = []
+            for turn in range(turns):
+                before = server.stats["prompt_tokens"]
+                agent.run(f"第{turn}个问题：AAPL 的护城河怎么样？", stream=False)
+                sizes.append(server.stats["prompt_tokens"] - before)
+            # 同一个 Agent 服务另一位用户的新会话（Playground 中所有会话共用一个 Agent）
+            agent.run("KO 的分红稳定吗？", session_id="chat-2", user_id="userB", stream=False)
+            return agent, sizes
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = StorageEngine(os.path.join(tmp, "agents.db"))
+        try:
+            _, baseline = last_prompt_tokens(Memory, engine.storage("baseline_agent"))
+            manager = HistoryManager(max_context_tokens=2500, summary_tokens=500)
+            agent, windowed = last_prompt_tokens(lambda: HistoryWindowMemory(manager), engine.storage("window_agent"),
+                                                 agent_class=HistoryWindowAgent)
+            print(f"📊 每轮提示token 原始: {baseline}")
+            print(f"📊 每轮提示token 窗口: {windowed}")
+            assert max(windowed) < max(baseline)
+            assert agent.memory.last_window.tokens <= 2500 and agent.memory.last_window.folded_runs > 0
+
+            stored = engine.storage("window_agent").read("chat-1")
+            summary = stored.session_data[HISTORY_SUMMARY_KEY]
+            assert "第1轮" in summary["summary"] and summary["covered_run_id"]
+            assert not (stored.memory.get("summaries") or {})
+            # 其他会话的行不包含这个会话的摘要
+            other = engine.storage("window_agent").read("chat-2", user_id="userB")
+            assert HISTORY_SUMMARY_KEY not in (other.session_data or {}) and not (other.memory.get("summaries") or {})
+
+            # 新的 Agent 实例从存储加载会话后沿用摘要，只折叠新增的轮次
+            reloaded = HistoryWindowAgent(model=agent.model, memory=HistoryWindowMemory(manager), session_id="chat-1",
+                                          storage=engine.storage("window_agent"), add_history_to_messages=True,
+                                          num_history_responses=5)
+            reloaded.read_from_storage(session_id="chat-1")
+            messages = reloaded.memory.get_messages_from_last_n_runs(session_id="chat-1", last_n=5, skip_role="system")
+            assert reloaded.memory.last_window.summary_reused
+            assert messages[0].content.startswith("以下是本次会话较早对话的摘要")
+        finally:
+            engine.close()
+
+    print("✅ Agent 历史窗口正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试对话历史窗口")
+    print("=" * 80)
+
+    test_window_folds_old_runs_under_token_cap()
+    test_agent_history_is_bounded_and_summary_persisted()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+测试增量综合分析
+用延迟到达的模拟大师结果验证滚动状态和截止时间
+"""
+
+import time
+import queue
+import threading
+
+# 导入路径现在由conftest.py统一处理
+
+RESULTS = {
+    "Warren Buffett": ("## 投资建议\n建议买入。\n- 护城河宽广，品牌定价权强\n- ROE长期保持在30%以上", 0.05),
+    "Charlie Munger": ("## 结论\n值得投资，建议买入。\n- 管理层理性，资本配置优秀", 0.1),
+    "Benjamin Graham": ("## 投资建议\n建议卖出。\n- P/E远高于15倍，缺乏安全边际", 0.15),
+    "Ray Dalio": ("## 投资建议\n继续持有。\n- 宏观周期处于后期，注意分散风险", 1.0),
+}
+
+
+class FakeAgent:
+    """记录调用次数的最终报告Agent"""
+    calls = []
+
+    def run(self, prompt):
+        FakeAgent.calls.append(prompt)
+
+        class Response:
+            content = "# 综合报告"
+        return Response()
+
+
+def _produce(result_queue, names):
+    for name in names:
+        text, delay = RESULTS[name]
+
+        def worker(name=name, text=text, delay=delay):
+            time.sleep(delay)
+            result_queue.put({"agent": name, "symbol": "AAPL", "analysis": text, "style": name})
+        threading.Thread(target=worker, daemon=True).start()
+
+
+def test_rolling_state():
+    """测试滚动状态的统计、共识和分歧"""
+    print("🧪 测试滚动综合状态")
+    print("=" * 60)
+
+    from src.utils.incremental_synthesis import RollingSynthesisState
+    from src.utils.token_manager import TokenManager
+
+    state = RollingSynthesisState(symbol="AAPL", expected_masters=list(RESULTS))
+    for i, name in enumerate(["Warren Buffett", "Charlie Munger", "Benjamin Graham"]):
+        state.add({"agent": name, "symbol": "AAPL", "analysis": RESULTS[name][0]}, TokenManager(), i)
+
+    assert state.tally == {"买入": 2, "卖出": 1}
+    assert state.consensus() == "买入"
+    assert [e["agent"] for e in state.disagreements()] == ["Benjamin Graham"]
+    assert state.missing == ["Ray Dalio"]
+
+    rendered = state.render()
+    print(rendered)
+    assert "多数意见: 买入（67%）" in rendered
+    assert "未按时完成的大师: Ray Dalio" in rendered
+    assert "- 护城河宽广，品牌定价权强" in rendered
+
+    print("✅ 滚动综合状态正常")
+
+
+def test_deadline_with_partial_results():
+    """测试截止时间到达时用已完成的大师生成报告"""
+    print("\n🧪 测试截止时间")
+    print("=" * 60)
+
+    from src.utils.incremental_synthesis import IncrementalSynthesizer
+    from src.utils.token_manager import TokenManager
+
+    FakeAgent.calls.clear()
+    result_queue = queue.Queue()
+    _produce(result_queue, list(RESULTS))
+
+    synthesizer = IncrementalSynthesizer(TokenManager(), agent_factory=FakeAgent, deadline_seconds=0.5)
+    updates = []
+    start = time.perf_counter()
+    outcome = synthesizer.consume("AAPL", result_queue, list(RESULTS),
+                                  on_update=lambda state, entry: updates.append(entry["agent"]))
+    elapsed = time.perf_counter() - start
+
+    assert outcome["timed_out"] is True
+    assert elapsed < 0.9  # 不等待1秒后才到达的Ray Dalio
+    assert updates == ["Warren Buffett", "Charlie Munger", "Benjamin Graham"]
+    assert outcome["state"].missing == ["Ray Dalio"]
+    assert outcome["report"] == "# 综合报告"
+    assert len(FakeAgent.calls) == 1  # 只有一次最终LLM调用
+    assert "未按时完成的大师: Ray Dalio" in FakeAgent.calls[0]
+
+    print("✅ 截止时间处理正常")
+
+
+def test_finishes_when_last_master_lands():
+    """测试最后一位大师到达后立即生成报告"""
+    print("\n🧪 测试全部完成")
+    print("=" * 60)
+
+    from src.utils.incremental_synthesis import IncrementalSynthesizer
+    from src.utils.token_manager import TokenManager
+
+    names = ["Warren Buffett", "Charlie Munger", "Benjamin Graham"]
+    result_queue = queue.Queue()
+    _produce(result_queue, names)
+
+    outcome = IncrementalSynthesizer(TokenManager()).consume("AAPL", result_queue, names, deadline_seconds=5)
+
+    assert outcome["timed_out"] is False
+    assert outcome["wait_time"] < 1
+    assert len(outcome["individual_analyses"]) == 3
+    assert outcome["report"].startswith("股票: AAPL")
+
+    print("✅ 全部完成时立即生成报告")
+
+
+def test_cancel_skips_remaining_masters():
+    """测试截止后设置取消事件：串行模式下尚未开始的大师不再调用模型，完成的结果不再入队"""
+    print("\n🧪 测试取消剩余大师")
+    print("=" * 60)
+
+    import os
+    from src.agents.configurable_investment_agent import ConfigurableMultiAgentAnalyzer
+
+    ran = []
+
+    class SlowMaster:
+        precomputed_factors = []
+        description = "测试"
+
+        def __init__(self, name):
+            self.agent_name = name
+
+        def analyze_stock(self, symbol, *args):
+            ran.append(self.agent_name)
+            time.sleep(0.1)
+            return {"agent": self.agent_name, "symbol": symbol, "analysis": RESULTS[self.agent_name][0], "style": "测试"}
+
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    try:
+        analyzer = ConfigurableMultiAgentAnalyzer()
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_API_KEY", None)
+        else:
+            os.environ["LLM_API_KEY"] = previous
+    analyzer.factor_engine = None
+    analyzer._build_news_digest = lambda symbol: None
+    analyzer.active_agents = {name: SlowMaster(name) for name in RESULTS}
+
+    result_queue, cancel = queue.Queue(), threading.Event()
+    worker = threading.Thread(target=analyzer.analyze_stock_multi_perspective, daemon=True,
+                              kwargs={"symbol": "AAPL", "parallel": False, "result_queue": result_queue,
+                                      "cancel_event": cancel})
+    worker.start()
+    assert result_queue.get(timeout=1)["agent"] == "Warren Buffett"
+    time.sleep(0.05)  # 第二位大师正在分析
+    cancel.set()
+    worker.join(timeout=1)
+
+    assert ran == ["Warren Buffett", "Charlie Munger"]
+    assert result_queue.empty()
+
+    print("✅ 取消剩余大师正常")
+
+
+def test_incremental_mode_end_to_end():
+    """测试 analysis_mode="incremental" 从大师分析、增量综合到最终报告完整跑通，截止后未完成的大师被记为缺席"""
+    print("\n🧪 测试增量模式端到端")
+    print("=" * 60)
+
+    import os
+    from src.agents.multi_agent_investment_v2 import MultiAgentInvestmentAnalyzerV2
+
+    class StubMaster:
+        precomputed_factors = []
+        description = "测试"
+
+        def __init__(self, name):
+            self.agent_name = name
+
+        def analyze_stock(self, symbol, *args):
+            time.sleep(RESULTS[self.agent_name][1])
+            return {"agent": self.agent_name, "symbol": symbol, "analysis": RESULTS[self.agent_name][0], "style": "测试"}
+
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    try:
+        analyzer = MultiAgentInvestmentAnalyzerV2()
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_API_KEY", None)
+        else:
+            os.environ["LLM_API_KEY"] = previous
+    analyzer.result_store = None
+    config_analyzer = analyzer.config_analyzer
+    config_analyzer.factor_engine = None
+    config_analyzer.analysis_memory = None
+    config_analyzer._build_news_digest = lambda symbol: None
+    config_analyzer.load_agents = lambda masters: None
+    config_analyzer.active_agents = {name: StubMaster(name) for name in RESULTS}
+    FakeAgent.calls.clear()
+    analyzer.synthesizer.incremental_synthesizer.agent_factory = FakeAgent
+
+    masters = analyzer.available_masters[:len(RESULTS)]
+    result = analyzer.analyze_stock_multi_master("AAPL", masters, analysis_mode="incremental", deadline_seconds=0.5)
+
+    assert result["analysis_mode"] == "incremental" and result["synthesis"] == "# 综合报告"
+    assert [a["agent"] for a in result["individual_analyses"]] == ["Warren Buffett", "Charlie Munger", "Benjamin Graham"]
+    assert result["missing_masters"] == ["Ray Dalio"] and result["performance"]["timed_out"] is True
+    assert result["performance"]["total_time"] < 0.9 and result["run_id"] is None
+    assert len(FakeAgent.calls) == 1
+
+    print("✅ 增量模式端到端正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试增量综合分析")
+    print("=" * 80)
+
+    test_rolling_state()
+    test_deadline_with_partial_results()
+    test_finishes_when_last_master_lands()
+    test_cancel_skips_remaining_masters()
+    test_incremental_mode_end_to_end()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
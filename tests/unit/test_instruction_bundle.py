@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+测试预编译的大师指令包
+"""
+
+import os
+import copy
+import dataclasses
+
+import yaml
+
+# 导入路径现在由conftest.py统一处理
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "src", "config", "investment_agents_config.yaml")
+
+
+def _load_config():
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def test_bundle_compiled_once_per_config():
+    """测试同一份配置只编译一次，配置变化生成新版本"""
+    print("🧪 测试指令包缓存")
+    print("=" * 60)
+
+    from src.utils.instruction_bundle import CHAT_NOTES, compile_master_bundle, config_hash
+
+    masters = _load_config()["investment_masters"]
+    buffett = masters["warren_buffett"]
+
+    bundle = compile_master_bundle(buffett)
+    assert compile_master_bundle(copy.deepcopy(buffett)) is bundle
+    # 键顺序不影响配置哈希
+    assert config_hash(dict(reversed(list(buffett.items())))) == bundle.config_hash
+
+    assert bundle.instructions[0] == f"你是{buffett['agent_name']}，{buffett['description']}"
+    assert f"- {buffett['investment_philosophy'][0]}" in bundle.instructions
+    assert bundle.instructions[-1] == f"- 举例特点：{buffett['style_characteristics']['examples']}"
+    assert bundle.chat_instructions == bundle.instructions + CHAT_NOTES
+    assert bundle.framework.startswith("1. **") and bundle.framework in bundle.text
+    assert bundle.token_count > 100
+
+    try:
+        bundle.text = "篡改"
+        assert False, "指令包应当不可变"
+    except dataclasses.FrozenInstanceError:
+        pass
+
+    changed = copy.deepcopy(buffett)
+    changed["instructions"].append("关注资本配置记录")
+    updated = compile_master_bundle(changed)
+    assert updated is not bundle and updated.content_hash != bundle.content_hash
+    assert "- 关注资本配置记录" in updated.instructions and "- 关注资本配置记录" not in bundle.instructions
+
+    hashes = {compile_master_bundle(config).content_hash for config in masters.values()}
+    assert len(hashes) == len(masters)
+    for name, config in masters.items():
+        print(f"📦 {name}: {compile_master_bundle(config).token_count} tokens")
+
+    print("✅ 指令包缓存正常")
+
+
+def test_agent_and_factory_share_bundle():
+    """测试分析Agent与工厂（Playground/CLI使用）拿到同一份指令包"""
+    print("\n🧪 测试指令包共享")
+    print("=" * 60)
+
+    from src.agents.configurable_investment_agent import ConfigurableInvestmentAgent, InvestmentMasterAgent
+
+    factory = ConfigurableInvestmentAgent(CONFIG_PATH)
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    try:
+        agent = InvestmentMasterAgent(factory.get_master_info("peter_lynch"), "mock-model", factory.config)
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_API_KEY", None)
+        else:
+            os.environ["LLM_API_KEY"] = previous
+
+    bundle = factory.get_instruction_bundle("peter_lynch")
+    assert agent.bundle is bundle
+    assert agent.agent.instructions == list(bundle.instructions)
+    assert bundle.framework in agent._build_analysis_prompt("AAPL")
+
+    print("✅ 指令包共享正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试预编译指令包")
+    print("=" * 80)
+
+    test_bundle_compiled_once_per_config()
+    test_agent_and_factory_share_bundle()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
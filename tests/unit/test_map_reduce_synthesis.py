@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试分层 Map-Reduce 综合
+7位大师 × 50只股票，验证单次调用token上限和可预估的调用次数
+"""
+
+import threading
+
+# 导入路径现在由conftest.py统一处理
+
+MASTERS = ["Warren Buffett", "Charlie Munger", "Peter Lynch", "Benjamin Graham",
+           "Ray Dalio", "Joel Greenblatt", "David Tepper"]
+SYMBOLS = [f"S{i:02d}" for i in range(50)]
+
+
+class VerboseAgent:
+    """总是返回超长输出的模拟Agent，用于验证摘要长度被强制截断"""
+    prompts = []
+    lock = threading.Lock()
+
+    def run(self, prompt):
+        with VerboseAgent.lock:
+            VerboseAgent.prompts.append(prompt)
+
+        class Response:
+            content = "分析要点" * 1000
+        return Response()
+
+
+def _analyses():
+    return [
+        {"agent": master, "symbol": symbol,
+         "analysis": f"## 投资建议\n建议买入{symbol}。\n" + f"- {master}认为{symbol}的护城河较宽，估值合理\n" * 40}
+        for symbol in SYMBOLS for master in MASTERS
+    ]
+
+
+def test_plan_is_predictable():
+    """测试调用计划"""
+    print("🧪 测试调用计划")
+    print("=" * 60)
+
+    from src.utils.map_reduce_synthesis import MapReduceSynthesizer
+    from src.utils.token_manager import TokenManager
+
+    synthesizer = MapReduceSynthesizer(TokenManager(), VerboseAgent, summary_tokens=300, window_tokens=3000)
+    assert synthesizer.fan_in == 9
+
+    plan = synthesizer.plan(350)
+    assert plan.reduce_levels == [39, 5]
+    assert plan.total_calls == 350 + 39 + 5 + 1
+    assert synthesizer.plan(5).total_calls == 6
+
+    print("✅ 调用计划可预估")
+
+
+def test_masters_by_symbols_bounded_calls():
+    """测试7位大师×50只股票的综合"""
+    print("\n🧪 测试大规模综合")
+    print("=" * 60)
+
+    from src.utils.map_reduce_synthesis import MapReduceSynthesizer
+    from src.utils.token_manager import TokenManager
+
+    token_manager = TokenManager()
+    synthesizer = MapReduceSynthesizer(token_manager, VerboseAgent, summary_tokens=300, window_tokens=3000)
+    analyses = _analyses()
+
+    for leaves in (MapReduceSynthesizer.group_by_master(analyses), synthesizer.group_by_symbol(analyses)):
+        VerboseAgent.prompts.clear()
+        result = synthesizer.synthesize(leaves, "50只股票对比")
+
+        print(f"📊 叶子 {len(leaves)} → 各层 {result['levels']}，调用 {result['calls']} 次，"
+              f"单次最大 {result['max_call_tokens']} tokens")
+        assert result["calls"] == result["plan"].total_calls == len(VerboseAgent.prompts)
+        assert result["max_call_tokens"] <= synthesizer.window_tokens
+        assert result["levels"][-1] <= synthesizer.fan_in
+
+    # 按股票分组时每个叶子保留全部大师的建议
+    assert len(leaves) == 50
+    assert all(leaves["S00"].count(master) >= 1 for master in MASTERS)
+
+    print("✅ 大规模综合调用受控")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试分层 Map-Reduce 综合")
+    print("=" * 80)
+
+    test_plan_is_predictable()
+    test_masters_by_symbols_bounded_calls()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+测试本地模拟LLM服务器和可配置的模型地址
+"""
+
+import os
+import json
+import time
+
+import httpx
+
+# 导入路径现在由conftest.py统一处理
+
+
+def test_base_url_resolution():
+    """测试 base_url 的优先级"""
+    print("🧪 测试模型地址解析")
+    print("=" * 60)
+
+    from src.utils.model_factory import resolve_base_url, create_model, DEFAULT_BASE_URL
+
+    previous = os.environ.pop("LLM_BASE_URL", None)
+    try:
+        assert resolve_base_url({}) == DEFAULT_BASE_URL
+        assert resolve_base_url({"base_url": "http://config/v1"}) == "http://config/v1"
+        os.environ["LLM_BASE_URL"] = "http://env/v1"
+        assert resolve_base_url({"base_url": "http://config/v1"}) == "http://env/v1"
+        assert create_model("qwen-plus", {"model_config": {}}).base_url == "http://env/v1"
+    finally:
+        os.environ.pop("LLM_BASE_URL", None)
+        if previous is not None:
+            os.environ["LLM_BASE_URL"] = previous
+
+    print("✅ 模型地址解析正常")
+
+
+def test_agent_tool_call_script():
+    """测试Agent通过模拟服务器完成工具调用"""
+    print("\n🧪 测试工具调用脚本")
+    print("=" * 60)
+
+    from agno.agent import Agent
+    from src.utils.mock_llm_server import MockLLMServer, MockLLMConfig
+    from src.utils.model_factory import create_model
+
+    calls = []
+
+    def get_current_stock_price(symbol: str) -> str:
+        """Get the current stock price."""
+        calls.append(symbol)
+        return "189.50"
+
+    config = MockLLMConfig(
+        tool_script=[{"tool_calls": [{"name": "get_current_stock_price", "arguments": {"symbol": "AAPL"}}]}],
+        reply="AAPL 当前价格 189.50",
+    )
+    with MockLLMServer(config) as server:
+        model = create_model("mock-model", {"model_config": {"base_url": server.base_url}}, api_key="test")
+        agent = Agent(model=model, tools=[get_current_stock_price])
+        response = agent.run("AAPL现在多少钱？")
+
+        assert calls == ["AAPL"]
+        assert response.content == "AAPL 当前价格 189.50"
+        assert server.stats["requests"] == 2
+
+    print("✅ 工具调用脚本正常")
+
+
+def test_streaming_throughput_and_rate_limit():
+    """测试流式输出吞吐和429注入"""
+    print("\n🧪 测试流式输出和限流注入")
+    print("=" * 60)
+
+    from src.utils.mock_llm_server import MockLLMServer, MockLLMConfig
+    from src.utils.replay import LatencyModel
+
+    config = MockLLMConfig(latency=LatencyModel.parse("fixed:0.05"), tokens_per_second=200,
+                           completion_tokens=20, rate_limit_every=3)
+    with MockLLMServer(config) as server:
+        body = {"model": "m", "stream": True, "stream_options": {"include_usage": True},
+                "messages": [{"role": "user", "content": "hi"}]}
+
+        start = time.perf_counter()
+        with httpx.stream("POST", f"{server.base_url}/chat/completions", json=body) as r:
+            lines = [line for line in r.iter_lines() if line.startswith("data: ")]
+        elapsed = time.perf_counter() - start
+
+        assert lines[-1] == "data: [DONE]"
+        chunks = [json.loads(line[6:]) for line in lines[:-1]]
+        text = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+        assert text.endswith("tok19")
+        assert chunks[-1]["usage"]["completion_tokens"] == 22
+        assert elapsed >= 0.05 + 22 / 200 * 0.9
+
+        plain = dict(body, stream=False)
+        assert httpx.post(f"{server.base_url}/chat/completions", json=plain).status_code == 200
+        limited = httpx.post(f"{server.base_url}/chat/completions", json=plain)
+        assert limited.status_code == 429
+        assert limited.headers["Retry-After"] == "1.0"
+        assert server.stats["rate_limited"] == 1
+
+    print("✅ 流式输出和限流注入正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试模拟LLM服务器")
+    print("=" * 80)
+
+    test_base_url_resolution()
+    test_agent_tool_call_script()
+    test_streaming_throughput_and_rate_limit()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
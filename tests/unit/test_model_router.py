@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+测试分级模型路由和SLO降级
+"""
+
+import os
+
+import yaml
+
+# 导入路径现在由conftest.py统一处理
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "src", "config", "investment_agents_config.yaml")
+
+
+def test_route_resolution():
+    """测试路由配置和默认值"""
+    print("🧪 测试路由配置")
+    print("=" * 60)
+
+    from src.utils.model_router import ModelRouter
+
+    router = ModelRouter({"default_model": "plus", "team_coordinator_model": "max"})
+    assert router.route_config("summarization").model == "plus"
+    assert router.route_config("team_coordination").model == "max"
+    assert router.choose("synthesis") == "plus"
+    try:
+        router.route_config("translation")
+        assert False, "未知路由应当报错"
+    except ValueError:
+        pass
+
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        model_config = yaml.safe_load(f)["model_config"]
+    router = ModelRouter(model_config)
+    assert router.route_config("synthesis").model == "qwen-max-latest"
+    assert router.route_config("summarization").model == "qwen-turbo-latest"
+    assert router.route_config("master_analysis").fallback == "qwen-turbo-latest"
+
+    print("✅ 路由配置正常")
+
+
+def test_fallback_when_slo_at_risk():
+    """测试主模型延迟逼近SLO时切换备用模型，并按路由统计延迟和token"""
+    print("\n🧪 测试SLO降级")
+    print("=" * 60)
+
+    from agno.agent import Agent
+    from src.utils.mock_llm_server import MockLLMServer, MockLLMConfig
+    from src.utils.model_router import ModelRouter
+    from src.utils.replay import LatencyModel
+
+    model_config = {
+        "default_model": "big-model",
+        "routing": {"risk_ratio": 0.8, "min_samples": 3, "probe_every": 4},
+        "routes": {"synthesis": {"model": "big-model", "fallback": "fast-model", "latency_slo_seconds": 0.1}},
+    }
+    router = ModelRouter(model_config)
+
+    with MockLLMServer(MockLLMConfig(latency=LatencyModel.parse("fixed:0.12"), reply="综合报告")) as server:
+        model_config["base_url"] = server.base_url
+        agent = Agent(model=router.create_model("synthesis", api_key="test"))
+
+        used = []
+        for i in range(7):
+            if i == 5:
+                list(agent.run("生成报告", stream=True))  # 流式调用同样路由和统计
+            else:
+                agent.run("生成报告", stream=False)
+            used.append(agent.model.id)
+
+    print(f"🔀 各次调用使用的模型: {used}")
+    # 前3次建立延迟样本后判定有风险，之后降级；第4次降级调用试探主模型
+    assert used == ["big-model"] * 3 + ["fast-model"] * 3 + ["big-model"]
+
+    rows = {row["model"]: row for row in router.report()}
+    print(router.format_report())
+    assert rows["big-model"]["calls"] == 4 and rows["big-model"]["fallback_calls"] == 0
+    assert rows["fast-model"]["calls"] == 3 and rows["fast-model"]["fallback_calls"] == 3
+    assert rows["fast-model"]["output_tokens"] > 0 and rows["big-model"]["input_tokens"] > 0
+    assert rows["big-model"]["p50_seconds"] >= 0.12
+
+    print("✅ SLO降级正常")
+
+
+def test_slo_window_ignores_errors_and_recovers():
+    """测试出错调用不计入延迟窗口，降级期间试探主模型足够快时立即切回"""
+    print("\n🧪 测试SLO窗口恢复")
+    print("=" * 60)
+
+    from src.utils.model_router import ModelRouter
+
+    router = ModelRouter({
+        "default_model": "big-model",
+        "routing": {"risk_ratio": 0.8, "min_samples": 3, "probe_every": 2},
+        "routes": {"synthesis": {"model": "big-model", "fallback": "fast-model", "latency_slo_seconds": 1.0}},
+    })
+
+    # 超时报错的调用不会把主模型推入降级
+    for _ in range(3):
+        router.record("synthesis", "big-model", 5.0, error=True)
+    assert router.choose("synthesis") == "big-model"
+
+    for _ in range(3):
+        router.record("synthesis", "big-model", 2.0)
+    assert [router.choose("synthesis") for _ in range(2)] == ["fast-model", "big-model"]
+
+    # 试探调用在阈值内返回，窗口清空后直接回到主模型
+    router.record("synthesis", "big-model", 0.3)
+    assert [router.choose("synthesis") for _ in range(3)] == ["big-model"] * 3
+    assert {row["model"]: row["errors"] for row in router.report()}["big-model"] == 3
+
+    print("✅ SLO窗口恢复正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试分级模型路由")
+    print("=" * 80)
+
+    test_route_resolution()
+    test_fallback_when_slo_at_risk()
+    test_slo_window_ignores_errors_and_recovers()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+测试提示词前缀稳定化和前缀缓存命中统计
+"""
+
+import os
+import copy
+
+import yaml
+
+# 导入路径现在由conftest.py统一处理
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "src", "config", "investment_agents_config.yaml")
+
+FACTOR_TABLES = {
+    "AAPL": "| 因子 | 数值 |\n|------|------|\n| P/E | 31.2 |\n| ROE | 147% |",
+    "KO": "| 因子 | 数值 |\n|------|------|\n| P/E | 24.8 |\n| 股息率 | 3.1% |",
+}
+
+
+def _load_config():
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def _compressed(agent, recommendation):
+    return {"agent": agent, "recommendation": recommendation,
+            "summary": f"{agent}认为当前估值{recommendation}理由充分", "key_points": ["现金流稳定", "护城河宽"]}
+
+
+def test_master_prompt_prefix_is_stable():
+    """测试同一位大师对不同股票、因子和新闻的提示词共享完整的固定前缀"""
+    print("🧪 测试大师提示词前缀")
+    print("=" * 60)
+
+    from src.agents.configurable_investment_agent import InvestmentMasterAgent
+    from src.utils.prompt_cache import VOLATILE_SECTION_HEADER, common_prefix_length
+
+    config = _load_config()
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    try:
+        for structured in (False, True):
+            config = copy.deepcopy(config)
+            config["structured_output"] = {"enabled": structured, "mode": "json"}
+            agent = InvestmentMasterAgent(config["investment_masters"]["warren_buffett"], "mock-model", config)
+            first = agent._build_analysis_prompt("AAPL", FACTOR_TABLES["AAPL"], "- 苹果发布新一代芯片")
+            second = agent._build_analysis_prompt("KO", FACTOR_TABLES["KO"])
+            third = agent._build_analysis_prompt("MSFT")
+
+            static_end = first.index(VOLATILE_SECTION_HEADER) + len(VOLATILE_SECTION_HEADER)
+            assert first[:static_end] == second[:static_end] == third[:static_end]
+            assert "AAPL" not in first[:static_end]
+            assert first.rstrip().endswith("**分析对象：** 股票 AAPL")
+            print(f"📐 结构化={structured}: 固定前缀 {static_end} 字符，"
+                  f"AAPL/KO 公共前缀 {common_prefix_length(first, second)} 字符")
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_API_KEY", None)
+        else:
+            os.environ["LLM_API_KEY"] = previous
+
+    print("✅ 大师提示词前缀稳定")
+
+
+def test_synthesis_prompt_has_no_timestamp():
+    """测试压缩模式综合提示词不含时间戳，且前缀跨股票不变"""
+    print("\n🧪 测试综合提示词前缀")
+    print("=" * 60)
+
+    from src.agents.multi_agent_investment_v2 import EnhancedInvestmentSynthesizer
+    from src.utils.prompt_cache import VOLATILE_SECTION_HEADER
+
+    previous = os.environ.get("LLM_API_KEY")
+    os.environ["LLM_API_KEY"] = "test"
+    try:
+        synthesizer = EnhancedInvestmentSynthesizer(model_id="mock-model")
+    finally:
+        if previous is None:
+            os.environ.pop("LLM_API_KEY", None)
+        else:
+            os.environ["LLM_API_KEY"] = previous
+
+    aapl = synthesizer._build_compressed_prompt("AAPL", [_compressed("Warren Buffett", "买入"),
+                                                         _compressed("Benjamin Graham", "卖出")])
+    ko = synthesizer._build_compressed_prompt("KO", [_compressed("Peter Lynch", "持有")])
+    static_end = aapl.index(VOLATILE_SECTION_HEADER)
+    assert aapl[:static_end] == ko[:static_end]
+    assert "分析时间" not in aapl and "AAPL" not in aapl[:static_end]
+    assert "| Warren Buffett | 买入 |" in aapl[static_end:]
+
+    print("✅ 综合提示词不含时间戳")
+
+
+def test_cache_ratio_reported():
+    """测试模型路由从 usage 中统计前缀缓存命中率"""
+    print("\n🧪 测试前缀缓存命中率")
+    print("=" * 60)
+
+    from agno.agent import Agent
+    from src.utils.mock_llm_server import MockLLMServer, MockLLMConfig
+    from src.utils.model_router import ModelRouter
+    from src.utils.prompt_cache import assemble_prompt, cached_prompt_tokens
+
+    assert cached_prompt_tokens({"prompt_tokens_details": {"cached_tokens": 128}}) == 128
+    assert cached_prompt_tokens({"prompt_tokens": 10}) == 0
+
+    static = "请以价值投资的视角分析下方指定的股票，重点关注护城河、管理层和安全边际。\n" * 40
+    model_config = {"default_model": "stable-model"}
+
+    with MockLLMServer(MockLLMConfig(reply="分析完成")) as server:
+        model_config["base_url"] = server.base_url
+        router = ModelRouter(model_config)
+        for route, build in (("master_analysis", lambda symbol: assemble_prompt(static, [f"股票 {symbol}"])),
+                             ("synthesis", lambda symbol: f"股票 {symbol}\n" + static)):
+            agent = Agent(model=router.create_model(route, api_key="test"))
+            for symbol in ("AAPL", "KO", "MSFT"):
+                agent.run(build(symbol), stream=False)
+        cached_total = server.stats["cached_tokens"]
+
+    print(router.format_report())
+    rows = {row["route"]: row for row in router.report()}
+    stable, volatile_first = rows["master_analysis"], rows["synthesis"]
+    assert stable["cached_tokens"] > 0 and 0 < stable["cache_ratio"] < 1
+    # 易变内容放在开头时，两次请求在股票代码处就分叉，几乎无法命中
+    assert stable["cache_ratio"] > volatile_first["cache_ratio"] + 0.3
+    assert cached_total == stable["cached_tokens"] + volatile_first["cached_tokens"]
+    assert "| 前缀缓存 |" in router.format_report()
+
+    print("✅ 前缀缓存命中率统计正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试提示词前缀稳定化")
+    print("=" * 80)
+
+    test_master_prompt_prefix_is_stable()
+    test_synthesis_prompt_has_no_timestamp()
+    test_cache_ratio_reported()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+测试跨股票排名引擎
+"""
+
+import math
+import time
+
+# 导入路径现在由conftest.py统一处理
+
+
+def _result(masters, synthesis=""):
+    return {
+        "individual_analyses": [{"agent": agent, "analysis": text, "style": "价值投资"} for agent, text in masters],
+        "synthesis": synthesis,
+    }
+
+
+def test_extract_signals():
+    """测试从分析文本中提取结构化信号"""
+    print("🧪 测试信号提取")
+    print("=" * 60)
+
+    from src.utils.ranking import extract_signals
+
+    report = """
+| 推荐操作 | 买入 |
+| 综合评分 | 8.5/10分 |
+| 风险等级 | 中 |
+- 信心度：高
+- 目标价格：$1,250.50
+"""
+    signals = extract_signals(report)
+    assert signals["rating"] == 8.5
+    assert signals["recommendation"] == 1.0
+    assert signals["risk"] == 0.5
+    assert signals["conviction"] == 1.0
+    assert signals["target_price"] == 1250.5
+
+    signals = extract_signals("建议卖出，信心度 40%，评分 3分")
+    assert signals["recommendation"] == 0.0
+    assert signals["conviction"] == 0.4
+    assert signals["rating"] == 3.0
+    assert math.isnan(signals["target_price"])
+
+    print("✅ 信号提取正常")
+
+
+def test_rank_with_weights():
+    """测试按权重跨大师汇总排名"""
+    print("\n🧪 测试加权排名")
+    print("=" * 60)
+
+    from src.utils.ranking import RankingEngine
+
+    all_results = {
+        "AAA": _result([("Buffett", "建议持有，评分 6/10"), ("Graham", "建议持有，评分 6/10")]),
+        "BBB": _result([("Buffett", "建议买入，评分 9/10，风险等级低"), ("Graham", "建议卖出，评分 2/10")],
+                       "| 综合评分 | 7/10 |"),
+        "CCC": _result([("Buffett", "无法判断")]),
+    }
+    engine = RankingEngine()
+    ranking = engine.rank(all_results)
+
+    assert list(ranking.index) == ["BBB", "AAA", "CCC"]
+    assert math.isnan(ranking.loc["CCC", "score"])
+    assert ranking.loc["BBB", "buy"] == 1 and ranking.loc["BBB", "sell"] == 1
+
+    rows = engine.format_ranking_rows(ranking).splitlines()
+    print("\n".join(rows))
+    assert rows[0].startswith("| 1 | BBB |") and "买入1/持有0/卖出1" in rows[0]
+    assert rows[-1] == "| 3 | CCC | 待评估 | 买入0/持有0/卖出0 |"
+
+    # 提高 Graham 的权重后，他看空的 BBB 落到 AAA 之后
+    config = {
+        "investment_masters": {"benjamin_graham": {"agent_name": "Graham"}},
+        "ranking": {"master_weights": {"benjamin_graham": 5.0}},
+    }
+    ranking = RankingEngine(config).rank(all_results)
+    assert list(ranking.index) == ["AAA", "BBB", "CCC"]
+
+    print("✅ 加权排名正常")
+
+
+def test_conviction_scales_recommendation():
+    """测试信心度缩放建议的幅度：高信心卖出排在持有和低信心卖出之后"""
+    print("\n🧪 测试信心度缩放")
+    print("=" * 60)
+
+    from src.utils.ranking import RankingEngine
+
+    all_results = {
+        "HOLD": _result([("Buffett", "建议持有，评分 5/10，信心度 低")]),
+        "SURE": _result([("Buffett", "建议卖出，评分 5/10，信心度 高")]),
+        "UNSURE": _result([("Buffett", "建议卖出，评分 5/10，信心度 30%")]),
+        "BUY": _result([("Buffett", "建议买入，评分 5/10，信心度 高")]),
+    }
+    ranking = RankingEngine().rank(all_results)
+    print(ranking["score"].round(2).to_dict())
+    assert list(ranking.index) == ["BUY", "HOLD", "UNSURE", "SURE"]
+    assert ranking.loc["HOLD", "score"] == 5.0
+
+    print("✅ 信心度缩放正常")
+
+
+def test_symbol_without_analyses():
+    """测试所有大师出错、综合报告为空的股票排在最后并显示待评估，计数为0"""
+    print("\n🧪 测试无分析结果的股票")
+    print("=" * 60)
+
+    from src.utils.ranking import RankingEngine
+
+    engine = RankingEngine()
+    ranking = engine.rank({"AAA": _result([("Buffett", "建议买入，评分 8/10")]), "EMPTY": _result([])})
+    rows = engine.format_ranking_rows(ranking).splitlines()
+    print("\n".join(rows))
+    assert list(ranking.index) == ["AAA", "EMPTY"] and ranking["buy"].dtype.kind == "i"
+    assert rows[-1] == "| 2 | EMPTY | 待评估 | 买入0/持有0/卖出0 |"
+
+    only_empty = engine.rank({"EMPTY": _result([])})
+    assert engine.format_ranking_rows(only_empty) == "| 1 | EMPTY | 待评估 | 买入0/持有0/卖出0 |"
+
+    print("✅ 无分析结果的股票正常")
+
+
+def test_rank_hundreds_of_symbols():
+    """测试数百只股票的排名速度"""
+    print("\n🧪 测试大规模排名")
+    print("=" * 60)
+
+    from src.utils.ranking import RankingEngine
+
+    all_results = {
+        f"S{i:03d}": _result(
+            [(f"Master{m}", f"建议{'买入' if (i + m) % 3 else '持有'}，评分 {(i * 7 + m) % 10}/10，信心度中等")
+             for m in range(7)],
+            f"| 综合评分 | {i % 10}/10 |"
+        )
+        for i in range(500)
+    }
+
+    start = time.perf_counter()
+    ranking = RankingEngine().rank(all_results)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"⚡ 排名 {len(ranking)} 只股票（{len(ranking) * 8} 个来源）耗时 {elapsed_ms:.0f} 毫秒")
+
+    assert len(ranking) == 500
+    assert ranking["score"].is_monotonic_decreasing
+    assert elapsed_ms < 3000
+
+    print("✅ 大规模排名正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试跨股票排名引擎")
+    print("=" * 80)
+
+    test_extract_signals()
+    test_rank_with_weights()
+    test_conviction_scales_recommendation()
+    test_symbol_without_analyses()
+    test_rank_hundreds_of_symbols()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+测试工具录制/回放
+使用本地工具集模拟YFinance，无需网络
+"""
+
+import os
+import gzip
+import json
+import time
+import tempfile
+
+from agno.tools import Toolkit
+
+# 导入路径现在由conftest.py统一处理
+
+
+class FakeYFinanceTools(Toolkit):
+    """模拟的行情工具集，记录真实调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+        super().__init__(name="yfinance_tools", tools=[self.get_current_stock_price])
+
+    def get_current_stock_price(self, symbol: str) -> str:
+        """Get the current stock price."""
+        self.calls += 1
+        return f"{symbol}: {100 + self.calls:.2f}"
+
+
+def test_record_then_replay():
+    """测试录制后离线回放"""
+    print("🧪 测试录制和回放")
+    print("=" * 60)
+
+    from src.utils.replay import ToolCassette, ToolReplayer, LatencyModel, CassetteMissError
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tools.json.gz")
+
+        live = FakeYFinanceTools()
+        ToolReplayer(ToolCassette(path), mode="record").wrap_toolkit(live)
+        recorded = live.functions["get_current_stock_price"].entrypoint(symbol="AAPL")
+        assert recorded == "AAPL: 101.00"
+        live.functions["get_current_stock_price"].entrypoint(symbol="KO")
+
+        # 每条录制追加一行，不重写整个文件
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            assert [json.loads(line)["kwargs"]["symbol"] for line in f] == ["AAPL", "KO"]
+
+        # 新进程读取磁带回放，不再调用真实工具
+        offline = FakeYFinanceTools()
+        replayer = ToolReplayer(ToolCassette(path), mode="replay", latency=LatencyModel(kind="none"))
+        replayer.wrap_toolkit(offline)
+        entrypoint = offline.functions["get_current_stock_price"].entrypoint
+        assert entrypoint(symbol="AAPL") == recorded
+        assert entrypoint(symbol="AAPL") == recorded
+        assert offline.calls == 0
+        assert replayer.stats["replayed"] == 2
+
+        try:
+            entrypoint(symbol="MSFT")
+            assert False, "未录制的调用应该报错"
+        except CassetteMissError:
+            pass
+
+        # 版本1的整文件JSON磁带照常读取，save() 压实为JSON行
+        cassette = ToolCassette(path)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": cassette.entries}, f)
+        legacy = ToolCassette(path)
+        assert legacy.entries == cassette.entries
+        legacy.save()
+        assert ToolCassette(path).entries == cassette.entries
+
+    print("✅ 录制和回放正常")
+
+
+def test_latency_models():
+    """测试合成延迟模型"""
+    print("\n🧪 测试合成延迟")
+    print("=" * 60)
+
+    from src.utils.replay import LatencyModel
+
+    assert LatencyModel.parse("fixed:0.2").sample() == 0.2
+    assert LatencyModel.parse("recorded").sample(0.35) == 0.35
+    assert LatencyModel.parse("none").sample(0.35) == 0.0
+
+    uniform = LatencyModel.parse("uniform:0.1,0.3", seed=1)
+    assert all(0.1 <= uniform.sample() <= 0.3 for _ in range(100))
+
+    # 相同种子的对数正态序列可重复
+    a = LatencyModel.parse("lognormal:-1.5,0.5", seed=7)
+    b = LatencyModel.parse("lognormal:-1.5,0.5", seed=7)
+    samples = [a.sample() for _ in range(5)]
+    assert samples == [b.sample() for _ in range(5)]
+    assert all(s > 0 for s in samples)
+
+    print("✅ 合成延迟正常")
+
+
+def test_replay_applies_latency_and_skips_other_toolkits():
+    """测试回放延迟注入，且只包装指定的工具集"""
+    print("\n🧪 测试回放延迟和工具集过滤")
+    print("=" * 60)
+
+    from agno.tools.reasoning import ReasoningTools
+    from src.utils.replay import ToolCassette, ToolReplayer, LatencyModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tools.json.gz")
+        ToolReplayer(ToolCassette(path), mode="record").wrap_toolkit(FakeYFinanceTools()) \
+            .functions["get_current_stock_price"].entrypoint("AAPL")
+
+        replayer = ToolReplayer(ToolCassette(path), mode="replay", latency=LatencyModel.parse("fixed:0.05"))
+        reasoning = ReasoningTools()
+        original = reasoning.functions["think"].entrypoint
+        tools = replayer.wrap_tools([FakeYFinanceTools(), reasoning])
+        assert reasoning.functions["think"].entrypoint is original
+
+        start = time.perf_counter()
+        tools[0].functions["get_current_stock_price"].entrypoint("AAPL")
+        assert time.perf_counter() - start >= 0.05
+
+    print("✅ 回放延迟和工具集过滤正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试工具录制/回放")
+    print("=" * 80)
+
+    test_record_then_replay()
+    test_latency_models()
+    test_replay_applies_latency_and_skips_other_toolkits()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
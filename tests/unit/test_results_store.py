@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+测试分析结果存储：保存多大师分析、最新评分、条件查询、全文检索和取回完整报告
+"""
+
+import os
+import time
+import tempfile
+
+# 导入路径现在由conftest.py统一处理
+
+GRAHAM = "Benjamin Graham价值投资鼻祖"
+BUFFETT = "Warren Buffett价值投资分析师"
+KEYS = {GRAHAM: "benjamin_graham", BUFFETT: "warren_buffett"}
+
+
+def _result(symbol, graham_text, buffett_text="护城河宽阔，长期持有。", failed=False):
+    analyses = [{"agent": GRAHAM, "symbol": symbol, "analysis": graham_text, "style": "价值"},
+                {"agent": BUFFETT, "symbol": symbol, "analysis": buffett_text, "style": "价值",
+                 "structured": {"rating": 8, "recommendation": "买入"}}]
+    if failed:
+        analyses.append({"agent": "Ray Dalio全天候投资分析师", "symbol": symbol, "analysis": "分析失败: 超时", "style": "错误"})
+    return {"symbol": symbol, "selected_masters": ["benjamin_graham", "warren_buffett"], "individual_analyses": analyses,
+            "synthesis": f"## {symbol} 综合报告\n综合评分: 7/10，建议持有。", "analysis_mode": "compressed",
+            "performance": {"total_time": 12.5, "masters_count": 2}}
+
+
+def _signals(result):
+    from src.utils.ranking import RankingEngine
+    frame = RankingEngine().collect_signals({result["symbol"]: result})
+    return {row["source"]: row for row in frame.to_dict("records")}
+
+
+def test_save_latest_and_query():
+    """测试保存后按股票/大师取最新评分、按日期和评分筛选，并取回完整报告"""
+    print("🧪 测试分析结果存储")
+    print("=" * 60)
+
+    from src.storage import AnalysisResultStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnalysisResultStore(os.path.join(tmp, "results.db"))
+        try:
+            day = 86400
+            now = int(time.time())
+            runs = {}
+            for offset, symbol, rating in [(3, "AAPL", 5), (1, "AAPL", 8), (2, "KO", 6), (1, "MSFT", 9)]:
+                result = _result(symbol, f"格雷厄姆数低于股价，安全边际不足。评分: {rating}/10，建议卖出。")
+                runs[(symbol, offset)] = store.save(result, KEYS, _signals(result), created_at=now - offset * day)
+            failed = _result("aapl", "净流动资产充足。评分: 9/10，建议买入。", failed=True)
+            latest_run = store.save(failed, KEYS, _signals(failed), created_at=now)
+
+            latest = store.latest(["AAPL", "KO", "NVDA"], "benjamin_graham")
+            print(f"📊 自选股最新格雷厄姆评分: {[(row['symbol'], row['rating']) for row in latest]}")
+            assert [(row["symbol"], row["rating"], row["recommendation"]) for row in latest] == \
+                [("AAPL", 9.0, "买入"), ("KO", 6.0, "卖出")]
+            assert latest[0]["run_id"] == latest_run
+
+            everything = store.latest()
+            assert {(row["symbol"], row["master"]) for row in everything} >= {("MSFT", "synthesis"), ("KO", "warren_buffett")}
+            assert sorted(store.masters()) == ["benjamin_graham", "synthesis", "warren_buffett"]
+
+            history = store.history("AAPL", "benjamin_graham")
+            assert [row["rating"] for row in history] == [9.0, 8.0, 5.0]
+            recent = store.query(master="benjamin_graham", since=now - 1.5 * day, min_rating=8.5)
+            assert [(row["symbol"], row["rating"]) for row in recent] == [("AAPL", 9.0), ("MSFT", 9.0)]
+            assert store.query(master="synthesis", recommendation="持有", limit=2)[0]["rating"] == 7.0
+
+            run = store.latest_run("AAPL")
+            assert run["run_id"] == latest_run and run["failed_masters"] == ["Ray Dalio全天候投资分析师"]
+            assert [a["master"] for a in run["individual_analyses"]] == ["benjamin_graham", "warren_buffett"]
+            assert run["individual_analyses"][1]["structured"] == {"rating": 8, "recommendation": "买入"}
+            assert "综合评分: 7/10" in run["synthesis"] and run["performance"]["total_time"] == 12.5
+            assert store.latest_run("AAPL", since=now + 60) is None and store.get_run("missing") is None
+
+            assert store.delete_before(now - 1.5 * day) == 2
+            assert [row["rating"] for row in store.history("AAPL", "benjamin_graham")] == [9.0, 8.0]
+        finally:
+            store.close()
+
+    print("✅ 分析结果存储正常")
+
+
+def test_full_text_search():
+    """测试中文全文检索（trigram 索引和短词逐行匹配），删除的分析不再命中"""
+    print("\n🧪 测试全文检索")
+    print("=" * 60)
+
+    from src.storage import AnalysisResultStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnalysisResultStore(os.path.join(tmp, "results.db"))
+        try:
+            assert store.fts_enabled
+            old = store.save(_result("AAPL", "自由现金流稳定增长，估值合理。"), KEYS, created_at=time.time() - 86400 * 10)
+            store.save(_result("KO", "品牌护城河稳固，自由现金流充沛。"), KEYS)
+            store.save(_result("TSLA", "增长故事，缺乏安全边际。", "估值过高"), KEYS)
+
+            hits = store.search("自由现金流")
+            print(f"🔍 命中: {[(row['symbol'], row['snippet']) for row in hits]}")
+            assert [row["symbol"] for row in hits] == ["KO", "AAPL"] and "【自由现金流】" in hits[0]["snippet"]
+            assert [(row["symbol"], row["master"]) for row in store.search("自由现金流 护城河")] == [("KO", "benjamin_graham")]
+            assert [row["master"] for row in store.search("估值", symbol="TSLA")] == ["warren_buffett"]
+            assert [row["symbol"] for row in store.search("估值", master="benjamin_graham")] == ["AAPL"]
+            assert store.search("  ") == [] and store.search('"引号"') == []
+            # 短词逐行匹配时英文不区分大小写，摘录保留原文的大小写
+            store.save(_result("MSFT", "加大 AI 基础设施投入。"), KEYS)
+            assert [row["snippet"] for row in store.search("ai")] == ["加大 【AI】 基础设施投入。"]
+
+            assert store.delete_before(time.time() - 86400) == 1
+            assert [row["symbol"] for row in store.search("自由现金流")] == ["KO"]
+            assert store.get_run(old) is None
+        finally:
+            store.close()
+
+    print("✅ 全文检索正常")
+
+
+def test_latest_uses_covering_index():
+    """测试最新评分查询走 (symbol, master, created_at, rating) 覆盖索引，在上万条记录上保持毫秒级"""
+    print("\n🧪 测试最新评分查询性能")
+    print("=" * 60)
+
+    from src.storage.results import run_results_benchmark, format_benchmark
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run_results_benchmark(os.path.join(tmp, "results.db"), symbols=200, masters=5, runs=10,
+                                       watchlist=30, repeat=5)
+    print(format_benchmark(result))
+    assert result["rows"] == 200 * 10 * 6
+    assert result["latest_watchlist_ms"] < 50 and result["history_ms"] < 50
+
+    print("✅ 最新评分查询正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试分析结果存储")
+    print("=" * 80)
+
+    test_save_latest_and_query()
+    test_full_text_search()
+    test_latest_uses_covering_index()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+测试股票池筛选器
+在合成的大规模因子表上验证规则推导、筛选和排名
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# 导入路径现在由conftest.py统一处理
+
+
+def _load_config():
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    config_file = os.path.join(project_root, "src", "config", "investment_agents_config.yaml")
+    with open(config_file, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def _synthetic_table(n: int = 5000, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    pe = rng.uniform(-5, 60, n)
+    pb = rng.uniform(0.3, 10, n)
+    return pd.DataFrame({
+        "roe": rng.uniform(-0.2, 0.5, n),
+        "roic": rng.uniform(-0.3, 0.8, n),
+        "earnings_yield": rng.uniform(-0.1, 0.25, n),
+        "pe": np.where(pe > 0, pe, np.nan),
+        "pb": pb,
+        "pe_x_pb": np.where(pe > 0, pe * pb, np.nan),
+        "peg": rng.uniform(-1, 4, n),
+        "debt_to_equity": rng.uniform(0, 3, n),
+        "current_ratio": rng.uniform(0.5, 4, n),
+        "graham_margin": rng.uniform(-0.8, 0.6, n),
+        "ncav_per_share": rng.uniform(-20, 20, n),
+        "graham_defensive_score": rng.integers(0, 6, n),
+        "magic_formula_rank": np.arange(n),
+    }, index=[f"S{i:05d}" for i in range(n)])
+
+
+def test_rule_sets_from_framework():
+    """测试从analysis_framework推导规则集"""
+    print("🧪 测试规则集推导")
+    print("=" * 60)
+
+    from src.utils.screener import build_rule_sets
+
+    rule_sets = build_rule_sets(_load_config())
+
+    greenblatt = rule_sets["joel_greenblatt"]
+    assert "magic_formula_metrics" in greenblatt.sources
+    assert greenblatt.rank_by[0] == ("magic_formula_rank", True)
+
+    graham = rule_sets["benjamin_graham"]
+    assert "quantitative_screening" in graham.sources
+    assert any(r.describe() == "pe < 15.0" for r in graham.rules)
+
+    # 没有量化条目的大师退回默认质量排序
+    assert rule_sets["ray_dalio"].rules == []
+    assert rule_sets["ray_dalio"].rank_by == [("roe", False)]
+
+    print("✅ 规则集推导正确")
+
+
+def test_screen_large_universe():
+    """测试在5000只股票上的筛选速度和排名"""
+    print("\n🧪 测试大规模股票池筛选")
+    print("=" * 60)
+
+    from src.utils.screener import UniverseScreener
+
+    screener = UniverseScreener(_load_config())
+    table = _synthetic_table()
+
+    start = time.perf_counter()
+    top = screener.screen_table(table, "joel_greenblatt", top_k=10)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"⚡ 筛选 {len(table)} 只股票耗时 {elapsed_ms:.1f} 毫秒")
+
+    assert len(top) == 10
+    assert (top["roic"] > 0).all() and (top["earnings_yield"] > 0).all()
+    assert top["screen_score"].is_monotonic_decreasing
+    assert elapsed_ms < 1000
+
+    graham = screener.screen_table(table, "benjamin_graham")
+    assert (graham["pe"] > 0).all()
+    assert graham["screen_score"].is_monotonic_decreasing
+
+    print("✅ 大规模筛选正常")
+
+
+def test_custom_screening_rules():
+    """测试配置中的自定义筛选规则"""
+    print("\n🧪 测试自定义筛选规则")
+    print("=" * 60)
+
+    from src.utils.screener import UniverseScreener
+
+    config = _load_config()
+    config["investment_masters"]["peter_lynch"]["screening_rules"] = [
+        {"factor": "peg", "op": "<", "value": 0.5, "required": True},
+    ]
+    result = UniverseScreener(config).screen_table(_synthetic_table(), "peter_lynch")
+
+    assert len(result) > 0
+    assert (result["peg"] < 0.5).all()
+
+    print("✅ 自定义规则生效")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试股票池筛选器")
+    print("=" * 80)
+
+    test_rule_sets_from_framework()
+    test_screen_large_universe()
+    test_custom_screening_rules()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
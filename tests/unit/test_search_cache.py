@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+测试搜索缓存层
+使用本地fixture后端，无需网络
+"""
+
+import json
+import time
+import threading
+
+# 导入路径现在由conftest.py统一处理
+
+FIXTURES = {
+    "news": {
+        "AAPL news": [
+            {"title": "Apple beats estimates", "body": "Apple reported record revenue.",
+             "url": "https://www.example.com/apple-beats?utm_source=ddg", "source": "Example", "date": "2025-05-02T10:00:00"},
+            {"title": "Apple beats estimates", "body": "Apple reported record revenue.",
+             "url": "https://mirror.example.org/apple", "source": "Mirror", "date": "2025-05-02T11:00:00"},
+            {"title": "iPhone demand in China", "body": "Shipments slowed in April.",
+             "url": "https://example.com/iphone-china", "source": "Example", "date": "2025-05-01T08:00:00"},
+        ],
+        "AAPL earnings": [
+            {"title": "Apple beats estimates (update)", "body": "Guidance raised.",
+             "url": "https://example.com/apple-beats/", "source": "Example", "date": "2025-05-02T12:00:00"},
+            {"title": "Services margin hits high", "body": "Services grew 14%.",
+             "url": "https://example.com/services", "source": "Example", "date": "2025-05-03T09:00:00"},
+        ],
+    },
+    "search": {
+        "apple moat": [
+            {"title": "Apple ecosystem", "href": "https://example.com/moat", "body": "Switching costs."},
+        ],
+    },
+}
+
+
+def _make_cache(ttl_seconds=900):
+    from src.utils.search_cache import SearchCache, FixtureSearchBackend
+
+    backend = FixtureSearchBackend(FIXTURES)
+    return SearchCache(backend=backend, ttl_seconds=ttl_seconds), backend
+
+
+def test_query_normalization_and_ttl():
+    """测试查询归一化和TTL"""
+    print("🧪 测试查询归一化和TTL")
+    print("=" * 60)
+
+    from src.utils.search_cache import normalize_query, normalize_url
+
+    assert normalize_query("AAPL latest news") == normalize_query("aapl  News!")
+    assert normalize_query("Apple stock moat", {"apple": "aapl"}) == "aapl moat stock"
+    # 意图词保留在缓存键中：股价查询不会拿到同一股票的新闻缓存
+    assert normalize_query("AAPL stock price") != normalize_query("AAPL news")
+    assert normalize_query("AAPL 最新 股价") != normalize_query("AAPL 新闻")
+    assert normalize_url("https://www.Example.com/a/?utm_source=x#top") == normalize_url("http://example.com/a")
+
+    cache, backend = _make_cache()
+    cache.register_alias("Apple Inc", "AAPL")
+    assert len(cache.get("news", "AAPL news")) == 2  # 转载的相同新闻被去重
+    cache.get("news", "latest aapl news")
+    cache.get("news", "Apple news")
+    assert len(backend.calls) == 1
+    assert cache.stats["hits"] == 2
+
+    expired, backend = _make_cache(ttl_seconds=0)
+    expired.get("search", "apple moat")
+    expired.get("search", "apple moat")
+    assert len(backend.calls) == 2
+
+    print("✅ 归一化和TTL正常")
+
+
+def test_single_flight():
+    """测试并发的相同查询只请求一次"""
+    print("\n🧪 测试single-flight")
+    print("=" * 60)
+
+    from src.utils.search_cache import SearchCache, FixtureSearchBackend
+
+    class SlowBackend(FixtureSearchBackend):
+        def news(self, query, max_results):
+            time.sleep(0.1)
+            return super().news(query, max_results)
+
+    backend = SlowBackend(FIXTURES)
+    cache = SearchCache(backend=backend)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("news", "AAPL news")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(backend.calls) == 1
+    assert cache.stats["coalesced"] == 7
+    assert all(r == results[0] for r in results)
+
+    print("✅ 并发请求已合并")
+
+
+def test_cached_tools_and_news_digest():
+    """测试缓存工具集和共享新闻摘要"""
+    print("\n🧪 测试缓存工具集和新闻摘要")
+    print("=" * 60)
+
+    from src.utils.search_cache import CachedSearchTools, NewsDigestStore
+
+    cache, backend = _make_cache()
+    tools = CachedSearchTools(cache)
+    assert set(tools.functions) == {"duckduckgo_search", "duckduckgo_news"}
+    assert json.loads(tools.duckduckgo_search("Apple moat"))[0]["title"] == "Apple ecosystem"
+
+    store = NewsDigestStore(cache, max_items=8)
+    items = store.get_items("aapl")
+    titles = [item["title"] for item in items]
+    # 两个查询的结果合并后按URL和内容去重
+    assert titles == ["Apple beats estimates", "iPhone demand in China", "Services margin hits high"]
+
+    digest = store.get_digest("AAPL")
+    print(digest)
+    assert digest.splitlines()[0].startswith("- Apple beats estimates（Example | 2025-05-02）")
+
+    # 摘要只构建一次，大师通过工具再次查询时命中缓存
+    calls = len(backend.calls)
+    store.get_digest("AAPL")
+    tools.duckduckgo_news("AAPL latest news")
+    assert len(backend.calls) == calls
+
+    print("✅ 缓存工具集和新闻摘要正常")
+
+
+def test_backend_goes_through_replay():
+    """测试在线后端的请求经过工具回放，新闻摘要在离线回放时不联网"""
+    print("\n🧪 测试搜索后端回放")
+    print("=" * 60)
+
+    import os
+    import tempfile
+    from src.utils.replay import ToolCassette, ToolReplayer, LatencyModel
+    from src.utils.search_cache import DuckDuckGoBackend, NewsDigestStore, SearchCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cassette = ToolCassette(os.path.join(tmp, "tools.json.gz"))
+        recorder = ToolReplayer(cassette, mode="record")
+        for query, results in FIXTURES["news"].items():
+            recorder.wrap_callable("search_backend.news", lambda **kwargs: json.dumps(results[:kwargs["max_results"]])) \
+                (query=query, max_results=8)
+
+        replayer = ToolReplayer(ToolCassette(cassette.path), mode="replay", latency=LatencyModel(kind="none"))
+        store = NewsDigestStore(SearchCache(backend=DuckDuckGoBackend(replayer)), max_items=8)
+        titles = [item["title"] for item in store.get_items("AAPL")]
+        assert titles == ["Apple beats estimates", "iPhone demand in China", "Services margin hits high"]
+        assert replayer.stats == {"recorded": 0, "replayed": 2, "misses": 0}
+
+    print("✅ 搜索后端回放正常")
+
+
+def test_shared_cache_registers_aliases():
+    """测试共享缓存按配置注册公司名别名，公司名查询命中股票代码的缓存"""
+    print("\n🧪 测试共享缓存别名")
+    print("=" * 60)
+
+    import os
+    import tempfile
+    from src.utils import search_cache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture_path = os.path.join(tmp, "search.json")
+        with open(fixture_path, "w", encoding="utf-8") as f:
+            json.dump(FIXTURES, f)
+        config = {"search_cache": {"backend": "fixture", "fixture_path": fixture_path,
+                                   "aliases": {"AAPL": ["Apple Inc", "苹果"], "KO": "Coca-Cola"}}}
+
+        previous = search_cache._shared_cache
+        search_cache._shared_cache = None
+        try:
+            cache = search_cache.get_shared_search_cache(config)
+            assert cache.aliases["apple"] == cache.aliases["苹果"] == "aapl" and cache.aliases["coca"] == "ko"
+            cache.get("news", "AAPL news")
+            cache.get("news", "Apple news")
+            cache.get("news", "苹果 news")
+            assert cache.stats["hits"] == 2 and len(cache.backend.calls) == 1
+        finally:
+            search_cache._shared_cache = previous
+
+    print("✅ 共享缓存别名正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试搜索缓存层")
+    print("=" * 80)
+
+    test_query_normalization_and_ttl()
+    test_single_flight()
+    test_cached_tools_and_news_digest()
+    test_backend_goes_through_replay()
+    test_shared_cache_registers_aliases()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+测试会话JSON列压缩和压缩迁移工具
+"""
+
+import os
+import tempfile
+
+from sqlalchemy import text
+
+# 导入路径现在由conftest.py统一处理
+
+
+def _memory(turns):
+    """模拟带历史的会话：每轮一份几KB的Markdown分析"""
+    analysis = "## 巴菲特视角\n\n护城河、管理层、安全边际。" * 80
+    return {"runs": [{"run_id": f"r{i}", "content": f"第{i}轮\n{analysis}"} for i in range(turns)],
+            "memories": None}
+
+
+def _session(session_id, memory):
+    from agno.storage.session.agent import AgentSession
+    return AgentSession(session_id=session_id, agent_id="buffett", user_id="u1", memory=memory,
+                        session_data={"session_name": session_id})
+
+
+def test_codec_round_trip_and_recent_runs():
+    """测试分帧压缩的往返和只解码最近几条运行记录"""
+    print("🧪 测试压缩编解码")
+    print("=" * 60)
+
+    import json
+    from src.storage.compression import compress_json, decode_json_column, recent_runs, is_compressed
+
+    memory = _memory(6)
+    for value in (memory, memory["runs"], {"summary": "无运行记录"}, "纯文本"):
+        blob = compress_json(value)
+        assert is_compressed(blob) and decode_json_column(blob) == value
+
+    blob = compress_json(memory)
+    raw = json.dumps(memory, ensure_ascii=False)
+    print(f"📦 压缩前 {len(raw.encode('utf-8'))} 字节，压缩后 {len(blob)} 字节")
+    assert len(blob) < len(raw.encode("utf-8")) / 5
+    assert [run["run_id"] for run in recent_runs(blob, 2)] == ["r4", "r5"]
+    # 未压缩的旧数据同样支持
+    assert recent_runs(raw, 2) == recent_runs(blob, 2) and decode_json_column(raw) == memory
+    assert recent_runs(compress_json({"summary": "x"}), 3) == [] and recent_runs(None, 3) == []
+
+    print("✅ 压缩编解码正常")
+
+
+def test_storage_compresses_transparently():
+    """测试会话存储写入时压缩、读取时透明解压，小会话保持JSON文本"""
+    print("\n🧪 测试会话存储透明压缩")
+    print("=" * 60)
+
+    from src.storage import StorageEngine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = StorageEngine(os.path.join(tmp, "agents.db"))
+        try:
+            storage = engine.storage("buffett_agent")
+            storage.upsert(_session("big", _memory(8)))
+            storage.upsert(_session("small", {"runs": [{"run_id": "r0", "content": "你好"}]}))
+            assert [run["run_id"] for run in storage.read_recent_runs("big", 2)] == ["r6", "r7"]
+            assert engine.flush(5)
+
+            with engine.engine.connect() as conn:
+                types = dict(conn.execute(text("SELECT session_id, typeof(memory) FROM buffett_agent")).all())
+            assert types == {"big": "blob", "small": "text"}
+
+            assert storage.read("big").memory == _memory(8)
+            assert storage.read("small").memory["runs"][0]["content"] == "你好"
+            assert [run["run_id"] for run in storage.read_recent_runs("big", 3)] == ["r5", "r6", "r7"]
+            assert len(storage.get_all_sessions()) == 2
+            assert storage.read("big").session_data == {"session_name": "big"}
+        finally:
+            engine.close()
+
+    print("✅ 会话存储透明压缩正常")
+
+
+def test_compression_migration_tool():
+    """测试压缩迁移工具压缩旧数据并报告空间和延迟"""
+    print("\n🧪 测试压缩迁移工具")
+    print("=" * 60)
+
+    from agno.storage.sqlite import SqliteStorage
+    from src.storage import StorageEngine
+    from src.storage.recompress import run_compression_migration, format_report
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "agents.db")
+        legacy = SqliteStorage(table_name="buffett_agent", db_file=db_file)
+        legacy.create()
+        for i in range(20):
+            legacy.upsert(_session(f"s{i}", _memory(5)))
+        legacy.upsert(_session("tiny", {"runs": []}))
+        legacy.db_engine.dispose()
+
+        report = run_compression_migration(db_file, batch_size=7, sample=5, recent=2)
+        print(format_report(report))
+        assert report["compressed"] == {"buffett_agent": 20}
+        assert report["after"]["column_bytes"] < report["before"]["column_bytes"] / 5
+        assert report["after"]["file_bytes"] < report["before"]["file_bytes"]
+
+        assert run_compression_migration(db_file, sample=0)["compressed"] == {}
+
+        engine = StorageEngine(db_file)
+        try:
+            assert engine.storage("buffett_agent").read("s3").memory == _memory(5)
+        finally:
+            engine.close()
+
+    print("✅ 压缩迁移工具正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试会话压缩")
+    print("=" * 80)
+
+    test_codec_round_trip_and_recent_runs()
+    test_storage_compresses_transparently()
+    test_compression_migration_tool()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
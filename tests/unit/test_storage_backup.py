@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+测试会话库在线备份、轮换和恢复
+"""
+
+import os
+import time
+import tempfile
+import threading
+
+# 导入路径现在由conftest.py统一处理
+
+
+def _session(session_id, turn=0, payload=2000):
+    from src.storage.benchmark import _chat_session
+    return _chat_session("buffett", session_id, turn, payload)
+
+
+def test_online_backup_during_writes():
+    """测试写入进行中按页分步备份：得到开始时刻的一致快照、不重新开始、不阻塞写入"""
+    print("🧪 测试在线备份")
+    print("=" * 60)
+
+    import sqlite3
+    import gzip
+    from src.storage import StorageEngine, backup_database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = StorageEngine(os.path.join(tmp, "agents.db"), {"backup": {"dir": os.path.join(tmp, "backups")}})
+        try:
+            storage = engine.storage("buffett_agent")
+            for i in range(300):
+                storage.upsert(_session(f"s{i}"))
+            assert engine.flush(5)
+
+            stop = threading.Event()
+            writes = []
+
+            def writer():
+                turn = 0
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    storage.upsert(_session(f"live{turn % 20}", turn))
+                    writes.append(time.perf_counter() - start)
+                    turn += 1
+                    time.sleep(0.001)
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            try:
+                stats = backup_database(engine.engine, engine.db_file, os.path.join(tmp, "backups"),
+                                        pages_per_step=8, step_sleep_ms=2)
+            finally:
+                stop.set()
+                thread.join()
+            print(f"📊 备份统计: {stats}")
+            assert stats["restarts"] == 0 and stats["steps"] > 1
+            assert stats["file"].endswith(".db.gz") and stats["bytes"] < stats["db_bytes"]
+            assert writes and max(writes) < 1.0
+
+            restored = os.path.join(tmp, "check.db")
+            with gzip.open(stats["file"], "rb") as src, open(restored, "wb") as dst:
+                dst.write(src.read())
+            conn = sqlite3.connect(restored)
+            try:
+                assert conn.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+                assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+                assert conn.execute("SELECT COUNT(*) FROM buffett_agent WHERE session_id LIKE 's%'").fetchone()[0] == 300
+            finally:
+                conn.close()
+        finally:
+            engine.close()
+
+    print("✅ 在线备份正常")
+
+
+def test_service_rotation_and_restore():
+    """测试定时服务的备份间隔和轮换，以及从备份恢复前自动备份当前数据库"""
+    print("\n🧪 测试备份轮换和恢复")
+    print("=" * 60)
+
+    from src.storage import StorageEngine, list_backups, restore_backup
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "agents.db")
+        backup_dir = os.path.join(tmp, "backups")
+        engine = StorageEngine(db_file, {"backup": {"dir": backup_dir, "keep": 2, "step_sleep_ms": 0}})
+        try:
+            storage = engine.storage("buffett_agent")
+            storage.upsert(_session("kept"))
+            assert engine.flush(5)
+            assert engine.backups.next_delay() == 0
+
+            first = engine.backups.run_once()
+            assert 23 * 3600 < engine.backups.next_delay() <= 24 * 3600
+            for _ in range(2):
+                time.sleep(0.01)
+                engine.backups.run_once()
+            backups = list_backups(backup_dir, db_file)
+            assert len(backups) == 2 and first["file"] not in [b["file"] for b in backups]
+            assert engine.metrics()["backup"]["removed"] == [first["file"]]
+
+            storage.upsert(_session("after_backup"))
+            assert engine.flush(5)
+        finally:
+            engine.close()
+
+        result = restore_backup(backups[0]["file"], db_file, backup_dir)
+        print(f"📊 恢复结果: {result}")
+        assert result["safety_backup"] and os.path.exists(backups[0]["file"])
+
+        engine = StorageEngine(db_file)
+        try:
+            storage = engine.storage("buffett_agent")
+            assert storage.read("kept") is not None and storage.read("after_backup") is None
+        finally:
+            engine.close()
+
+        # 恢复前的安全备份包含恢复前的最新会话
+        restore_backup(result["safety_backup"], db_file)
+        engine = StorageEngine(db_file)
+        try:
+            assert engine.storage("buffett_agent").read("after_backup") is not None
+        finally:
+            engine.close()
+
+    print("✅ 备份轮换和恢复正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试会话库备份")
+    print("=" * 80)
+
+    test_online_backup_during_writes()
+    test_service_rotation_and_restore()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+测试共享SQLite存储引擎和会话批量写入
+"""
+
+import os
+import copy
+import tempfile
+
+from sqlalchemy import text
+
+# 导入路径现在由conftest.py统一处理
+
+
+def _session(session_id, turn, agent_id="buffett"):
+    from agno.storage.session.agent import AgentSession
+    return AgentSession(session_id=session_id, agent_id=agent_id, user_id="u1",
+                        memory={"runs": [{"input": f"第{turn}轮"}]}, session_data={"turn": turn})
+
+
+def test_engine_pragmas_and_sharing():
+    """测试WAL、busy_timeout和同一数据库文件共用引擎"""
+    print("🧪 测试共享引擎")
+    print("=" * 60)
+
+    from src.storage import get_storage_engine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "agents.db")
+        config = {"storage": {"db_file": db_file, "pool_size": 3, "busy_timeout_ms": 1234}}
+        engine = get_storage_engine(config)
+        try:
+            assert get_storage_engine(config) is engine
+            assert engine.engine.pool.size() == 3
+
+            with engine.engine.connect() as conn:
+                assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+                assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+
+            buffett = engine.storage("buffett_agent")
+            assert engine.storage("buffett_agent") is buffett
+            assert engine.storage("munger_agent").db_engine is buffett.db_engine is engine.engine
+            assert buffett.table_exists()
+        finally:
+            engine.close()
+
+    print("✅ 共享引擎正常")
+
+
+def test_write_queue_batches_and_reads_own_writes():
+    """测试写入排队合并、读到自己刚写入的会话，以及落盘后其他连接可见"""
+    print("\n🧪 测试会话写入队列")
+    print("=" * 60)
+
+    from agno.storage.sqlite import SqliteStorage
+    from src.storage import StorageEngine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "agents.db")
+        engine = StorageEngine(db_file, {"write_batch_ms": 50})
+        try:
+            storage = engine.storage("buffett_agent")
+            for turn in range(20):
+                storage.upsert(_session("s1", turn))
+            # 尚未落盘时读取返回队列中的最新版本
+            assert storage.read("s1").session_data == {"turn": 19}
+            assert storage.read("s1", user_id="someone-else") is None
+
+            # agno 复制Agent时深拷贝存储，副本仍然共用写入队列
+            replica = copy.deepcopy(storage)
+            assert replica.write_queue is storage.write_queue and replica.db_engine is engine.engine
+            replica.upsert(_session("s2", 0))
+
+            assert engine.flush(5)
+            stats = engine.write_queue.stats
+            print(f"📦 写入统计: {stats}")
+            assert stats["submitted"] == 21 and stats["errors"] == 0
+            assert stats["written"] < stats["submitted"] and stats["coalesced"] > 0
+
+            plain = SqliteStorage(table_name="buffett_agent", db_file=db_file)
+            assert plain.read("s1").session_data == {"turn": 19}
+            assert sorted(storage.get_all_session_ids()) == ["s1", "s2"]
+
+            storage.upsert(_session("s3", 0))
+            storage.delete_session("s3")
+            assert engine.flush(5) and plain.read("s3") is None
+            plain.db_engine.dispose()
+        finally:
+            engine.close()
+
+    print("✅ 会话写入队列正常")
+
+
+def test_write_queue_metrics_and_shutdown_durability():
+    """测试队列深度、提交耗时和落盘延迟指标，以及后台线程停止后关闭时同步写完"""
+    print("\n🧪 测试写入队列指标")
+    print("=" * 60)
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src.storage import StorageEngine, SessionWriteQueue
+    from src.storage.api import create_storage_router
+    from src.storage.write_queue import _STOP
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = StorageEngine(os.path.join(tmp, "agents.db"), {"write_batch_ms": 100})
+        try:
+            storage = engine.storage("buffett_agent")
+            for i in range(5):
+                storage.upsert(_session(f"s{i}", 0))
+            pending = engine.write_queue.metrics()
+            assert pending["queue_depth"] == 5 and pending["oldest_pending_ms"] >= 0
+
+            assert engine.flush(5)
+            metrics = engine.metrics()["write_queue"]
+            print(f"📊 写入队列指标: {metrics}")
+            assert metrics["queue_depth"] == 0 and metrics["batches"] == 1
+            assert metrics["batch_size"]["max"] == 5 and metrics["flush_ms"]["p95"] > 0
+            # 入队立即返回，落盘延迟包含批次收集窗口
+            assert metrics["commit_lag_ms"]["p50"] >= 50 > metrics["submit_ms"]["p95"]
+
+            app = FastAPI()
+            app.include_router(create_storage_router(engine))
+            body = TestClient(app).get("/v1/storage/metrics").json()
+            assert body["write_queue"]["written"] == 5 and body["schema_version"] == engine.schema_version
+
+            # 后台线程已经停止时，关闭队列在当前线程写完剩余会话
+            write_queue = SessionWriteQueue(engine.engine)
+            write_queue._queue.put(_STOP)
+            write_queue._thread.join(5)
+            storage.write_queue = write_queue
+            storage.upsert(_session("late", 3))
+            write_queue.close()
+            storage.write_queue = engine.write_queue
+            assert write_queue.metrics()["queue_depth"] == 0 and storage.read("late").session_data == {"turn": 3}
+        finally:
+            engine.close()
+
+    print("✅ 写入队列指标正常")
+
+
+def test_parallel_chat_benchmark():
+    """测试并发对话负载下共享引擎不丢写入、不报错"""
+    print("\n🧪 测试并发对话负载")
+    print("=" * 60)
+
+    from src.storage.benchmark import run_storage_benchmark, format_results
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [run_storage_benchmark(os.path.join(tmp, f"{mode}.db"), mode, agents=4, chats=12, turns=10,
+                                         payload_bytes=500)
+                   for mode in ("per_agent", "shared")]
+
+    print(format_results(results))
+    shared = results[1]
+    assert shared["errors"] == 0 and shared["persisted_sessions"] == 12
+    assert shared["batches"] < shared["upserts"]
+
+    print("✅ 并发对话负载正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试共享存储引擎")
+    print("=" * 80)
+
+    test_engine_pragmas_and_sharing()
+    test_write_queue_batches_and_reads_own_writes()
+    test_write_queue_metrics_and_shutdown_durability()
+    test_parallel_chat_benchmark()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
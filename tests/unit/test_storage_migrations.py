@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+测试会话库迁移和索引
+"""
+
+import os
+import tempfile
+
+from sqlalchemy import text
+
+# 导入路径现在由conftest.py统一处理
+
+
+def _indexes(engine, table):
+    with engine.connect() as conn:
+        return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=:t"),
+                                {"t": table}).scalars())
+
+
+def _plan(engine, sql):
+    with engine.connect() as conn:
+        return " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def test_startup_migration_indexes_existing_tables():
+    """测试启动迁移为已有的会话表建索引，重复启动不重复执行"""
+    print("🧪 测试启动迁移")
+    print("=" * 60)
+
+    from agno.storage.sqlite import SqliteStorage
+    from src.storage import StorageEngine, create_sqlite_engine
+    from src.storage.migrations import run_migrations
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "agents.db")
+        # 旧版本 Playground 建的表：没有复合索引，也没有 schema_version
+        for table, mode in (("warren_buffett_agent", "agent"), ("buffett_munger_team", "team")):
+            legacy = SqliteStorage(table_name=table, db_file=db_file, mode=mode)
+            legacy.create()
+            legacy.db_engine.dispose()
+        plain = create_sqlite_engine(db_file)
+        with plain.begin() as conn:
+            conn.execute(text("CREATE TABLE notes_agent (id INTEGER PRIMARY KEY, body TEXT)"))
+        plain.dispose()
+
+        engine = StorageEngine(db_file)
+        try:
+            assert engine.schema_version == 2
+            for table in ("warren_buffett_agent", "buffett_munger_team"):
+                assert {f"ix_{table}_user_updated", f"ix_{table}_created_at"} <= _indexes(engine.engine, table)
+            assert not any(name.startswith("ix_") for name in _indexes(engine.engine, "notes_agent"))
+
+            listing = _plan(engine.engine, "SELECT * FROM warren_buffett_agent WHERE user_id = 'u' ORDER BY updated_at DESC")
+            cleanup = _plan(engine.engine, "DELETE FROM warren_buffett_agent WHERE created_at < 1700000000")
+            print(f"🔍 会话列表: {listing}")
+            print(f"🔍 过期清理: {cleanup}")
+            assert "ix_warren_buffett_agent_user_updated" in listing
+            assert "ix_warren_buffett_agent_created_at" in cleanup
+
+            # 迁移之后新建的表同样带索引
+            engine.storage("peter_lynch_agent")
+            assert "ix_peter_lynch_agent_created_at" in _indexes(engine.engine, "peter_lynch_agent")
+
+            assert run_migrations(engine.engine) == []
+        finally:
+            engine.close()
+
+        again = StorageEngine(db_file)
+        try:
+            assert again.schema_version == 2
+        finally:
+            again.close()
+
+    print("✅ 启动迁移正常")
+
+
+def test_new_migrations_applied_once():
+    """测试新增迁移按版本号顺序只执行一次"""
+    print("\n🧪 测试迁移版本")
+    print("=" * 60)
+
+    from src.storage.engine import create_sqlite_engine
+    from src.storage.migrations import MIGRATIONS, Migration, current_version, run_migrations
+
+    calls = []
+    extra = Migration(3, "add_notes", lambda conn: (calls.append(3), conn.execute(text("CREATE TABLE notes (id INTEGER)"))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(os.path.join(tmp, "agents.db"))
+        assert run_migrations(engine, [extra] + MIGRATIONS) == [1, 2, 3]
+        assert run_migrations(engine, MIGRATIONS + [extra]) == []
+        with engine.connect() as conn:
+            assert current_version(conn) == 3
+            names = conn.execute(text("SELECT name FROM schema_version ORDER BY version")).scalars().all()
+        assert names == ["session_indexes", "session_archive", "add_notes"] and calls == [3]
+        engine.dispose()
+
+    print("✅ 迁移版本正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试会话库迁移")
+    print("=" * 80)
+
+    test_startup_migration_indexes_existing_tables()
+    test_new_migrations_applied_once()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
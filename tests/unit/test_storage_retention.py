@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+测试会话保留服务
+"""
+
+import os
+import time
+import tempfile
+
+from sqlalchemy import text
+
+# 导入路径现在由conftest.py统一处理
+
+
+def _seed(engine, table, sessions):
+    """直接写入会话行：sessions 为 (session_id, created_at, updated_at)"""
+    with engine.begin() as conn:
+        conn.execute(text(f'INSERT INTO "{table}" (session_id, user_id, memory, created_at, updated_at) '
+                          "VALUES (:session_id, 'u1', :memory, :created_at, :updated_at)"),
+                     [{"session_id": sid, "memory": f'{{"runs": ["{sid}"]}}', "created_at": created, "updated_at": updated}
+                      for sid, created, updated in sessions])
+
+
+def _ids(engine, table):
+    with engine.connect() as conn:
+        return sorted(conn.execute(text(f'SELECT session_id FROM "{table}"')).scalars())
+
+
+def test_retention_policy_batches_and_archive():
+    """测试按表策略分批清理、按最后活跃时间判断过期，以及压缩归档"""
+    print("🧪 测试会话保留策略")
+    print("=" * 60)
+
+    from src.storage import StorageEngine
+    from src.storage.retention import load_archived_session
+
+    now = time.time()
+    hour = 3600
+    settings = {"retention": {
+        "batch_size": 7, "batch_pause_ms": 0,
+        "default": {"max_age_hours": 24, "archive": True},
+        "tables": {"selector_agent": {"max_age_hours": 1, "archive": False},
+                   "portfolio_agent": {"max_age_hours": 0}},
+    }}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = StorageEngine(os.path.join(tmp, "agents.db"), settings)
+        try:
+            for table in ("buffett_agent", "selector_agent", "portfolio_agent"):
+                engine.storage(table)
+            old = int(now - 48 * hour)
+            _seed(engine.engine, "buffett_agent",
+                  [(f"old{i}", old, None) for i in range(20)]
+                  + [("active", old, int(now - hour)), ("fresh", int(now), None)])
+            _seed(engine.engine, "selector_agent", [("s_old", int(now - 2 * hour), None), ("s_new", int(now), None)])
+            _seed(engine.engine, "portfolio_agent", [("p_old", old, None)])
+
+            stats = engine.retention.run_once(now)
+            print(f"📊 清理统计: {stats}")
+
+            assert stats["deleted"] == {"buffett_agent": 20, "selector_agent": 1}
+            assert stats["archived"] == 20 and stats["batches"] == 3 + 1
+            assert _ids(engine.engine, "buffett_agent") == ["active", "fresh"]
+            assert _ids(engine.engine, "selector_agent") == ["s_new"]
+            assert _ids(engine.engine, "portfolio_agent") == ["p_old"]
+
+            archived = load_archived_session(engine.engine, "buffett_agent", "old3")
+            assert archived["memory"] == '{"runs": ["old3"]}' and archived["created_at"] == old
+            assert load_archived_session(engine.engine, "selector_agent", "s_old") is None
+
+            assert engine.retention.run_once(now)["deleted"] == {}
+        finally:
+            engine.close()
+
+    print("✅ 会话保留策略正常")
+
+
+def test_incremental_vacuum_and_background_thread():
+    """测试新库使用增量回收、checkpoint，以及后台线程定期执行"""
+    print("\n🧪 测试空间回收和后台清理")
+    print("=" * 60)
+
+    from src.storage import StorageEngine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = StorageEngine(os.path.join(tmp, "agents.db"),
+                               {"retention": {"interval_seconds": 0.05, "default": {"archive": False}}})
+        try:
+            with engine.engine.connect() as conn:
+                assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+
+            engine.storage("buffett_agent")
+            old = int(time.time() - 30 * 24 * 3600)
+            with engine.engine.begin() as conn:
+                conn.execute(text("INSERT INTO buffett_agent (session_id, user_id, memory, created_at) "
+                                  "VALUES (:sid, 'u1', :memory, :created)"),
+                             [{"sid": f"s{i}", "memory": "x" * 4000, "created": old} for i in range(50)])
+
+            engine.retention.start()
+            deadline = time.time() + 5
+            while engine.retention.last_run is None and time.time() < deadline:
+                time.sleep(0.02)
+            engine.retention.stop()
+
+            stats = engine.retention.last_run
+            print(f"📊 后台清理统计: {stats}")
+            assert stats["deleted"] == {"buffett_agent": 50}
+            assert stats["vacuumed_pages"] >= 50
+            assert stats["checkpoint"][0] == 0
+            assert _ids(engine.engine, "buffett_agent") == []
+        finally:
+            engine.close()
+
+    print("✅ 空间回收和后台清理正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试会话保留服务")
+    print("=" * 80)
+
+    test_retention_policy_batches_and_archive()
+    test_incremental_vacuum_and_background_thread()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()
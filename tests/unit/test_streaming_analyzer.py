@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试流式分析器的章节并发生成
+使用本地模拟LLM服务器，无需真实模型服务
+"""
+
+import time
+import threading
+
+# 导入路径现在由conftest.py统一处理
+
+ANALYSES = [
+    {"agent": "Warren Buffett价值投资分析师", "symbol": "AAPL",
+     "analysis": "## 投资建议\n建议买入。护城河宽广，ROE持续高于30%。"},
+    {"agent": "Benjamin Graham价值投资分析师", "symbol": "AAPL",
+     "analysis": "## 投资建议\n建议持有。P/E偏高，安全边际不足。"},
+]
+
+
+def test_sections_stream_in_parallel():
+    """测试四个章节并发请求并按顺序组装"""
+    print("🧪 测试章节并发流式生成")
+    print("=" * 60)
+
+    from agno.agent import Agent
+    from src.utils.mock_llm_server import MockLLMServer, MockLLMConfig
+    from src.utils.model_factory import create_model
+    from src.utils.replay import LatencyModel
+    from src.utils.token_manager import TokenManager, StreamingAnalyzer
+
+    config = MockLLMConfig(latency=LatencyModel.parse("fixed:0.2"), tokens_per_second=100,
+                           completion_tokens=20)
+    with MockLLMServer(config) as server:
+        def agent_factory():
+            model = create_model("mock-model", {"model_config": {"base_url": server.base_url}}, api_key="test")
+            return Agent(model=model)
+
+        analyzer = StreamingAnalyzer(TokenManager(), agent_factory=agent_factory)
+
+        tokens = {}
+        lock = threading.Lock()
+
+        def on_token(section, delta):
+            with lock:
+                tokens.setdefault(section, []).append(delta)
+
+        ready_order = []
+        start = time.perf_counter()
+        result = analyzer.stream_multi_master_analysis(
+            "AAPL", ANALYSES, on_token=on_token,
+            on_section=lambda name, text: ready_order.append(name)
+        )
+        elapsed = time.perf_counter() - start
+        print(f"⚡ 四个章节总耗时 {elapsed * 1000:.0f}ms")
+
+        # 每个章节约0.2s首包 + 0.3s输出，串行需要2s以上
+        assert elapsed < 1.8
+        assert server.stats["peak_in_flight"] >= 2
+
+        assert ready_order == StreamingAnalyzer.SECTION_ORDER
+        assert list(result["sections"]) == StreamingAnalyzer.SECTION_ORDER
+        for name in StreamingAnalyzer.SECTION_ORDER:
+            assert result["sections"][name] == "".join(tokens[name])
+            assert result["sections"][name].endswith("tok19")
+            assert result["metrics"][name]["ttft_ms"] >= 200
+            assert result["metrics"][name]["latency_ms"] >= result["metrics"][name]["ttft_ms"] - 50
+
+        total = result["metrics"]["total"]
+        assert total["ttft_ms"] < total["latency_ms"]
+
+    print("✅ 章节并发流式生成正常")
+
+
+def test_prompts_only_without_agent_factory():
+    """测试未提供Agent工厂时只生成提示词"""
+    print("\n🧪 测试仅生成提示词")
+    print("=" * 60)
+
+    from src.utils.token_manager import TokenManager, StreamingAnalyzer
+
+    result = StreamingAnalyzer(TokenManager()).stream_multi_master_analysis("AAPL", ANALYSES)
+    assert list(result["sections"]) == StreamingAnalyzer.SECTION_ORDER
+    assert "AAPL" in result["sections"]["risk_assessment"]
+    assert result["metrics"] == {}
+
+    print("✅ 提示词生成正常")
+
+
+def main():
+    """主测试函数"""
+    print("🚀 开始测试流式分析器")
+    print("=" * 80)
+
+    test_sections_stream_in_parallel()
+    test_prompts_only_without_agent_factory()
+
+    print("\n🎉 所有测试通过！")
+    return True
+
+
+if __name__ == "__main__":
+    main()